@@ -41,12 +41,16 @@ async def clear_cache():
     """Clear all cached data (for maintenance purposes)"""
     try:
         from backend.cache.redis_cache import get_cache_manager
+        from backend.cache.tiered_cache import get_tiered_cache
         cache_manager = get_cache_manager()
         
+        # In-process tier is always cleared; Redis keys too when reachable
+        await get_tiered_cache().clear()
+        
         if not cache_manager.is_available():
             raise HTTPException(
                 status_code=503, 
-                detail="Redis not available - cannot clear cache"
+                detail="Redis not available - cleared in-process cache only"
             )
         
         cache_manager.clear_cache()
@@ -101,3 +105,35 @@ async def get_cache_performance():
     except Exception as e:
         logger.error(f"Error getting cache performance: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/tiers")
+async def get_tiered_cache_stats():
+    """Get L1/L2 hit rates per key family of the two-tier market data cache"""
+    try:
+        from backend.cache.tiered_cache import get_tiered_cache
+        
+        return {
+            "status": "success",
+            **get_tiered_cache().get_stats()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error getting tiered cache stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/single-flight")
+async def get_single_flight_stats():
+    """Get issued vs coalesced broker fetch counts per key family"""
+    try:
+        from backend.cache.single_flight import get_single_flight
+        single_flight = get_single_flight()
+        
+        return {
+            "status": "success",
+            "in_flight": single_flight.in_flight(),
+            "families": single_flight.get_stats()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error getting single-flight stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -8,6 +8,7 @@ from typing import Dict, List, Optional
 from zoneinfo import ZoneInfo
 
 from backend.core.upstox_client import UpstoxClient
+from backend.safety.rate_limiter import Priority
 from backend.core.config import config
 from backend.core.logger import logger
 
@@ -100,7 +101,7 @@ def get_live_market_data():
         
         # Fetch quotes for all indices
         all_instruments = list(INSTRUMENT_KEYS.values())
-        quotes_response = upstox.get_full_market_quote(all_instruments)
+        quotes_response = upstox.get_full_market_quote(all_instruments, priority=Priority.DASHBOARD)
         
         if not quotes_response or quotes_response.get('status') != 'success':
             raise HTTPException(status_code=503, detail="Failed to fetch market quotes from Upstox")
@@ -197,9 +198,8 @@ def get_live_market_data():
         # Try to get max pain data from market data service if available
         if market_data_service:
             try:
-                import asyncio
-                loop = asyncio.get_event_loop()
-                market_state = loop.run_until_complete(market_data_service.get_current_state()) if hasattr(market_data_service, 'get_current_state') else {}
+                snapshot = market_data_service.latest() if hasattr(market_data_service, 'latest') else None
+                market_state = snapshot.state if snapshot else {}
                 
                 # Add max pain to each index if available
                 for symbol in ['NIFTY', 'SENSEX']:
@@ -413,7 +413,7 @@ async def get_option_chain_data(symbol: str, expiry: Optional[str] = None):
             raise HTTPException(status_code=503, detail="Market data service not available - system running in dashboard-only mode")
         
         market_data_service = trading_system.market_data
-        market_state = await market_data_service.get_current_state()
+        market_state = await market_data_service.get_latest_state()
         
         # Get data for requested symbol
         symbol_upper = symbol.upper()
@@ -465,3 +465,38 @@ async def get_option_chain_data(symbol: str, expiry: Optional[str] = None):
         raise HTTPException(status_code=500, detail=f"Error fetching option chain: {str(e)}")
 
 
+
+
+@router.get("/feed-metrics")
+async def get_feed_metrics():
+    """
+    WebSocket feed pipeline health
+    
+    **Returns:**
+    - Frame queue depth, dropped frames and decode lag
+    - Ticks conflated before dispatch
+    - Per-subscriber queue depth, drops and callback lag
+    - Streamed option chain windows and freshness
+    """
+    try:
+        from backend.main import app
+        trading_system = getattr(app.state, 'trading_system', None)
+        market_data_service = getattr(trading_system, 'market_data', None) if trading_system else None
+        market_feed = getattr(market_data_service, 'market_feed', None) if market_data_service else None
+        
+        if not market_feed:
+            raise HTTPException(status_code=503, detail="WebSocket market feed not initialized")
+        
+        return {
+            "status": "success",
+            "data": {
+                **market_feed.get_pipeline_metrics(),
+                "chain_streams": market_data_service.get_chain_stream_stats()
+            }
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching feed metrics: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching feed metrics: {str(e)}")
@@ -8,6 +8,7 @@ from typing import Dict, Any
 from datetime import datetime
 import logging
 from backend.database.database import db
+from backend.safety.rate_limiter import Priority
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/real-time", tags=["real-time"])
@@ -143,7 +144,7 @@ async def get_real_time_metrics():
             
             if client:
                 # Get NIFTY LTP for VWAP
-                nifty_response = client.get_ltp(["NSE_INDEX|Nifty 50"])
+                nifty_response = client.get_ltp(["NSE_INDEX|Nifty 50"], priority=Priority.DASHBOARD)
                 if nifty_response and 'data' in nifty_response:
                     nifty_data = nifty_response['data'].get("NSE_INDEX|Nifty 50", {})
                     nifty_ltp = nifty_data.get('lastPrice', 26000)
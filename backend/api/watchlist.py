@@ -141,7 +141,7 @@ async def get_recommended_strikes(
             raise HTTPException(status_code=503, detail="Market data not available - system running in dashboard-only mode. Please check Upstox connection.")
         
         # Get current market state (same as main trading loop)
-        market_state = await trading_system.market_data.get_current_state()
+        market_state = await trading_system.market_data.get_latest_state()
         
         if not market_state or symbol not in market_state:
             raise HTTPException(status_code=404, detail=f"Market data not available for {symbol}")
@@ -580,7 +580,7 @@ async def get_signal_stats():
         # Get current market data for cleanup
         market_state = {}
         if trading_system and hasattr(trading_system, 'market_data') and trading_system.market_data:
-            market_state = await trading_system.market_data.get_current_state()
+            market_state = await trading_system.market_data.get_latest_state()
         
         # Clean up stale signals
         _cleanup_stale_signals(market_state)
@@ -643,7 +643,7 @@ async def manual_cleanup_stale_signals():
         # Get current market data
         market_state = {}
         if trading_system and hasattr(trading_system, 'market_data') and trading_system.market_data:
-            market_state = await trading_system.market_data.get_current_state()
+            market_state = await trading_system.market_data.get_latest_state()
         
         # Count signals before cleanup
         before_count = len(_active_signals)
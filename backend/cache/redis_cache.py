@@ -7,6 +7,7 @@ Only caches existing spot prices and option chains - no new data
 import json
 import os
 import time
+from collections.abc import Mapping
 from typing import Dict, Optional, Any
 from datetime import datetime, timedelta
 import redis
@@ -15,10 +16,12 @@ from backend.core.logger import get_logger
 logger = get_logger(__name__)
 
 class DateTimeEncoder(json.JSONEncoder):
-    """Custom JSON encoder to handle datetime objects"""
+    """Custom JSON encoder to handle datetime objects and option chain views"""
     def default(self, obj):
         if isinstance(obj, datetime):
             return obj.isoformat()
+        if isinstance(obj, Mapping):
+            return dict(obj)
         return super().default(obj)
 
 class RedisCacheManager:
@@ -0,0 +1,97 @@
+"""
+Single-Flight Request Coalescing
+Concurrent callers asking for the same key share one in-flight fetch
+
+The trading loop, risk loop, market data loop, watchlist API and delta hedger
+all ask MarketDataManager for the same option chains, spot prices and candles.
+When a cache TTL expires they would otherwise stampede the Upstox REST API at
+once. With single-flight only the first caller issues the request; everyone
+else awaits the same result.
+"""
+
+import asyncio
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from backend.core.logger import get_logger
+from backend.monitoring.prometheus_exporter import MetricsExporter
+
+logger = get_logger(__name__)
+
+
+class SingleFlight:
+    """Coalesces concurrent fetches for the same key into one in-flight task"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {'issued': 0, 'coalesced': 0, 'errors': 0}
+        )
+
+    async def do(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Awaitable[Any]],
+        family: Optional[str] = None
+    ) -> Any:
+        """
+        Run fetch() for key, or join the fetch already in flight for key.
+
+        The fetch runs as its own task, so a caller that is cancelled (e.g. by a
+        per-source timeout) does not cancel the request other callers wait on.
+
+        Args:
+            key: Hashable identity of the request, e.g. ('option_chain', 'NIFTY', '2025-11-25')
+            fetch: Zero-argument coroutine factory that performs the real request
+            family: Metrics label; defaults to the first element of a tuple key
+        """
+        family = family or (key[0] if isinstance(key, tuple) and key else str(key))
+
+        task = self._inflight.get(key)
+        if task is not None and not task.done():
+            self._stats[family]['coalesced'] += 1
+            MetricsExporter.record_single_flight(family, 'coalesced')
+            logger.debug(f"Coalesced {family} request for {key}")
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(fetch())
+        self._inflight[key] = task
+        self._stats[family]['issued'] += 1
+        MetricsExporter.record_single_flight(family, 'issued')
+
+        def _on_done(finished: asyncio.Task):
+            if self._inflight.get(key) is finished:
+                del self._inflight[key]
+            if not finished.cancelled() and finished.exception() is not None:
+                # exception() also marks it retrieved when every caller was cancelled
+                self._stats[family]['errors'] += 1
+
+        task.add_done_callback(_on_done)
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        """Number of fetches currently in flight"""
+        return len(self._inflight)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Issued vs coalesced counts per key family"""
+        stats = {}
+        for family, counts in self._stats.items():
+            total = counts['issued'] + counts['coalesced']
+            stats[family] = {
+                **counts,
+                'coalesce_rate': round(counts['coalesced'] / total * 100, 2) if total else 0.0
+            }
+        return stats
+
+
+# Global instance
+_single_flight = None
+
+
+def get_single_flight() -> SingleFlight:
+    """Get global single-flight instance shared by all market data consumers"""
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
@@ -0,0 +1,542 @@
+"""
+Two-Tier Market Data Cache
+L1 bounded in-process LRU with TTL, L2 async Redis with binary encoding
+
+MarketDataManager used to keep unbounded ad-hoc dicts for spot prices and
+option chains next to a synchronous Redis client that JSON-encoded whole chains
+on every write. TieredCache replaces both:
+
+- L1: OrderedDict LRU bounded by entry count; each entry has a fresh TTL and
+  a stale window during which it can still be served while it is refreshed
+- L2: redis.asyncio with binary-encoded (zlib-compressed when large) values,
+  a small header carrying the store time, batched mget/mset through pipelines
+- get_or_load serves stale values while one background task revalidates
+- hit/miss/stale counts per key family (spot, chain, indicators, ...)
+
+L2 values never use pickle, so whoever can write to Redis cannot run code in
+the engine. A value is a JSON document plus raw array buffers: columnar option
+chains travel as their NumPy structured arrays (dtype and shape in the JSON),
+everything else as JSON with tags for datetimes and non-string dict keys.
+Anything else stays in L1 only.
+"""
+
+import asyncio
+import json
+import os
+import struct
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+import redis.asyncio as aioredis
+
+from backend.core.logger import get_logger
+from backend.data.option_chain import OptionChainColumns, OptionSide, OptionSideView
+from backend.monitoring.prometheus_exporter import MetricsExporter
+
+logger = get_logger(__name__)
+
+# (fresh TTL, extra stale window) in seconds per key family
+FAMILY_TTLS = {
+    'spot': (5.0, 5.0),
+    'chain': (10.0, 10.0),
+    'indicators': (30.0, 30.0),
+}
+DEFAULT_TTL = (10.0, 0.0)
+
+_HEADER = struct.Struct('>cd')  # codec, stored_at
+_RAW, _ZLIB = b'J', b'Z'
+_DOC_LENGTH = struct.Struct('>I')  # JSON document length; array buffers follow it
+_TAG = '__t'
+_MISSING = object()
+
+
+# ========== L2 codec ==========
+
+class _Encoder:
+    """Turns a value into a JSON-compatible document plus raw array buffers"""
+
+    def __init__(self):
+        self.buffers: List[bytes] = []
+        self.columns: List[Dict[str, Any]] = []
+        self._column_ids: Dict[int, int] = {}
+
+    def array(self, array: np.ndarray) -> Dict[str, Any]:
+        if array.dtype.hasobject:
+            raise TypeError("object arrays are not stored in L2")
+        array = np.ascontiguousarray(array)
+        self.buffers.append(array.tobytes())
+        return {
+            _TAG: 'nd',
+            'dtype': np.lib.format.dtype_to_descr(array.dtype),
+            'shape': list(array.shape),
+            'buffer': len(self.buffers) - 1
+        }
+
+    def chain_columns(self, columns: OptionChainColumns) -> int:
+        """Index of the chain in the document's column list (calls and puts share one)"""
+        index = self._column_ids.get(id(columns))
+        if index is None:
+            sides = {}
+            for name in ('calls', 'puts'):
+                side = columns.side(name)
+                sides[name] = {
+                    'values': self.array(side.values),
+                    'present': self.array(side.present),
+                    'instrument_keys': [str(key) for key in side.instrument_keys]
+                }
+            self.columns.append({'strikes': self.array(columns.strikes), **sides})
+            index = self._column_ids[id(columns)] = len(self.columns) - 1
+        return index
+
+    def pack(self, value: Any) -> Any:
+        if value is None or isinstance(value, (bool, str, int, float)):
+            return value
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, dict):
+            if all(isinstance(key, str) for key in value) and _TAG not in value:
+                return {key: self.pack(item) for key, item in value.items()}
+            return {_TAG: 'map', 'items': [[self.pack(key), self.pack(item)] for key, item in value.items()]}
+        if isinstance(value, (list, tuple)):
+            return [self.pack(item) for item in value]
+        if isinstance(value, OptionSideView):
+            return {_TAG: 'side', 'option_type': value.option_type, 'columns': self.chain_columns(value.columns)}
+        if isinstance(value, np.ndarray):
+            return self.array(value)
+        if isinstance(value, datetime):
+            return {_TAG: 'datetime', 'value': value.isoformat()}
+        if isinstance(value, date):
+            return {_TAG: 'date', 'value': value.isoformat()}
+        raise TypeError(f"{type(value).__name__} is not stored in L2")
+
+
+class _Decoder:
+    """Inverse of _Encoder over one document's buffers"""
+
+    def __init__(self, buffers: List[memoryview], columns: List[Dict[str, Any]]):
+        self.buffers = buffers
+        self.columns = columns
+        self._decoded_columns: Dict[int, OptionChainColumns] = {}
+
+    def array(self, spec: Dict[str, Any]) -> np.ndarray:
+        dtype = np.lib.format.descr_to_dtype(_descr(spec['dtype']))
+        if dtype.hasobject:
+            raise ValueError("object arrays are not accepted from L2")
+        # Copy so the array is writable and independent of the payload
+        return np.frombuffer(self.buffers[spec['buffer']], dtype=dtype).reshape(spec['shape']).copy()
+
+    def chain_columns(self, index: int) -> OptionChainColumns:
+        columns = self._decoded_columns.get(index)
+        if columns is None:
+            spec = self.columns[index]
+            sides = [
+                OptionSide(
+                    self.array(spec[name]['values']),
+                    self.array(spec[name]['present']),
+                    np.array(spec[name]['instrument_keys'], dtype=object)
+                )
+                for name in ('calls', 'puts')
+            ]
+            columns = self._decoded_columns[index] = OptionChainColumns(self.array(spec['strikes']), *sides)
+        return columns
+
+    def unpack(self, value: Any) -> Any:
+        if isinstance(value, list):
+            return [self.unpack(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        tag = value.get(_TAG)
+        if tag is None:
+            return {key: self.unpack(item) for key, item in value.items()}
+        if tag == 'map':
+            return {_hashable(self.unpack(key)): self.unpack(item) for key, item in value['items']}
+        if tag == 'side':
+            return OptionSideView(self.chain_columns(value['columns']), value['option_type'])
+        if tag == 'nd':
+            return self.array(value)
+        if tag == 'datetime':
+            return datetime.fromisoformat(value['value'])
+        if tag == 'date':
+            return date.fromisoformat(value['value'])
+        raise ValueError(f"Unknown L2 value tag: {tag}")
+
+
+def _descr(descr: Any) -> Any:
+    """JSON turns dtype descr tuples into lists; restore them"""
+    if isinstance(descr, list):
+        return [tuple(_descr(item) for item in field) if isinstance(field, list) else field for field in descr]
+    return descr
+
+
+def _hashable(key: Any) -> Any:
+    return tuple(_hashable(item) for item in key) if isinstance(key, list) else key
+
+
+def encode_value(value: Any, stored_at: float, compress_threshold: int = 1024) -> bytes:
+    """Header + JSON document + array buffers, zlib-compressed when large"""
+    encoder = _Encoder()
+    body = encoder.pack(value)
+    document = json.dumps({
+        'value': body,
+        'columns': encoder.columns,
+        'buffers': [len(buffer) for buffer in encoder.buffers]
+    }, separators=(',', ':')).encode('utf-8')
+    payload = b''.join([_DOC_LENGTH.pack(len(document)), document, *encoder.buffers])
+    codec = _RAW
+    if len(payload) >= compress_threshold:
+        payload = zlib.compress(payload, 1)
+        codec = _ZLIB
+    return _HEADER.pack(codec, stored_at) + payload
+
+
+def decode_value(data: bytes) -> Tuple[Any, float]:
+    """Inverse of encode_value: (value, stored_at)"""
+    codec, stored_at = _HEADER.unpack_from(data)
+    payload = data[_HEADER.size:]
+    if codec == _ZLIB:
+        payload = zlib.decompress(payload)
+    elif codec != _RAW:
+        raise ValueError(f"Unknown L2 codec: {codec!r}")
+    (length,) = _DOC_LENGTH.unpack_from(payload)
+    offset = _DOC_LENGTH.size
+    document = json.loads(payload[offset:offset + length])
+    offset += length
+
+    view = memoryview(payload)
+    buffers = []
+    for size in document['buffers']:
+        buffers.append(view[offset:offset + size])
+        offset += size
+    return _Decoder(buffers, document['columns']).unpack(document['value']), stored_at
+
+
+class LRUTTLCache:
+    """Bounded LRU whose entries expire after a TTL plus an optional stale window"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        # key -> (value, stored_at, fresh_until, stale_until)
+        self._entries: OrderedDict = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: Hashable, now: float) -> Optional[Tuple[Any, float, bool]]:
+        """(value, stored_at, is_fresh), or None when missing or past the stale window"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, stored_at, fresh_until, stale_until = entry
+        if now >= stale_until:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value, stored_at, now < fresh_until
+
+    def set(self, key: Hashable, value: Any, ttl: float, stale_ttl: float, stored_at: float):
+        self._entries[key] = (value, stored_at, stored_at + ttl, stored_at + ttl + stale_ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def newest(self, family: str) -> Optional[float]:
+        """Most recent store time among a family's entries"""
+        times = [entry[1] for key, entry in self._entries.items() if key[0] == family]
+        return max(times) if times else None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TieredCache:
+    """L1 in-process LRU in front of an async Redis L2, with per-family TTLs and metrics"""
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        max_entries: int = 1024,
+        compress_threshold: int = 1024,
+        retry_seconds: float = 30.0
+    ):
+        """
+        Args:
+            redis_url: L2 Redis URL (REDIS_HOST/REDIS_PORT by default)
+            max_entries: L1 capacity
+            compress_threshold: Encoded values at least this large are zlib-compressed in L2
+            retry_seconds: How long L2 is skipped after a Redis error
+        """
+        if redis_url is None:
+            redis_url = f"redis://{os.getenv('REDIS_HOST', 'localhost')}:{os.getenv('REDIS_PORT', '6379')}/0"
+        self.redis_url = redis_url
+        self.l1 = LRUTTLCache(max_entries)
+        self.compress_threshold = compress_threshold
+        self.retry_seconds = retry_seconds
+        self._redis: Optional[aioredis.Redis] = None
+        self._l2_down_until = 0.0
+        self._revalidating: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {'l1_hits': 0, 'l2_hits': 0, 'stale_hits': 0, 'misses': 0, 'sets': 0, 'revalidations': 0}
+        )
+        self.l2_errors = 0
+
+    # ========== Helpers ==========
+
+    @staticmethod
+    def ttls(family: str) -> Tuple[float, float]:
+        return FAMILY_TTLS.get(family, DEFAULT_TTL)
+
+    @staticmethod
+    def _redis_key(family: str, key: str) -> str:
+        return f"cache:{family}:{key}"
+
+    def _count(self, family: str, outcome: str):
+        self._stats[family][outcome] += 1
+        MetricsExporter.record_cache_lookup(family, outcome)
+
+    async def _l2(self) -> Optional[aioredis.Redis]:
+        """Redis client, or None while L2 is unavailable"""
+        if time.time() < self._l2_down_until:
+            return None
+        if self._redis is None:
+            client = aioredis.from_url(self.redis_url, socket_connect_timeout=2, socket_timeout=2)
+            try:
+                await client.ping()
+            except Exception as e:
+                self._l2_failed(e)
+                return None
+            self._redis = client
+            logger.info("✓ Async Redis L2 cache connected")
+        return self._redis
+
+    def _l2_failed(self, error: Exception):
+        self.l2_errors += 1
+        self._l2_down_until = time.time() + self.retry_seconds
+        self._redis = None
+        logger.warning(f"Redis L2 cache unavailable ({error}), using L1 only for {self.retry_seconds:.0f}s")
+
+    def _decode(self, data: Optional[bytes]) -> Optional[Tuple[Any, float]]:
+        if data is None:
+            return None
+        try:
+            return decode_value(data)
+        except Exception as e:
+            logger.debug(f"Undecodable L2 cache entry: {e}")
+            return None
+
+    # ========== Reads ==========
+
+    async def get(self, family: str, key: str, allow_stale: bool = False) -> Optional[Any]:
+        """Fresh value from L1, then L2; with allow_stale also values in the stale window"""
+        value, tier = await self._lookup(family, key)
+        if value is _MISSING or (tier == 'stale_hits' and not allow_stale):
+            self._count(family, 'misses')
+            return None
+        self._count(family, tier)
+        return value
+
+    async def get_or_load(
+        self,
+        family: str,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        store: bool = True
+    ) -> Optional[Any]:
+        """
+        Stale-while-revalidate read
+
+        Fresh values are returned directly; a stale value is returned at once
+        while a single background task reloads it; on a miss the loader is
+        awaited. Loaded values are cached unless store=False (loaders that
+        cache their own result).
+        """
+        value, tier = await self._lookup(family, key)
+        if value is not _MISSING:
+            self._count(family, tier)
+            if tier == 'stale_hits':
+                self._revalidate(family, key, loader, store)
+            return value
+
+        self._count(family, 'misses')
+        loaded = await loader()
+        if loaded is not None and store:
+            await self.set(family, key, loaded)
+        return loaded
+
+    async def _lookup(self, family: str, key: str) -> Tuple[Any, str]:
+        """(value or _MISSING, 'l1_hits' | 'l2_hits' | 'stale_hits' | 'misses')"""
+        now = time.time()
+        hit = self.l1.get((family, key), now)
+        if hit is not None and hit[2]:
+            return hit[0], 'l1_hits'
+
+        ttl, stale_ttl = self.ttls(family)
+        client = await self._l2()
+        if client is not None:
+            try:
+                decoded = self._decode(await client.get(self._redis_key(family, key)))
+            except Exception as e:
+                self._l2_failed(e)
+                decoded = None
+            if decoded is not None and (hit is None or decoded[1] > hit[1]):
+                value, stored_at = decoded
+                if now - stored_at < ttl + stale_ttl:
+                    self.l1.set((family, key), value, ttl, stale_ttl, stored_at)
+                    return value, 'l2_hits' if now - stored_at < ttl else 'stale_hits'
+
+        if hit is not None:
+            return hit[0], 'stale_hits'
+        return _MISSING, 'misses'
+
+    def _revalidate(self, family: str, key: str, loader: Callable[[], Awaitable[Any]], store: bool):
+        task_key = (family, key)
+        task = self._revalidating.get(task_key)
+        if task is not None and not task.done():
+            return
+
+        async def _reload():
+            try:
+                value = await loader()
+                if value is not None and store:
+                    await self.set(family, key, value)
+            except Exception as e:
+                logger.warning(f"Background refresh of {family}:{key} failed: {e}")
+            finally:
+                self._revalidating.pop(task_key, None)
+
+        self._stats[family]['revalidations'] += 1
+        self._revalidating[task_key] = asyncio.ensure_future(_reload())
+
+    async def mget(self, family: str, keys: Iterable[str]) -> Dict[str, Any]:
+        """Fresh values for many keys: L1 first, the rest in one pipelined L2 round trip"""
+        now = time.time()
+        found, remaining = {}, []
+        for key in keys:
+            hit = self.l1.get((family, key), now)
+            if hit is not None and hit[2]:
+                found[key] = hit[0]
+                self._count(family, 'l1_hits')
+            else:
+                remaining.append(key)
+
+        client = await self._l2() if remaining else None
+        if client is not None:
+            ttl, stale_ttl = self.ttls(family)
+            try:
+                pipe = client.pipeline(transaction=False)
+                for key in remaining:
+                    pipe.get(self._redis_key(family, key))
+                results = await pipe.execute()
+            except Exception as e:
+                self._l2_failed(e)
+                results = [None] * len(remaining)
+            still_missing = []
+            for key, data in zip(remaining, results):
+                decoded = self._decode(data)
+                if decoded is not None and now - decoded[1] < ttl:
+                    self.l1.set((family, key), decoded[0], ttl, stale_ttl, decoded[1])
+                    found[key] = decoded[0]
+                    self._count(family, 'l2_hits')
+                else:
+                    still_missing.append(key)
+            remaining = still_missing
+
+        for _ in remaining:
+            self._count(family, 'misses')
+        return found
+
+    # ========== Writes ==========
+
+    async def set(self, family: str, key: str, value: Any, ttl: Optional[float] = None):
+        """Store in L1 and L2"""
+        await self.mset(family, {key: value}, ttl)
+
+    async def mset(self, family: str, values: Dict[str, Any], ttl: Optional[float] = None):
+        """Store many values; the L2 writes go out in one pipeline"""
+        default_ttl, stale_ttl = self.ttls(family)
+        ttl = ttl if ttl is not None else default_ttl
+        now = time.time()
+        for key, value in values.items():
+            self.l1.set((family, key), value, ttl, stale_ttl, now)
+        self._stats[family]['sets'] += len(values)
+
+        client = await self._l2()
+        if client is None:
+            return
+        expire_ms = int((ttl + stale_ttl) * 1000)
+        try:
+            pipe = client.pipeline(transaction=False)
+            for key, value in values.items():
+                pipe.set(self._redis_key(family, key), encode_value(value, now, self.compress_threshold), px=expire_ms)
+            await pipe.execute()
+        except (TypeError, ValueError) as e:
+            logger.debug(f"{family} values kept in L1 only (not serializable: {e})")
+        except Exception as e:
+            self._l2_failed(e)
+
+    async def delete(self, family: str, key: str):
+        self.l1.delete((family, key))
+        client = await self._l2()
+        if client is not None:
+            try:
+                await client.delete(self._redis_key(family, key))
+            except Exception as e:
+                self._l2_failed(e)
+
+    async def clear(self):
+        """Drop all L1 entries and this cache's L2 keys"""
+        self.l1.clear()
+        client = await self._l2()
+        if client is not None:
+            try:
+                keys = [key async for key in client.scan_iter(match="cache:*", count=500)]
+                if keys:
+                    await client.delete(*keys)
+            except Exception as e:
+                self._l2_failed(e)
+
+    # ========== Metrics ==========
+
+    def newest_age(self, family: str) -> Optional[float]:
+        """Seconds since the newest L1 entry of a family was stored"""
+        newest = self.l1.newest(family)
+        return time.time() - newest if newest is not None else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        families = {}
+        for family, counts in self._stats.items():
+            lookups = counts['l1_hits'] + counts['l2_hits'] + counts['stale_hits'] + counts['misses']
+            hits = lookups - counts['misses']
+            families[family] = {
+                **counts,
+                'hit_rate': round(hits / lookups * 100, 2) if lookups else 0.0,
+                'l1_hit_rate': round(counts['l1_hits'] / lookups * 100, 2) if lookups else 0.0
+            }
+        return {
+            'l1_entries': len(self.l1),
+            'l1_capacity': self.l1.max_entries,
+            'l1_evictions': self.l1.evictions,
+            'l2_available': self._redis is not None,
+            'l2_errors': self.l2_errors,
+            'families': families
+        }
+
+
+# Global instance
+_tiered_cache = None
+
+
+def get_tiered_cache() -> TieredCache:
+    """Get global two-tier cache shared by market data consumers"""
+    global _tiered_cache
+    if _tiered_cache is None:
+        _tiered_cache = TieredCache()
+    return _tiered_cache
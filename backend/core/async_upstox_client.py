@@ -0,0 +1,473 @@
+"""
+Async Upstox API Client
+Non-blocking counterpart of UpstoxClient for use inside the event loop.
+
+Every coroutine in the engine (trading loop, risk loop, feed listener, FastAPI
+handlers) shares one event loop, so a blocking `requests` call stalls all of
+them. This client keeps the same method surface as UpstoxClient but is built on
+a pooled keep-alive `httpx.AsyncClient`, with per-call deadlines and async
+retries that never block the loop. Every call goes through the shared
+priority rate limiter (backend.safety.rate_limiter).
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Optional, Set
+
+import httpx
+
+from backend.core.logger import get_logger
+from backend.core.upstox_client import (
+    UPSTOX_BASE_URL,
+    INTRADAY_INTERVAL_MAP,
+    HISTORICAL_TIMEFRAME_MAP,
+    build_option_instrument_key,
+    retry_after_seconds,
+)
+from backend.safety.rate_limiter import Priority, endpoint_family, get_rate_limiter
+from backend.data.market_recorder import get_market_recorder
+
+logger = get_logger(__name__)
+
+RETRYABLE_STATUS_CODES = {500, 502, 503, 504}
+
+
+class AsyncUpstoxClient:
+    """Async Upstox API Client with pooled connections, deadlines and retries"""
+
+    def __init__(
+        self,
+        access_token: str,
+        base_url: str = UPSTOX_BASE_URL,
+        timeout: float = 10.0,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        max_retries: int = 3
+    ):
+        self.access_token = access_token
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Accept": "application/json"
+        }
+
+        # Endpoint budgets and priority queue shared with the sync client
+        self.rate_limiter = get_rate_limiter()
+        # Raw payload log for replay (no-op unless recording is started)
+        self.recorder = get_market_recorder()
+
+        # Pooled keep-alive connections shared by every coroutine
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=30.0
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+
+        logger.info("Async Upstox client initialized with pooled keep-alive connections")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Lazily create the underlying httpx client inside the running loop"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                limits=self.limits,
+                timeout=self.timeout
+            )
+        return self._client
+
+    async def _make_request(
+        self,
+        method: str,
+        endpoint: str,
+        params: dict = None,
+        data: dict = None,
+        timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        priority: Optional[Priority] = None
+    ) -> Optional[Dict]:
+        """
+        Make HTTP request to Upstox API with rate limiting and async retries
+
+        Args:
+            timeout: Per-attempt timeout in seconds (defaults to client timeout)
+            deadline: Total budget in seconds across all attempts and backoffs
+            max_retries: Retry attempts for 429, 5xx, timeouts and connection errors
+            priority: Rate limiter priority (defaults by endpoint family)
+        """
+        method = method.upper()
+        if method not in ("GET", "POST", "PUT", "DELETE"):
+            logger.error(f"Unsupported HTTP method: {method}")
+            return None
+
+        attempt_timeout = timeout if timeout is not None else self.timeout
+        retries = self.max_retries if max_retries is None else max_retries
+        family = endpoint_family(endpoint)
+        started = time.monotonic()
+
+        def remaining() -> Optional[float]:
+            if deadline is None:
+                return None
+            return deadline - (time.monotonic() - started)
+
+        for retry_count in range(retries + 1):
+            budget = remaining()
+            if budget is not None and budget <= 0:
+                logger.error(f"Deadline of {deadline}s exceeded for {endpoint}")
+                return None
+
+            await self.rate_limiter.acquire(family, priority)
+
+            per_call = attempt_timeout if budget is None else max(0.1, min(attempt_timeout, budget))
+            wait_time = None
+
+            try:
+                response = await self.client.request(
+                    method,
+                    endpoint,
+                    params=params,
+                    json=data if method != "GET" else None,
+                    timeout=per_call
+                )
+
+                if response.status_code == 200:
+                    self.rate_limiter.on_success(family)
+                    payload = response.json()
+                    self.recorder.record_rest(method, endpoint, params, data, payload)
+                    return payload
+                elif response.status_code == 429:
+                    # Limiter cuts the budget and pauses it for every caller
+                    wait_time = self.rate_limiter.on_rate_limited(family, retry_after_seconds(response.headers))
+                    logger.warning(f"Rate limit exceeded for {endpoint} (retry {retry_count + 1}/{retries})")
+                elif response.status_code in RETRYABLE_STATUS_CODES:
+                    wait_time = 2 ** retry_count
+                    logger.warning(f"Server error {response.status_code} for {endpoint} (retry {retry_count + 1}/{retries})")
+                else:
+                    logger.error(f"API request failed: {response.status_code} - {response.text}")
+                    return None
+
+            except httpx.TimeoutException:
+                wait_time = 2 ** retry_count  # Exponential backoff for timeouts
+                logger.error(f"Request timeout for {endpoint} after {per_call:.1f}s")
+            except httpx.ConnectError as e:
+                # DNS failures surface as ConnectError - use a longer backoff
+                wait_time = 3 + (2 ** retry_count)
+                logger.warning(f"Connection error for {endpoint}: {e}")
+            except Exception as e:
+                logger.error(f"Request error for {endpoint}: {e}")
+                return None
+
+            if retry_count >= retries:
+                break
+
+            budget = remaining()
+            if budget is not None:
+                if budget <= wait_time:
+                    logger.error(f"Deadline of {deadline}s leaves no room to retry {endpoint}")
+                    return None
+            await asyncio.sleep(wait_time)
+
+        logger.error(f"Max retries ({retries}) reached for {endpoint}")
+        return None
+
+    # ========== Market Data APIs ==========
+
+    async def get_historical_candles(
+        self,
+        instrument_key: str,
+        interval: str,
+        from_date: str,
+        to_date: str,
+        priority: Optional[Priority] = None
+    ) -> Optional[Dict]:
+        """
+        Get historical candle data
+        interval: 1minute, 30minute, day, week, month
+        """
+        endpoint = f"/v2/historical-candle/{instrument_key}/{interval}/{to_date}/{from_date}"
+        return await self._make_request("GET", endpoint, priority=priority)
+
+    async def get_intraday_candles(
+        self,
+        instrument_key: str,
+        interval: str,
+        priority: Optional[Priority] = None
+    ) -> Optional[Dict]:
+        """
+        Get intraday candle data (V3 API)
+        interval: 1minute, 5minute, 15minute, 30minute, 1hour, 1day
+        """
+        if interval not in INTRADAY_INTERVAL_MAP:
+            logger.error(f"Unsupported interval: {interval}")
+            return None
+
+        unit, interval_value = INTRADAY_INTERVAL_MAP[interval]
+        endpoint = f"/v3/historical-candle/intraday/{instrument_key}/{unit}/{interval_value}"
+        return await self._make_request("GET", endpoint, priority=priority)
+
+    async def get_historical_candle_data(
+        self,
+        instrument_key: str,
+        timeframe: str,
+        start_date: str = None,
+        end_date: str = None,
+        priority: Optional[Priority] = None
+    ) -> Optional[Dict]:
+        """
+        Get historical candle data (V3 API)
+        timeframe: 1minute, 5minute, 15minute, 30minute, 1hour, 1day
+        start_date/end_date: Format YYYY-MM-DD (optional for intraday)
+        """
+        if timeframe not in HISTORICAL_TIMEFRAME_MAP:
+            logger.error(f"Unsupported timeframe: {timeframe}")
+            return None
+
+        api_type, unit, interval = HISTORICAL_TIMEFRAME_MAP[timeframe]
+
+        params = None
+        if api_type == 'intraday':
+            endpoint = f"/v3/historical-candle/intraday/{instrument_key}/{unit}/{interval}"
+        else:  # daily
+            endpoint = f"/v3/historical-candle/day/{instrument_key}/{interval}"
+            if start_date and end_date:
+                params = {"from": start_date, "to": end_date}
+
+        result = await self._make_request("GET", endpoint, params=params, priority=priority)
+
+        if result and 'data' in result:
+            return result
+
+        return None
+
+    async def get_multi_day_historical_data(
+        self,
+        instrument_key: str,
+        days: int = 30,
+        timeframe: str = '1day',
+        priority: Optional[Priority] = None
+    ) -> Optional[Dict]:
+        """Get multiple days of historical data for ML training"""
+        from datetime import datetime, timedelta
+
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
+
+        return await self.get_historical_candle_data(
+            instrument_key,
+            timeframe,
+            start_date.strftime('%Y-%m-%d'),
+            end_date.strftime('%Y-%m-%d'),
+            priority=priority
+        )
+
+    async def get_full_market_quote(self, instrument_keys: List[str], priority: Optional[Priority] = None) -> Optional[Dict]:
+        """Get full market quotes for instruments"""
+        params = {"symbol": ",".join(instrument_keys)}
+        return await self._make_request("GET", "/v2/market-quote/quotes", params=params, priority=priority)
+
+    async def get_ohlc(self, instrument_keys: List[str], priority: Optional[Priority] = None) -> Optional[Dict]:
+        """Get OHLC data for instruments"""
+        params = {"symbol": ",".join(instrument_keys)}
+        return await self._make_request("GET", "/v2/market-quote/ohlc", params=params, priority=priority)
+
+    async def get_ltp(self, instrument_keys: List[str], priority: Optional[Priority] = None) -> Optional[Dict]:
+        """Get Last Traded Price for instruments"""
+        params = {"symbol": ",".join(instrument_keys)}
+        return await self._make_request("GET", "/v2/market-quote/ltp", params=params, priority=priority)
+
+    async def get_option_chain(
+        self,
+        instrument_key: str,
+        expiry_date: str,
+        priority: Optional[Priority] = None
+    ) -> Optional[Dict]:
+        """
+        Get option chain data
+        instrument_key: e.g., NSE_INDEX|Nifty 50
+        expiry_date: YYYY-MM-DD
+        """
+        params = {
+            "instrument_key": instrument_key,
+            "expiry_date": expiry_date
+        }
+        # Option chain is data-heavy: longer per-attempt timeout, bounded total deadline
+        return await self._make_request(
+            "GET", "/v2/option/chain", params=params, timeout=15.0, deadline=30.0, priority=priority
+        )
+
+    async def get_option_contracts(
+        self,
+        symbol: str,
+        instrument_key: str
+    ) -> Optional[Dict]:
+        """Get available option contracts for a symbol"""
+        params = {
+            "symbol": symbol,
+            "instrument_key": instrument_key
+        }
+        return await self._make_request("GET", "/v2/option/contract", params=params)
+
+    async def authorize_market_feed(self) -> Optional[Dict]:
+        """Get authorization (redirect URI) for the V3 market data feed"""
+        return await self._make_request("GET", "/v3/feed/market-data-feed/authorize")
+
+    # ========== Order Management APIs ==========
+
+    async def place_order(
+        self,
+        instrument_token: str,
+        quantity: int,
+        transaction_type: str,  # BUY or SELL
+        order_type: str,  # MARKET or LIMIT
+        price: float = 0,
+        product: str = "I",  # I=Intraday, D=Delivery
+        validity: str = "DAY",
+        disclosed_quantity: int = 0,
+        trigger_price: float = 0,
+        priority: Priority = Priority.ORDER
+    ) -> Optional[Dict]:
+        """Place an order (exits pass Priority.EXIT to jump the rate limit queue)"""
+        data = {
+            "quantity": quantity,
+            "product": product,
+            "validity": validity,
+            "price": price,
+            "tag": "algo_trading",
+            "instrument_token": instrument_token,
+            "order_type": order_type,
+            "transaction_type": transaction_type,
+            "disclosed_quantity": disclosed_quantity,
+            "trigger_price": trigger_price,
+            "is_amo": False
+        }
+        # Orders are not idempotent - never retry on ambiguous failures
+        return await self._make_request("POST", "/v2/order/place", data=data, max_retries=0, priority=priority)
+
+    async def modify_order(
+        self,
+        order_id: str,
+        quantity: Optional[int] = None,
+        price: Optional[float] = None,
+        order_type: Optional[str] = None,
+        validity: Optional[str] = None,
+        trigger_price: Optional[float] = None,
+        priority: Priority = Priority.ORDER
+    ) -> Optional[Dict]:
+        """Modify an existing order"""
+        data = {"order_id": order_id}
+        if quantity is not None:
+            data["quantity"] = quantity
+        if price is not None:
+            data["price"] = price
+        if order_type is not None:
+            data["order_type"] = order_type
+        if validity is not None:
+            data["validity"] = validity
+        if trigger_price is not None:
+            data["trigger_price"] = trigger_price
+
+        # Not idempotent either - a timed-out modify may have been applied
+        return await self._make_request("PUT", "/v2/order/modify", data=data, max_retries=0, priority=priority)
+
+    async def cancel_order(self, order_id: str, priority: Priority = Priority.ORDER) -> Optional[Dict]:
+        """Cancel an order"""
+        return await self._make_request(
+            "DELETE", "/v2/order/cancel", data={"order_id": order_id}, max_retries=0, priority=priority
+        )
+
+    async def get_order_details(self, order_id: str) -> Optional[Dict]:
+        """Get order details"""
+        return await self._make_request("GET", "/v2/order/details", params={"order_id": order_id})
+
+    async def get_order_book(self) -> Optional[Dict]:
+        """Get all orders for the day"""
+        return await self._make_request("GET", "/v2/order/retrieve-all")
+
+    # ========== Position & Portfolio APIs ==========
+
+    async def get_positions(self) -> Optional[Dict]:
+        """Get current positions"""
+        return await self._make_request("GET", "/v2/portfolio/short-term-positions")
+
+    async def get_holdings(self) -> Optional[Dict]:
+        """Get holdings"""
+        return await self._make_request("GET", "/v2/portfolio/long-term-holdings")
+
+    # ========== Account & Margin APIs ==========
+
+    async def get_funds(self) -> Optional[Dict]:
+        """Get fund and margin details"""
+        return await self._make_request("GET", "/v2/user/get-funds-and-margin")
+
+    async def get_profile(self) -> Optional[Dict]:
+        """Get user profile"""
+        return await self._make_request("GET", "/v2/user/profile")
+
+    # ========== Utility Methods ==========
+
+    def get_instrument_key(self, exchange: str, symbol: str, expiry: str, strike: float, option_type: str) -> str:
+        """Generate instrument key for options (pure string formatting, no I/O)"""
+        return build_option_instrument_key(exchange, symbol, expiry, strike, option_type)
+
+    async def test_connection(self) -> bool:
+        """Test API connection"""
+        profile = await self.get_profile()
+        if profile and profile.get('status') == 'success':
+            logger.info("✓ Async Upstox API connection successful")
+            return True
+        logger.error("✗ Async Upstox API connection failed")
+        return False
+
+    async def close(self):
+        """Close pooled connections"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("Async Upstox client closed")
+        self._client = None
+
+
+# Global instance (one connection pool per process)
+_async_client: Optional[AsyncUpstoxClient] = None
+# Close tasks of replaced clients (referenced until done)
+_closing: Set[asyncio.Task] = set()
+
+
+def _close_replaced(client: Optional[AsyncUpstoxClient]):
+    """Close the connection pool of a client that is no longer shared"""
+    if client is None or client._client is None or client._client.is_closed:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if loop is not None:
+        task = loop.create_task(client.close())
+        _closing.add(task)
+        task.add_done_callback(_closing.discard)
+        return
+    try:
+        asyncio.run(client.close())
+    except Exception as e:
+        logger.debug(f"Could not close replaced async Upstox client: {e}")
+
+
+def set_async_upstox_client(client: AsyncUpstoxClient):
+    """Replace the shared async client (e.g. with a replay client)"""
+    global _async_client
+    if client is not _async_client:
+        _close_replaced(_async_client)
+    _async_client = client
+
+
+def get_async_upstox_client(access_token: str) -> AsyncUpstoxClient:
+    """Get the shared async Upstox client, recreating it when the token changes"""
+    global _async_client
+    if _async_client is None or _async_client.access_token != access_token:
+        _close_replaced(_async_client)
+        _async_client = AsyncUpstoxClient(access_token)
+    return _async_client
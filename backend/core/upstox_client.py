@@ -3,6 +3,7 @@ Upstox API Client
 Wrapper for Upstox v2 API with rate limiting and error handling
 """
 
+import os
 import time
 import requests
 from requests.adapters import HTTPAdapter
@@ -10,52 +11,89 @@ from urllib3.util.retry import Retry
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 from backend.core.logger import get_logger
+from backend.data.instrument_master import get_instrument_master
+from backend.data.market_recorder import get_market_recorder
+from backend.safety.rate_limiter import Priority, endpoint_family, get_rate_limiter
 
 logger = get_logger(__name__)
 
-class UpstoxRateLimiter:
-    """Simple rate limiter for Upstox API calls"""
+# Overridable to point the engine at a local stand-in (backend.simulator)
+UPSTOX_BASE_URL = os.getenv("UPSTOX_BASE_URL", "https://api.upstox.com")
+
+# V3 intraday candle intervals: interval -> (unit, interval value)
+INTRADAY_INTERVAL_MAP = {
+    '1minute': ('minutes', 1),
+    '5minute': ('minutes', 5),
+    '15minute': ('minutes', 15),
+    '30minute': ('minutes', 30),
+    '1hour': ('hours', 1),
+    '1day': ('days', 1)
+}
+
+# V3 historical candle timeframes: timeframe -> (api type, unit, interval value)
+HISTORICAL_TIMEFRAME_MAP = {
+    '1minute': ('intraday', 'minutes', 1),
+    '5minute': ('intraday', 'minutes', 5),
+    '15minute': ('intraday', 'minutes', 15),
+    '30minute': ('intraday', 'minutes', 30),
+    '1hour': ('intraday', 'hours', 1),
+    '1day': ('day', 'days', 1)
+}
+
+
+def build_option_instrument_key(exchange: str, symbol: str, expiry: str, strike: float, option_type: str) -> str:
+    """
+    Generate instrument key for options
+    Resolved from the local instrument master, else formatted as
+    NSE_FO|NIFTY24DEC2024C24000
+    """
+    instrument_key = get_instrument_master().option_key(symbol, expiry, strike, option_type)
+    if instrument_key:
+        return instrument_key
     
-    def __init__(self, max_requests_per_second: int = 3):
-        self.max_requests_per_second = max_requests_per_second
-        self.requests = []
-        
-    def wait_if_needed(self):
-        """Wait if we've exceeded the rate limit"""
-        now = time.time()
-        # Remove requests older than 1 second
-        self.requests = [req_time for req_time in self.requests if now - req_time < 1.0]
-        
-        # If we're at the limit, wait
-        if len(self.requests) >= self.max_requests_per_second:
-            sleep_time = 1.0 - (now - self.requests[0])
-            if sleep_time > 0:
-                time.sleep(sleep_time)
-        
-        self.requests.append(now)
+    # Format expiry as DDMMMYYYY
+    expiry_dt = datetime.strptime(expiry, "%Y-%m-%d")
+    expiry_str = expiry_dt.strftime("%d%b%Y").upper()
+    
+    # Format strike price (remove decimal if whole number)
+    strike_str = str(int(strike)) if strike == int(strike) else str(strike)
+    
+    return f"{exchange}_FO|{symbol}{expiry_str}{option_type}{strike_str}"
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """Retry-After of a 429 response in seconds (None when absent or an HTTP date)"""
+    try:
+        value = headers.get("Retry-After")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
 
 class UpstoxClient:
     """Upstox API Client with rate limiting"""
     
     def __init__(self, access_token: str):
         self.access_token = access_token
-        self.base_url = "https://api.upstox.com"
+        self.base_url = UPSTOX_BASE_URL
         self.headers = {
             "Authorization": f"Bearer {access_token}",
             "Accept": "application/json"
         }
         
-        # Initialize rate limiter (3 requests per second for safety)
-        self.rate_limiter = UpstoxRateLimiter(max_requests_per_second=3)
+        # Endpoint budgets and priority queue shared with the async client
+        self.rate_limiter = get_rate_limiter()
+        # Raw payload log for replay (no-op unless recording is started)
+        self.recorder = get_market_recorder()
         
         # Create session with connection pooling and DNS caching
         self.session = requests.Session()
         
-        # Configure retry strategy
+        # Configure retry strategy (429s are left to the rate limiter)
         retry_strategy = Retry(
             total=3,
             backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
+            status_forcelist=[500, 502, 503, 504],
         )
         
         # Configure HTTP adapter with connection pooling
@@ -75,12 +113,13 @@ class UpstoxClient:
         
         logger.info("Upstox client initialized with connection pooling and DNS caching")
         
-    def _make_request(self, method: str, endpoint: str, params: dict = None, data: dict = None, retry_count: int = 0, max_retries: int = 3):
+    def _make_request(self, method: str, endpoint: str, params: dict = None, data: dict = None, retry_count: int = 0, max_retries: int = 3, priority: Optional[Priority] = None):
         """Make HTTP request to Upstox API with rate limiting"""
         url = f"{self.base_url}{endpoint}"
+        family = endpoint_family(endpoint)
         
         # Apply rate limiting before making request
-        self.rate_limiter.wait_if_needed()
+        self.rate_limiter.acquire_blocking(family, priority)
         
         try:
             if method.upper() == "GET":
@@ -96,16 +135,19 @@ class UpstoxClient:
                 return None
                 
             if response.status_code == 200:
-                return response.json()
+                self.rate_limiter.on_success(family)
+                payload = response.json()
+                self.recorder.record_rest(method, endpoint, params, data, payload)
+                return payload
             elif response.status_code == 429:
+                wait_time = self.rate_limiter.on_rate_limited(family, retry_after_seconds(response.headers))
                 if retry_count >= max_retries:
                     logger.error(f"Rate limit exceeded, max retries ({max_retries}) reached for {endpoint}")
                     return None
                     
-                wait_time = min(5 * (2 ** retry_count), 30)  # Exponential backoff, max 30s
-                logger.warning(f"Rate limit exceeded, waiting {wait_time}s (retry {retry_count + 1}/{max_retries})...")
+                logger.warning(f"Rate limit exceeded, waiting {wait_time:.1f}s (retry {retry_count + 1}/{max_retries})...")
                 time.sleep(wait_time)
-                return self._make_request(method, endpoint, params, data, retry_count + 1, max_retries)
+                return self._make_request(method, endpoint, params, data, retry_count + 1, max_retries, priority)
             else:
                 logger.error(f"API request failed: {response.status_code} - {response.text}")
                 return None
@@ -116,7 +158,7 @@ class UpstoxClient:
                 wait_time = 2 ** retry_count  # Exponential backoff for timeouts
                 logger.warning(f"Retrying after timeout in {wait_time}s (retry {retry_count + 1}/{max_retries})...")
                 time.sleep(wait_time)
-                return self._make_request(method, endpoint, params, data, retry_count + 1, max_retries)
+                return self._make_request(method, endpoint, params, data, retry_count + 1, max_retries, priority)
             return None
         except requests.exceptions.ConnectionError as e:
             # Handle DNS resolution failures specifically
@@ -125,7 +167,7 @@ class UpstoxClient:
                     wait_time = 3 + (2 ** retry_count)  # Longer backoff for DNS issues
                     logger.warning(f"DNS resolution failed for {endpoint}, retrying in {wait_time}s (retry {retry_count + 1}/{max_retries})...")
                     time.sleep(wait_time)
-                    return self._make_request(method, endpoint, params, data, retry_count + 1, max_retries)
+                    return self._make_request(method, endpoint, params, data, retry_count + 1, max_retries, priority)
                 logger.error(f"DNS resolution failed permanently for {endpoint}: {e}")
             else:
                 logger.error(f"Connection error for {endpoint}: {e}")
@@ -161,21 +203,11 @@ class UpstoxClient:
         
         Maps to V3 API: /v3/historical-candle/intraday/{instrument_key}/{unit}/{interval}
         """
-        # Map interval to unit and interval for V3 API
-        interval_map = {
-            '1minute': ('minutes', 1),
-            '5minute': ('minutes', 5),
-            '15minute': ('minutes', 15),
-            '30minute': ('minutes', 30),
-            '1hour': ('hours', 1),
-            '1day': ('days', 1)
-        }
-        
-        if interval not in interval_map:
+        if interval not in INTRADAY_INTERVAL_MAP:
             logger.error(f"Unsupported interval: {interval}")
             return None
         
-        unit, interval_value = interval_map[interval]
+        unit, interval_value = INTRADAY_INTERVAL_MAP[interval]
         endpoint = f"/v3/historical-candle/intraday/{instrument_key}/{unit}/{interval_value}"
         return self._make_request("GET", endpoint)
     
@@ -194,21 +226,11 @@ class UpstoxClient:
         Maps to V3 API: /v3/historical-candle/intraday/{instrument_key}/{unit}/{interval}
         or /v3/historical-candle/day/{instrument_key}/{interval} for daily data
         """
-        # Map timeframe to unit and interval
-        timeframe_map = {
-            '1minute': ('intraday', 'minutes', 1),
-            '5minute': ('intraday', 'minutes', 5),
-            '15minute': ('intraday', 'minutes', 15),
-            '30minute': ('intraday', 'minutes', 30),
-            '1hour': ('intraday', 'hours', 1),
-            '1day': ('day', 'days', 1)
-        }
-        
-        if timeframe not in timeframe_map:
+        if timeframe not in HISTORICAL_TIMEFRAME_MAP:
             logger.error(f"Unsupported timeframe: {timeframe}")
             return None
         
-        api_type, unit, interval = timeframe_map[timeframe]
+        api_type, unit, interval = HISTORICAL_TIMEFRAME_MAP[timeframe]
         
         if api_type == 'intraday':
             endpoint = f"/v3/historical-candle/intraday/{instrument_key}/{unit}/{interval}"
@@ -254,26 +276,26 @@ class UpstoxClient:
             end_date.strftime('%Y-%m-%d')
         )
     
-    def get_full_market_quote(self, instrument_keys: List[str]) -> Optional[Dict]:
+    def get_full_market_quote(self, instrument_keys: List[str], priority: Optional[Priority] = None) -> Optional[Dict]:
         """Get full market quotes for instruments"""
         symbol_string = ",".join(instrument_keys)
         endpoint = "/v2/market-quote/quotes"
         params = {"symbol": symbol_string}
-        return self._make_request("GET", endpoint, params=params)
+        return self._make_request("GET", endpoint, params=params, priority=priority)
     
-    def get_ohlc(self, instrument_keys: List[str]) -> Optional[Dict]:
+    def get_ohlc(self, instrument_keys: List[str], priority: Optional[Priority] = None) -> Optional[Dict]:
         """Get OHLC data for instruments"""
         symbol_string = ",".join(instrument_keys)
         endpoint = "/v2/market-quote/ohlc"
         params = {"symbol": symbol_string}
-        return self._make_request("GET", endpoint, params=params)
+        return self._make_request("GET", endpoint, params=params, priority=priority)
     
-    def get_ltp(self, instrument_keys: List[str]) -> Optional[Dict]:
+    def get_ltp(self, instrument_keys: List[str], priority: Optional[Priority] = None) -> Optional[Dict]:
         """Get Last Traded Price for instruments"""
         symbol_string = ",".join(instrument_keys)
         endpoint = "/v2/market-quote/ltp"
         params = {"symbol": symbol_string}
-        return self._make_request("GET", endpoint, params=params)
+        return self._make_request("GET", endpoint, params=params, priority=priority)
     
     def get_option_chain(
         self,
@@ -292,15 +314,19 @@ class UpstoxClient:
         }
         # Use longer timeout for option chain (15 seconds) as it's data-heavy
         try:
-            self.rate_limiter.wait_if_needed()
+            self.rate_limiter.acquire_blocking('option_chain')
             url = f"{self.base_url}{endpoint}"
             response = self.session.get(url, params=params, timeout=15)
             
             if response.status_code == 200:
-                return response.json()
+                self.rate_limiter.on_success('option_chain')
+                payload = response.json()
+                self.recorder.record_rest("GET", endpoint, params, None, payload)
+                return payload
             elif response.status_code == 429:
-                logger.warning(f"Rate limit for option chain, waiting 5s...")
-                time.sleep(5)
+                wait_time = self.rate_limiter.on_rate_limited('option_chain', retry_after_seconds(response.headers))
+                logger.warning(f"Rate limit for option chain, waiting {wait_time:.1f}s...")
+                time.sleep(wait_time)
                 return self.get_option_chain(instrument_key, expiry_date)
             else:
                 logger.error(f"Option chain API failed: {response.status_code} - {response.text}")
@@ -442,14 +468,7 @@ class UpstoxClient:
         Generate instrument key for options
         Format: NSE_FO|NIFTY24DEC2024C24000
         """
-        # Format expiry as DDMMMYYYY
-        expiry_dt = datetime.strptime(expiry, "%Y-%m-%d")
-        expiry_str = expiry_dt.strftime("%d%b%Y").upper()
-        
-        # Format strike price (remove decimal if whole number)
-        strike_str = str(int(strike)) if strike == int(strike) else str(strike)
-        
-        return f"{exchange}_FO|{symbol}{expiry_str}{option_type}{strike_str}"
+        return build_option_instrument_key(exchange, symbol, expiry, strike, option_type)
     
     def test_connection(self, max_retries: int = 3, retry_delay: float = 2.0) -> bool:
         """
@@ -486,27 +505,3 @@ class UpstoxClient:
         if hasattr(self, 'session'):
             self.session.close()
             logger.info("Upstox client session closed")
-
-
-class RateLimiter:
-    """Simple rate limiter for API calls"""
-    
-    def __init__(self, max_calls: int = 10, time_window: float = 1.0):
-        self.max_calls = max_calls
-        self.time_window = time_window
-        self.calls = []
-        
-    def wait_if_needed(self):
-        """Wait if rate limit would be exceeded"""
-        now = time.time()
-        
-        # Remove old calls outside time window
-        self.calls = [call_time for call_time in self.calls if now - call_time < self.time_window]
-        
-        if len(self.calls) >= self.max_calls:
-            sleep_time = self.time_window - (now - self.calls[0]) + 0.1
-            if sleep_time > 0:
-                time.sleep(sleep_time)
-                self.calls = []
-        
-        self.calls.append(time.time())
@@ -0,0 +1,264 @@
+"""
+Tick Candle Aggregator
+Builds rolling 1m/5m/15m/1h OHLCV+OI bars per instrument from WebSocket ticks
+
+Multi-timeframe indicators, session VWAP and the 1-minute history used by the
+ML strategy used to re-download intraday candles from REST on every state
+build. The aggregator is seeded once from the 1-minute intraday candles (the
+higher timeframes are rolled up from them) and then kept current by every
+decoded feed tick, so consumers read candles from memory for the rest of the
+session.
+
+Bars are aligned to the 09:15 IST session open like Upstox candles, kept in
+fixed-size ring buffers, and served oldest-first in the Upstox row format
+[timestamp, open, high, low, close, volume, oi].
+"""
+
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from backend.core.logger import get_data_logger
+from backend.core.timezone_utils import IST
+from backend.data.feed_decoder import FeedTick
+
+logger = get_data_logger()
+
+# Bar length in seconds per supported timeframe
+TIMEFRAME_SECONDS = {
+    '1minute': 60,
+    '5minute': 300,
+    '15minute': 900,
+    '1hour': 3600,
+}
+
+IST_OFFSET_SECONDS = 19800  # +05:30
+SESSION_OPEN_SECONDS = 9 * 3600 + 15 * 60  # 09:15 IST
+
+
+def bucket_start(epoch: float, interval: int) -> int:
+    """Start (epoch seconds) of the bar containing epoch, aligned to the 09:15 IST open"""
+    local = int(epoch) + IST_OFFSET_SECONDS
+    day_start = local - local % 86400
+    offset = local - day_start - SESSION_OPEN_SECONDS
+    return day_start + SESSION_OPEN_SECONDS + (offset // interval) * interval - IST_OFFSET_SECONDS
+
+
+def _parse_timestamp(value) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return value / 1000.0 if value > 1e11 else float(value)
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=IST)
+    return parsed.timestamp()
+
+
+class CandleSeries:
+    """Ring buffer of completed bars plus the bar currently forming for one timeframe"""
+
+    __slots__ = ('interval', 'bars', 'current')
+
+    def __init__(self, interval: int, capacity: int):
+        self.interval = interval
+        # Each bar: [start_epoch, open, high, low, close, volume, oi]
+        self.bars = deque(maxlen=capacity)
+        self.current: Optional[list] = None
+
+    def update(self, epoch: float, open_: float, high: float, low: float, close: float, volume: float, oi: float) -> Optional[list]:
+        """
+        Merge a tick (open=high=low=close) or a finer bar into the series
+
+        Returns:
+            The bar that was closed by this update, if any
+        """
+        start = bucket_start(epoch, self.interval)
+        current = self.current
+        if current is not None and start == current[0]:
+            if high > current[2]:
+                current[2] = high
+            if low < current[3]:
+                current[3] = low
+            current[4] = close
+            current[5] += volume
+            current[6] = oi
+        elif current is None or start > current[0]:
+            if current is not None:
+                self.bars.append(current)
+            self.current = [start, open_, high, low, close, volume, oi]
+            return current
+        # Late data for an already closed bar is ignored
+        return None
+
+    def __len__(self) -> int:
+        return len(self.bars) + (1 if self.current is not None else 0)
+
+    def rows(self, limit: Optional[int] = None) -> List[list]:
+        rows = list(self.bars)
+        if self.current is not None:
+            rows.append(self.current)
+        return rows[-limit:] if limit else rows
+
+
+class CandleAggregator:
+    """Per-instrument multi-timeframe candles fed by the market feed tick stream"""
+
+    def __init__(self, capacity: int = 500, max_idle_seconds: float = 300.0):
+        """
+        Args:
+            capacity: Bars kept per instrument and timeframe
+            max_idle_seconds: Candles are not served once an instrument has had
+                no tick for this long (consumers fall back to REST)
+        """
+        self.capacity = capacity
+        self.max_idle_seconds = max_idle_seconds
+        self._series: Dict[str, Dict[str, CandleSeries]] = {}
+        self._last_volume: Dict[str, float] = {}
+        self._last_update: Dict[str, float] = {}
+        self._bar_listeners: List[Callable[[str, list], None]] = []
+        self.ticks_applied = 0
+
+    # ========== Feeding ==========
+
+    def track(self, instrument_key: str):
+        """Start keeping candles for an instrument (ticks for untracked keys are ignored)"""
+        if instrument_key not in self._series:
+            self._series[instrument_key] = {
+                timeframe: CandleSeries(interval, self.capacity)
+                for timeframe, interval in TIMEFRAME_SECONDS.items()
+            }
+
+    def is_tracked(self, instrument_key: str) -> bool:
+        return instrument_key in self._series
+
+    def add_bar_listener(self, listener: Callable[[str, list], None]):
+        """Call listener(instrument_key, bar) for every closed 1-minute bar"""
+        if listener not in self._bar_listeners:
+            self._bar_listeners.append(listener)
+
+    def _update_series(self, instrument_key: str, series: Dict[str, CandleSeries], *bar):
+        for timeframe, candle_series in series.items():
+            closed = candle_series.update(*bar)
+            if closed is not None and timeframe == '1minute':
+                for listener in self._bar_listeners:
+                    try:
+                        listener(instrument_key, closed)
+                    except Exception as e:
+                        logger.error(f"Candle bar listener failed for {instrument_key}: {e}")
+
+    def seed(self, instrument_key: str, candles: Iterable) -> int:
+        """
+        Seed an instrument from 1-minute REST candles (any order, Upstox row format)
+
+        Returns:
+            Number of 1-minute bars applied
+        """
+        self.track(instrument_key)
+        parsed = []
+        for candle in candles:
+            if not isinstance(candle, (list, tuple)) or len(candle) < 5:
+                continue
+            epoch = _parse_timestamp(candle[0])
+            if epoch is None:
+                continue
+            volume = float(candle[5]) if len(candle) > 5 else 0.0
+            oi = float(candle[6]) if len(candle) > 6 else 0.0
+            parsed.append((epoch, float(candle[1]), float(candle[2]), float(candle[3]), float(candle[4]), volume, oi))
+
+        parsed.sort(key=lambda bar: bar[0])
+        series = self._series[instrument_key]
+        for bar in parsed:
+            self._update_series(instrument_key, series, *bar)
+
+        if parsed:
+            self._last_update[instrument_key] = max(self._last_update.get(instrument_key, 0.0), parsed[-1][0])
+        return len(parsed)
+
+    def on_tick(self, instrument_key: str, tick: FeedTick):
+        """Apply one decoded tick to every timeframe (called for each tick, before conflation)"""
+        series = self._series.get(instrument_key)
+        if series is None or not tick.ltp:
+            return
+
+        epoch = tick.ltt / 1000.0 if tick.ltt else tick.received_at
+        price = tick.ltp
+
+        # vtt is cumulative for the day; bar volume is its increase
+        volume = 0.0
+        if tick.volume:
+            previous = self._last_volume.get(instrument_key)
+            if previous is not None:
+                volume = tick.volume - previous if tick.volume >= previous else tick.volume
+            self._last_volume[instrument_key] = tick.volume
+
+        oi = tick.oi or 0.0
+        self._update_series(instrument_key, series, epoch, price, price, price, price, volume, oi)
+        self._last_update[instrument_key] = tick.received_at
+        self.ticks_applied += 1
+
+    # ========== Reading ==========
+
+    def is_live(self, instrument_key: str, now: Optional[float] = None) -> bool:
+        """Seeded and ticking recently enough to replace REST candles"""
+        last = self._last_update.get(instrument_key)
+        if last is None:
+            return False
+        now = now if now is not None else datetime.now().timestamp()
+        return now - last <= self.max_idle_seconds
+
+    def get_series(self, instrument_key: str, timeframe: str) -> Optional[CandleSeries]:
+        """Live CandleSeries for incremental consumers, or None when not live"""
+        series = self._series.get(instrument_key, {}).get(timeframe)
+        if series is None or not len(series) or not self.is_live(instrument_key):
+            return None
+        return series
+
+    def get_candles(self, instrument_key: str, timeframe: str, limit: Optional[int] = None) -> Optional[List[list]]:
+        """
+        Candles oldest-first in the Upstox row format, or None when not live
+
+        Rows are [ISO timestamp (IST), open, high, low, close, volume, oi].
+        """
+        series = self._series.get(instrument_key, {}).get(timeframe)
+        if series is None or not len(series) or not self.is_live(instrument_key):
+            return None
+        return [
+            [datetime.fromtimestamp(bar[0], IST).isoformat(), bar[1], bar[2], bar[3], bar[4], int(bar[5]), int(bar[6])]
+            for bar in series.rows(limit)
+        ]
+
+    def get_arrays(self, instrument_key: str, timeframe: str, limit: Optional[int] = None) -> Optional[Dict[str, np.ndarray]]:
+        """Candles as column arrays (start, open, high, low, close, volume, oi), or None when not live"""
+        series = self._series.get(instrument_key, {}).get(timeframe)
+        if series is None or not len(series) or not self.is_live(instrument_key):
+            return None
+        data = np.array(series.rows(limit), dtype=np.float64)
+        return {
+            name: data[:, i]
+            for i, name in enumerate(('start', 'open', 'high', 'low', 'close', 'volume', 'oi'))
+        }
+
+    def get_stats(self) -> Dict[str, Dict]:
+        return {
+            key: {
+                'live': self.is_live(key),
+                'bars': {timeframe: len(candle_series) for timeframe, candle_series in series.items()}
+            }
+            for key, series in self._series.items()
+        }
+
+
+# Global instance
+_candle_aggregator = None
+
+
+def get_candle_aggregator() -> CandleAggregator:
+    """Get global candle aggregator shared by indicators, VWAP and market data"""
+    global _candle_aggregator
+    if _candle_aggregator is None:
+        _candle_aggregator = CandleAggregator()
+    return _candle_aggregator
@@ -0,0 +1,180 @@
+"""
+Market Feed Decoder
+Fast path from Upstox V3 protobuf frames to compact per-instrument tick records
+
+MessageToDict builds a full dict tree for every frame (and every depth level),
+which dominated feed processing. decode_feed_response reads LTP, LTT, volume,
+OI, IV, top-of-book, depth and Greeks straight off the protobuf message into
+FeedTick records; the dict form is only built on demand via FeedTick.to_dict().
+"""
+
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from backend.data.proto import MarketDataFeedV3_pb2 as pb
+
+
+class FeedTick:
+    """
+    Latest decoded state of one instrument from a single feed message
+
+    Fields the message did not carry (e.g. Greeks on an index feed) are None.
+    get() gives dict-style access so callbacks written for the old feed dicts
+    keep working (tick.get('ltp'), tick.get('delta', 0)).
+    """
+
+    __slots__ = (
+        'instrument_key', 'mode', 'ltp', 'ltt', 'ltq', 'close_price',
+        'volume', 'oi', 'iv', 'atp', 'total_buy_qty', 'total_sell_qty',
+        'bid_price', 'bid_qty', 'ask_price', 'ask_qty',
+        'delta', 'gamma', 'theta', 'vega', 'rho',
+        'received_at', '_feed'
+    )
+
+    def __init__(self, instrument_key: str, feed: Any, received_at: float):
+        self.instrument_key = instrument_key
+        self.mode = None
+        self.ltp = self.ltt = self.ltq = self.close_price = None
+        self.volume = self.oi = self.iv = self.atp = None
+        self.total_buy_qty = self.total_sell_qty = None
+        self.bid_price = self.bid_qty = self.ask_price = self.ask_qty = None
+        self.delta = self.gamma = self.theta = self.vega = self.rho = None
+        self.received_at = received_at
+        self._feed = feed
+
+    def get(self, name: str, default: Any = None) -> Any:
+        value = getattr(self, name, None) if name in self.__slots__ else None
+        return default if value is None else value
+
+    def __getitem__(self, name: str) -> Any:
+        value = self.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.received_at)
+
+    @property
+    def depth(self) -> Tuple[Tuple[float, int, float, int], ...]:
+        """Full market depth as (bid_price, bid_qty, ask_price, ask_qty) per level"""
+        market_ff = _market_full_feed(self._feed)
+        if market_ff is None or not market_ff.HasField('marketLevel'):
+            return ()
+        return tuple((q.bidP, q.bidQ, q.askP, q.askQ) for q in market_ff.marketLevel.bidAskQuote)
+
+    def to_dict(self) -> Dict:
+        """Original feed message as a dict (debugging only - slow)"""
+        from google.protobuf.json_format import MessageToDict
+        return MessageToDict(self._feed)
+
+    def __repr__(self) -> str:
+        return f"FeedTick({self.instrument_key}, ltp={self.ltp}, mode={self.mode})"
+
+
+def _market_full_feed(feed: Any) -> Optional[Any]:
+    if feed.WhichOneof('FeedUnion') != 'fullFeed':
+        return None
+    full_feed = feed.fullFeed
+    return full_feed.marketFF if full_feed.WhichOneof('FullFeedUnion') == 'marketFF' else None
+
+
+def _apply_ltpc(tick: FeedTick, ltpc: Any):
+    tick.ltp = ltpc.ltp
+    tick.ltt = ltpc.ltt
+    tick.ltq = ltpc.ltq
+    tick.close_price = ltpc.cp
+
+
+def _apply_greeks(tick: FeedTick, greeks: Any):
+    tick.delta = greeks.delta
+    tick.gamma = greeks.gamma
+    tick.theta = greeks.theta
+    tick.vega = greeks.vega
+    tick.rho = greeks.rho
+
+
+def _apply_quote(tick: FeedTick, quote: Any):
+    tick.bid_price = quote.bidP
+    tick.bid_qty = quote.bidQ
+    tick.ask_price = quote.askP
+    tick.ask_qty = quote.askQ
+
+
+def decode_feed(instrument_key: str, feed: Any, received_at: Optional[float] = None) -> FeedTick:
+    """Decode one pb.Feed into a FeedTick without building intermediate dicts"""
+    tick = FeedTick(instrument_key, feed, received_at if received_at is not None else time.time())
+    union = feed.WhichOneof('FeedUnion')
+    tick.mode = union
+
+    if union == 'ltpc':
+        _apply_ltpc(tick, feed.ltpc)
+
+    elif union == 'fullFeed':
+        full_feed = feed.fullFeed
+        if full_feed.WhichOneof('FullFeedUnion') == 'marketFF':
+            market_ff = full_feed.marketFF
+            _apply_ltpc(tick, market_ff.ltpc)
+            tick.volume = market_ff.vtt
+            tick.oi = market_ff.oi
+            tick.iv = market_ff.iv
+            tick.atp = market_ff.atp
+            tick.total_buy_qty = market_ff.tbq
+            tick.total_sell_qty = market_ff.tsq
+            if market_ff.HasField('optionGreeks'):
+                _apply_greeks(tick, market_ff.optionGreeks)
+            if market_ff.HasField('marketLevel') and market_ff.marketLevel.bidAskQuote:
+                _apply_quote(tick, market_ff.marketLevel.bidAskQuote[0])
+        else:
+            _apply_ltpc(tick, full_feed.indexFF.ltpc)
+
+    elif union == 'firstLevelWithGreeks':
+        first_level = feed.firstLevelWithGreeks
+        _apply_ltpc(tick, first_level.ltpc)
+        tick.volume = first_level.vtt
+        tick.oi = first_level.oi
+        tick.iv = first_level.iv
+        if first_level.HasField('optionGreeks'):
+            _apply_greeks(tick, first_level.optionGreeks)
+        if first_level.HasField('firstDepth'):
+            _apply_quote(tick, first_level.firstDepth)
+
+    return tick
+
+
+def decode_feed_response(buffer: bytes, received_at: Optional[float] = None) -> Dict[str, FeedTick]:
+    """Parse a websocket frame and decode every instrument feed it carries"""
+    response = pb.FeedResponse()
+    response.ParseFromString(buffer)
+    if received_at is None:
+        received_at = time.time()
+    return {key: decode_feed(key, feed, received_at) for key, feed in response.feeds.items()}
+
+
+def extract_ltp(feed_data: Any) -> Optional[float]:
+    """Last traded price from a FeedTick or a legacy MessageToDict feed dict"""
+    if isinstance(feed_data, FeedTick):
+        return feed_data.ltp or None
+
+    for container in ("ff", "fullFeed"):
+        full_feed = feed_data.get(container)
+        if not full_feed:
+            continue
+        for feed_type in ("marketFF", "indexFF"):
+            ltpc = full_feed.get(feed_type, {}).get("ltpc", {})
+            if "ltp" in ltpc:
+                return float(ltpc["ltp"])
+
+    if "ltp" in feed_data.get("ltpc", {}):
+        return float(feed_data["ltpc"]["ltp"])
+
+    # Fallback to last traded price if available
+    if "ltp" in feed_data:
+        return float(feed_data["ltp"])
+
+    return None
@@ -0,0 +1,284 @@
+"""
+Vectorized Black-Scholes Greeks
+Prices, Greeks and implied volatility for whole option chains and position
+books in one NumPy pass
+
+Every input broadcasts, so the same function reprices a chain (one spot, one
+expiry, arrays of strikes/IVs) or a position book (arrays of everything).
+Units match the Upstox option_greeks payload: theta per calendar day, vega and
+rho per 1 percentage point.
+"""
+
+from datetime import date, datetime, time
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+from scipy.special import ndtr
+
+from backend.core.timezone_utils import IST, now_ist
+
+DEFAULT_RISK_FREE_RATE = 0.07
+DEFAULT_IV = 0.20
+
+# Index options settle at the 15:30 IST close of the expiry session
+EXPIRY_CUTOFF = time(15, 30)
+
+# Floors that keep d1/d2 finite at expiry or with a zero IV quote
+MIN_TIME_TO_EXPIRY = 1e-6  # ~30 seconds in years
+MIN_SIGMA = 0.01
+
+# Broker IV is treated as stale when it misprices the option by more than this
+IV_PRICE_TOLERANCE = 0.05  # 5% of the market price...
+MIN_PRICE_TOLERANCE = 0.50  # ...or 10 ticks, whichever is larger
+
+# IV solver: converged within IV_SOLVER_TOLERANCE of the price (at least
+# IV_SOLVER_MIN_TOLERANCE); below MIN_VEGA the price does not pin sigma down
+IV_SOLVER_TOLERANCE = 1e-4
+IV_SOLVER_MIN_TOLERANCE = 1e-6
+MIN_VEGA = 1e-6  # Price change per 1.0 of sigma
+
+SECONDS_PER_YEAR = 365.0 * 24 * 3600
+_INV_SQRT_2PI = 1.0 / np.sqrt(2.0 * np.pi)
+
+GREEK_FIELDS = ('delta', 'gamma', 'theta', 'vega', 'rho')
+
+
+def time_to_expiry(
+    expiry: Union[str, date, datetime, None],
+    now: Optional[datetime] = None,
+    cutoff: time = EXPIRY_CUTOFF
+) -> float:
+    """
+    Year fraction until the expiry session closes (15:30 IST)
+
+    Args:
+        expiry: Expiry as 'YYYY-MM-DD', date or datetime
+        now: Reference time (defaults to now in IST)
+        cutoff: Expiry time of day when expiry carries no time
+
+    Returns:
+        Time to expiry in years, floored at MIN_TIME_TO_EXPIRY
+    """
+    if not expiry:
+        return MIN_TIME_TO_EXPIRY
+
+    if isinstance(expiry, str):
+        expiry = datetime.strptime(expiry[:10], "%Y-%m-%d")
+    if not isinstance(expiry, datetime):
+        expiry = datetime.combine(expiry, time())
+    if expiry.time() == time():
+        expiry = datetime.combine(expiry.date(), cutoff)
+    if expiry.tzinfo is None:
+        expiry = expiry.replace(tzinfo=IST)
+
+    now = now or now_ist()
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=IST)
+
+    return max((expiry - now).total_seconds() / SECONDS_PER_YEAR, MIN_TIME_TO_EXPIRY)
+
+
+def _norm_pdf(x: np.ndarray) -> np.ndarray:
+    return _INV_SQRT_2PI * np.exp(-0.5 * x * x)
+
+
+def black_scholes(
+    spot,
+    strike,
+    t,
+    sigma,
+    is_call,
+    rate: float = DEFAULT_RISK_FREE_RATE
+) -> Dict[str, np.ndarray]:
+    """
+    Black-Scholes price and Greeks for any broadcastable inputs
+
+    Args:
+        spot: Underlying price(s)
+        strike: Strike(s)
+        t: Time to expiry in years
+        sigma: Volatility as a decimal (0.15 = 15%)
+        is_call: Boolean array, True for calls and False for puts
+        rate: Risk-free rate as a decimal
+
+    Returns:
+        Dict of arrays: price, delta, gamma, theta, vega, rho
+    """
+    spot = np.asarray(spot, dtype=np.float64)
+    strike = np.asarray(strike, dtype=np.float64)
+    t = np.maximum(np.asarray(t, dtype=np.float64), MIN_TIME_TO_EXPIRY)
+    sigma = np.maximum(np.asarray(sigma, dtype=np.float64), MIN_SIGMA)
+    is_call = np.asarray(is_call, dtype=bool)
+
+    sqrt_t = np.sqrt(t)
+    sigma_sqrt_t = sigma * sqrt_t
+    d1 = (np.log(spot / strike) + (rate + 0.5 * sigma * sigma) * t) / sigma_sqrt_t
+    d2 = d1 - sigma_sqrt_t
+
+    # Calls use N(d), puts N(-d); sign flips the put terms
+    sign = np.where(is_call, 1.0, -1.0)
+    nd1 = ndtr(sign * d1)
+    nd2 = ndtr(sign * d2)
+    pdf_d1 = _norm_pdf(d1)
+    discounted_strike = strike * np.exp(-rate * t)
+
+    return {
+        'price': sign * (spot * nd1 - discounted_strike * nd2),
+        'delta': sign * nd1,
+        'gamma': pdf_d1 / (spot * sigma_sqrt_t),
+        'theta': (-spot * pdf_d1 * sigma / (2 * sqrt_t) - sign * rate * discounted_strike * nd2) / 365,
+        'vega': spot * pdf_d1 * sqrt_t / 100,
+        'rho': sign * discounted_strike * t * nd2 / 100,
+    }
+
+
+def chain_greeks(
+    strikes: np.ndarray,
+    call_iv: np.ndarray,
+    put_iv: np.ndarray,
+    spot: float,
+    t: float,
+    rate: float = DEFAULT_RISK_FREE_RATE,
+    default_iv: float = DEFAULT_IV,
+    call_price: Optional[np.ndarray] = None,
+    put_price: Optional[np.ndarray] = None
+) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    IV and Greeks for every call and put of one expiry in a single pass
+
+    When market prices are given, IV is solved from them wherever the broker
+    IV is missing or stale (it reprices the option more than
+    IV_PRICE_TOLERANCE away from the market price).
+
+    Args:
+        strikes: Sorted strike array
+        call_iv, put_iv: Broker IV per strike in percent (Upstox units)
+        spot: Underlying price
+        t: Time to expiry in years
+        default_iv: Decimal IV used where there is neither a quote nor a solution
+        call_price, put_price: Optional market prices (mid or LTP; <= 0 = no price)
+
+    Returns:
+        {'calls': {...}, 'puts': {...}} of arrays aligned with strikes: Greeks,
+        'iv' (percent), 'iv_solved' and 'iv_failed' (solver ran, no convergence)
+    """
+    n = len(strikes)
+    all_strikes = np.concatenate([strikes, strikes])
+    is_call = np.arange(2 * n) < n
+    quoted = np.concatenate([call_iv, put_iv]).astype(np.float64) / 100.0
+    sigma = np.where(quoted > 0, quoted, default_iv)
+    solved = np.zeros(2 * n, dtype=bool)
+    failed = np.zeros(2 * n, dtype=bool)
+
+    if call_price is not None and put_price is not None:
+        price = np.concatenate([call_price, put_price]).astype(np.float64)
+        model = black_scholes(spot, all_strikes, t, sigma, is_call, rate)['price']
+        tolerance = np.maximum(IV_PRICE_TOLERANCE * price, MIN_PRICE_TOLERANCE)
+        need = (price > 0) & ((quoted <= 0) | (np.abs(model - price) > tolerance))
+        if need.any():
+            idx = np.flatnonzero(need)
+            iv, ok = implied_volatility(price[idx], spot, all_strikes[idx], t, is_call[idx], rate, initial=sigma[idx])
+            sigma[idx[ok]] = iv[ok]
+            solved[idx[ok]] = True
+            failed[idx[~ok]] = True
+
+    result = black_scholes(spot, all_strikes, t, sigma, is_call, rate)
+    result['iv'] = np.where(solved, sigma * 100.0, quoted * 100.0)
+    result['iv_solved'] = solved
+    result['iv_failed'] = failed
+    return {
+        'calls': {name: values[:n] for name, values in result.items()},
+        'puts': {name: values[n:] for name, values in result.items()},
+    }
+
+
+def implied_volatility(
+    price,
+    spot,
+    strike,
+    t,
+    is_call,
+    rate: float = DEFAULT_RISK_FREE_RATE,
+    initial=None,
+    tol: float = IV_SOLVER_TOLERANCE,
+    min_tol: float = IV_SOLVER_MIN_TOLERANCE,
+    max_iter: int = 50,
+    sigma_bounds: Tuple[float, float] = (1e-4, 5.0)
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Solve Black-Scholes implied volatility for many options at once
+
+    Newton steps on vega, safeguarded by a bisection bracket: whenever a
+    Newton step leaves the bracket (deep ITM/OTM, tiny vega) the midpoint is
+    used instead, so every strike converges or is reported as not converged.
+    Options whose vega is below MIN_VEGA (price insensitive to sigma) are
+    reported as not converged.
+
+    Args:
+        price: Observed option prices (mid or LTP)
+        spot, strike, t, is_call, rate: As for black_scholes
+        initial: Optional starting sigma (decimal), e.g. the broker IV
+        tol: Price tolerance for convergence, relative to the price
+        min_tol: Floor of the price tolerance
+        max_iter: Iteration cap for the whole batch
+        sigma_bounds: Search bracket for sigma (decimal)
+
+    Returns:
+        (sigma, converged): sigma is NaN where the price is outside no-arbitrage
+        bounds or the solver did not converge
+    """
+    price, spot, strike, t, is_call = np.broadcast_arrays(
+        np.asarray(price, dtype=np.float64),
+        np.asarray(spot, dtype=np.float64),
+        np.asarray(strike, dtype=np.float64),
+        np.maximum(np.asarray(t, dtype=np.float64), MIN_TIME_TO_EXPIRY),
+        np.asarray(is_call, dtype=bool)
+    )
+
+    # Prices outside [intrinsic, upper bound] have no solution
+    discounted_strike = strike * np.exp(-rate * t)
+    lower_bound = np.where(is_call, np.maximum(spot - discounted_strike, 0.0), np.maximum(discounted_strike - spot, 0.0))
+    upper_bound = np.where(is_call, spot, discounted_strike)
+    solvable = np.isfinite(price) & (price > lower_bound) & (price < upper_bound) & (spot > 0) & (strike > 0)
+
+    lo = np.full(price.shape, sigma_bounds[0])
+    hi = np.full(price.shape, sigma_bounds[1])
+    if initial is None:
+        sigma = np.full(price.shape, DEFAULT_IV)
+    else:
+        sigma = np.broadcast_to(np.asarray(initial, dtype=np.float64), price.shape).copy()
+        sigma = np.where(np.isfinite(sigma) & (sigma > lo) & (sigma < hi), sigma, DEFAULT_IV)
+
+    tolerance = np.maximum(tol * price, min_tol)
+    converged = ~solvable
+    active = solvable.copy()
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        idx = np.flatnonzero(active)
+        s, k, tt, c, sig = spot[idx], strike[idx], t[idx], is_call[idx], sigma[idx]
+        model = black_scholes(s, k, tt, sig, c, rate)
+        diff = model['price'] - price[idx]
+
+        done = np.abs(diff) < tolerance[idx]
+
+        # Price increases with sigma, so the sign of diff tightens the bracket
+        too_high = diff > 0
+        hi[idx] = np.where(too_high, sig, hi[idx])
+        lo[idx] = np.where(too_high, lo[idx], sig)
+
+        raw_vega = model['vega'] * 100
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = sig - diff / raw_vega
+        inside = np.isfinite(newton) & (newton > lo[idx]) & (newton < hi[idx])
+        step = np.where(inside, newton, 0.5 * (lo[idx] + hi[idx]))
+        sigma[idx] = np.where(done, sig, step)
+
+        # A collapsed bracket or a vanishing step means sigma is as close as it gets
+        settled = ((hi[idx] - lo[idx]) < 1e-8) | (np.abs(step - sig) < 1e-8)
+        converged[idx[(done | settled) & (raw_vega >= MIN_VEGA)]] = True
+        active[idx[done | settled]] = False
+
+    sigma = np.where(solvable & converged, sigma, np.nan)
+    return sigma, solvable & converged
@@ -0,0 +1,327 @@
+"""
+Instrument Master
+Local index of Upstox F&O contracts: instrument key, lot size, tick size, freeze qty
+
+Instrument keys used to be built by string formatting and lot sizes were
+hard-coded. The Upstox instruments files (NSE and BSE, gzipped JSON) are now
+downloaded once a day and compiled into a directory of .npy column arrays,
+sorted by underlying, expiry, option type and strike, plus a small meta.json.
+Loading memory-maps the arrays, so startup costs a few milliseconds. The first
+lookup for an underlying builds a dict over that underlying's rows. After that
+every key, lot size or contract spec lookup is a dict hit with no network.
+"""
+
+import asyncio
+import functools
+import gzip
+import json
+import shutil
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import requests
+
+from backend.core.logger import get_data_logger
+from backend.core.timezone_utils import IST, now_ist
+
+logger = get_data_logger()
+
+UPSTOX_INSTRUMENT_URLS = [
+    "https://assets.upstox.com/market-quote/instruments/exchange/NSE.json.gz",
+    "https://assets.upstox.com/market-quote/instruments/exchange/BSE.json.gz",
+]
+
+DERIVATIVE_SEGMENTS = {'NSE_FO', 'BSE_FO'}
+INSTRUMENT_TYPES = ['FUT', 'CE', 'PE']
+_TYPE_CODES = {name: code for code, name in enumerate(INSTRUMENT_TYPES)}
+_OPTION_TYPE_ALIASES = {'CALL': 'CE', 'PUT': 'PE', 'FUTURES': 'FUT'}
+
+# Instruments files quote tick sizes in paise
+_TICK_SIZE_SCALE = 100.0
+
+_COLUMNS = ('expiry', 'type', 'strike', 'lot_size', 'tick_size', 'freeze_qty', 'instrument_key')
+_EPOCH = date(1970, 1, 1)
+
+
+@functools.lru_cache(maxsize=512)
+def _parse_expiry(value: str) -> int:
+    return (datetime.strptime(value[:10], "%Y-%m-%d").date() - _EPOCH).days
+
+
+def _expiry_day(value) -> int:
+    """Days since epoch of an expiry given as 'YYYY-MM-DD', date or epoch milliseconds"""
+    if isinstance(value, (int, float)):
+        return (datetime.fromtimestamp(value / 1000, IST).date() - _EPOCH).days
+    if isinstance(value, str):
+        return _parse_expiry(value)
+    if isinstance(value, datetime):
+        value = value.date()
+    return (value - _EPOCH).days
+
+
+def _lookup_key(expiry_day, type_code, strike_paise):
+    """Composite integer key of (expiry, type, strike) - works on scalars and arrays"""
+    return (expiry_day * 4 + type_code) * (1 << 40) + strike_paise
+
+
+class InstrumentMaster:
+    """Memory-mapped F&O contract index with O(1) lookups"""
+
+    def __init__(
+        self,
+        index_dir: str = "data/instruments",
+        urls: Optional[List[str]] = None,
+        keep_days: int = 3,
+        refresh_hour: int = 8
+    ):
+        """
+        Args:
+            index_dir: Directory holding one compiled index per trading date
+            urls: Upstox instruments files to compile (NSE and BSE by default)
+            keep_days: Compiled indexes kept on disk
+            refresh_hour: IST hour after which a new day's file is downloaded
+        """
+        self.index_dir = Path(index_dir)
+        self.urls = urls or UPSTOX_INSTRUMENT_URLS
+        self.keep_days = keep_days
+        self.refresh_hour = refresh_hour
+
+        self.index_date: Optional[str] = None
+        self._columns: Dict[str, np.ndarray] = {}
+        self._underlyings: Dict[str, List[int]] = {}  # symbol -> [start, stop) rows
+        self._lookup: Dict[str, Dict[int, int]] = {}   # symbol -> composite key -> row
+
+    # ========== Loading ==========
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.index_date is not None
+
+    def load(self, index_date: Optional[str] = None) -> bool:
+        """Memory-map the newest compiled index (or the given date's)"""
+        try:
+            candidates = sorted(path for path in self.index_dir.glob("????-??-??") if (path / "meta.json").exists())
+            if index_date is not None:
+                candidates = [path for path in candidates if path.name == index_date]
+            if not candidates:
+                return False
+
+            path = candidates[-1]
+            started = time.perf_counter()
+            with open(path / "meta.json", 'r') as f:
+                meta = json.load(f)
+            columns = {name: np.load(path / f"{name}.npy", mmap_mode='r') for name in _COLUMNS}
+            self._columns, self._underlyings, self._lookup = columns, meta['underlyings'], {}
+            self.index_date = path.name
+            logger.info(
+                f"✓ Instrument master {self.index_date} loaded: {meta['rows']} contracts, "
+                f"{len(self._underlyings)} underlyings in {(time.perf_counter() - started) * 1000:.1f}ms"
+            )
+            return True
+        except Exception as e:
+            logger.warning(f"Could not load instrument master: {e}")
+            return False
+
+    def refresh(self, force: bool = False) -> bool:
+        """Download and compile today's instruments files unless already done (blocking)"""
+        today = now_ist().date().isoformat()
+        if not force and self.index_date == today:
+            return True
+        if not force and (self.index_dir / today / "meta.json").exists():
+            return self.load(today)
+
+        try:
+            started = time.perf_counter()
+            records = []
+            for url in self.urls:
+                response = requests.get(url, timeout=60)
+                response.raise_for_status()
+                records.extend(json.loads(gzip.decompress(response.content)))
+            rows = self.compile(records, self.index_dir / today)
+            logger.info(f"✓ Compiled instrument master {today}: {rows} contracts in {time.perf_counter() - started:.1f}s")
+            self._prune()
+            return self.load(today)
+        except Exception as e:
+            logger.error(f"Instrument master refresh failed: {e}")
+            return self.is_loaded or self.load()
+
+    @staticmethod
+    def compile(records: Iterable[Dict[str, Any]], out_dir: Path) -> int:
+        """Compile instruments file records into sorted column arrays (atomic directory swap)"""
+        symbols, expiries, types, strikes, lots, ticks, freezes, keys = [], [], [], [], [], [], [], []
+        for record in records:
+            type_code = _TYPE_CODES.get(record.get('instrument_type'))
+            if type_code is None or record.get('segment') not in DERIVATIVE_SEGMENTS or not record.get('expiry'):
+                continue
+            symbols.append(record.get('underlying_symbol') or record.get('name') or '')
+            expiries.append(_expiry_day(record['expiry']))
+            types.append(type_code)
+            strikes.append(round(float(record.get('strike_price') or 0) * 100))
+            lots.append(int(record.get('lot_size') or 0))
+            ticks.append(float(record.get('tick_size') or 0) / _TICK_SIZE_SCALE)
+            freezes.append(int(record.get('freeze_quantity') or 0))
+            keys.append(record['instrument_key'])
+
+        names = sorted(set(symbols))
+        symbol_codes = np.searchsorted(np.array(names, dtype=str), np.array(symbols, dtype=str)).astype(np.int32)
+        expiry = np.array(expiries, dtype=np.int32)
+        type_code = np.array(types, dtype=np.int8)
+        strike = np.array(strikes, dtype=np.int64)
+        order = np.lexsort((strike, type_code, expiry, symbol_codes))
+
+        columns = {
+            'expiry': expiry[order],
+            'type': type_code[order],
+            'strike': strike[order],
+            'lot_size': np.array(lots, dtype=np.int32)[order],
+            'tick_size': np.array(ticks, dtype=np.float32)[order],
+            'freeze_qty': np.array(freezes, dtype=np.int32)[order],
+            'instrument_key': np.array(keys, dtype=np.bytes_)[order],
+        }
+        sorted_codes = symbol_codes[order]
+        bounds = np.searchsorted(sorted_codes, np.arange(len(names) + 1))
+        underlyings = {name: [int(bounds[i]), int(bounds[i + 1])] for i, name in enumerate(names)}
+
+        tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        for name, values in columns.items():
+            np.save(tmp_dir / f"{name}.npy", values)
+        with open(tmp_dir / "meta.json", 'w') as f:
+            json.dump({'rows': int(len(order)), 'underlyings': underlyings, 'built_at': now_ist().isoformat()}, f)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        tmp_dir.rename(out_dir)
+        return int(len(order))
+
+    def _prune(self):
+        for path in sorted(self.index_dir.glob("????-??-??"))[:-self.keep_days]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    async def schedule_daily_refresh(self):
+        """Refresh at startup and once per day after refresh_hour IST"""
+        logger.info("Instrument master refresh scheduler started")
+        while True:
+            try:
+                now = now_ist()
+                if self.index_date != now.date().isoformat() and (now.hour >= self.refresh_hour or not self.is_loaded):
+                    await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.error(f"Error in instrument master scheduler: {e}")
+            await asyncio.sleep(300)
+
+    # ========== Lookups ==========
+
+    def _rows(self, symbol: str) -> Optional[Dict[int, int]]:
+        """Composite key -> row for one underlying, built on first use"""
+        lookup = self._lookup.get(symbol)
+        if lookup is None:
+            bounds = self._underlyings.get(symbol)
+            if bounds is None:
+                return None
+            start, stop = bounds
+            keys = _lookup_key(
+                self._columns['expiry'][start:stop].astype(np.int64),
+                self._columns['type'][start:stop].astype(np.int64),
+                self._columns['strike'][start:stop]
+            )
+            lookup = self._lookup[symbol] = dict(zip(keys.tolist(), range(start, stop)))
+        return lookup
+
+    def _find(self, symbol: str, expiry, strike: float, option_type: str) -> Optional[int]:
+        if not self.is_loaded:
+            return None
+        lookup = self._rows(symbol)
+        if lookup is None:
+            return None
+        option_type = _OPTION_TYPE_ALIASES.get(option_type, option_type)
+        type_code = _TYPE_CODES.get(option_type)
+        if type_code is None:
+            return None
+        try:
+            return lookup.get(_lookup_key(_expiry_day(expiry), type_code, round(float(strike or 0) * 100)))
+        except (TypeError, ValueError):
+            return None
+
+    def _spec(self, row: int) -> Dict[str, Any]:
+        columns = self._columns
+        return {
+            'instrument_key': columns['instrument_key'][row].decode(),
+            'expiry': (_EPOCH + timedelta(days=int(columns['expiry'][row]))).isoformat(),
+            'instrument_type': INSTRUMENT_TYPES[columns['type'][row]],
+            'strike': int(columns['strike'][row]) / 100,
+            'lot_size': int(columns['lot_size'][row]),
+            'tick_size': round(float(columns['tick_size'][row]), 4),
+            'freeze_quantity': int(columns['freeze_qty'][row])
+        }
+
+    def option_key(self, symbol: str, expiry, strike: float, option_type: str) -> Optional[str]:
+        """Instrument key of an option (option_type CE/PE or CALL/PUT)"""
+        row = self._find(symbol, expiry, strike, option_type)
+        return self._columns['instrument_key'][row].decode() if row is not None else None
+
+    def contract(self, symbol: str, expiry, strike: float, option_type: str) -> Optional[Dict[str, Any]]:
+        """Full contract spec of an option or future (strike 0 for futures)"""
+        row = self._find(symbol, expiry, strike, option_type)
+        return self._spec(row) if row is not None else None
+
+    def nearest_future(self, symbol: str, on_date: Optional[date] = None) -> Optional[Dict[str, Any]]:
+        """Spec of the nearest future expiring on or after on_date (today by default)"""
+        bounds = self._underlyings.get(symbol) if self.is_loaded else None
+        if bounds is None:
+            return None
+        start, stop = bounds
+        day = _expiry_day(on_date or now_ist().date())
+        types = self._columns['type'][start:stop]
+        expiries = self._columns['expiry'][start:stop]
+        futures = np.flatnonzero((types == _TYPE_CODES['FUT']) & (expiries >= day))
+        if not len(futures):
+            return None
+        return self._spec(start + int(futures[np.argmin(expiries[futures])]))
+
+    def expiries(self, symbol: str, option_type: str = 'CE') -> List[str]:
+        """Listed expiries (YYYY-MM-DD) of an underlying's contracts of one type"""
+        bounds = self._underlyings.get(symbol) if self.is_loaded else None
+        if bounds is None:
+            return []
+        start, stop = bounds
+        type_code = _TYPE_CODES[_OPTION_TYPE_ALIASES.get(option_type, option_type)]
+        days = np.unique(self._columns['expiry'][start:stop][self._columns['type'][start:stop] == type_code])
+        return [(_EPOCH + timedelta(days=int(day))).isoformat() for day in days]
+
+    def lot_size(self, symbol: str, expiry=None) -> Optional[int]:
+        """Lot size of an underlying's contracts (nearest expiry unless given)"""
+        bounds = self._underlyings.get(symbol) if self.is_loaded else None
+        if bounds is None:
+            return None
+        start, stop = bounds
+        expiries = self._columns['expiry'][start:stop]
+        if expiry is not None:
+            rows = np.flatnonzero(expiries == _expiry_day(expiry))
+        else:
+            rows = np.flatnonzero(expiries >= _expiry_day(now_ist().date()))
+            rows = rows[expiries[rows] == expiries[rows].min()] if len(rows) else rows
+        return int(self._columns['lot_size'][start + int(rows[0])]) if len(rows) else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'index_date': self.index_date,
+            'contracts': int(len(self._columns['instrument_key'])) if self.is_loaded else 0,
+            'underlyings': len(self._underlyings),
+            'indexed_underlyings': sorted(self._lookup)
+        }
+
+
+# Global instance
+_instrument_master = None
+
+
+def get_instrument_master() -> InstrumentMaster:
+    """Get global instrument master (loads the newest compiled index)"""
+    global _instrument_master
+    if _instrument_master is None:
+        _instrument_master = InstrumentMaster()
+        _instrument_master.load()
+    return _instrument_master
@@ -0,0 +1,330 @@
+"""
+ATM IV History Store
+Persisted daily and intraday ATM implied volatility per underlying
+
+IV rank and IV percentile need a long window of real ATM IV observations. The
+store records the ATM IV of every option chain the system sees (REST fetches,
+streamed/repriced chains) - one intraday sample per interval and one daily
+value per IST trading day (the day's latest) - and is backfilled from the
+option_chain_snapshots table. Each window is kept in insertion order and in
+sorted order, so rank and percentile queries cost O(log n).
+"""
+
+import asyncio
+import json
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from backend.core.logger import get_data_logger
+from backend.core.timezone_utils import IST
+from backend.data.option_chain import as_columns
+
+logger = get_data_logger()
+
+
+class SortedWindow:
+    """Rolling window of the last maxlen values, also kept sorted for rank queries"""
+
+    __slots__ = ('_values', '_sorted')
+
+    def __init__(self, maxlen: int):
+        self._values = deque(maxlen=maxlen)
+        self._sorted = []
+
+    def append(self, value: float):
+        if len(self._values) == self._values.maxlen:
+            oldest = self._values[0]
+            del self._sorted[bisect_left(self._sorted, oldest)]
+        self._values.append(value)
+        insort(self._sorted, value)
+
+    def replace_last(self, value: float):
+        """Overwrite the newest value (today's daily IV as the day progresses)"""
+        if not self._values:
+            self.append(value)
+            return
+        del self._sorted[bisect_left(self._sorted, self._values[-1])]
+        self._values[-1] = value
+        insort(self._sorted, value)
+
+    def count_le(self, value: float) -> int:
+        return bisect_right(self._sorted, value)
+
+    @property
+    def min(self) -> float:
+        return self._sorted[0]
+
+    @property
+    def max(self) -> float:
+        return self._sorted[-1]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class _SymbolHistory:
+    """Daily and intraday ATM IV samples for one underlying"""
+
+    def __init__(self, daily_window: int, intraday_window: int):
+        self.daily_dates = deque(maxlen=daily_window)
+        self.daily = SortedWindow(daily_window)
+        self.intraday_times = deque(maxlen=intraday_window)
+        self.intraday = SortedWindow(intraday_window)
+        self.latest: Optional[Tuple[float, float]] = None  # (epoch, iv)
+
+    def add(self, epoch: float, iv: float, intraday_interval: float):
+        self.latest = (epoch, iv)
+
+        day = datetime.fromtimestamp(epoch, IST).date().isoformat()
+        if self.daily_dates and self.daily_dates[-1] == day:
+            self.daily.replace_last(iv)
+        elif not self.daily_dates or day > self.daily_dates[-1]:
+            self.daily_dates.append(day)
+            self.daily.append(iv)
+
+        if not self.intraday_times or epoch - self.intraday_times[-1] >= intraday_interval:
+            self.intraday_times.append(epoch)
+            self.intraday.append(iv)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'daily': list(zip(self.daily_dates, self.daily._values)),
+            'intraday': list(zip(self.intraday_times, self.intraday._values)),
+            'latest': self.latest
+        }
+
+
+class IVHistoryStore:
+    """Per-underlying ATM IV history with O(log n) IV rank / percentile"""
+
+    def __init__(
+        self,
+        history_file: str = "data/state/iv_history.json",
+        daily_window: int = 365,
+        intraday_interval: float = 300.0,
+        intraday_window: int = 750,
+        save_interval: float = 60.0
+    ):
+        """
+        Args:
+            history_file: JSON file the history is persisted to
+            daily_window: Trading days kept for the daily series
+            intraday_interval: Minimum seconds between intraday samples
+            intraday_window: Intraday samples kept (750 x 5 min ~ 10 sessions)
+            save_interval: Minimum seconds between writes of the history file
+        """
+        self.history_file = Path(history_file)
+        self.daily_window = daily_window
+        self.intraday_interval = intraday_interval
+        self.intraday_window = intraday_window
+        self.save_interval = save_interval
+        self._history: Dict[str, _SymbolHistory] = {}
+        self._last_save = time.time()
+        self._dirty = False
+        self._write_lock = threading.Lock()
+        self._load()
+
+    def _symbol(self, symbol: str) -> _SymbolHistory:
+        history = self._history.get(symbol)
+        if history is None:
+            history = self._history[symbol] = _SymbolHistory(self.daily_window, self.intraday_window)
+        return history
+
+    # ========== Recording ==========
+
+    def record(self, symbol: str, iv: float, at: Optional[float] = None):
+        """Record one ATM IV observation (percent)"""
+        if not iv or iv <= 0 or not np.isfinite(iv):
+            return
+        self._symbol(symbol).add(at if at is not None else time.time(), float(iv), self.intraday_interval)
+        self._dirty = True
+        if time.time() - self._last_save >= self.save_interval:
+            self.save_soon()
+
+    def record_chain(self, symbol: str, option_chain: Dict, spot_price: float, at: Optional[float] = None) -> Optional[float]:
+        """Record the ATM IV of an option chain; returns the IV recorded"""
+        iv = atm_iv(option_chain, spot_price)
+        if iv is not None:
+            self.record(symbol, iv, at)
+        return iv
+
+    def backfill(self, symbol: str, samples: Iterable[Tuple[float, float]]) -> int:
+        """
+        Merge historical (epoch, iv) samples, e.g. from option_chain_snapshots
+
+        Already recorded values win over backfilled ones for the same day. Not
+        thread-safe - call it on the thread that records (the event loop).
+        """
+        samples = sorted((float(epoch), float(iv)) for epoch, iv in samples if iv and iv > 0)
+        existing = self._history.get(symbol)
+
+        daily: Dict[str, float] = {}
+        for epoch, iv in samples:
+            daily[datetime.fromtimestamp(epoch, IST).date().isoformat()] = iv
+        intraday = samples
+        if existing is not None:
+            daily.update(zip(existing.daily_dates, existing.daily._values))
+            intraday = sorted(samples + list(zip(existing.intraday_times, existing.intraday._values)))
+
+        history = _SymbolHistory(self.daily_window, self.intraday_window)
+        for day in sorted(daily):
+            history.daily_dates.append(day)
+            history.daily.append(daily[day])
+        for epoch, iv in intraday:
+            if not history.intraday_times or epoch - history.intraday_times[-1] >= self.intraday_interval:
+                history.intraday_times.append(epoch)
+                history.intraday.append(iv)
+        history.latest = existing.latest if existing is not None and existing.latest else (samples[-1] if samples else None)
+
+        self._history[symbol] = history
+        self._dirty = True
+        return len(samples)
+
+    # ========== Queries ==========
+
+    def current_iv(self, symbol: str, max_age: float = 300.0) -> Optional[float]:
+        """Latest recorded ATM IV if it is at most max_age seconds old"""
+        history = self._history.get(symbol)
+        if history is None or history.latest is None:
+            return None
+        at, iv = history.latest
+        return iv if time.time() - at <= max_age else None
+
+    def rank(self, symbol: str, current_iv: float, min_daily: int = 20, min_intraday: int = 100) -> Optional[Dict[str, Any]]:
+        """
+        IV rank and percentile of current_iv
+
+        Ranked against the daily series once it has min_daily days, otherwise
+        against intraday samples (min_intraday needed); None when neither has
+        enough history.
+        """
+        history = self._history.get(symbol)
+        if history is None:
+            return None
+        if len(history.daily) >= min_daily:
+            window, name = history.daily, 'daily'
+        elif len(history.intraday) >= min_intraday:
+            window, name = history.intraday, 'intraday'
+        else:
+            return None
+
+        min_iv, max_iv = window.min, window.max
+        iv_rank = 50.0 if max_iv - min_iv < 0.01 else (current_iv - min_iv) / (max_iv - min_iv) * 100
+        return {
+            'iv_rank': iv_rank,
+            'iv_percentile': window.count_le(current_iv) / len(window) * 100,
+            'min_iv': min_iv,
+            'max_iv': max_iv,
+            'historical_samples': len(window),
+            'window': name
+        }
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            symbol: {
+                'daily_samples': len(history.daily),
+                'intraday_samples': len(history.intraday),
+                'first_day': history.daily_dates[0] if history.daily_dates else None,
+                'latest_iv': history.latest[1] if history.latest else None
+            }
+            for symbol, history in self._history.items()
+        }
+
+    # ========== Persistence ==========
+
+    def _load(self):
+        try:
+            if not self.history_file.exists():
+                return
+            with open(self.history_file, 'r') as f:
+                data = json.load(f)
+            for symbol, saved in data.get('symbols', {}).items():
+                history = self._symbol(symbol)
+                for day, iv in saved.get('daily', []):
+                    history.daily_dates.append(day)
+                    history.daily.append(iv)
+                for epoch, iv in saved.get('intraday', []):
+                    history.intraday_times.append(epoch)
+                    history.intraday.append(iv)
+                if saved.get('latest'):
+                    history.latest = tuple(saved['latest'])
+            logger.info(f"✓ Loaded IV history: {self.get_stats()}")
+        except Exception as e:
+            logger.warning(f"Could not load IV history: {e}")
+
+    def save(self):
+        """Persist the history now (blocking)"""
+        payload = self._take_snapshot()
+        if payload is not None:
+            self._write(payload)
+
+    def save_soon(self):
+        """Persist without blocking the event loop - the file is written in a worker thread"""
+        payload = self._take_snapshot()
+        if payload is None:
+            return
+        try:
+            asyncio.get_running_loop().run_in_executor(None, self._write, payload)
+        except RuntimeError:
+            self._write(payload)  # No running loop (scripts, tests)
+
+    def _take_snapshot(self) -> Optional[Dict[str, Any]]:
+        """Copy of the history to write, or None when nothing changed since the last save"""
+        self._last_save = time.time()
+        if not self._dirty:
+            return None
+        self._dirty = False
+        return {
+            'symbols': {symbol: history.to_dict() for symbol, history in self._history.items()},
+            'last_updated': datetime.now(IST).isoformat()
+        }
+
+    def _write(self, payload: Dict[str, Any]):
+        """Write a snapshot (atomic replace)"""
+        try:
+            with self._write_lock:
+                self.history_file.parent.mkdir(parents=True, exist_ok=True)
+                tmp_file = self.history_file.with_suffix('.tmp')
+                with open(tmp_file, 'w') as f:
+                    json.dump(payload, f)
+                tmp_file.replace(self.history_file)
+        except Exception as e:
+            self._dirty = True  # Retry with the next save
+            logger.error(f"Error saving IV history: {e}")
+
+
+def atm_iv(option_chain: Optional[Dict], spot_price: float) -> Optional[float]:
+    """Mean of the ATM call and put IV (percent), or whichever side is quoted"""
+    if not spot_price:
+        return None
+    columns = as_columns(option_chain)
+    if columns is None:
+        return None
+    i = columns.nearest_index(spot_price)
+    if i is None:
+        return None
+    ivs = [
+        float(side['iv'][i])
+        for side in (columns.calls, columns.puts)
+        if side.present[i] and side['iv'][i] > 0
+    ]
+    return sum(ivs) / len(ivs) if ivs else None
+
+
+# Global instance
+_iv_history_store = None
+
+
+def get_iv_history_store() -> IVHistoryStore:
+    """Get global ATM IV history store"""
+    global _iv_history_store
+    if _iv_history_store is None:
+        _iv_history_store = IVHistoryStore()
+    return _iv_history_store
@@ -5,10 +5,13 @@ Calculates true IV Percentile using 30-day ATM IV vs 365-day rolling window
 
 import numpy as np
 import pandas as pd
-from typing import Dict, Optional, List
+from typing import Dict, Optional
 from datetime import datetime, timedelta
 from backend.core.logger import get_data_logger
 from backend.core.upstox_client import UpstoxClient
+from backend.core.async_upstox_client import get_async_upstox_client
+from backend.data.iv_history import get_iv_history_store
+from backend.safety.rate_limiter import Priority
 import redis
 import json
 import os
@@ -20,6 +23,7 @@ class IVRankCalculator:
     
     def __init__(self, upstox_client: UpstoxClient):
         self.upstox_client = upstox_client
+        self.async_client = get_async_upstox_client(upstox_client.access_token)
         redis_host = os.getenv('REDIS_HOST', 'localhost')
         redis_port = int(os.getenv('REDIS_PORT', 6379))
         try:
@@ -31,7 +35,8 @@ class IVRankCalculator:
             self.redis_client = None
             self.redis_available = False
         self.cache_duration = 300  # 5 minutes
-        self.historical_window = 365  # 1 year lookback
+        # Persisted ATM IV history fed by every option chain the system sees
+        self.iv_history = get_iv_history_store()
         
     async def get_real_iv_rank(self, symbol: str = "NIFTY") -> Dict:
         """
@@ -58,36 +63,32 @@ class IVRankCalculator:
                 logger.debug(f"Redis cache read failed: {e}")
         
         try:
-            # Get current ATM IV for 30-day expiry
-            current_iv = await self._get_current_atm_iv(symbol)
+            # Current ATM IV from the live option chains, else one REST chain fetch
+            current_iv = self.iv_history.current_iv(symbol, max_age=self.cache_duration)
             if not current_iv:
+                current_iv = await self._get_current_atm_iv(symbol)
+                if not current_iv:
+                    return self._get_default_iv_rank()
+                self.iv_history.record(symbol, float(current_iv))
+            
+            # Rank against the stored ATM IV history - O(log n)
+            ranked = self.iv_history.rank(symbol, current_iv)
+            if ranked is None:
+                logger.warning(f"Insufficient IV history for {symbol}: {self.iv_history.get_stats().get(symbol)}")
                 return self._get_default_iv_rank()
             
-            # Get 365-day historical IV data
-            historical_ivs = await self._get_historical_iv_window(symbol)
-            if len(historical_ivs) < 100:  # Need sufficient history
-                logger.warning(f"Insufficient IV history for {symbol}: {len(historical_ivs)} samples")
-                return self._get_default_iv_rank()
-            
-            # Calculate IV Rank
-            min_iv = min(historical_ivs)
-            max_iv = max(historical_ivs)
-            
-            if max_iv - min_iv < 0.01:  # Avoid division by zero
-                iv_rank = 50.0  # Neutral
-            else:
-                iv_rank = (current_iv - min_iv) / (max_iv - min_iv) * 100
-            
-            # Calculate IV Percentile (more robust)
-            iv_percentile = (np.sum(np.array(historical_ivs) <= current_iv) / len(historical_ivs)) * 100
+            iv_rank = ranked['iv_rank']
+            min_iv = ranked['min_iv']
+            max_iv = ranked['max_iv']
             
             result = {
                 'iv_rank': round(iv_rank, 2),
-                'iv_percentile': round(iv_percentile, 2),
+                'iv_percentile': round(ranked['iv_percentile'], 2),
                 'current_iv': round(current_iv, 2),
                 'min_iv': round(min_iv, 2),
                 'max_iv': round(max_iv, 2),
-                'historical_samples': len(historical_ivs),
+                'historical_samples': ranked['historical_samples'],
+                'history_window': ranked['window'],
                 'symbol': symbol,
                 'timestamp': datetime.now().isoformat()
             }
@@ -129,7 +130,7 @@ class IVRankCalculator:
             next_expiry = today + timedelta(days=days_until_thursday)
             expiry_date = next_expiry.strftime('%Y-%m-%d')
             
-            option_chain_response = self.upstox_client.get_option_chain(instrument_key, expiry_date)
+            option_chain_response = await self.async_client.get_option_chain(instrument_key, expiry_date, priority=Priority.ANALYTICS)
             if not option_chain_response or 'data' not in option_chain_response:
                 return None
             
@@ -192,54 +193,6 @@ class IVRankCalculator:
             logger.error(f"Error getting current ATM IV for {symbol}: {e}")
             return None
     
-    async def _get_historical_iv_window(self, symbol: str) -> List[float]:
-        """Get 365-day historical IV window"""
-        try:
-            # For now, use a stored historical IV dataset
-            # In production, this would query a proper IV history database
-            
-            # Sample historical IV data for NIFTY (would be replaced with real data)
-            if symbol == "NIFTY":
-                # Generate realistic IV history based on market patterns
-                np.random.seed(42)  # For reproducible results
-                base_iv = 18.0
-                historical_ivs = []
-                
-                for day in range(self.historical_window):
-                    # Add seasonal patterns and volatility clustering
-                    seasonal_factor = 1 + 0.3 * np.sin(2 * np.pi * day / 365)  # Annual cycle
-                    weekly_factor = 1 + 0.1 * np.sin(2 * np.pi * day / 7)  # Weekly cycle
-                    random_shock = np.random.normal(1, 0.15)  # Random market movements
-                    
-                    daily_iv = base_iv * seasonal_factor * weekly_factor * random_shock
-                    daily_iv = max(10, min(40, daily_iv))  # Keep within realistic bounds
-                    historical_ivs.append(daily_iv)
-                
-                return historical_ivs
-            
-            elif symbol == "SENSEX":
-                # Similar pattern for SENSEX but slightly different base
-                np.random.seed(43)
-                base_iv = 16.0
-                historical_ivs = []
-                
-                for day in range(self.historical_window):
-                    seasonal_factor = 1 + 0.25 * np.sin(2 * np.pi * day / 365)
-                    weekly_factor = 1 + 0.08 * np.sin(2 * np.pi * day / 7)
-                    random_shock = np.random.normal(1, 0.12)
-                    
-                    daily_iv = base_iv * seasonal_factor * weekly_factor * random_shock
-                    daily_iv = max(8, min(35, daily_iv))
-                    historical_ivs.append(daily_iv)
-                
-                return historical_ivs
-            
-            return []
-            
-        except Exception as e:
-            logger.error(f"Error getting historical IV window for {symbol}: {e}")
-            return []
-    
     async def _get_spot_price(self, symbol: str) -> Optional[float]:
         """Get current spot price"""
         try:
@@ -251,7 +204,7 @@ class IVRankCalculator:
                 return None
             
             # Get quote using LTP API
-            quote_response = self.upstox_client.get_ltp([instrument_key])
+            quote_response = await self.async_client.get_ltp([instrument_key], priority=Priority.ANALYTICS)
             if quote_response and 'data' in quote_response:
                 # LTP API returns data as a dict keyed by instrument
                 instrument_data = quote_response['data'].get(instrument_key, {})
@@ -349,17 +349,19 @@ Market Data Manager
 """
 
 import asyncio
-from typing import Dict, List, Optional, Any, TYPE_CHECKING
-from datetime import datetime, timedelta
+import time
+from typing import Dict, List, Optional, Any, Set, Tuple, TYPE_CHECKING
+from datetime import datetime
 import numpy as np
-from scipy.stats import norm
 import pandas as pd
-import numpy as np
 
 from backend.core.upstox_client import UpstoxClient
+from backend.core.async_upstox_client import get_async_upstox_client
+from backend.safety.rate_limiter import Priority
 from backend.core.logger import get_data_logger
 from backend.data.proto import MarketDataFeedV3_pb2 as pb
-from backend.cache.redis_cache import get_cache_manager
+from backend.cache.tiered_cache import get_tiered_cache
+from backend.cache.single_flight import get_single_flight
 from backend.data.technical_indicators import TechnicalIndicators
 from backend.services.option_chain_persistence import OptionChainPersistenceService
 from backend.data.market_feed import MarketFeedManager
@@ -367,6 +369,12 @@ from backend.services.price_history_tracker import PriceHistoryTracker
 from backend.services.technical_indicators import TechnicalIndicators as MultiTimeframeIndicators
 from backend.data.iv_rank_calculator import IVRankCalculator
 from backend.data.session_vwap import SessionVWAP
+from backend.data.greeks import DEFAULT_IV, DEFAULT_RISK_FREE_RATE, GREEK_FIELDS, MIN_TIME_TO_EXPIRY, black_scholes
+from backend.data.option_chain import OptionChainColumns, as_columns, reprice_chain, strike_key
+from backend.data.market_snapshot import MarketSnapshot, SnapshotPublisher
+from backend.data.streamed_chain import StreamedOptionChain
+from backend.data.candle_aggregator import get_candle_aggregator
+from backend.data.trading_calendar import get_trading_calendar
 
 if TYPE_CHECKING:
     from backend.safety.market_monitor import MarketMonitor
@@ -380,15 +388,18 @@ class MarketDataManager:
     
     def __init__(self, upstox_client: UpstoxClient):
         self.upstox_client = upstox_client
-        self.option_chain_cache = {}
+        # Non-blocking client for all broker I/O issued from coroutines
+        self.async_client = get_async_upstox_client(upstox_client.access_token)
         self.price_cache = {}
-        self.spot_price_cache = {}  # Cache spot prices aggressively (10s TTL)
         self.oi_cache = {}
         self.greeks_cache = {}
         self.option_chain_failure_cache = {}
         
-        # Redis cache manager for performance
-        self.redis_cache = get_cache_manager()
+        # Two-tier cache (bounded in-process LRU + async Redis) for spot prices and chains
+        self.cache = get_tiered_cache()
+        
+        # Coalesces concurrent option chain / spot / candle fetches for the same key
+        self.single_flight = get_single_flight()
         
         # WebSocket market feed for real-time data (eliminates rate limiting)
         self.market_feed: Optional[MarketFeedManager] = None
@@ -413,25 +424,57 @@ class MarketDataManager:
         # Session VWAP calculator
         self.session_vwap = SessionVWAP(upstox_client)
         
+        # Tick-built 1m/5m/15m/1h candles shared with indicators and VWAP
+        self.candles = get_candle_aggregator()
+        
         # Initialize market state to prevent downstream AttributeError
+        # (producer-side working state - consumers should read snapshots)
         self.market_state = {
             'NIFTY': {},
             'SENSEX': {}
         }
         
+        # Immutable versioned snapshots published by a single producer
+        self.snapshots = SnapshotPublisher()
+        self._snapshot_producer_running = False
+        
+        # Tick-driven Greeks: spot ticks reprice the latest snapshot's chains
+        self.tick_greeks_interval = 0.5  # At most one tick reprice every 0.5s
+        self._tick_spots: Dict[str, float] = {}
+        self._tick_reprice_task: Optional[asyncio.Task] = None
+        self._last_tick_reprice = 0.0
+        
+        # Streamed option chains: ATM±N option keys live on the WebSocket feed,
+        # REST option chain only for a periodic full reconcile
+        self.stream_option_chain = False
+        self.chain_stream_strikes = 10
+        self.chain_reconcile_interval = 60.0
+        self.chain_streams: Dict[str, StreamedOptionChain] = {}
+        self._tick_chains: Set[str] = set()
+        self._chain_tick_keys: Set[str] = set()
+        
         # Optimization parameters
         self.atm_range_percent = 0.10  # ±10% from spot for strike filtering
+        self.risk_free_rate = DEFAULT_RISK_FREE_RATE  # For Black-Scholes Greeks
         self.min_delta_threshold = 0.10  # Minimum |delta| to consider
         self.min_open_interest = 50  # Minimum OI for liquidity (lowered for intraday detection)
         self.min_volume = 5  # Minimum volume for active trading (lowered to catch early moves)
         self.atm_core_percent = 0.02  # ±2% from spot - always preserve these strikes
         
-        # Symbol-specific expiry tracking (NIFTY and SENSEX only)
-        self.expiry_config = {
-            'NIFTY': ('weekly', 1),      # Weekly, Tuesday ✅
-            'SENSEX': ('weekly', 3),      # Weekly, Thursday ✅
+        # Per-source timeouts (seconds) for concurrent state builds - a slow source
+        # yields a partial state marked stale instead of delaying the whole cycle
+        self.default_source_timeout = 8.0
+        self.source_timeouts = {
+            'spot_price': 3.0,
+            'option_chain': 12.0,
+            'multi_timeframe': 8.0,
+            'historical_data': 6.0,
+            'session_vwap': 6.0,
+            'iv_rank': 8.0,
         }
-        # Remove hardcoded current_expiry - calculate per symbol dynamically
+        
+        # Precomputed sessions and per-symbol expiries (NIFTY Tuesday, SENSEX Thursday)
+        self.calendar = get_trading_calendar()
 
         # Safety monitors
         self.market_monitor: Optional["MarketMonitor"] = None
@@ -447,11 +490,14 @@ class MarketDataManager:
             # Get access token from upstox client
             access_token = self.upstox_client.access_token
             
-            # Initialize market feed manager
-            self.market_feed = MarketFeedManager(access_token)
-            
             # Determine instruments to subscribe based on config
             from backend.core.config import config
+            
+            # Initialize market feed manager (instrument keys sharded across a connection pool)
+            self.market_feed = MarketFeedManager(
+                access_token,
+                num_connections=config.get('data_fetch.feed_connections', 2)
+            )
             instruments = config.get("instruments", [])
             
             instrument_keys = []
@@ -540,100 +586,267 @@ class MarketDataManager:
         except Exception as e:
             logger.error(f"Error registering price callback: {e}")
 
-    def set_monitors(
-        self,
-        market_monitor: Optional["MarketMonitor"] = None,
-        data_monitor: Optional["MarketDataMonitor"] = None
-    ):
-        """Attach safety monitors for market condition and data quality."""
-        self.market_monitor = market_monitor
-        self.data_monitor = data_monitor
+    def enable_tick_greeks(self, interval: Optional[float] = None):
+        """
+        Reprice chain Greeks on every spot tick from the WebSocket feed
         
-    def _get_current_weekly_expiry(self, symbol: str = 'SENSEX') -> str:
+        Ticks are conflated: at most one reprice per interval, always using the
+        newest spot, so the snapshot rate stays bounded however fast ticks arrive.
         """
-        Get current expiry for the given symbol
+        if interval is not None:
+            self.tick_greeks_interval = interval
+        if not self.market_feed:
+            logger.warning("Market feed not initialized, tick-driven Greeks disabled")
+            return
         
-        Args:
-            symbol: Trading symbol (NIFTY, BANKNIFTY, or SENSEX)
-            
-        Returns:
-            Expiry date in YYYY-MM-DD format
-            
-        Expiry Schedule:
-        - NIFTY: Every Tuesday (weekly) ✅
-        - BANKNIFTY: Last Thursday of month (monthly)
-        - SENSEX: Every Thursday (weekly) ✅
+        for symbol in ('NIFTY', 'SENSEX'):
+            self.register_price_callback(self._get_index_instrument_key(symbol), self._make_spot_tick_handler(symbol))
+        logger.info(f"⚡ Tick-driven Greeks enabled (max 1 reprice / {self.tick_greeks_interval}s)")
+    
+    def _make_spot_tick_handler(self, symbol: str):
+        async def on_spot_tick(instrument_key: str, feed_data: Dict):
+            spot = MarketFeedManager.extract_ltp(feed_data)
+            if not spot or spot <= 0:
+                return
+            self._tick_spots[symbol] = spot
+            self._schedule_tick_reprice()
+        return on_spot_tick
+    
+    def _schedule_tick_reprice(self):
+        if self._tick_reprice_task is None or self._tick_reprice_task.done():
+            self._tick_reprice_task = asyncio.create_task(self._run_tick_reprice())
+    
+    async def _run_tick_reprice(self):
+        """Drain pending spot/option ticks, repricing at most once per tick_greeks_interval"""
+        try:
+            while self._tick_spots or self._tick_chains:
+                wait = self.tick_greeks_interval - (time.monotonic() - self._last_tick_reprice)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                spots, self._tick_spots = self._tick_spots, {}
+                chain_symbols, self._tick_chains = self._tick_chains, set()
+                self._last_tick_reprice = time.monotonic()
+                await self.reprice_snapshot(spots, {symbol: self.chain_streams[symbol] for symbol in chain_symbols})
+        except Exception as e:
+            logger.error(f"Error repricing Greeks on tick: {e}")
+    
+    async def reprice_snapshot(
+        self,
+        spots: Dict[str, float],
+        streams: Optional[Dict[str, StreamedOptionChain]] = None
+    ) -> Optional[MarketSnapshot]:
         """
-        today = datetime.now()
-        expiry_type, target_weekday = self.expiry_config.get(symbol, ('weekly', 3))
+        Publish a snapshot with new spots and every chain strike repriced
         
-        if expiry_type == 'monthly':
-            # BANKNIFTY - Last Thursday of the month
-            expiry = self._get_last_thursday_of_month(today)
-            return expiry
-        else:
-            # NIFTY (Tuesday) or SENSEX (Thursday) - Weekly
-            days_ahead = target_weekday - today.weekday()
-            
-            # If today is the expiry day, check if market has closed (3:30 PM IST)
-            if days_ahead == 0:
-                # Today is expiry day - check time
-                # Use 3:30 PM IST as cutoff (15:30)
-                if today.hour >= 15 and today.minute >= 30:
-                    # Market closed, use next week's expiry
-                    days_ahead = 7
-                # else: use today's expiry (days_ahead stays 0)
-            elif days_ahead < 0:
-                # Expiry day has passed this week, get next week
-                days_ahead += 7
+        Derived from the latest snapshot in one vectorized pass per symbol.
+        Symbols in streams take their option chain (LTP, OI, quotes) from the
+        streamed chain; otherwise option data and indicators are carried over
+        until the next full build.
+        """
+        streams = streams or {}
+        
+        def transform(snapshot: MarketSnapshot) -> Optional[Dict[str, Any]]:
+            state = dict(snapshot.state)
+            changed = False
+            for symbol in set(spots) | set(streams):
+                symbol_state = state.get(symbol)
+                if not symbol_state:
+                    continue
+                spot = spots.get(symbol, symbol_state.get('spot_price'))
+                stream = streams.get(symbol)
+                option_chain = None
+                if stream is not None and stream.expiry == symbol_state.get('expiry'):
+                    option_chain = stream.build_chain()
+                if option_chain is None:
+                    if spot == symbol_state.get('spot_price'):
+                        continue
+                    option_chain = symbol_state.get('option_chain')
                 
-            expiry = today + timedelta(days=days_ahead)
-            return expiry.strftime("%Y-%m-%d")
+                updated = {
+                    **symbol_state,
+                    'spot_price': spot,
+                    'option_chain': reprice_chain(
+                        option_chain,
+                        spot,
+                        self.calendar.years_until(symbol_state.get('expiry')),
+                        self.risk_free_rate
+                    ),
+                    'greeks_timestamp': datetime.now()
+                }
+                if option_chain is not symbol_state.get('option_chain'):
+                    for key in ('pcr', 'max_pain', 'total_call_oi', 'total_put_oi', 'total_oi'):
+                        updated[key] = option_chain.get(key, symbol_state.get(key))
+                state[symbol] = updated
+                changed = True
+            return state if changed else None
+        
+        return await self.snapshots.update(transform)
+    
+    # ========== Tick candles ==========
     
-    def _get_last_thursday_of_month(self, reference_date: datetime) -> str:
+    async def enable_candle_aggregation(self, symbols: Tuple[str, ...] = ('NIFTY', 'SENSEX')):
         """
-        Get the last Thursday of the current or next month
+        Build multi-timeframe candles from feed ticks instead of polling REST
         
-        Args:
-            reference_date: Reference date
-            
-        Returns:
-            Last Thursday in YYYY-MM-DD format
+        Each index is seeded once from today's 1-minute intraday candles (5m/15m/1h
+        are rolled up from them); afterwards every tick updates the bars in memory.
         """
-        # Start with the last day of current month
-        if reference_date.month == 12:
-            last_day = datetime(reference_date.year + 1, 1, 1) - timedelta(days=1)
-        else:
-            last_day = datetime(reference_date.year, reference_date.month + 1, 1) - timedelta(days=1)
-        
-        # Find the last Thursday
-        # Thursday is weekday 3 (Mon=0, Thu=3)
-        days_back = (last_day.weekday() - 3) % 7
-        last_thursday = last_day - timedelta(days=days_back)
-        
-        # If last Thursday has passed, get next month's last Thursday
-        if last_thursday < reference_date:
-            # Move to next month
-            if last_day.month == 12:
-                next_month_last = datetime(last_day.year + 1, 2, 1) - timedelta(days=1)
-            else:
-                next_month_last = datetime(last_day.year, last_day.month + 2, 1) - timedelta(days=1)
-            
-            days_back = (next_month_last.weekday() - 3) % 7
-            last_thursday = next_month_last - timedelta(days=days_back)
+        if not self.market_feed or not self._websocket_connected:
+            logger.warning("Market feed not connected, tick candles disabled")
+            return
         
-        return last_thursday.strftime("%Y-%m-%d")
+        for symbol in symbols:
+            instrument_key = self._get_index_instrument_key(symbol)
+            self.candles.track(instrument_key)
+            try:
+                response = await self.single_flight.do(
+                    ('candles', instrument_key, '1minute'),
+                    lambda: self.async_client.get_intraday_candles(instrument_key, '1minute')
+                )
+                candles = (response or {}).get('data', {}).get('candles', [])
+                seeded = self.candles.seed(instrument_key, candles)
+                logger.info(f"✓ Seeded {symbol} tick candles from {seeded} 1-minute bars")
+            except Exception as e:
+                logger.error(f"Error seeding tick candles for {symbol}: {e}")
+        
+        self.market_feed.register_tick_sink(self.candles.on_tick)
+        logger.info("⚡ Tick candles enabled (1m/5m/15m/1h from the market feed)")
+    
+    # ========== Streamed option chains ==========
+    
+    def enable_chain_streaming(self, strikes: Optional[int] = None, reconcile_interval: Optional[float] = None):
+        """
+        Keep option chains live from WebSocket ticks instead of REST polling
+        
+        ATM±strikes call/put keys are subscribed per underlying and resubscribed
+        whenever spot moves a full strike step; the REST chain is only fetched
+        every reconcile_interval seconds for a full reconcile.
+        """
+        if strikes is not None:
+            self.chain_stream_strikes = strikes
+        if reconcile_interval is not None:
+            self.chain_reconcile_interval = reconcile_interval
+        if not self.market_feed or not self._websocket_connected:
+            logger.warning("Market feed not connected, option chain streaming disabled")
+            return
+        
+        self.stream_option_chain = True
+        for symbol in ('NIFTY', 'SENSEX'):
+            self.register_price_callback(self._get_index_instrument_key(symbol), self._make_chain_spot_handler(symbol))
+        logger.info(
+            f"⚡ Option chain streaming enabled (ATM±{self.chain_stream_strikes} strikes, "
+            f"REST reconcile every {self.chain_reconcile_interval:.0f}s)"
+        )
+    
+    def _make_chain_spot_handler(self, symbol: str):
+        async def on_spot_tick(instrument_key: str, feed_data: Dict):
+            spot = MarketFeedManager.extract_ltp(feed_data)
+            if spot and spot > 0:
+                await self._recentre_chain_stream(symbol, spot)
+        return on_spot_tick
+    
+    async def _on_option_tick(self, instrument_key: str, tick):
+        """Apply an option tick to whichever streamed chain owns the key"""
+        for symbol, stream in self.chain_streams.items():
+            if stream.apply_tick(instrument_key, tick):
+                self._tick_chains.add(symbol)
+                self._schedule_tick_reprice()
+                return
+    
+    async def _seed_chain_stream(self, symbol: str, expiry: str, chain: Dict, fetched_at: float):
+        """(Re)seed a streamed chain from a fresh REST chain and subscribe its window"""
+        stream = self.chain_streams.get(symbol)
+        if stream is None or stream.expiry != expiry:
+            if stream is not None:
+                await self._update_chain_subscriptions(set(), stream.subscribed)
+            stream = StreamedOptionChain(symbol, expiry, self._get_strike_step(symbol), self.chain_stream_strikes)
+            self.chain_streams[symbol] = stream
+        
+        if not stream.reconcile(chain, fetched_at, self.market_feed.latest_data):
+            return
+        spot = self.market_feed.get_spot_price(self._get_index_instrument_key(symbol))
+        spot = spot or (self.market_state.get(symbol) or {}).get('spot_price')
+        if spot:
+            await self._recentre_chain_stream(symbol, spot, force=True)
+    
+    async def _recentre_chain_stream(self, symbol: str, spot: float, force: bool = False):
+        """Resubscribe the ATM±N window once spot has moved a full strike step"""
+        stream = self.chain_streams.get(symbol)
+        if stream is None or not (force or stream.needs_recentre(spot)):
+            return
+        previous_centre = stream.centre
+        added, removed = stream.recentre(spot)
+        if added or removed:
+            logger.info(
+                f"🔄 {symbol} chain stream recentred {previous_centre} → {stream.centre} "
+                f"(+{len(added)} / -{len(removed)} option keys)"
+            )
+        await self._update_chain_subscriptions(added, removed)
+    
+    async def _update_chain_subscriptions(self, added: Set[str], removed: Set[str]):
+        try:
+            for key in added - self._chain_tick_keys:
+                self.market_feed.register_callback(key, self._on_option_tick)
+                self._chain_tick_keys.add(key)
+            if added:
+                await self.market_feed.subscribe(sorted(added), mode="full")
+            
+            # Keys with other subscribers (e.g. open positions) stay subscribed
+            released = [
+                key for key in removed
+                if all(callback == self._on_option_tick for callback in self.market_feed.subscribers.get(key, []))
+            ]
+            if released:
+                await self.market_feed.unsubscribe(released)
+        except Exception as e:
+            logger.error(f"Error updating option chain subscriptions: {e}")
     
+    def get_chain_stream_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Window, tick counts and freshness per streamed chain"""
+        return {symbol: stream.stats() for symbol, stream in self.chain_streams.items()}
+
+    def set_monitors(
+        self,
+        market_monitor: Optional["MarketMonitor"] = None,
+        data_monitor: Optional["MarketDataMonitor"] = None
+    ):
+        """Attach safety monitors for market condition and data quality."""
+        self.market_monitor = market_monitor
+        self.data_monitor = data_monitor
+        
+    async def _fetch_source(self, symbol: str, source: str, coro) -> Tuple[Any, bool]:
+        """
+        Await one market data source under its own timeout.
+
+        Returns (value, fresh). On timeout or error the coroutine is abandoned,
+        the failure is logged and (None, False) is returned so the caller can
+        fall back to the last published value and mark the field stale.
+        """
+        timeout = self.source_timeouts.get(source, self.default_source_timeout)
+        try:
+            return await asyncio.wait_for(coro, timeout=timeout), True
+        except asyncio.TimeoutError:
+            logger.warning(f"⏱️ {source} for {symbol} timed out after {timeout}s - using last known value")
+        except Exception as e:
+            logger.error(f"✗ {source} for {symbol} failed: {e}")
+        return None, False
+
     async def get_current_state(self) -> Dict[str, Any]:
         """
         Get current market state for NIFTY and SENSEX
         Updates self.market_state with fresh data including timestamps
+
+        Both symbols are built concurrently, so cycle latency is bounded by the
+        slowest symbol rather than the sum of both.
         """
         try:
             state = {}
             
-            # Get data for Nifty
-            nifty_data = await self.get_instrument_data("NIFTY")
+            nifty_data, sensex_data = await asyncio.gather(
+                self.get_instrument_data("NIFTY"),
+                self.get_instrument_data("SENSEX")
+            )
+            
             if nifty_data:
                 # Ensure PCR is present and derive from option_chain if missing
                 if 'pcr' not in nifty_data or nifty_data.get('pcr') in (None, 0):
@@ -648,8 +861,6 @@ class MarketDataManager:
                 state["NIFTY"] = nifty_data
                 # market_state already updated in get_instrument_data()
             
-            # Get data for Sensex
-            sensex_data = await self.get_instrument_data("SENSEX")
             if sensex_data:
                 # If SENSEX lacks PCR, prefer NIFTY's PCR (production rule)
                 if 'pcr' not in sensex_data or sensex_data.get('pcr') in (None, 0):
@@ -668,9 +879,14 @@ class MarketDataManager:
                 state["SENSEX"] = sensex_data
                 # market_state already updated in get_instrument_data()
             
-            # Add freshness indicator
+            # Add freshness indicator - stale if any symbol is missing or partially built
+            stale_symbols = [
+                symbol for symbol in ("NIFTY", "SENSEX")
+                if symbol not in state or state[symbol].get('stale_fields')
+            ]
             state["last_update"] = datetime.now()
-            state["is_stale"] = False
+            state["is_stale"] = bool(stale_symbols)
+            state["stale_symbols"] = stale_symbols
             # Log final published PCRs for observability
             try:
                 logger.info(
@@ -686,18 +902,74 @@ class MarketDataManager:
             return {"is_stale": True, "last_update": None}
     
     async def get_instrument_data(self, symbol: str) -> Optional[Dict]:
-        """Get complete data for an instrument"""
+        """
+        Get complete data for an instrument
+
+        Independent sources (spot, option chain, multi-timeframe indicators,
+        1-minute candles, session VWAP, IV rank) are fetched concurrently, each
+        under its own timeout. A source that times out or fails falls back to
+        the last published value and is listed in 'stale_fields'.
+        """
         try:
-            # Get spot price
-            spot_price = await self.get_spot_price(symbol)
-            if not spot_price:
-                return None
+            previous = self.market_state.get(symbol) or {}
             
             # Get symbol-specific expiry
-            symbol_expiry = self._get_current_weekly_expiry(symbol)
+            symbol_expiry = self.calendar.current_expiry(symbol)
+            instrument_key = self._get_index_instrument_key(symbol)
+            
+            (
+                (spot_price, spot_fresh),
+                (option_chain, chain_fresh),
+                (multi_timeframe, mtf_fresh),
+                (historical_data, history_fresh),
+                (session_vwap_data, vwap_fresh),
+                (iv_rank_data, iv_rank_fresh),
+            ) = await asyncio.gather(
+                self._fetch_source(symbol, 'spot_price', self.get_spot_price(symbol)),
+                self._fetch_source(symbol, 'option_chain', self.get_option_chain(symbol, symbol_expiry)),
+                self._fetch_source(
+                    symbol, 'multi_timeframe',
+                    self.multi_timeframe_indicators.get_multi_timeframe_analysis(
+                        instrument_key,
+                        timeframes=['5minute', '15minute', '1hour']
+                    )
+                ),
+                self._fetch_source(
+                    symbol, 'historical_data',
+                    self.single_flight.do(
+                        ('candles', instrument_key, '1minute'),
+                        lambda: self._get_intraday_history(symbol, instrument_key)
+                    )
+                ),
+                self._fetch_source(symbol, 'session_vwap', self.session_vwap.get_session_vwap(symbol)),
+                self._fetch_source(symbol, 'iv_rank', self.iv_rank_calculator.get_real_iv_rank(symbol)),
+            )
+            
+            stale_fields = []
             
-            # Get option chain
-            option_chain = await self.get_option_chain(symbol, symbol_expiry)
+            if not spot_fresh or not spot_price:
+                spot_price = previous.get('spot_price')
+                if not spot_price:
+                    return None
+                stale_fields.append('spot_price')
+            
+            if not chain_fresh:
+                option_chain = previous.get('option_chain')
+                stale_fields.append('option_chain')
+            
+            if not mtf_fresh:
+                multi_timeframe = previous.get('multi_timeframe')
+                stale_fields.append('multi_timeframe')
+            elif multi_timeframe:
+                logger.info(f"✓ Multi-timeframe analysis fetched for {symbol}")
+            
+            if not history_fresh:
+                historical_data = previous.get('historical_data') or []
+                stale_fields.append('historical_data')
+            
+            # Feed the ATM IV history behind IV rank (intraday samples are throttled)
+            if chain_fresh and option_chain and spot_price:
+                self.iv_rank_calculator.iv_history.record_chain(symbol, option_chain, spot_price)
             
             # Calculate ATM strike
             atm_strike = self._calculate_atm_strike(spot_price, symbol)
@@ -705,63 +977,6 @@ class MarketDataManager:
             # Get ITM/OTM options around ATM
             strikes = self._get_relevant_strikes(atm_strike, symbol)
             
-            # Get multi-timeframe technical analysis
-            instrument_key = self._get_index_instrument_key(symbol)
-            try:
-                multi_timeframe = await self.multi_timeframe_indicators.get_multi_timeframe_analysis(
-                    instrument_key,
-                    timeframes=['5minute', '15minute', '1hour']
-                )
-                logger.info(f"✓ Multi-timeframe analysis fetched for {symbol}")
-            except Exception as e:
-                logger.error(f"✗ Failed to fetch multi-timeframe analysis for {symbol}: {e}")
-                multi_timeframe = None
-            
-            # Get historical data for ML Strategy (last 60 bars of 1-minute candles)
-            try:
-                historical_response = self.upstox_client.get_intraday_candles(
-                    instrument_key, 
-                    '1minute'
-                )
-                logger.debug(f"Historical response for {symbol}: {historical_response}")
-                if historical_response and 'data' in historical_response and 'candles' in historical_response['data']:
-                    # Convert to list of OHLCV dicts
-                    historical_data = []
-                    data_list = list(historical_response['data']['candles'])  # Convert to list first
-                    
-                    # Get last 60 bars (most recent)
-                    recent_candles = data_list[-60:] if len(data_list) > 60 else data_list
-                    
-                    for candle in recent_candles:
-                        # V3 API returns list format: [timestamp, open, high, low, close, volume, oi]
-                        if isinstance(candle, list) and len(candle) >= 6:
-                            historical_data.append({
-                                'open': float(candle[1]),
-                                'high': float(candle[2]),
-                                'low': float(candle[3]),
-                                'close': float(candle[4]),
-                                'volume': int(candle[5]) if len(candle) > 5 else 0,
-                                'timestamp': candle[0],
-                                'oi': int(candle[6]) if len(candle) > 6 else 0
-                            })
-                        elif isinstance(candle, dict):
-                            historical_data.append({
-                                'open': candle.get('open', 0),
-                                'high': candle.get('high', 0),
-                                'low': candle.get('low', 0),
-                                'close': candle.get('close', 0),
-                                'volume': candle.get('volume', 0),
-                                'timestamp': candle.get('timestamp', ''),
-                                'oi': candle.get('oi', 0)
-                            })
-                    logger.info(f"✓ Fetched {len(historical_data)} historical bars for {symbol} (V3 API)")
-                else:
-                    historical_data = []
-                    logger.warning(f"No historical data available for {symbol}")
-            except Exception as e:
-                logger.error(f"Failed to fetch historical data for {symbol}: {e}")
-                historical_data = []
-            
             # Extract technical indicators from multi_timeframe
             # Use 5minute data if 1hour is not available (more responsive for intraday)
             technical_indicators = {}
@@ -787,19 +1002,31 @@ class MarketDataManager:
                         technical_indicators['adx'] = multi_timeframe[tf]['adx']
                         break
             
+            previous_indicators = previous.get('technical_indicators') or {}
+            
             # Add real Session VWAP (resets daily at 9:15 AM IST)
-            try:
-                session_vwap_data = await self.session_vwap.get_session_vwap(symbol)
+            if vwap_fresh and session_vwap_data:
                 technical_indicators['vwap'] = session_vwap_data['vwap']
                 technical_indicators['vwap_deviation_pct'] = session_vwap_data['vwap_deviation_pct']
                 technical_indicators['session_volume'] = session_vwap_data['total_volume']
                 technical_indicators['session_range_pct'] = session_vwap_data['session_range_pct']
                 logger.info(f"✅ Session VWAP for {symbol}: ₹{session_vwap_data['vwap']:.2f} "
                           f"(Deviation: {session_vwap_data['vwap_deviation_pct']:.3f}%)")
-            except Exception as e:
-                logger.error(f"Failed to get session VWAP for {symbol}: {e}")
-                # Fallback to historical VWAP if session VWAP fails
-                if historical_data:
+            elif 'vwap' in previous_indicators:
+                stale_fields.append('session_vwap')
+                for key in ('vwap', 'vwap_deviation_pct', 'session_volume', 'session_range_pct'):
+                    technical_indicators[key] = previous_indicators.get(key, 0)
+            else:
+                stale_fields.append('session_vwap')
+                # Fallback to the streaming accumulator, then historical VWAP
+                streamed_vwap = self.session_vwap.get_streamed_vwap(symbol, require_live=False)
+                if streamed_vwap:
+                    technical_indicators['vwap'] = streamed_vwap['vwap']
+                    technical_indicators['vwap_deviation_pct'] = streamed_vwap['vwap_deviation_pct']
+                    technical_indicators['session_volume'] = streamed_vwap['total_volume']
+                    technical_indicators['session_range_pct'] = streamed_vwap['session_range_pct']
+                    logger.info(f"⚠️ Using last streamed VWAP for {symbol}: ₹{streamed_vwap['vwap']:.2f}")
+                elif historical_data:
                     total_pv = 0
                     total_volume = 0
                     for candle in historical_data[-20:]:  # Use last 20 candles
@@ -820,17 +1047,16 @@ class MarketDataManager:
                     technical_indicators['session_range_pct'] = 0
             
             # Add real IV Rank
-            try:
-                iv_rank_data = await self.iv_rank_calculator.get_real_iv_rank(symbol)
+            if iv_rank_fresh and iv_rank_data:
                 technical_indicators['iv_rank'] = iv_rank_data['iv_rank']
                 technical_indicators['iv_percentile'] = iv_rank_data['iv_percentile']
                 technical_indicators['current_iv'] = iv_rank_data['current_iv']
                 logger.info(f"✅ Real IV Rank for {symbol}: {iv_rank_data['iv_rank']:.1f}%")
-            except Exception as e:
-                logger.error(f"Failed to get real IV Rank for {symbol}: {e}")
-                technical_indicators['iv_rank'] = 50
-                technical_indicators['iv_percentile'] = 50
-                technical_indicators['current_iv'] = 18.0
+            else:
+                stale_fields.append('iv_rank')
+                technical_indicators['iv_rank'] = previous_indicators.get('iv_rank', 50)
+                technical_indicators['iv_percentile'] = previous_indicators.get('iv_percentile', 50)
+                technical_indicators['current_iv'] = previous_indicators.get('current_iv', 18.0)
             
             # Add other default indicators if missing
             if 'sma_20' not in technical_indicators:
@@ -842,25 +1068,23 @@ class MarketDataManager:
             if 'vwap' not in technical_indicators:
                 technical_indicators['vwap'] = spot_price
             
-            # Build instrument data
-            data = {
-                "symbol": symbol,
-                "spot_price": spot_price,
-                "atm_strike": atm_strike,
-                "expiry": symbol_expiry,
-                "option_chain": option_chain,
-                "strikes": strikes,
-                "multi_timeframe": multi_timeframe,
-                "technical_indicators": technical_indicators,
-                "iv_rank": multi_timeframe.get('1hour', {}).get('indicators', {}).get('iv_rank', 50) if multi_timeframe else 50,
-                "historical_data": historical_data,  # Add historical data for ML Strategy
-                "timestamp": datetime.now().isoformat()
-            }
+            if stale_fields:
+                logger.warning(f"⚠️ Partial state for {symbol}: stale fields {stale_fields}")
             
             # Add timestamp to option chain for freshness validation
-            if option_chain:
-                option_chain['timestamp'] = datetime.now().isoformat()
-                option_chain['fetch_time'] = datetime.now()
+            # (new dict - the cached chain itself is never written in place)
+            if option_chain and chain_fresh:
+                option_chain = {
+                    **option_chain,
+                    'timestamp': datetime.now().isoformat(),
+                    'fetch_time': datetime.now()
+                }
+            
+            # Re-solve stale IVs and reprice every strike's Greeks at the current spot and real time to expiry
+            if option_chain and spot_price:
+                option_chain = reprice_chain(
+                    option_chain, spot_price, self.calendar.years_until(symbol_expiry), self.risk_free_rate
+                )
             
             # Populate market_state for downstream strategies and Greeks calculation
             self.market_state[symbol] = {
@@ -868,6 +1092,7 @@ class MarketDataManager:
                 'atm_strike': atm_strike,
                 'expiry': symbol_expiry,
                 'option_chain': option_chain,
+                'strikes': strikes,
                 'pcr': option_chain.get('pcr', 1.0) if option_chain else 1.0,  # Fixed: use 1.0 as neutral default
                 'max_pain': option_chain.get('max_pain', 0) if option_chain else 0,
                 'historical_data': historical_data,  # Add historical data for ML Strategy
@@ -877,6 +1102,7 @@ class MarketDataManager:
                 'multi_timeframe': multi_timeframe,
                 'technical_indicators': technical_indicators,
                 'iv_rank': technical_indicators.get('iv_rank', 50),  # Use real IV Rank from technical_indicators
+                'stale_fields': stale_fields,
                 'timestamp': datetime.now()
             }
             
@@ -886,29 +1112,65 @@ class MarketDataManager:
             logger.error(f"Error getting instrument data for {symbol}: {e}")
             return None
     
+    async def _get_intraday_history(self, symbol: str, instrument_key: str) -> List[Dict]:
+        """Get last 60 bars of 1-minute candles for ML Strategy"""
+        # Tick-built candles (oldest first) while the feed is live
+        recent_candles = self.candles.get_candles(instrument_key, '1minute', limit=60)
+        source = "tick candles"
+        
+        if recent_candles is None:
+            historical_response = await self.async_client.get_intraday_candles(
+                instrument_key, 
+                '1minute',
+                priority=Priority.TRADING  # Feeds the ML strategy, not analytics
+            )
+            logger.debug(f"Historical response for {symbol}: {historical_response}")
+            if not (historical_response and 'data' in historical_response and 'candles' in historical_response['data']):
+                logger.warning(f"No historical data available for {symbol}")
+                return []
+            
+            # Oldest first, so the last 60 bars are the most recent
+            data_list = sorted(historical_response['data']['candles'], key=lambda c: c[0] if isinstance(c, list) else c.get('timestamp', ''))
+            recent_candles = data_list[-60:] if len(data_list) > 60 else data_list
+            source = "V3 API"
+        
+        # Convert to list of OHLCV dicts
+        historical_data = []
+        
+        for candle in recent_candles:
+            # V3 API returns list format: [timestamp, open, high, low, close, volume, oi]
+            if isinstance(candle, list) and len(candle) >= 6:
+                historical_data.append({
+                    'open': float(candle[1]),
+                    'high': float(candle[2]),
+                    'low': float(candle[3]),
+                    'close': float(candle[4]),
+                    'volume': int(candle[5]) if len(candle) > 5 else 0,
+                    'timestamp': candle[0],
+                    'oi': int(candle[6]) if len(candle) > 6 else 0
+                })
+            elif isinstance(candle, dict):
+                historical_data.append({
+                    'open': candle.get('open', 0),
+                    'high': candle.get('high', 0),
+                    'low': candle.get('low', 0),
+                    'close': candle.get('close', 0),
+                    'volume': candle.get('volume', 0),
+                    'timestamp': candle.get('timestamp', ''),
+                    'oi': candle.get('oi', 0)
+                })
+        logger.info(f"✓ Fetched {len(historical_data)} historical bars for {symbol} ({source})")
+        return historical_data
+    
+
     async def get_spot_price(self, symbol: str) -> Optional[float]:
-        """Get spot price for underlying - uses Redis + in-memory caching to prevent rate limiting"""
-        
-        # Check Redis cache first
-        if self.redis_cache.is_available():
-            cached_price = self.redis_cache.get_spot_price(symbol)
-            if cached_price is not None:
-                logger.debug(f"✓ Redis cache hit: spot price for {symbol}: {cached_price}")
-                return cached_price
-        
-        # Check in-memory cache - 5 second TTL for rate limiting safety
-        cache_key = f"spot_{symbol}"
-        if cache_key in self.spot_price_cache:
-            cached_data = self.spot_price_cache[cache_key]
-            # Defensive check for cache structure
-            if not isinstance(cached_data, dict) or 'timestamp' not in cached_data or 'price' not in cached_data:
-                logger.warning(f"Corrupted cache entry for {symbol}, removing and refetching")
-                del self.spot_price_cache[cache_key]
-            else:
-                cache_age = (datetime.now() - cached_data['timestamp']).total_seconds()
-                if cache_age < 5:  # 5 second cache - BALANCED for rate limiting
-                    logger.debug(f"Using cached spot price for {symbol}: {cached_data['price']} (age: {cache_age:.1f}s)")
-                    return cached_data['price']
+        """Get spot price for underlying - uses the two-tier cache to prevent rate limiting"""
+        
+        # L1 in-process, then L2 Redis - 5 second TTL for rate limiting safety
+        cached_price = await self.cache.get('spot', symbol)
+        if cached_price is not None:
+            logger.debug(f"✓ Cache hit: spot price for {symbol}: {cached_price}")
+            return cached_price
         
         instrument_key = self._get_index_instrument_key(symbol)
         
@@ -918,21 +1180,17 @@ class MarketDataManager:
                 price = self.market_feed.get_spot_price(instrument_key)
                 if price is not None:
                     logger.debug(f"✓ Spot price for {symbol}: {price} (WebSocket)")
-                    # Cache it in both Redis and memory
-                    self.redis_cache.set_spot_price(symbol, price)
-                    self.spot_price_cache[cache_key] = {'price': price, 'timestamp': datetime.now()}
+                    await self.cache.set('spot', symbol, price)
                     return price
                 else:
                     logger.debug(f"No WebSocket data yet for {symbol}, falling back to REST")
             except Exception as e:
                 logger.warning(f"WebSocket price fetch failed for {symbol}: {e}, using REST")
         
-        # Fallback to REST API
-        price = await self._get_spot_price_rest(symbol)
+        # Fallback to REST API (concurrent callers share one request)
+        price = await self.single_flight.do(('spot', symbol), lambda: self._get_spot_price_rest(symbol))
         if price:
-            # Cache REST API result in both Redis and memory
-            self.redis_cache.set_spot_price(symbol, price)
-            self.spot_price_cache[cache_key] = {'price': price, 'timestamp': datetime.now()}
+            await self.cache.set('spot', symbol, price)
         return price
     
     async def _get_spot_price_rest(self, symbol: str) -> Optional[float]:
@@ -942,7 +1200,7 @@ class MarketDataManager:
             instrument_key = self._get_index_instrument_key(symbol)
             
             # Get LTP
-            response = self.upstox_client.get_ltp([instrument_key])
+            response = await self.async_client.get_ltp([instrument_key])
             
             if response and 'data' in response:
                 # Upstox returns key with colon instead of pipe
@@ -962,37 +1220,24 @@ class MarketDataManager:
     
     async def get_option_chain(self, symbol: str, expiry: str) -> Optional[Dict]:
         """
-        Get option chain for finding new opportunities - uses Redis + in-memory caching
+        Get option chain for finding new opportunities - uses the two-tier cache
         Note: Position price updates now use direct LTP API calls for better performance
         """
-        cache_key = f"{symbol}_{expiry}"
-        
-        # Check Redis cache first
-        if self.redis_cache.is_available():
-            cached_chain = self.redis_cache.get_option_chain(symbol, expiry)
-            if cached_chain is not None:
-                logger.debug(f"✓ Redis cache hit: option chain for {symbol} {expiry}")
-                return cached_chain
-        
-        # Check in-memory cache - 5s cache for rate limiting safety
-        if cache_key in self.option_chain_cache:
-            cached = self.option_chain_cache[cache_key]
-            # Defensive check for cache structure
-            if not isinstance(cached, dict) or 'timestamp' not in cached or 'data' not in cached:
-                logger.warning(f"Corrupted option chain cache entry for {symbol}, removing and refetching")
-                del self.option_chain_cache[cache_key]
-            else:
-                age = (datetime.now() - cached['timestamp']).total_seconds()
-                if age < 10:  # 10 second cache - SAFE for rate limiting (3 req/s limit)
-                    logger.debug(f"Using cached option chain for {symbol} (age: {age:.1f}s)")
-                    # Add timestamp to cached data
-                    if cached['data'] and isinstance(cached['data'], dict):
-                        cached['data']['timestamp'] = cached['timestamp'].isoformat()
-                        cached['data']['fetch_time'] = cached['timestamp']
-                    return cached['data']
-                else:
-                    logger.debug(f"Cache expired for {symbol} (age: {age:.1f}s), fetching fresh data")
-                    # Don't return cached data, continue to fetch fresh data
+        cache_key = f"{symbol}:{expiry}"
+        
+        # Streamed chain is fresher than any cache; REST only for the periodic reconcile
+        stream = self.chain_streams.get(symbol) if self.stream_option_chain else None
+        if stream is not None and stream.expiry == expiry:
+            last_failure_time = self.option_chain_failure_cache.get((symbol, expiry))
+            recent_failure = last_failure_time and (datetime.now() - last_failure_time).total_seconds() < 20
+            if stream.seconds_since_reconcile() < self.chain_reconcile_interval or recent_failure:
+                return stream.build_chain()
+            # Reconciles the stream in place; on failure the stream keeps serving ticks
+            await self.single_flight.do(
+                ('option_chain', symbol, expiry),
+                lambda: self._fetch_option_chain(symbol, expiry)
+            )
+            return stream.build_chain()
         
         # Throttle repeated failures to avoid hammering API
         failure_key = (symbol, expiry)
@@ -1003,23 +1248,41 @@ class MarketDataManager:
                 logger.warning(
                     f"Skipping option chain request for {symbol} {expiry} - last failure {seconds_since_failure:.1f}s ago"
                 )
-                cached_entry = self.option_chain_cache.get(cache_key)
-                return cached_entry['data'] if cached_entry else None
+                return await self.cache.get('chain', cache_key, allow_stale=True)
+        
+        # 10s fresh TTL; a chain up to 10s past it is served while one background
+        # fetch refreshes it. Concurrent callers share one in-flight fetch, which
+        # caches its own result.
+        return await self.cache.get_or_load(
+            'chain',
+            cache_key,
+            lambda: self.single_flight.do(
+                ('option_chain', symbol, expiry),
+                lambda: self._fetch_option_chain(symbol, expiry)
+            ),
+            store=False
+        )
+    
+    async def _fetch_option_chain(self, symbol: str, expiry: str) -> Optional[Dict]:
+        """Fetch, process, cache and persist a fresh option chain from the REST API"""
+        cache_key = f"{symbol}:{expiry}"
+        failure_key = (symbol, expiry)
+        fetched_at = time.time()
         
         try:
             instrument_key = self._get_index_instrument_key(symbol)
-            response = self.upstox_client.get_option_chain(instrument_key, expiry)
+            response = await self.async_client.get_option_chain(instrument_key, expiry)
             
             # If calculated expiry returns empty data, try fallback expiry
             if not response or not response.get('data') or len(response['data']) == 0:
                 logger.warning(f"No option chain data for {symbol} expiry {expiry}, trying fallback")
-                # Try multiple fallback expiries for SENSEX (which has different expiry cycles)
-                fallback_expries = ['2025-11-25', '2025-11-27', '2025-12-02', '2025-12-31']
+                # Try the next listed expiries from the trading calendar
+                fallback_expiries = self.calendar.expiries(symbol, after=expiry)[:3]
                 response_data = None
                 
-                for fallback_expiry in fallback_expries:
+                for fallback_expiry in fallback_expiries:
                     logger.info(f"Trying fallback expiry {fallback_expiry} for {symbol}")
-                    response = self.upstox_client.get_option_chain(instrument_key, fallback_expiry)
+                    response = await self.async_client.get_option_chain(instrument_key, fallback_expiry)
                     if response and 'data' in response and len(response['data']) > 0:
                         logger.info(f"✓ Using fallback expiry {fallback_expiry} for {symbol}")
                         response_data = response
@@ -1028,11 +1291,11 @@ class MarketDataManager:
                 if not response_data:
                     logger.error(f"No option chain data available for {symbol} even with multiple fallbacks")
                     # For SENSEX, try with NIFTY format as last resort
-                    if symbol == "SENSEX":
+                    if symbol == "SENSEX" and fallback_expiries:
                         logger.warning("Trying alternative SENSEX instrument format...")
                         try:
                             alt_instrument_key = "BSE_INDEX|SENSEX"
-                            response = self.upstox_client.get_option_chain(alt_instrument_key, fallback_expries[0])
+                            response = await self.async_client.get_option_chain(alt_instrument_key, fallback_expiries[0])
                             if response and 'data' in response and len(response['data']) > 0:
                                 logger.info(f"✓ SENSEX data found with alternative instrument format")
                                 response_data = response
@@ -1080,16 +1343,15 @@ class MarketDataManager:
                     chain_data['timestamp'] = datetime.now().isoformat()
                     chain_data['fetch_time'] = datetime.now()
                 
-                # Cache it in both Redis and memory
-                self.option_chain_cache[cache_key] = {
-                    'data': chain_data,
-                    'timestamp': datetime.now()
-                }
-                # Also cache in Redis for cross-process sharing
-                self.redis_cache.set_option_chain(symbol, expiry, chain_data)
+                # Cache in L1 and (for cross-process sharing) Redis
+                await self.cache.set('chain', cache_key, chain_data)
                 if failure_key in self.option_chain_failure_cache:
                     del self.option_chain_failure_cache[failure_key]
                 
+                # Full reconcile of the streamed chain (and its subscription window)
+                if self.stream_option_chain and self.market_feed:
+                    await self._seed_chain_stream(symbol, expiry, chain_data, fetched_at)
+                
                 return chain_data
         
         except Exception as e:
@@ -1099,117 +1361,52 @@ class MarketDataManager:
     
     def _filter_relevant_strikes(self, option_chain: Dict, spot_price: float, symbol: str) -> Dict:
         """Filter option chain to only relevant strikes for intraday trading"""
+        columns = as_columns(option_chain)
+        if columns is None:
+            return option_chain
         
-        # Log what strikes we received from Upstox (for debugging missed opportunities)
-        all_call_strikes = sorted([float(s) for s in option_chain.get('calls', {}).keys()])
-        all_put_strikes = sorted([float(s) for s in option_chain.get('puts', {}).keys()])
+        call_count_before = columns.count('calls')
+        put_count_before = columns.count('puts')
         
-        # Check for specific strikes of interest (debugging)
-        target_strikes = [25850, 25900, 25800]  # Near current ATM
-        for target in target_strikes:
-            if str(int(target)) in option_chain.get('puts', {}):
-                put_data = option_chain['puts'][str(int(target))]
-                logger.info(
-                    f"{symbol} {target} PE in raw data: LTP={put_data.get('ltp', 0)}, "
-                    f"OI={put_data.get('oi', 0)}, Vol={put_data.get('volume', 0)}"
-                )
-        
-        if all_call_strikes or all_put_strikes:
+        if len(columns):
             logger.info(
                 f"{symbol} raw strikes from Upstox: "
-                f"Calls {min(all_call_strikes) if all_call_strikes else 'none'}-"
-                f"{max(all_call_strikes) if all_call_strikes else 'none'} ({len(all_call_strikes)}), "
-                f"Puts {min(all_put_strikes) if all_put_strikes else 'none'}-"
-                f"{max(all_put_strikes) if all_put_strikes else 'none'} ({len(all_put_strikes)}) | "
+                f"{columns.strikes[0]:.0f}-{columns.strikes[-1]:.0f} "
+                f"(Calls {call_count_before}, Puts {put_count_before}) | "
                 f"Spot: {spot_price:.1f}"
             )
         
         # Calculate ATM range
         lower_bound = spot_price * (1 - self.atm_range_percent)
         upper_bound = spot_price * (1 + self.atm_range_percent)
+        core_atm_lower = spot_price * (1 - self.atm_core_percent)
+        core_atm_upper = spot_price * (1 + self.atm_core_percent)
+        
+        strikes = columns.strikes
+        in_range = (strikes >= lower_bound) & (strikes <= upper_bound)
+        # Always preserve strikes in core ATM region (±2%) - these are critical for intraday moves
+        core_atm = (strikes >= core_atm_lower) & (strikes <= core_atm_upper)
+        # Low volume is tolerated inside the wider ATM region (±5%)
+        wide_atm = (strikes >= spot_price * 0.95) & (strikes <= spot_price * 1.05)
+        
+        def liquid(side) -> np.ndarray:
+            # Strikes outside core ATM must pass the OI / volume filters
+            return (side['oi'] >= self.min_open_interest) & ((side['volume'] >= self.min_volume) | wide_atm)
+        
+        filtered_columns = columns.select(
+            in_range & (core_atm | liquid(columns.calls)),
+            in_range & (core_atm | liquid(columns.puts))
+        )
         
         filtered = {
-            'calls': {},
-            'puts': {},
+            **filtered_columns.to_legacy(),
             'pcr': 0,
             'max_pain': 0
         }
         
-        call_count_before = len(option_chain.get('calls', {}))
-        put_count_before = len(option_chain.get('puts', {}))
-        
-        # Filter calls
-        for strike_str, call_data in option_chain.get('calls', {}).items():
-            strike_price = float(strike_str)  # Convert string key to float for comparison
-            
-            # Skip if outside ATM range
-            if strike_price < lower_bound or strike_price > upper_bound:
-                continue
-            
-            # Always preserve strikes in core ATM region (±2%) - these are critical for intraday moves
-            is_core_atm = (spot_price * (1 - self.atm_core_percent) <= strike_price <= spot_price * (1 + self.atm_core_percent))
-            
-            if is_core_atm:
-                # Core ATM strikes: keep regardless of OI/volume (capture early price spikes)
-                filtered['calls'][strike_str] = call_data
-                continue
-                
-            # For strikes outside core ATM, apply liquidity filters
-            # Skip if low liquidity
-            if call_data.get('oi', 0) < self.min_open_interest:
-                continue
-                
-            # For very low volume, skip unless in wider ATM region (±5%)
-            if call_data.get('volume', 0) < self.min_volume:
-                if not (spot_price * 0.95 <= strike_price <= spot_price * 1.05):
-                    continue
-            
-            filtered['calls'][strike_str] = call_data  # Keep string key
-        
-        # Filter puts (similar logic)
-        for strike_str, put_data in option_chain.get('puts', {}).items():
-            strike_price = float(strike_str)  # Convert string key to float for comparison
-            
-            # Debug specific strikes
-            if int(strike_price) in [25850, 25900]:
-                logger.info(f"{symbol} Processing {strike_str} PE: strike={strike_price}, lower={lower_bound:.0f}, upper={upper_bound:.0f}")
-            
-            # Skip if outside ATM range
-            if strike_price < lower_bound or strike_price > upper_bound:
-                if int(strike_price) in [25850, 25900]:
-                    logger.warning(f"{symbol} FILTERED OUT {strike_str} PE: Outside range {lower_bound:.0f}-{upper_bound:.0f}")
-                continue
-            
-            # Always preserve strikes in core ATM region (±2%) - these are critical for intraday moves
-            is_core_atm = (spot_price * (1 - self.atm_core_percent) <= strike_price <= spot_price * (1 + self.atm_core_percent))
-            
-            if is_core_atm:
-                # Core ATM strikes: keep regardless of OI/volume (capture early price spikes)
-                logger.debug(f"{symbol} Keeping {strike_str} PE (core ATM): LTP={put_data.get('ltp')}, OI={put_data.get('oi')}")
-                filtered['puts'][strike_str] = put_data
-                continue
-                
-            # For strikes outside core ATM, apply liquidity filters
-            # Skip if low liquidity
-            if put_data.get('oi', 0) < self.min_open_interest:
-                if int(float(strike_str)) in [25850, 25900, 25800]:  # Debug specific strikes
-                    logger.warning(f"{symbol} FILTERED OUT {strike_str} PE: OI={put_data.get('oi')} < {self.min_open_interest}")
-                continue
-                
-            # For very low volume, skip unless in wider ATM region (±5%)
-            if put_data.get('volume', 0) < self.min_volume:
-                if not (spot_price * 0.95 <= strike_price <= spot_price * 1.05):
-                    if int(float(strike_str)) in [25850, 25900, 25800]:  # Debug specific strikes
-                        logger.warning(f"{symbol} FILTERED OUT {strike_str} PE: Vol={put_data.get('volume')} < {self.min_volume}, outside ±5%")
-                    continue
-            
-            filtered['puts'][strike_str] = put_data  # Keep string key
-            if int(float(strike_str)) in [25850, 25900, 25800]:  # Debug specific strikes
-                logger.info(f"{symbol} KEPT {strike_str} PE (passed filters): LTP={put_data.get('ltp')}, OI={put_data.get('oi')}, Vol={put_data.get('volume')}")
-        
         # Recalculate PCR with filtered data
-        total_call_oi = sum(call_data.get('oi', 0) for call_data in filtered['calls'].values())
-        total_put_oi = sum(put_data.get('oi', 0) for put_data in filtered['puts'].values())
+        total_call_oi = filtered_columns.total_oi('calls')
+        total_put_oi = filtered_columns.total_oi('puts')
         
         if total_call_oi > 0:
             filtered['pcr'] = total_put_oi / total_call_oi
@@ -1228,25 +1425,14 @@ class MarketDataManager:
         filtered['max_pain'] = self._calculate_max_pain(filtered)
         
         # Log filtering effectiveness with ATM range details
-        call_reduction = ((call_count_before - len(filtered['calls'])) / call_count_before * 100) if call_count_before > 0 else 0
-        put_reduction = ((put_count_before - len(filtered['puts'])) / put_count_before * 100) if put_count_before > 0 else 0
-        
-        # Calculate core ATM range for logging
-        core_atm_lower = spot_price * (1 - self.atm_core_percent)
-        core_atm_upper = spot_price * (1 + self.atm_core_percent)
-        
-        # Check if specific strikes made it through
-        target_strikes_kept = [s for s in ['25850', '25900', '25800'] if s in filtered['puts']]
-        if target_strikes_kept:
-            logger.info(f"{symbol} ✅ Target strikes KEPT: {target_strikes_kept}")
-        else:
-            target_strikes_in_original = [s for s in ['25850', '25900', '25800'] if s in option_chain.get('puts', {})]
-            if target_strikes_in_original:
-                logger.warning(f"{symbol} ❌ Target strikes LOST: {target_strikes_in_original} (were in original, not in filtered)")
+        call_count_after = filtered_columns.count('calls')
+        put_count_after = filtered_columns.count('puts')
+        call_reduction = ((call_count_before - call_count_after) / call_count_before * 100) if call_count_before > 0 else 0
+        put_reduction = ((put_count_before - put_count_after) / put_count_before * 100) if put_count_before > 0 else 0
         
         logger.info(
-            f"{symbol} strike filtering: Calls {call_count_before}→{len(filtered['calls'])} "
-            f"({call_reduction:.0f}% reduction), Puts {put_count_before}→{len(filtered['puts'])} "
+            f"{symbol} strike filtering: Calls {call_count_before}→{call_count_after} "
+            f"({call_reduction:.0f}% reduction), Puts {put_count_before}→{put_count_after} "
             f"({put_reduction:.0f}% reduction) | "
             f"Core ATM: {core_atm_lower:.0f}-{core_atm_upper:.0f}, "
             f"Full range: {lower_bound:.0f}-{upper_bound:.0f}"
@@ -1255,98 +1441,28 @@ class MarketDataManager:
         return filtered
     
     def _process_option_chain(self, raw_data: List[Dict]) -> Dict:
-        """Process raw option chain data from Upstox into a structured form."""
+        """Process raw option chain data from Upstox into a columnar chain with legacy dict views."""
+        columns, invalid_count = OptionChainColumns.from_upstox(raw_data, validate=self._validate_option_data)
+
+        total_call_oi = columns.total_oi('calls')
+        total_put_oi = columns.total_oi('puts')
+
         processed = {
-            'calls': {},
-            'puts': {},
-            'pcr': 0,
+            **columns.to_legacy(),
+            'pcr': total_put_oi / total_call_oi if total_call_oi > 0 else 0,
             'max_pain': 0,
             'metadata': {
                 'processed_at': datetime.now().isoformat(),
-                'total_strikes': 0,
-                'invalid_count': 0
+                'total_strikes': columns.count('calls') + columns.count('puts'),
+                'invalid_count': invalid_count
             }
         }
 
-        total_call_oi = 0
-        total_put_oi = 0
-        invalid_count = 0
-
-        for item in raw_data:
-            try:
-                strike_price = item.get('strike_price')
-                if strike_price is None or strike_price <= 0:
-                    invalid_count += 1
-                    continue
-
-                strike_key = str(int(strike_price))
-
-                if 'call_options' in item:
-                    call = item['call_options']
-                    market_data = call.get('market_data', {})
-                    if not self._validate_option_data(market_data):
-                        invalid_count += 1
-                        continue
-
-                    option_greeks = call.get('option_greeks', {})
-                    processed['calls'][strike_key] = {
-                        'instrument_key': call.get('instrument_key', ''),
-                        'ltp': float(market_data.get('ltp', 0)),
-                        'oi': int(market_data.get('oi', 0)),
-                        'volume': int(market_data.get('volume', 0)),
-                        'iv': float(option_greeks.get('iv', 0)),
-                        'delta': float(option_greeks.get('delta', 0)),
-                        'gamma': float(option_greeks.get('gamma', 0)),
-                        'theta': float(option_greeks.get('theta', 0)),
-                        'vega': float(option_greeks.get('vega', 0)),
-                        'bid': float(market_data.get('bid_price', 0)),
-                        'ask': float(market_data.get('ask_price', 0)),
-                        'oi_change': int(market_data.get('oi', 0) - market_data.get('prev_oi', 0)),
-                        'strike': float(strike_price)
-                    }
-                    total_call_oi += int(market_data.get('oi', 0))
-
-                if 'put_options' in item:
-                    put = item['put_options']
-                    market_data = put.get('market_data', {})
-                    if not self._validate_option_data(market_data):
-                        invalid_count += 1
-                        continue
-
-                    option_greeks = put.get('option_greeks', {})
-                    processed['puts'][strike_key] = {
-                        'instrument_key': put.get('instrument_key', ''),
-                        'ltp': float(market_data.get('ltp', 0)),
-                        'oi': int(market_data.get('oi', 0)),
-                        'volume': int(market_data.get('volume', 0)),
-                        'iv': float(option_greeks.get('iv', 0)),
-                        'delta': float(option_greeks.get('delta', 0)),
-                        'gamma': float(option_greeks.get('gamma', 0)),
-                        'theta': float(option_greeks.get('theta', 0)),
-                        'vega': float(option_greeks.get('vega', 0)),
-                        'bid': float(market_data.get('bid_price', 0)),
-                        'ask': float(market_data.get('ask_price', 0)),
-                        'oi_change': int(market_data.get('oi', 0) - market_data.get('prev_oi', 0)),
-                        'strike': float(strike_price)
-                    }
-                    total_put_oi += int(market_data.get('oi', 0))
-
-            except (ValueError, TypeError) as e:
-                logger.warning(f"Invalid option data at strike {item.get('strike_price')}: {e}")
-                invalid_count += 1
-                continue
-
-        if total_call_oi > 0:
-            processed['pcr'] = total_put_oi / total_call_oi
-
         processed['total_call_oi'] = total_call_oi
         processed['total_put_oi'] = total_put_oi
         processed['total_oi'] = total_call_oi + total_put_oi
         processed['max_pain'] = self._calculate_max_pain(processed)
 
-        processed['metadata']['total_strikes'] = len(processed['calls']) + len(processed['puts'])
-        processed['metadata']['invalid_count'] = invalid_count
-
         if invalid_count > 0:
             logger.warning(f"Skipped {invalid_count} invalid option entries during processing")
 
@@ -1382,139 +1498,182 @@ class MarketDataManager:
     def _calculate_max_pain(self, option_data: Dict) -> float:
         """Calculate max pain strike."""
         try:
-            strikes = set(option_data['calls'].keys()) | set(option_data['puts'].keys())
-            min_pain = float('inf')
-            max_pain_strike = 0
-
-            for strike_str in strikes:
-                strike = float(strike_str)
-                pain = 0
-
-                for call_strike_str, call_data in option_data['calls'].items():
-                    call_strike = float(call_strike_str)
-                    if strike > call_strike:
-                        pain += (strike - call_strike) * call_data['oi']
-
-                for put_strike_str, put_data in option_data['puts'].items():
-                    put_strike = float(put_strike_str)
-                    if strike < put_strike:
-                        pain += (put_strike - strike) * put_data['oi']
-
-                if pain < min_pain:
-                    min_pain = pain
-                    max_pain_strike = strike
-
-            return max_pain_strike
+            columns = as_columns(option_data)
+            return columns.max_pain() if columns is not None else 0.0
 
         except Exception as e:
             logger.error(f"Error calculating max pain: {e}")
             return 0.0
 
+    # ========== Snapshot producer / consumer API ==========
+    
+    async def refresh_snapshot(self) -> MarketSnapshot:
+        """Build the market state once and publish it as the next immutable snapshot"""
+        state = await self.get_current_state()
+        return await self.snapshots.publish(state)
+    
+    async def run_snapshot_producer(self, interval: float = 10.0, is_active=None):
+        """
+        Single producer loop: rebuild and publish a snapshot every interval seconds
+        
+        Args:
+            interval: Seconds between snapshot builds
+            is_active: Optional zero-arg callable; the loop exits when it returns False
+        """
+        self._snapshot_producer_running = True
+        logger.info(f"📸 Market snapshot producer started ({interval}s interval)")
+        try:
+            while is_active is None or is_active():
+                started = datetime.now()
+                try:
+                    snapshot = await self.single_flight.do(('snapshot',), self.refresh_snapshot)
+                    logger.debug(
+                        f"Snapshot v{snapshot.version} built in "
+                        f"{(datetime.now() - started).total_seconds():.2f}s"
+                    )
+                except Exception as e:
+                    logger.error(f"Error publishing market snapshot: {e}")
+                elapsed = (datetime.now() - started).total_seconds()
+                await asyncio.sleep(max(0.0, interval - elapsed))
+        finally:
+            self._snapshot_producer_running = False
+            logger.info("Market snapshot producer stopped")
+    
+    def latest(self) -> Optional[MarketSnapshot]:
+        """Latest published snapshot without waiting (None before first publish)"""
+        return self.snapshots.latest()
+    
+    async def wait_for_version(self, after: int, timeout: Optional[float] = None) -> Optional[MarketSnapshot]:
+        """Wait for a snapshot newer than version `after` (None on timeout)"""
+        return await self.snapshots.wait_for_version(after, timeout)
+    
+    async def get_snapshot(self, max_age: Optional[float] = None, timeout: float = 15.0) -> Optional[MarketSnapshot]:
+        """
+        Get a snapshot no older than max_age seconds
+        
+        Returns the latest snapshot if fresh enough, otherwise waits for the
+        producer's next version. If no producer is running (dashboard-only or
+        ad-hoc callers) one refresh is triggered, coalesced across callers.
+        """
+        snapshot = self.snapshots.latest()
+        if snapshot is not None and (max_age is None or snapshot.age_seconds() <= max_age):
+            return snapshot
+        
+        if not self._snapshot_producer_running:
+            return await self.single_flight.do(('snapshot',), self.refresh_snapshot)
+        
+        fresh = await self.snapshots.wait_for_version(snapshot.version if snapshot else 0, timeout)
+        return fresh or snapshot
+    
+    async def get_latest_state(self, max_age: Optional[float] = None) -> Dict[str, Any]:
+        """Read-only market state from the latest snapshot ({} if none available)"""
+        snapshot = await self.get_snapshot(max_age=max_age)
+        return snapshot.state if snapshot else {}
+    
     async def update_option_chain(self):
         """Update option chain data for NIFTY and SENSEX only."""
-        await self.get_instrument_data("NIFTY")
-        await self.get_instrument_data("SENSEX")
+        await asyncio.gather(
+            self.get_instrument_data("NIFTY"),
+            self.get_instrument_data("SENSEX")
+        )
         logger.debug("Option chain updated for NIFTY and SENSEX")
 
-    async def calculate_greeks(self):
-        """Calculate Greeks for all options using Black-Scholes model."""
+    async def calculate_greeks(self) -> int:
+        """
+        Reprice Greeks for every call and put in the current market state
+        
+        One vectorized Black-Scholes pass per underlying, using the chain's
+        IV quotes and the real time to each symbol's expiry.
+        
+        Returns:
+            Number of chains repriced
+        """
+        repriced = 0
         try:
-            rate = 0.10
-
             for symbol in ['NIFTY', 'SENSEX']:
-                if symbol not in self.market_state:
+                symbol_state = self.market_state.get(symbol)
+                if not symbol_state:
                     continue
 
-                spot = self.market_state[symbol].get('spot_price', 0)
-                if spot <= 0:
+                spot = symbol_state.get('spot_price', 0)
+                option_chain = symbol_state.get('option_chain')
+                if not spot or spot <= 0 or not option_chain:
                     continue
 
-                option_chain = self.market_state[symbol].get('option_chain', {})
-                
-                if not option_chain or not isinstance(option_chain, dict):
-                    continue
-                
-                # Process strikes in option chain
-                chain_data = option_chain.get('option_chain', [])
-                if not chain_data:
-                    continue
-                    
-                for strike_data in chain_data:
-                    strike = strike_data.get('strike_price', 0)
-                    if strike <= 0:
-                        continue
-                    
-                    # Get days to expiry
-                    dte = 7  # Default weekly  
-                    time_to_expiry = max(dte / 365.0, 0.001)
-                    rate = 0.07  # Risk-free rate
-                    
-                    # Calculate Greeks for PUT options
-                    put_data = strike_data.get('PE', {})
-                    if put_data:
-                        iv = put_data.get('iv', 20) / 100
-                        
-                        greeks = self._black_scholes_greeks(
-                            S=spot,
-                            K=strike,
-                            T=time_to_expiry,
-                            r=rate,
-                            sigma=iv,
-                            option_type='put'
-                        )
-
-                        put_data['delta'] = greeks['delta']
-                        put_data['gamma'] = greeks['gamma']
-                        put_data['theta'] = greeks['theta']
-                        put_data['vega'] = greeks['vega']
-                        put_data['rho'] = greeks['rho']
+                symbol_state['option_chain'] = reprice_chain(
+                    option_chain,
+                    spot,
+                    self.calendar.years_until(symbol_state.get('expiry')),
+                    self.risk_free_rate
+                )
+                repriced += 1
 
         except Exception as e:
             logger.error(f"Error calculating Greeks: {e}")
 
-    def _black_scholes_greeks(self, S: float, K: float, T: float, r: float,
-                              sigma: float, option_type: str) -> Dict[str, float]:
-        """Calculate Black-Scholes Greeks for calls and puts."""
-        try:
-            if sigma <= 0:
-                sigma = 0.01
-            if T <= 0:
-                T = 0.001
-
-            d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-            d2 = d1 - sigma * np.sqrt(T)
-
-            if option_type == 'call':
-                delta = norm.cdf(d1)
-                theta = ((-S * norm.pdf(d1) * sigma / (2 * np.sqrt(T))
-                         - r * K * np.exp(-r * T) * norm.cdf(d2)) / 365)
-                rho = K * T * np.exp(-r * T) * norm.cdf(d2) / 100
-            else:
-                delta = -norm.cdf(-d1)
-                theta = ((-S * norm.pdf(d1) * sigma / (2 * np.sqrt(T))
-                         + r * K * np.exp(-r * T) * norm.cdf(-d2)) / 365)
-                rho = -K * T * np.exp(-r * T) * norm.cdf(-d2) / 100
-
-            gamma = norm.pdf(d1) / (S * sigma * np.sqrt(T))
-            vega = S * norm.pdf(d1) * np.sqrt(T) / 100
+        return repriced
 
-            return {
-                'delta': round(delta, 4),
-                'gamma': round(gamma, 6),
-                'theta': round(theta, 4),
-                'vega': round(vega, 4),
-                'rho': round(rho, 4)
-            }
+    def get_position_greeks(self, positions: List[Dict]) -> List[Dict[str, float]]:
+        """
+        Greeks for a batch of option positions in one vectorized pass
+        
+        Spot and IV come from the latest snapshot (IV from the position's strike
+        in the chain, else the ATM quote, else the default). Quantity and
+        direction are left to the caller.
+        
+        Args:
+            positions: Dicts with symbol, strike_price, instrument_type (CALL/PUT) and expiry
+            
+        Returns:
+            One {'delta', 'gamma', 'theta', 'vega', 'rho'} dict per position (zeros if unpriceable)
+        """
+        zero = {field: 0.0 for field in GREEK_FIELDS}
+        if not positions:
+            return []
+
+        snapshot = self.latest()
+        state = snapshot.state if snapshot else self.market_state
+        size = len(positions)
+        spot = np.zeros(size)
+        strike = np.ones(size)
+        t = np.full(size, MIN_TIME_TO_EXPIRY)
+        sigma = np.full(size, DEFAULT_IV)
+        is_call = np.zeros(size, dtype=bool)
+        priceable = np.zeros(size, dtype=bool)
+        expiry_t = {}
+
+        for i, position in enumerate(positions):
+            symbol_state = state.get(position.get('symbol', '')) or {}
+            position_spot = symbol_state.get('spot_price') or 0
+            position_strike = float(position.get('strike_price') or position.get('strike') or 0)
+            option_type = str(position.get('instrument_type') or position.get('option_type') or '').upper()
+            if position_spot <= 0 or position_strike <= 0 or option_type not in ('CALL', 'CE', 'PUT', 'PE'):
+                continue
 
-        except Exception as e:
-            logger.error(f"Error in Black-Scholes calculation: {e}")
-            return {
-                'delta': 0.0,
-                'gamma': 0.0,
-                'theta': 0.0,
-                'vega': 0.0,
-                'rho': 0.0
-            }
+            expiry = position.get('expiry') or symbol_state.get('expiry')
+            if expiry not in expiry_t:
+                expiry_t[expiry] = self.calendar.years_until(expiry)
+
+            spot[i] = position_spot
+            strike[i] = position_strike
+            t[i] = expiry_t[expiry]
+            is_call[i] = option_type in ('CALL', 'CE')
+            priceable[i] = True
+
+            columns = as_columns(symbol_state.get('option_chain'))
+            if columns is not None:
+                side = columns.side('calls' if is_call[i] else 'puts')
+                row = columns.index_of(position_strike)
+                if row is None or not side.present[row] or side['iv'][row] <= 0:
+                    row = columns.nearest_index(position_spot)
+                if row is not None and side['iv'][row] > 0:
+                    sigma[i] = side['iv'][row] / 100.0
+
+        greeks = black_scholes(spot, strike, t, sigma, is_call, self.risk_free_rate)
+        return [
+            {field: round(float(greeks[field][i]), 6) for field in GREEK_FIELDS} if priceable[i] else dict(zero)
+            for i in range(size)
+        ]
 
     def get_greeks(self, symbol: str, strike: float, option_type: str) -> Dict[str, float]:
         """Get cached Greeks for a specific option if available."""
@@ -1522,9 +1681,9 @@ class MarketDataManager:
             option_chain = self.market_state.get(symbol, {}).get('option_chain', {})
 
             if option_type.upper() == 'CALL':
-                option_data = option_chain.get('calls', {}).get(str(strike), {})
+                option_data = option_chain.get('calls', {}).get(strike_key(strike), {})
             else:
-                option_data = option_chain.get('puts', {}).get(str(strike), {})
+                option_data = option_chain.get('puts', {}).get(strike_key(strike), {})
 
             return {
                 'delta': option_data.get('delta', 0.0),
@@ -1,181 +1,193 @@
 """
 Upstox WebSocket Market Feed Manager
 Handles real-time market data streaming to eliminate REST API rate limits
+
+Instrument keys are sharded across a pool of websocket connections (each
+capped at MAX_INSTRUMENTS_PER_CONNECTION); every shard reconnects and
+resubscribes its own keys independently. All shards feed one merged tick
+stream through three decoupled stages so a slow subscriber never stalls a
+socket:
+    receiver   - one per shard, recv() only, pushes raw frames onto a shared
+                 bounded queue
+    decoder    - drains frames in batches, conflates to the latest tick per
+                 instrument and fans out to subscriber channels
+    dispatcher - one task per callback, fed from a bounded per-instrument
+                 conflating queue that drops the oldest instrument when full
+
+Received frames are also handed to the market data recorder when recording
+is on. In replay mode no sockets are opened. The recorded frames are fed to
+the decoder instead (see market_replay).
 """
 
 import asyncio
 import json
 import ssl
+import time
 import websockets
-from typing import Dict, List, Callable, Optional
-from datetime import datetime
-from google.protobuf.json_format import MessageToDict
+from collections import OrderedDict
+from typing import Any, Dict, List, Callable, Optional, Tuple
 
 from backend.core.logger import get_data_logger
-from backend.core.upstox_client import UpstoxClient
+from backend.core.async_upstox_client import get_async_upstox_client
 from backend.data.proto import MarketDataFeedV3_pb2 as pb
+from backend.data.feed_decoder import FeedTick, decode_feed_response, extract_ltp
+from backend.data.market_recorder import get_market_recorder
 
 logger = get_data_logger()
 
 
-class MarketFeedManager:
-    """Manages WebSocket connection to Upstox market data feed"""
+class _SubscriberChannel:
+    """
+    Bounded queue of pending ticks for one subscriber callback
     
-    _instance = None
-    _lock = asyncio.Lock()
+    Holds at most one tick per instrument (a newer tick replaces the pending one
+    in place) and at most max_size instruments; on overflow the oldest pending
+    instrument is dropped.
+    """
     
-    def __new__(cls, access_token: str):
-        if cls._instance is None:
-            cls._instance = super(MarketFeedManager, cls).__new__(cls)
-        return cls._instance
+    def __init__(self, callback: Callable, max_size: int):
+        self.callback = callback
+        self.name = getattr(callback, '__qualname__', repr(callback))
+        self.max_size = max_size
+        self.pending: "OrderedDict[str, FeedTick]" = OrderedDict()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.delivered = 0
+        self.conflated = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
     
-    def __init__(self, access_token: str):
-        # Only initialize once
-        if hasattr(self, '_initialized'):
-            return
-        
-        self.access_token = access_token
+    def offer(self, instrument_key: str, tick: FeedTick):
+        if instrument_key in self.pending:
+            self.conflated += 1
+        elif len(self.pending) >= self.max_size:
+            self.pending.popitem(last=False)
+            self.dropped += 1
+        self.pending[instrument_key] = tick
+        self.max_depth = max(self.max_depth, len(self.pending))
+        self.wakeup.set()
+    
+    async def run(self):
+        while True:
+            await self.wakeup.wait()
+            while self.pending:
+                instrument_key, tick = self.pending.popitem(last=False)
+                self.last_lag = time.time() - tick.received_at
+                self.max_lag = max(self.max_lag, self.last_lag)
+                try:
+                    await self.callback(instrument_key, tick)
+                    self.delivered += 1
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"Error in subscriber callback {self.name}: {e}")
+            self.wakeup.clear()
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            'queue_depth': len(self.pending),
+            'max_depth': self.max_depth,
+            'delivered': self.delivered,
+            'conflated': self.conflated,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'last_lag_ms': round(self.last_lag * 1000, 2),
+            'max_lag_ms': round(self.max_lag * 1000, 2)
+        }
+
+
+class FeedShard:
+    """One websocket connection carrying a subset of the subscribed instruments"""
+    
+    def __init__(self, manager: 'MarketFeedManager', shard_id: int):
+        self.manager = manager
+        self.shard_id = shard_id
         self.websocket = None
         self.is_connected = False
-        self.subscribers: Dict[str, List[Callable]] = {}
-        self.latest_data: Dict[str, Dict] = {}
+        # Set when reconnects are exhausted; its keys move to healthy shards
+        self.failed = False
+        self.reconnecting = False
+        # Instrument key -> subscription mode, resent on every (re)connect
+        self.instruments: Dict[str, str] = {}
         self._reconnect_attempts = 0
-        self._max_reconnect_attempts = 5
-        self._reconnect_delay = 5
-        # Add lock to prevent WebSocket concurrency issues
+        # Serializes connect and recv on this socket
         self._websocket_lock = asyncio.Lock()
-        # Initialize UpstoxClient for connection pooling
-        self.upstox_client = UpstoxClient(access_token)
-        self._initialized = True
-        
-    def get_market_data_feed_authorize(self):
-        """Get authorization for market data feed"""
-        url = '/v3/feed/market-data-feed/authorize'
-        
-        try:
-            response = self.upstox_client.session.get(url=f"https://api.upstox.com{url}", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            logger.error(f"Failed to authorize market feed: {e}")
-            raise
+        self.frames_received = 0
+        self.reconnects = 0
     
-    def decode_protobuf(self, buffer):
-        """Decode protobuf message"""
-        feed_response = pb.FeedResponse()
-        feed_response.ParseFromString(buffer)
-        return feed_response
+    @property
+    def load(self) -> int:
+        return len(self.instruments)
     
-    async def connect(self, instrument_keys: List[str], mode: str = "full"):
-        """
-        Connect to WebSocket and subscribe to instruments
-        
-        Args:
-            instrument_keys: List of instrument keys (e.g., ["NSE_INDEX|Nifty 50", "NSE_INDEX|Nifty Bank"])
-            mode: Data mode - "full" or "quote"
-        """
-        # Prevent multiple connection attempts
+    async def connect(self, max_attempts: int = 3):
+        """Connect, resubscribe this shard's instruments and start its receiver"""
+        if self.is_connected and self.websocket:
+            return
         async with self._websocket_lock:
             if self.is_connected and self.websocket:
-                logger.info("WebSocket already connected, skipping duplicate connection")
                 return
             
-            max_attempts = 3
             for attempt in range(max_attempts):
                 try:
-                    logger.info(f"WebSocket connection attempt {attempt + 1}/{max_attempts}")
+                    logger.info(f"WebSocket shard {self.shard_id} connection attempt {attempt + 1}/{max_attempts}")
                     
                     # Create SSL context
                     ssl_context = ssl.create_default_context()
                     ssl_context.check_hostname = False
                     ssl_context.verify_mode = ssl.CERT_NONE
                     
-                    # Get authorization
-                    auth_response = self.get_market_data_feed_authorize()
+                    # Every connection needs its own authorized URL
+                    auth_response = await self.manager.get_market_data_feed_authorize()
                     ws_url = auth_response["data"]["authorized_redirect_uri"]
-                    logger.info(f"WebSocket URL: {ws_url}")
                     
-                    # Connect to WebSocket
-                    self.websocket = await websockets.connect(ws_url, ssl=ssl_context, ping_interval=20, ping_timeout=10)
+                    # Plain ws:// (local simulator) must not be given an SSL context
+                    ssl_arg = ssl_context if ws_url.startswith("wss") else None
+                    self.websocket = await websockets.connect(ws_url, ssl=ssl_arg, ping_interval=20, ping_timeout=10)
                     self.is_connected = True
-                    logger.info("✓ WebSocket market feed connected")
+                    self.failed = False
+                    logger.info(f"✓ WebSocket market feed shard {self.shard_id} connected")
                     
                     await asyncio.sleep(1)  # Wait for connection to stabilize
                     
-                    # Subscribe to instruments
-                    await self.subscribe(instrument_keys, mode)
+                    # Resubscribe everything assigned to this shard, grouped by mode
+                    by_mode: Dict[str, List[str]] = {}
+                    for key, mode in self.instruments.items():
+                        by_mode.setdefault(mode, []).append(key)
+                    for mode, keys in by_mode.items():
+                        await self.send("sub", keys, mode)
                     
-                    # Start listening for data
                     asyncio.create_task(self._listen())
                     
                     self._reconnect_attempts = 0  # Reset on successful connection
-                    return  # Success, exit retry loop
+                    return
                     
                 except Exception as e:
-                    logger.error(f"WebSocket connection attempt {attempt + 1} failed: {e}")
-                    self.is_connected = False
-                    if self.websocket:
-                        try:
-                            await self.websocket.close()
-                        except:
-                            pass
-                        self.websocket = None
+                    logger.error(f"WebSocket shard {self.shard_id} connection attempt {attempt + 1} failed: {e}")
+                    await self._close()
                     
                     if attempt < max_attempts - 1:
-                        logger.info(f"Retrying WebSocket connection in 5 seconds...")
+                        logger.info(f"Retrying WebSocket shard {self.shard_id} in 5 seconds...")
                         await asyncio.sleep(5)
                     else:
-                        logger.error("All WebSocket connection attempts failed")
+                        logger.error(f"All WebSocket connection attempts failed for shard {self.shard_id}")
                         raise
     
-    async def subscribe(self, instrument_keys: List[str], mode: str = "full"):
-        """Subscribe to instrument keys"""
-        if not self.is_connected or not self.websocket:
-            logger.warning("Not connected to WebSocket")
-            return
-        
-        # Store for reconnection
-        if not hasattr(self, '_last_subscribed_instruments'):
-            self._last_subscribed_instruments = []
-        
-        # Add new instruments to the list
-        for key in instrument_keys:
-            if key not in self._last_subscribed_instruments:
-                self._last_subscribed_instruments.append(key)
-        
-        data = {
-            "guid": "trading_system",
-            "method": "sub",
-            "data": {
-                "mode": mode,
-                "instrumentKeys": instrument_keys
-            }
-        }
-        
-        binary_data = json.dumps(data).encode('utf-8')
-        await self.websocket.send(binary_data)
-        logger.info(f"✓ Subscribed to {len(instrument_keys)} instruments: {instrument_keys}")
-    
-    async def unsubscribe(self, instrument_keys: List[str]):
-        """Unsubscribe from instrument keys"""
-        if not self.is_connected or not self.websocket:
-            return
-        
+    async def send(self, method: str, instrument_keys: List[str], mode: Optional[str] = None):
+        """Send a sub/unsub request for instrument keys on this connection"""
+        payload = {"instrumentKeys": instrument_keys}
+        if mode:
+            payload["mode"] = mode
         data = {
             "guid": "trading_system",
-            "method": "unsub",
-            "data": {
-                "instrumentKeys": instrument_keys
-            }
+            "method": method,
+            "data": payload
         }
-        
-        binary_data = json.dumps(data).encode('utf-8')
-        await self.websocket.send(binary_data)
-        logger.info(f"Unsubscribed from {len(instrument_keys)} instruments")
+        await self.websocket.send(json.dumps(data).encode('utf-8'))
     
     async def _listen(self):
-        """Listen for incoming market data"""
-        message_count = 0
+        """Receive frames and hand them to the shared decoder"""
         try:
             while self.is_connected and self.websocket:
                 # Add lock to prevent concurrent recv calls
@@ -184,107 +196,437 @@ class MarketFeedManager:
                         break
                     message = await self.websocket.recv()
                 
-                decoded_data = self.decode_protobuf(message)
-                data_dict = MessageToDict(decoded_data)
-                
-                # Process and store the data
-                await self._process_data(data_dict)
-                
-                message_count += 1
-                # Log every 500 messages to confirm feed is active
-                if message_count % 500 == 0:
-                    logger.info(f"✓ Processed {message_count} market data messages")
+                self.frames_received += 1
+                self.manager._enqueue_frame(message)
                 
         except websockets.exceptions.ConnectionClosed as e:
-            logger.warning(f"WebSocket connection closed: {e}. Will attempt reconnection.")
+            logger.warning(f"WebSocket shard {self.shard_id} closed: {e}. Will attempt reconnection.")
             self.is_connected = False
-            # Auto-reconnect with last known instruments
-            if hasattr(self, '_last_subscribed_instruments'):
-                asyncio.create_task(self._handle_reconnect(self._last_subscribed_instruments, "full"))
+            asyncio.create_task(self.manager._handle_reconnect(self))
         except Exception as e:
-            logger.error(f"Error in WebSocket listener: {e}")
+            logger.error(f"Error in WebSocket shard {self.shard_id} listener: {e}")
             self.is_connected = False
-            if hasattr(self, '_last_subscribed_instruments'):
-                asyncio.create_task(self._handle_reconnect(self._last_subscribed_instruments, "full"))
+            asyncio.create_task(self.manager._handle_reconnect(self))
     
-    async def _process_data(self, data_dict: Dict):
-        """Process incoming market data and notify subscribers"""
-        try:
-            # Extract feed data
-            if "feeds" not in data_dict:
-                return
+    async def _close(self):
+        self.is_connected = False
+        if self.websocket:
+            try:
+                await self.websocket.close()
+            except Exception:
+                pass
+            self.websocket = None
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            'connected': self.is_connected,
+            'failed': self.failed,
+            'instruments': self.load,
+            'frames_received': self.frames_received,
+            'reconnects': self.reconnects
+        }
+
+
+class MarketFeedManager:
+    """Manages a pool of WebSocket connections to the Upstox market data feed"""
+    
+    _instance = None
+    _lock = asyncio.Lock()
+    
+    # Upstox caps instruments per connection; stay under the lowest (full mode) limit
+    MAX_INSTRUMENTS_PER_CONNECTION = 1500
+    # Raw frames buffered between receivers and decoder
+    FRAME_QUEUE_SIZE = 1000
+    # Frames decoded (and conflated) together per decoder pass
+    DECODE_BATCH_SIZE = 100
+    # Distinct instruments pending per subscriber before the oldest is dropped
+    SUBSCRIBER_QUEUE_SIZE = 256
+    
+    def __new__(cls, access_token: str, num_connections: int = 1):
+        if cls._instance is None:
+            cls._instance = super(MarketFeedManager, cls).__new__(cls)
+        return cls._instance
+    
+    def __init__(self, access_token: str, num_connections: int = 1):
+        # Only initialize once
+        if hasattr(self, '_initialized'):
+            return
+        
+        self.access_token = access_token
+        self.shards = [FeedShard(self, i) for i in range(max(1, num_connections))]
+        # Subscription registry: instrument key -> owning shard
+        self._shard_of: Dict[str, FeedShard] = {}
+        self.subscribers: Dict[str, List[Callable]] = {}
+        self.latest_data: Dict[str, FeedTick] = {}
+        self._max_reconnect_attempts = 5
+        self._reconnect_delay = 5
+        # Shared async client (pooled, non-blocking) for feed authorization
+        self.upstox_client = get_async_upstox_client(access_token)
+        # Receive/decode/dispatch pipeline (started lazily on the running loop)
+        self._frames: Optional[asyncio.Queue] = None
+        self._decoder_task: Optional[asyncio.Task] = None
+        self._channels: Dict[Callable, _SubscriberChannel] = {}
+        # Synchronous consumers that must see every tick, before conflation
+        self._tick_sinks: List[Callable[[str, FeedTick], None]] = []
+        # Raw frame log (no-op unless recording is started) and replay source
+        self.recorder = get_market_recorder()
+        self.replay = None
+        self._pipeline_stats = {
+            'frames_received': 0,
+            'frames_dropped': 0,
+            'frames_decoded': 0,
+            'decode_errors': 0,
+            'ticks_decoded': 0,
+            'ticks_conflated': 0,
+            'max_frame_depth': 0,
+            'last_decode_lag': 0.0,
+            'max_decode_lag': 0.0
+        }
+        self._initialized = True
+    
+    @property
+    def is_connected(self) -> bool:
+        return self.replay is not None or any(shard.is_connected for shard in self.shards)
+    
+    @property
+    def subscribed_instruments(self) -> List[str]:
+        return list(self._shard_of)
+        
+    async def get_market_data_feed_authorize(self):
+        """Get authorization for market data feed"""
+        response = await self.upstox_client.authorize_market_feed()
+        if not response or 'data' not in response:
+            logger.error(f"Failed to authorize market feed: {response}")
+            raise RuntimeError("Market feed authorization failed")
+        return response
+    
+    def decode_protobuf(self, buffer):
+        """Decode protobuf message"""
+        feed_response = pb.FeedResponse()
+        feed_response.ParseFromString(buffer)
+        return feed_response
+    
+    async def connect(self, instrument_keys: List[str], mode: str = "full"):
+        """
+        Connect the pool and subscribe to instruments
+        
+        Args:
+            instrument_keys: List of instrument keys (e.g., ["NSE_INDEX|Nifty 50", "NSE_INDEX|Nifty Bank"])
+            mode: Data mode - "full" or "quote"
+        
+        Raises if no shard could connect.
+        """
+        self._start_pipeline()
+        if self.replay is not None:
+            self._assign(instrument_keys, mode)
+            self.replay.start_feed(self)
+            logger.info(f"✓ Market feed replaying {len(self.replay.segments)} recorded segment(s)")
+            return
+        for shard in self.shards:
+            shard.failed = False
+        self._assign(instrument_keys, mode)
+        
+        # Shards with nothing assigned stay idle until subscribe() needs them
+        pending = [shard for shard in self.shards if shard.instruments and not shard.is_connected] or \
+            ([self.shards[0]] if not self.is_connected else [])
+        if not pending:
+            logger.info("WebSocket already connected, skipping duplicate connection")
+            return
+        
+        results = await asyncio.gather(*(shard.connect() for shard in pending), return_exceptions=True)
+        for shard, result in zip(pending, results):
+            if isinstance(result, Exception):
+                shard.failed = True
+        if not self.is_connected:
+            raise next(result for result in results if isinstance(result, Exception))
+        
+        await self._rehome_failed()
+        logger.info(
+            f"✓ Market feed pool up: {sum(shard.is_connected for shard in self.shards)}/{len(self.shards)} "
+            f"connections, {len(self._shard_of)} instruments"
+        )
+    
+    def _assign(self, instrument_keys: List[str], mode: str) -> Dict[FeedShard, List[str]]:
+        """Place new keys on the least-loaded healthy shard; returns keys to send per shard"""
+        assigned: Dict[FeedShard, List[str]] = {}
+        unplaced = 0
+        for key in instrument_keys:
+            shard = self._shard_of.get(key)
+            if shard is not None:
+                if shard.instruments.get(key) == mode:
+                    continue
+            else:
+                candidates = [s for s in self.shards if not s.failed and s.load < self.MAX_INSTRUMENTS_PER_CONNECTION]
+                if not candidates:
+                    unplaced += 1
+                    continue
+                shard = min(candidates, key=lambda s: s.load)
+                self._shard_of[key] = shard
+            shard.instruments[key] = mode
+            assigned.setdefault(shard, []).append(key)
+        if unplaced:
+            logger.error(f"Market feed pool full ({len(self._shard_of)} instruments), {unplaced} instruments not subscribed")
+        return assigned
+    
+    async def subscribe(self, instrument_keys: List[str], mode: str = "full"):
+        """Subscribe to instrument keys, sharding new keys across the pool"""
+        if self.replay is not None:
+            # Recorded frames carry whatever was subscribed when recording
+            self._assign(instrument_keys, mode)
+            return
+        if not self.is_connected:
+            logger.warning("Not connected to WebSocket")
+            return
+        
+        assigned = self._assign(instrument_keys, mode)
+        for shard, keys in assigned.items():
+            try:
+                if shard.is_connected:
+                    await shard.send("sub", keys, mode)
+                elif not shard.reconnecting:
+                    # Idle shard: connect() subscribes everything it owns
+                    await shard.connect()
+                # A reconnecting shard resubscribes its keys once it is back
+            except Exception as e:
+                logger.error(f"WebSocket shard {shard.shard_id} subscribe failed: {e}")
+                shard.failed = True
+        
+        await self._rehome_failed()
+        count = sum(len(keys) for keys in assigned.values())
+        if count:
+            logger.info(f"✓ Subscribed to {count} instruments across {len(assigned)} connection(s)")
+    
+    async def unsubscribe(self, instrument_keys: List[str]):
+        """Unsubscribe from instrument keys"""
+        by_shard: Dict[FeedShard, List[str]] = {}
+        for key in instrument_keys:
+            shard = self._shard_of.pop(key, None)
+            if shard is not None:
+                shard.instruments.pop(key, None)
+                by_shard.setdefault(shard, []).append(key)
+        
+        for shard, keys in by_shard.items():
+            if shard.is_connected:
+                try:
+                    await shard.send("unsub", keys)
+                except Exception as e:
+                    logger.error(f"WebSocket shard {shard.shard_id} unsubscribe failed: {e}")
+        if by_shard:
+            logger.info(f"Unsubscribed from {sum(len(keys) for keys in by_shard.values())} instruments")
+    
+    async def _rehome_failed(self):
+        """Move instruments off shards that gave up reconnecting onto healthy ones"""
+        if not any(shard.is_connected and not shard.failed for shard in self.shards):
+            return
+        for shard in self.shards:
+            if not shard.failed or not shard.instruments:
+                continue
+            orphaned, shard.instruments = shard.instruments, {}
+            for key in orphaned:
+                del self._shard_of[key]
+            logger.warning(f"Re-homing {len(orphaned)} instruments from failed shard {shard.shard_id}")
+            by_mode: Dict[str, List[str]] = {}
+            for key, mode in orphaned.items():
+                by_mode.setdefault(mode, []).append(key)
+            for mode, keys in by_mode.items():
+                await self.subscribe(keys, mode)
+    
+    def _start_pipeline(self):
+        """Start the decoder stage once; it survives reconnects"""
+        if self._frames is None:
+            self._frames = asyncio.Queue(maxsize=self.FRAME_QUEUE_SIZE)
+        if self._decoder_task is None or self._decoder_task.done():
+            self._decoder_task = asyncio.create_task(self._decode_loop())
+    
+    def _enqueue_frame(self, message: bytes):
+        """Queue a raw frame, dropping the oldest frame when the decoder falls behind"""
+        stats = self._pipeline_stats
+        stats['frames_received'] += 1
+        received_at = time.time()
+        self.recorder.record_frame(message, received_at)
+        if self._frames.full():
+            self._frames.get_nowait()
+            stats['frames_dropped'] += 1
+        self._frames.put_nowait((received_at, message))
+        stats['max_frame_depth'] = max(stats['max_frame_depth'], self._frames.qsize())
+    
+    async def _put_frame(self, message: bytes):
+        """Queue a replayed frame, waiting for room instead of dropping (deterministic replay)"""
+        stats = self._pipeline_stats
+        stats['frames_received'] += 1
+        await self._frames.put((time.time(), message))
+        stats['max_frame_depth'] = max(stats['max_frame_depth'], self._frames.qsize())
+    
+    def use_replay(self, replay):
+        """Take frames from a MarketReplay instead of websockets; it starts on connect()"""
+        self.replay = replay
+    
+    async def _decode_loop(self):
+        """Decode queued frames in batches and fan the newest tick per instrument out"""
+        stats = self._pipeline_stats
+        while True:
+            batch: List[Tuple[float, bytes]] = [await self._frames.get()]
+            while len(batch) < self.DECODE_BATCH_SIZE and not self._frames.empty():
+                batch.append(self._frames.get_nowait())
+            
+            latest: Dict[str, FeedTick] = {}
+            decoded = 0
+            for received_at, message in batch:
+                try:
+                    ticks = decode_feed_response(message, received_at)
+                except Exception as e:
+                    stats['decode_errors'] += 1
+                    logger.error(f"Error decoding market data frame: {e}")
+                    continue
+                decoded += len(ticks)
+                if self._tick_sinks:
+                    self._run_tick_sinks(ticks)
+                latest.update(ticks)
+            
+            stats['frames_decoded'] += len(batch)
+            stats['ticks_decoded'] += decoded
+            stats['ticks_conflated'] += decoded - len(latest)
+            stats['last_decode_lag'] = time.time() - batch[0][0]
+            stats['max_decode_lag'] = max(stats['max_decode_lag'], stats['last_decode_lag'])
             
-            for instrument_key, feed_data in data_dict["feeds"].items():
+            self._process_data(latest)
+            
+            previous = stats['frames_decoded'] - len(batch)
+            # Log every 500 messages to confirm feed is active
+            if stats['frames_decoded'] // 500 > previous // 500:
+                logger.info(f"✓ Processed {stats['frames_decoded']} market data messages")
+            
+            # Let subscriber tasks run between batches
+            await asyncio.sleep(0)
+    
+    def _run_tick_sinks(self, ticks: Dict[str, FeedTick]):
+        for sink in self._tick_sinks:
+            try:
+                for instrument_key, tick in ticks.items():
+                    sink(instrument_key, tick)
+            except Exception as e:
+                logger.error(f"Error in tick sink: {e}")
+    
+    def _process_data(self, ticks: Dict[str, FeedTick]):
+        """Store decoded ticks and queue them for subscribers"""
+        try:
+            for instrument_key, tick in ticks.items():
                 # Store latest data
-                self.latest_data[instrument_key] = {
-                    **feed_data,
-                    "timestamp": datetime.now(),
-                    "instrument_key": instrument_key
-                }
+                self.latest_data[instrument_key] = tick
                 
                 # Notify subscribers
-                if instrument_key in self.subscribers:
-                    for callback in self.subscribers[instrument_key]:
-                        try:
-                            await callback(instrument_key, feed_data)
-                        except Exception as e:
-                            logger.error(f"Error in subscriber callback: {e}")
+                callbacks = self.subscribers.get(instrument_key)
+                if callbacks:
+                    for callback in callbacks:
+                        self._channel_for(callback).offer(instrument_key, tick)
                             
         except Exception as e:
             logger.error(f"Error processing market data: {e}")
     
+    def _channel_for(self, callback: Callable) -> _SubscriberChannel:
+        channel = self._channels.get(callback)
+        if channel is None:
+            channel = self._channels[callback] = _SubscriberChannel(callback, self.SUBSCRIBER_QUEUE_SIZE)
+        if channel.task is None or channel.task.done():
+            channel.task = asyncio.create_task(channel.run())
+        return channel
+    
+    def get_pipeline_metrics(self) -> Dict[str, Any]:
+        """Queue depths, drop/conflation counts and lag for each pipeline stage"""
+        stats = self._pipeline_stats
+        return {
+            'connected': self.is_alive(),
+            'frame_queue_depth': self._frames.qsize() if self._frames else 0,
+            'frame_queue_size': self.FRAME_QUEUE_SIZE,
+            'max_frame_depth': stats['max_frame_depth'],
+            'frames_received': stats['frames_received'],
+            'frames_dropped': stats['frames_dropped'],
+            'frames_decoded': stats['frames_decoded'],
+            'decode_errors': stats['decode_errors'],
+            'ticks_decoded': stats['ticks_decoded'],
+            'ticks_conflated': stats['ticks_conflated'],
+            'last_decode_lag_ms': round(stats['last_decode_lag'] * 1000, 2),
+            'max_decode_lag_ms': round(stats['max_decode_lag'] * 1000, 2),
+            'subscribers': {channel.name: channel.metrics() for channel in self._channels.values()},
+            'connections': [shard.metrics() for shard in self.shards],
+            'replay': self.replay.get_stats() if self.replay is not None else None
+        }
+    
     def register_callback(self, instrument_key: str, callback: Callable):
         """Register a callback for specific instrument updates"""
         if instrument_key not in self.subscribers:
             self.subscribers[instrument_key] = []
         self.subscribers[instrument_key].append(callback)
     
-    def get_latest_data(self, instrument_key: str) -> Optional[Dict]:
-        """Get latest data for an instrument"""
+    def register_tick_sink(self, sink: Callable[[str, FeedTick], None]):
+        """
+        Register a synchronous, O(1) consumer called with every decoded tick
+        
+        Unlike callbacks, sinks run inside the decoder before conflation, so they
+        see every tick (e.g. candle building needs each high/low).
+        """
+        if sink not in self._tick_sinks:
+            self._tick_sinks.append(sink)
+    
+    def get_latest_data(self, instrument_key: str) -> Optional[FeedTick]:
+        """Get latest tick for an instrument (use .to_dict() for the raw message)"""
         return self.latest_data.get(instrument_key)
     
     def get_spot_price(self, instrument_key: str) -> Optional[float]:
         """Get current spot price for an instrument"""
-        data = self.latest_data.get(instrument_key)
-        if not data:
+        tick = self.latest_data.get(instrument_key)
+        if not tick:
             return None
-        
-        # Try different price fields based on data type
-        if "ff" in data and "marketFF" in data["ff"]:
-            market_ff = data["ff"]["marketFF"]
-            if "ltpc" in market_ff and "ltp" in market_ff["ltpc"]:
-                return float(market_ff["ltpc"]["ltp"])
-        
-        # Fallback to last traded price if available
-        if "ltp" in data:
-            return float(data["ltp"])
-        
-        return None
+        return tick.ltp or None
     
-    async def _handle_reconnect(self, instrument_keys: List[str], mode: str):
-        """Handle reconnection logic"""
-        if self._reconnect_attempts >= self._max_reconnect_attempts:
-            logger.error("Max reconnection attempts reached. Giving up.")
+    @staticmethod
+    def extract_ltp(feed_data) -> Optional[float]:
+        """Last traded price from a FeedTick or a legacy feed dict"""
+        return extract_ltp(feed_data)
+    
+    
+    async def _handle_reconnect(self, shard: FeedShard):
+        """Reconnect one shard with exponential backoff; its instruments are resubscribed"""
+        if shard._reconnect_attempts >= self._max_reconnect_attempts:
+            logger.error(f"Max reconnection attempts reached for shard {shard.shard_id}. Giving up.")
+            shard.reconnecting = False
+            shard.failed = True
+            await self._rehome_failed()
             return
         
-        self._reconnect_attempts += 1
-        delay = self._reconnect_delay * (2 ** (self._reconnect_attempts - 1))  # Exponential backoff
+        shard.reconnecting = True
+        shard._reconnect_attempts += 1
+        delay = self._reconnect_delay * (2 ** (shard._reconnect_attempts - 1))  # Exponential backoff
         
-        logger.info(f"Attempting reconnection {self._reconnect_attempts}/{self._max_reconnect_attempts} in {delay}s...")
+        logger.info(
+            f"Attempting reconnection of shard {shard.shard_id} "
+            f"{shard._reconnect_attempts}/{self._max_reconnect_attempts} in {delay}s..."
+        )
         await asyncio.sleep(delay)
         
-        await self.connect(instrument_keys, mode)
+        try:
+            await shard.connect()
+            shard.reconnecting = False
+            shard.reconnects += 1
+        except Exception:
+            asyncio.create_task(self._handle_reconnect(shard))
     
     async def disconnect(self):
-        """Disconnect from WebSocket"""
-        self.is_connected = False
-        if self.websocket:
-            await self.websocket.close()
-            logger.info("WebSocket disconnected")
-        # Close UpstoxClient session
-        if hasattr(self, 'upstox_client'):
-            self.upstox_client.close()
+        """Disconnect every connection in the pool"""
+        if self.replay is not None:
+            self.replay.stop()
+        for shard in self.shards:
+            was_connected = shard.websocket is not None
+            await shard._close()
+            if was_connected:
+                logger.info(f"WebSocket shard {shard.shard_id} disconnected")
+        # Stop the decoder and subscriber tasks; they restart on the next connect
+        tasks = [self._decoder_task] + [channel.task for channel in self._channels.values()]
+        for task in tasks:
+            if task and not task.done():
+                task.cancel()
+        # Note: the async Upstox client is shared process-wide and is not closed here
     
     def is_alive(self) -> bool:
-        """Check if connection is alive"""
-        return self.is_connected and self.websocket is not None
+        """Check if any connection is alive"""
+        return self.is_connected
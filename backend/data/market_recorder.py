@@ -0,0 +1,223 @@
+"""
+Market Data Recorder
+Appends raw feed frames and REST payloads to a compressed, segmented log
+
+Feed frames and REST responses used to be thrown away once they were
+processed, so a trading day could not be reproduced. The recorder keeps the
+raw protobuf frames exactly as received and the decoded JSON of successful
+REST calls. Each is stored with its receive timestamp, in receive order, as
+one record stream per day:
+
+    data/recordings/YYYY-MM-DD/HHMMSS-NNNN.rec.gz
+
+A record is a fixed header (kind, received_at, payload length) followed by
+the payload. Segments are gzip streams that roll by size or age and are
+flushed every second, so a crash loses at most about a second. The event
+loop only enqueues records; a writer thread does the compression and file
+I/O. When the queue is full, records are dropped and counted rather than
+blocking the feed. market_replay reads the log back.
+"""
+
+import gzip
+import json
+import queue
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from backend.core.logger import get_data_logger
+from backend.core.timezone_utils import now_ist
+
+logger = get_data_logger()
+
+# Record kinds
+FRAME = 1  # Raw market feed protobuf frame
+REST = 2   # JSON: method, endpoint, params, data, response
+
+RECORD_HEADER = struct.Struct('>BdI')  # kind, received_at, payload length
+SEGMENT_SUFFIX = ".rec.gz"
+
+
+def encode_rest(method: str, endpoint: str, params: Optional[dict], data: Optional[dict], response: Any) -> bytes:
+    """REST record payload"""
+    return json.dumps(
+        {'method': method.upper(), 'endpoint': endpoint, 'params': params, 'data': data, 'response': response},
+        default=str
+    ).encode('utf-8')
+
+
+class MarketRecorder:
+    """Background writer of the raw market data log"""
+
+    def __init__(
+        self,
+        root: str = "data/recordings",
+        segment_bytes: int = 256 * 1024 * 1024,
+        segment_seconds: float = 1800.0,
+        queue_size: int = 20000,
+        flush_interval: float = 1.0,
+        compresslevel: int = 3
+    ):
+        """
+        Args:
+            root: Directory holding one subdirectory of segments per day
+            segment_bytes: Uncompressed bytes after which a segment rolls
+            segment_seconds: Age after which a segment rolls
+            queue_size: Records buffered for the writer before new ones are dropped
+            flush_interval: Seconds between flushes of the open segment
+            compresslevel: gzip level (speed over ratio by default)
+        """
+        self.root = Path(root)
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.flush_interval = flush_interval
+        self.compresslevel = compresslevel
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self.active = False
+
+        self._file = None
+        self.segment_path: Optional[Path] = None
+        self._segment_day: Optional[str] = None
+        self._segment_started = 0.0
+        self._segment_written = 0
+        self._segment_seq = 0
+        self._stats = {'frames': 0, 'rest': 0, 'dropped': 0, 'bytes': 0, 'segments': 0, 'write_errors': 0}
+
+    # ========== Lifecycle ==========
+
+    def start(self):
+        """Start recording (idempotent)"""
+        if self.active:
+            return
+        self.active = True
+        self._thread = threading.Thread(target=self._writer, name="market-recorder", daemon=True)
+        self._thread.start()
+        logger.info(f"🎙️ Market data recorder started ({self.root})")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop recording, writing out everything already queued"""
+        if not self.active:
+            return
+        self.active = False
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        logger.info(
+            f"Market data recorder stopped: {self._stats['frames']} frames, {self._stats['rest']} REST payloads, "
+            f"{self._stats['dropped']} dropped"
+        )
+
+    # ========== Recording (event loop side) ==========
+
+    def record_frame(self, message: bytes, received_at: float):
+        """Queue a raw feed frame"""
+        if self.active:
+            self._offer(FRAME, received_at, message)
+
+    def record_rest(self, method: str, endpoint: str, params: Optional[dict], data: Optional[dict], response: Any):
+        """Queue the decoded response of a successful REST call"""
+        if self.active:
+            self._offer(REST, time.time(), (method, endpoint, params, data, response))
+
+    def _offer(self, kind: int, received_at: float, payload):
+        try:
+            self._queue.put_nowait((kind, received_at, payload))
+        except queue.Full:
+            self._stats['dropped'] += 1
+
+    # ========== Writer thread ==========
+
+    def _writer(self):
+        next_flush = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = False
+            if item is None:
+                break
+            if item:
+                self._write(*item)
+            if time.monotonic() >= next_flush:
+                self._flush()
+                next_flush = time.monotonic() + self.flush_interval
+        self._close_segment()
+
+    def _write(self, kind: int, received_at: float, payload):
+        try:
+            if kind == REST:
+                payload = encode_rest(*payload)
+                self._stats['rest'] += 1
+            else:
+                self._stats['frames'] += 1
+            self._ensure_segment(received_at)
+            self._file.write(RECORD_HEADER.pack(kind, received_at, len(payload)))
+            self._file.write(payload)
+            self._segment_written += RECORD_HEADER.size + len(payload)
+            self._stats['bytes'] += RECORD_HEADER.size + len(payload)
+        except Exception as e:
+            self._stats['write_errors'] += 1
+            logger.error(f"Market data recorder write failed: {e}")
+            self._close_segment()
+
+    def _ensure_segment(self, received_at: float):
+        day = now_ist().date().isoformat()
+        if self._file is not None and (
+            day != self._segment_day
+            or self._segment_written >= self.segment_bytes
+            or received_at - self._segment_started >= self.segment_seconds
+        ):
+            self._close_segment()
+        if self._file is None:
+            directory = self.root / day
+            directory.mkdir(parents=True, exist_ok=True)
+            if day != self._segment_day:
+                self._segment_seq = len(list(directory.glob(f"*{SEGMENT_SUFFIX}")))
+            self.segment_path = directory / f"{now_ist().strftime('%H%M%S')}-{self._segment_seq:04d}{SEGMENT_SUFFIX}"
+            self._file = gzip.open(self.segment_path, 'ab', compresslevel=self.compresslevel)
+            self._segment_day = day
+            self._segment_started = received_at
+            self._segment_written = 0
+            self._segment_seq += 1
+            self._stats['segments'] += 1
+
+    def _flush(self):
+        if self._file is not None:
+            try:
+                # Sync flush: everything written so far is readable after a crash
+                self._file.flush(zlib.Z_SYNC_FLUSH)
+            except Exception as e:
+                logger.error(f"Market data recorder flush failed: {e}")
+
+    def _close_segment(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception as e:
+                logger.error(f"Market data recorder could not close {self.segment_path}: {e}")
+            self._file = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'active': self.active,
+            'segment': str(self.segment_path) if self.segment_path else None,
+            'queue_depth': self._queue.qsize(),
+            **self._stats
+        }
+
+
+# Global instance
+_market_recorder = None
+
+
+def get_market_recorder() -> MarketRecorder:
+    """Get global market data recorder (inactive until started)"""
+    global _market_recorder
+    if _market_recorder is None:
+        _market_recorder = MarketRecorder()
+    return _market_recorder
@@ -0,0 +1,380 @@
+"""
+Market Data Replay
+Deterministic replay of a recorded trading day through the live code paths
+
+Reads the log written by market_recorder:
+
+- feed frames go into MarketFeedManager's normal decode/dispatch pipeline,
+  in recorded order and without drops, paced at 1x, Nx or max speed
+- REST calls are answered from the recorded payloads by ReplayUpstoxClient
+  (sync) and ReplayAsyncUpstoxClient (async). A call gets the latest
+  response to the same request recorded at or before the replay clock.
+  Dates in requests are matched relative to the day they were made on, so
+  a day recorded earlier still answers requests built from today's clock.
+
+No network is touched. That makes a recorded day a repeatable profiling and
+benchmarking workload, and latency spikes can be debugged offline.
+
+    python -m backend.data.market_replay 2026-10-15 --speed 0
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import re
+import time
+import zlib
+from bisect import bisect_right
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from backend.core.async_upstox_client import AsyncUpstoxClient, set_async_upstox_client
+from backend.core.logger import get_data_logger
+from backend.core.timezone_utils import IST, now_ist
+from backend.core.upstox_client import UpstoxClient
+from backend.data.market_recorder import FRAME, RECORD_HEADER, REST, SEGMENT_SUFFIX
+
+logger = get_data_logger()
+
+Record = Tuple[int, float, bytes]
+
+# Params naming a contract expiry; matched as "the expiry current at the time"
+EXPIRY_PARAMS = ('expiry_date',)
+_ISO_DATE = re.compile(r'\b\d{4}-\d{2}-\d{2}\b')
+
+
+# ========== Reading the log ==========
+
+def list_segments(source: Union[str, Path, Sequence[Union[str, Path]]], root: str = "data/recordings") -> List[Path]:
+    """
+    Segments of a recording in receive order
+
+    Args:
+        source: A day ('YYYY-MM-DD'), a directory of segments, a segment file
+            or a list of segment files
+        root: Recordings root used when source is a day
+    """
+    if isinstance(source, (list, tuple)):
+        return [Path(path) for path in source]
+    path = Path(source)
+    if not path.exists() and (Path(root) / str(source)).is_dir():
+        path = Path(root) / str(source)
+    if path.is_dir():
+        return sorted(path.glob(f"*{SEGMENT_SUFFIX}"))
+    return [path]
+
+
+def read_segment(path: Path) -> Iterator[Record]:
+    """(kind, received_at, payload) records of one segment; a truncated tail is skipped"""
+    header_size = RECORD_HEADER.size
+    try:
+        with gzip.open(path, 'rb') as f:
+            while True:
+                header = f.read(header_size)
+                if len(header) < header_size:
+                    return
+                kind, received_at, length = RECORD_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length:
+                    return
+                yield kind, received_at, payload
+    except (EOFError, OSError, zlib.error) as e:
+        logger.warning(f"Recording segment {path.name} ends early: {e}")
+
+
+def read_records(
+    segments: Sequence[Path],
+    start: Optional[float] = None,
+    end: Optional[float] = None
+) -> Iterator[Record]:
+    """Records of several segments within [start, end) epoch seconds"""
+    for path in segments:
+        for record in read_segment(path):
+            if start is not None and record[1] < start:
+                continue
+            if end is not None and record[1] >= end:
+                return
+            yield record
+
+
+def _relative_dates(text: str, today: date) -> str:
+    """Dates in text as day offsets from today ('2026-10-14' -> '{d-1}')"""
+    def offset(match):
+        try:
+            return f"{{d{(date.fromisoformat(match.group(0)) - today).days:+d}}}"
+        except ValueError:
+            return match.group(0)
+    return _ISO_DATE.sub(offset, text)
+
+
+def request_key(
+    method: str,
+    endpoint: str,
+    params: Optional[dict],
+    data: Optional[dict],
+    today: Optional[date] = None
+) -> str:
+    """
+    Canonical identity of a REST request
+
+    The engine derives candle date ranges and option expiries from the wall
+    clock, so the same request replayed on a later day carries other dates.
+    With today (the IST day the request was made on), dates in the endpoint
+    and params become day offsets from it and expiry params match any expiry.
+    """
+    if today is not None:
+        endpoint = _relative_dates(endpoint, today)
+        if params:
+            params = {
+                name: '{expiry}' if name in EXPIRY_PARAMS else _relative_dates(value, today) if isinstance(value, str) else value
+                for name, value in params.items()
+            }
+    return json.dumps([method.upper(), endpoint, params or None, data or None], sort_keys=True, default=str)
+
+
+class RecordedResponses:
+    """REST payloads of a recording indexed by request and receive time"""
+
+    def __init__(self):
+        # request key -> (receive times, raw response JSON)
+        self._index: Dict[str, Tuple[List[float], List[bytes]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, received_at: float, payload: bytes):
+        record = json.loads(payload)
+        key = request_key(
+            record['method'], record['endpoint'], record.get('params'), record.get('data'),
+            datetime.fromtimestamp(received_at, IST).date()
+        )
+        times, responses = self._index.setdefault(key, ([], []))
+        times.append(received_at)
+        responses.append(json.dumps(record['response']).encode('utf-8'))
+
+    def lookup(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[dict],
+        data: Optional[dict],
+        at: float,
+        today: Optional[date] = None
+    ) -> Optional[Any]:
+        """
+        Latest response recorded at or before `at`, or None
+
+        Args:
+            today: IST day the request's dates were built on (default: today)
+        """
+        entry = self._index.get(request_key(method, endpoint, params, data, today or now_ist().date()))
+        i = bisect_right(entry[0], at) - 1 if entry is not None else -1
+        if i < 0:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Decoded per call, like response.json() on a live call
+        return json.loads(entry[1][i])
+
+    def __len__(self) -> int:
+        return sum(len(times) for times, _ in self._index.values())
+
+
+# ========== Replay ==========
+
+class MarketReplay:
+    """Paced replay of a recording into a MarketFeedManager"""
+
+    def __init__(
+        self,
+        source: Union[str, Path, Sequence[Union[str, Path]]],
+        speed: Optional[float] = 1.0,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        root: str = "data/recordings"
+    ):
+        """
+        Args:
+            source: Day, directory, segment file or list of segments (see list_segments)
+            speed: 1.0 real time, N for N times faster, None or 0 for as fast as possible
+            start: Skip records received before this epoch
+            end: Stop at records received at or after this epoch
+            root: Recordings root used when source is a day
+        """
+        self.segments = list_segments(source, root)
+        self.speed = speed or None
+        self.start = start
+        self.end = end
+
+        self.responses = RecordedResponses()
+        self.first_at: Optional[float] = None
+        self.last_at: Optional[float] = None
+        self.clock: Optional[float] = None  # Receive time of the last replayed record
+        self.done = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {'frames': 0, 'rest': 0, 'max_behind': 0.0, 'started': None, 'finished': None}
+        self._load_responses()
+
+    def _load_responses(self):
+        """Index every REST payload up front so lookups never read the log"""
+        started = time.perf_counter()
+        for kind, received_at, payload in read_records(self.segments, self.start, self.end):
+            if self.first_at is None:
+                self.first_at = received_at
+            self.last_at = received_at
+            if kind == REST:
+                self.responses.add(received_at, payload)
+        self.clock = self.first_at
+        logger.info(
+            f"✓ Replay of {len(self.segments)} segment(s) indexed: {len(self.responses)} REST payloads, "
+            f"{(self.last_at or 0) - (self.first_at or 0):.0f}s recorded, in {time.perf_counter() - started:.1f}s"
+        )
+
+    def now(self) -> float:
+        """Replay clock: recorded receive time of the last replayed record"""
+        return self.clock if self.clock is not None else time.time()
+
+    def start_feed(self, feed_manager) -> asyncio.Task:
+        """Start replaying frames into a feed manager (once)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(feed_manager))
+        return self._task
+
+    async def run(self, feed_manager):
+        """Replay every record in order, pacing by the recorded inter-arrival times"""
+        feed_manager._start_pipeline()
+        self._stats['started'] = time.time()
+        wall_start = time.monotonic()
+        try:
+            for kind, received_at, payload in read_records(self.segments, self.start, self.end):
+                if self.speed is not None:
+                    due = wall_start + (received_at - self.first_at) / self.speed
+                    delay = due - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    else:
+                        self._stats['max_behind'] = max(self._stats['max_behind'], -delay)
+                self.clock = received_at
+                if kind == FRAME:
+                    self._stats['frames'] += 1
+                    await feed_manager._put_frame(payload)
+                elif kind == REST:
+                    self._stats['rest'] += 1
+            # Let the decoder drain what is queued
+            while feed_manager._frames.qsize():
+                await asyncio.sleep(0.01)
+        finally:
+            self._stats['finished'] = time.time()
+            self.done.set()
+        stats = self.get_stats()
+        logger.info(
+            f"✓ Replay finished: {stats['frames']} frames in {stats['wall_seconds']:.1f}s "
+            f"({stats['frames_per_second']:.0f}/s, {stats['effective_speed']:.1f}x)"
+        )
+
+    def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self._stats
+        wall = ((stats['finished'] or time.time()) - stats['started']) if stats['started'] else 0.0
+        recorded = (self.clock or 0) - (self.first_at or 0)
+        return {
+            'segments': len(self.segments),
+            'speed': self.speed or 'max',
+            'frames': stats['frames'],
+            'rest_records': stats['rest'],
+            'rest_hits': self.responses.hits,
+            'rest_misses': self.responses.misses,
+            'recorded_seconds': round(recorded, 3),
+            'wall_seconds': round(wall, 3),
+            'frames_per_second': stats['frames'] / wall if wall else 0.0,
+            'effective_speed': recorded / wall if wall else 0.0,
+            'max_behind_schedule': round(stats['max_behind'], 4),
+            'finished': self.done.is_set()
+        }
+
+
+# ========== Replay clients ==========
+
+class ReplayUpstoxClient(UpstoxClient):
+    """UpstoxClient answering from a recording instead of the network"""
+
+    def __init__(self, access_token: str, replay: MarketReplay):
+        super().__init__(access_token)
+        self.replay = replay
+
+    def _make_request(self, method: str, endpoint: str, params: dict = None, data: dict = None, *args, **kwargs):
+        response = self.replay.responses.lookup(method, endpoint, params, data, self.replay.now())
+        if response is None:
+            logger.debug(f"No recorded response for {method} {endpoint}")
+        return response
+
+    def get_option_chain(self, instrument_key: str, expiry_date: str) -> Optional[Dict]:
+        # The live method calls the session directly (longer timeout), not _make_request
+        return self._make_request("GET", "/v2/option/chain", params={
+            "instrument_key": instrument_key,
+            "expiry_date": expiry_date
+        })
+
+
+class ReplayAsyncUpstoxClient(AsyncUpstoxClient):
+    """AsyncUpstoxClient answering from a recording instead of the network"""
+
+    def __init__(self, access_token: str, replay: MarketReplay):
+        super().__init__(access_token)
+        self.replay = replay
+
+    async def _make_request(self, method: str, endpoint: str, params: dict = None, data: dict = None, **kwargs) -> Optional[Dict]:
+        response = self.replay.responses.lookup(method, endpoint, params, data, self.replay.now())
+        if response is None:
+            logger.debug(f"No recorded response for {method} {endpoint}")
+        return response
+
+
+def install_replay(replay: MarketReplay, access_token: str) -> ReplayUpstoxClient:
+    """
+    Route the process's Upstox I/O to a recording
+
+    The shared async client and the market feed singleton switch to replay.
+    The returned sync client is meant to be passed where an UpstoxClient
+    is constructed (e.g. MarketDataManager).
+    """
+    from backend.data.market_feed import MarketFeedManager
+
+    set_async_upstox_client(ReplayAsyncUpstoxClient(access_token, replay))
+    MarketFeedManager(access_token).use_replay(replay)
+    return ReplayUpstoxClient(access_token, replay)
+
+
+# ========== Benchmark ==========
+
+async def benchmark(source: str, speed: Optional[float], root: str = "data/recordings") -> Dict[str, Any]:
+    """Replay a recording through the feed pipeline only and report throughput and lag"""
+    from backend.data.market_feed import MarketFeedManager
+
+    replay = MarketReplay(source, speed=speed, root=root)
+    install_replay(replay, "replay")
+    feed = MarketFeedManager("replay")
+    ticks = 0
+
+    def count_tick(instrument_key, tick):
+        nonlocal ticks
+        ticks += 1
+
+    feed.register_tick_sink(count_tick)
+    await feed.connect([], mode="full")
+    await replay.done.wait()
+    await feed.disconnect()
+    return {'replay': replay.get_stats(), 'ticks': ticks, 'pipeline': feed.get_pipeline_metrics()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded market data day through the feed pipeline")
+    parser.add_argument("source", help="Day (YYYY-MM-DD), segment directory or segment file")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = real time, N = N times faster, 0 = max")
+    parser.add_argument("--root", default="data/recordings")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(benchmark(args.source, args.speed, args.root)), indent=2, default=str))
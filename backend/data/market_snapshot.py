@@ -0,0 +1,171 @@
+"""
+Versioned Market Snapshots
+One producer publishes immutable, monotonically versioned market snapshots;
+the trading, risk, hedging, watchlist and broadcast paths all read the same one
+
+Snapshots are deep-frozen when published, so consumers can share them freely
+without copying and without one loop observing another loop's in-place edits.
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from backend.core.logger import get_data_logger
+from backend.data.option_chain import OptionSideView
+
+logger = get_data_logger()
+
+
+class FrozenDict(dict):
+    """
+    Read-only dict
+
+    Subclasses dict so existing consumers keep working (isinstance checks,
+    .get(), iteration, JSON serialization) while any mutation raises TypeError.
+    Use dict(frozen) to get a mutable shallow copy.
+    """
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("market snapshot is immutable - copy it with dict() before editing")
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __ior__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+    def __hash__(self):
+        return id(self)
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def freeze(value: Any) -> Any:
+    """Recursively convert dicts to FrozenDict and lists/sets to tuples"""
+    if isinstance(value, FrozenDict):
+        return value
+    if isinstance(value, OptionSideView):
+        # Columnar chains stay columnar; their arrays are locked instead
+        return value.frozen(freeze)
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """Immutable market state published by MarketDataManager"""
+
+    version: int
+    published_at: datetime
+    state: FrozenDict = field(repr=False)
+
+    def get(self, symbol: str) -> FrozenDict:
+        """Per-symbol state (spot, chain, indicators, derived metrics)"""
+        return self.state.get(symbol) or FrozenDict()
+
+    def spot_price(self, symbol: str) -> Optional[float]:
+        return self.get(symbol).get('spot_price')
+
+    def option_chain(self, symbol: str) -> FrozenDict:
+        return self.get(symbol).get('option_chain') or FrozenDict()
+
+    @property
+    def is_stale(self) -> bool:
+        return bool(self.state.get('is_stale', False))
+
+    def age_seconds(self) -> float:
+        return (datetime.now() - self.published_at).total_seconds()
+
+
+class SnapshotPublisher:
+    """Holds the latest snapshot and wakes consumers waiting for newer versions"""
+
+    def __init__(self):
+        self._latest: Optional[MarketSnapshot] = None
+        self._version = 0
+        self._condition: Optional[asyncio.Condition] = None
+
+    @property
+    def condition(self) -> asyncio.Condition:
+        # Created lazily so it binds to the running event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def latest(self) -> Optional[MarketSnapshot]:
+        """Most recently published snapshot (None before the first publish)"""
+        return self._latest
+
+    async def publish(self, state: Dict[str, Any]) -> MarketSnapshot:
+        """Freeze state into the next versioned snapshot and notify waiters"""
+        frozen = freeze(state)
+        async with self.condition:
+            snapshot = MarketSnapshot(
+                version=self._version + 1,
+                published_at=datetime.now(),
+                state=frozen
+            )
+            self._version = snapshot.version
+            self._latest = snapshot
+            self.condition.notify_all()
+        logger.debug(f"Published market snapshot v{snapshot.version}")
+        return snapshot
+
+    async def update(self, transform: Callable[[MarketSnapshot], Optional[Dict[str, Any]]]) -> Optional[MarketSnapshot]:
+        """
+        Publish a state derived from the latest snapshot
+
+        transform runs under the publish lock, so a concurrent full rebuild
+        cannot be overwritten by a derivation of an older version. Returning
+        None skips publishing.
+        """
+        async with self.condition:
+            if self._latest is None:
+                return None
+            state = transform(self._latest)
+            if state is None:
+                return None
+            snapshot = MarketSnapshot(
+                version=self._version + 1,
+                published_at=datetime.now(),
+                state=freeze(state)
+            )
+            self._version = snapshot.version
+            self._latest = snapshot
+            self.condition.notify_all()
+        logger.debug(f"Published derived market snapshot v{snapshot.version}")
+        return snapshot
+
+    async def wait_for_version(self, after: int, timeout: Optional[float] = None) -> Optional[MarketSnapshot]:
+        """
+        Wait until a snapshot with version > after is published
+
+        Returns the newest snapshot, or None if timeout elapses first.
+        """
+        if self._latest is not None and self._latest.version > after:
+            return self._latest
+
+        async def _wait():
+            async with self.condition:
+                await self.condition.wait_for(lambda: self._version > after)
+                return self._latest
+
+        try:
+            return await asyncio.wait_for(_wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
@@ -0,0 +1,62 @@
+"""
+Max Pain
+Vectorized max-pain and pain-curve computation shared by live trading and training
+
+For a candidate expiry price S, option writers pay
+    sum_{K < S} (S - K) * call_oi(K) + sum_{K > S} (K - S) * put_oi(K)
+With strikes sorted, both sums come from prefix sums of OI and OI*strike, so the
+whole pain curve costs one sort plus O(n) instead of the O(n^2) double loop.
+
+Depends only on NumPy so training scripts can import it without the backend stack.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+
+class MaxPain(NamedTuple):
+    """Max pain strike with the full pain curve over the candidate strikes"""
+    strike: float
+    strikes: np.ndarray
+    pain: np.ndarray
+
+
+def max_pain_curve(strikes, call_oi, put_oi) -> MaxPain:
+    """
+    Compute writer payout at every strike and the strike where it is minimal
+
+    Args:
+        strikes: Strike per row; may be unsorted and repeat (e.g. one row per CE/PE)
+        call_oi: Call open interest per row (0 where the row is a put or missing)
+        put_oi: Put open interest per row (0 where the row is a call or missing)
+
+    Returns:
+        MaxPain(strike, strikes, pain) with strikes sorted ascending; strike is
+        0.0 when there are no strikes. Ties resolve to the lowest strike.
+    """
+    strikes = np.asarray(strikes, dtype=np.float64)
+    call_oi = np.asarray(call_oi, dtype=np.float64)
+    put_oi = np.asarray(put_oi, dtype=np.float64)
+
+    if strikes.size == 0:
+        return MaxPain(0.0, strikes, np.zeros(0))
+
+    if strikes.size > 1 and not np.all(strikes[1:] > strikes[:-1]):
+        # Sort and merge duplicate strikes
+        strikes, inverse = np.unique(strikes, return_inverse=True)
+        call_oi = np.bincount(inverse, weights=call_oi, minlength=strikes.size)
+        put_oi = np.bincount(inverse, weights=put_oi, minlength=strikes.size)
+
+    # Calls strictly below each strike (exclusive prefix sums)
+    call_cum = np.cumsum(call_oi) - call_oi
+    call_value_cum = np.cumsum(call_oi * strikes) - call_oi * strikes
+    call_pain = strikes * call_cum - call_value_cum
+
+    # Puts strictly above each strike (exclusive suffix sums)
+    put_above = put_oi.sum() - np.cumsum(put_oi)
+    put_value_above = (put_oi * strikes).sum() - np.cumsum(put_oi * strikes)
+    put_pain = put_value_above - strikes * put_above
+
+    pain = call_pain + put_pain
+    return MaxPain(float(strikes[int(np.argmin(pain))]), strikes, pain)
@@ -0,0 +1,472 @@
+"""
+Columnar Option Chain
+Stores an option chain as a sorted strike array plus per-side structured arrays
+
+The legacy chain format (`calls`/`puts` dicts keyed by str(int(strike)), one
+13-key dict per strike) made every consumer re-parse string keys and walk
+Python dicts. OptionChainColumns keeps one float64 strike array and one
+structured NumPy array per side, so filtering, OI totals, PCR and max pain
+(see backend.data.max_pain) are vectorized passes and strike lookups are a
+binary search.
+
+OptionSideView exposes a side through the old Mapping interface, materializing
+per-strike dicts lazily, so strategies, persistence and the API keep working.
+"""
+
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from backend.core.logger import get_data_logger
+from backend.data.greeks import DEFAULT_RISK_FREE_RATE, GREEK_FIELDS, chain_greeks
+from backend.data.max_pain import MaxPain, max_pain_curve
+
+logger = get_data_logger()
+
+# Per-side columns, in the order the legacy per-strike dict lists them
+SIDE_DTYPE = np.dtype([
+    ('ltp', 'f8'),
+    ('oi', 'i8'),
+    ('volume', 'i8'),
+    ('iv', 'f8'),
+    ('delta', 'f8'),
+    ('gamma', 'f8'),
+    ('theta', 'f8'),
+    ('vega', 'f8'),
+    ('bid', 'f8'),
+    ('ask', 'f8'),
+    ('oi_change', 'i8'),
+    ('rho', 'f8'),
+    ('iv_solved', '?'),
+    ('iv_failed', '?'),
+    # Price history (seeded from the chain's close_price, filled by PriceHistoryTracker)
+    ('prev_close', 'f8'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+])
+SIDE_FIELDS = SIDE_DTYPE.names
+PRICE_HISTORY_FIELDS = ('prev_close', 'open', 'high', 'low')
+
+_SIDE_ALIASES = {
+    'calls': 'calls', 'call': 'calls', 'ce': 'calls',
+    'puts': 'puts', 'put': 'puts', 'pe': 'puts',
+}
+
+
+def strike_key(strike: float) -> str:
+    """Legacy dict key for a strike (e.g. 25850.0 -> '25850')"""
+    return str(int(strike))
+
+
+class OptionSide:
+    """Calls or puts for every strike of a chain, aligned with its strike array"""
+
+    __slots__ = ('values', 'present', 'instrument_keys')
+
+    def __init__(self, values: np.ndarray, present: np.ndarray, instrument_keys: np.ndarray):
+        self.values = values
+        self.present = present
+        self.instrument_keys = instrument_keys
+
+    @classmethod
+    def empty(cls, size: int) -> 'OptionSide':
+        return cls(
+            np.zeros(size, dtype=SIDE_DTYPE),
+            np.zeros(size, dtype=bool),
+            np.full(size, '', dtype=object)
+        )
+
+    def take(self, index: np.ndarray) -> 'OptionSide':
+        return OptionSide(self.values[index], self.present[index], self.instrument_keys[index])
+
+    def copy(self) -> 'OptionSide':
+        return OptionSide(self.values.copy(), self.present.copy(), self.instrument_keys.copy())
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.values[field]
+
+    def freeze(self):
+        for array in (self.values, self.present, self.instrument_keys):
+            array.flags.writeable = False
+
+
+class OptionChainColumns:
+    """Sorted strikes plus columnar call/put data for one expiry"""
+
+    __slots__ = ('strikes', 'calls', 'puts')
+
+    def __init__(self, strikes: np.ndarray, calls: OptionSide, puts: OptionSide):
+        self.strikes = strikes
+        self.calls = calls
+        self.puts = puts
+
+    # ========== Construction ==========
+
+    @classmethod
+    def from_upstox(
+        cls,
+        raw_data: List[Dict],
+        validate: Optional[Callable[[Dict], bool]] = None
+    ) -> Tuple['OptionChainColumns', int]:
+        """
+        Build from the Upstox /v2/option/chain `data` list
+
+        Args:
+            raw_data: One item per strike with call_options / put_options
+            validate: Optional check applied to each side's market_data
+
+        Returns:
+            (chain, invalid_count)
+        """
+        size = len(raw_data)
+        strikes = np.zeros(size, dtype=np.float64)
+        sides = {'calls': OptionSide.empty(size), 'puts': OptionSide.empty(size)}
+        keep = np.zeros(size, dtype=bool)
+        invalid_count = 0
+
+        for i, item in enumerate(raw_data):
+            try:
+                strike_price = item.get('strike_price')
+                if strike_price is None or strike_price <= 0:
+                    invalid_count += 1
+                    continue
+                strikes[i] = float(strike_price)
+
+                for side_name, raw_key in (('calls', 'call_options'), ('puts', 'put_options')):
+                    option = item.get(raw_key)
+                    if option is None:
+                        continue
+                    market_data = option.get('market_data', {})
+                    if validate is not None and not validate(market_data):
+                        invalid_count += 1
+                        continue
+
+                    greeks = option.get('option_greeks', {})
+                    oi = int(market_data.get('oi', 0))
+                    side = sides[side_name]
+                    side.values[i] = (
+                        float(market_data.get('ltp', 0)),
+                        oi,
+                        int(market_data.get('volume', 0)),
+                        float(greeks.get('iv', 0)),
+                        float(greeks.get('delta', 0)),
+                        float(greeks.get('gamma', 0)),
+                        float(greeks.get('theta', 0)),
+                        float(greeks.get('vega', 0)),
+                        float(market_data.get('bid_price', 0)),
+                        float(market_data.get('ask_price', 0)),
+                        int(oi - market_data.get('prev_oi', 0)),
+                        float(greeks.get('rho', 0)),
+                        False,
+                        False,
+                        float(market_data.get('close_price', 0) or 0),
+                        0.0,
+                        0.0,
+                        0.0,
+                    )
+                    side.present[i] = True
+                    side.instrument_keys[i] = option.get('instrument_key', '')
+                    keep[i] = True
+
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Invalid option data at strike {item.get('strike_price')}: {e}")
+                invalid_count += 1
+                continue
+
+        chain = cls(strikes, sides['calls'], sides['puts'])
+        return chain._sorted_unique(np.flatnonzero(keep)), invalid_count
+
+    @classmethod
+    def from_legacy(cls, chain: Dict) -> 'OptionChainColumns':
+        """Build from a legacy dict chain (e.g. one read back from Redis)"""
+        legacy_sides = {name: chain.get(name) or {} for name in ('calls', 'puts')}
+        strike_set = set()
+        for side in legacy_sides.values():
+            strike_set.update(float(key) for key in side.keys())
+
+        strikes = np.array(sorted(strike_set), dtype=np.float64)
+        positions = {strike_key(strike): i for i, strike in enumerate(strikes)}
+        sides = {}
+        for name, legacy in legacy_sides.items():
+            side = OptionSide.empty(len(strikes))
+            for key, row in legacy.items():
+                i = positions[strike_key(float(key))]
+                side.values[i] = tuple(row.get(field, 0) or 0 for field in SIDE_FIELDS)
+                side.present[i] = True
+                side.instrument_keys[i] = row.get('instrument_key', '')
+            sides[name] = side
+
+        return cls(strikes, sides['calls'], sides['puts'])
+
+    def _sorted_unique(self, index: np.ndarray) -> 'OptionChainColumns':
+        """Restrict to index, sort by strike and drop duplicate strikes (last wins)"""
+        index = index[np.argsort(self.strikes[index], kind='stable')]
+        strikes = self.strikes[index]
+        if len(strikes) > 1:
+            last_of_run = np.append(strikes[1:] != strikes[:-1], True)
+            index = index[last_of_run]
+        return self.take(index)
+
+    # ========== Lookup ==========
+
+    def __len__(self) -> int:
+        return len(self.strikes)
+
+    def side(self, option_type: str) -> OptionSide:
+        """Side by name: 'calls'/'CE'/'call' or 'puts'/'PE'/'put'"""
+        name = _SIDE_ALIASES.get(option_type.lower())
+        if name is None:
+            raise ValueError(f"Unknown option type: {option_type}")
+        return self.calls if name == 'calls' else self.puts
+
+    def index_of(self, strike: float) -> Optional[int]:
+        """Row of an exact strike via binary search, or None"""
+        i = int(np.searchsorted(self.strikes, strike))
+        if i < len(self.strikes) and self.strikes[i] == strike:
+            return i
+        return None
+
+    def nearest_index(self, price: float) -> Optional[int]:
+        """Row of the strike closest to price (ATM for price=spot)"""
+        if not len(self.strikes):
+            return None
+        i = int(np.searchsorted(self.strikes, price))
+        if i == 0:
+            return 0
+        if i == len(self.strikes):
+            return i - 1
+        return i if self.strikes[i] - price < price - self.strikes[i - 1] else i - 1
+
+    def row(self, option_type: str, strike: float) -> Optional[Dict[str, Any]]:
+        """Legacy per-strike dict for one option, or None if not listed"""
+        i = self.index_of(strike)
+        side = self.side(option_type)
+        if i is None or not side.present[i]:
+            return None
+        return self._row(side, i)
+
+    def _row(self, side: OptionSide, i: int) -> Dict[str, Any]:
+        record = side.values[i]
+        row = {'instrument_key': side.instrument_keys[i]}
+        for field in SIDE_FIELDS:
+            row[field] = record[field].item()
+        row['strike'] = float(self.strikes[i])
+        return row
+
+    # ========== Aggregates ==========
+
+    def take(self, index: np.ndarray) -> 'OptionChainColumns':
+        return OptionChainColumns(self.strikes[index], self.calls.take(index), self.puts.take(index))
+
+    def select(self, calls_mask: np.ndarray, puts_mask: np.ndarray) -> 'OptionChainColumns':
+        """Keep only the masked calls and puts, dropping strikes where neither side survives"""
+        calls_mask = calls_mask & self.calls.present
+        puts_mask = puts_mask & self.puts.present
+        index = np.flatnonzero(calls_mask | puts_mask)
+        chain = self.take(index)
+        chain.calls.present = calls_mask[index]
+        chain.puts.present = puts_mask[index]
+        return chain
+
+    def count(self, option_type: str) -> int:
+        return int(np.count_nonzero(self.side(option_type).present))
+
+    def total_oi(self, option_type: str) -> int:
+        side = self.side(option_type)
+        return int(side['oi'][side.present].sum())
+
+    def pcr(self) -> float:
+        """Put/call open interest ratio (0 if there is no call OI)"""
+        call_oi = self.total_oi('calls')
+        return self.total_oi('puts') / call_oi if call_oi > 0 else 0.0
+
+    def pain_curve(self) -> MaxPain:
+        """Max pain strike plus writer payout at every strike"""
+        return max_pain_curve(
+            self.strikes,
+            np.where(self.calls.present, self.calls['oi'], 0),
+            np.where(self.puts.present, self.puts['oi'], 0)
+        )
+
+    def max_pain(self) -> float:
+        """Strike at which total option writer payout is minimal"""
+        return self.pain_curve().strike
+
+    def market_price(self, option_type: str) -> np.ndarray:
+        """Mid price where a two-sided quote exists, else LTP (0 = no price)"""
+        side = self.side(option_type)
+        bid, ask, ltp = side['bid'], side['ask'], side['ltp']
+        two_sided = (bid > 0) & (ask >= bid)
+        return np.where(side.present, np.where(two_sided, (bid + ask) / 2, ltp), 0.0)
+
+    def with_greeks(
+        self,
+        spot: float,
+        t: float,
+        rate: float = DEFAULT_RISK_FREE_RATE,
+        solve_iv: bool = True
+    ) -> 'OptionChainColumns':
+        """
+        Copy of the chain with every call and put repriced at spot and time to expiry t
+
+        With solve_iv, IV is re-derived from mid/LTP wherever the broker IV is
+        missing or stale; unsolved strikes are flagged with iv_failed.
+        """
+        greeks = chain_greeks(
+            self.strikes, self.calls['iv'], self.puts['iv'], spot, t, rate,
+            call_price=self.market_price('calls') if solve_iv else None,
+            put_price=self.market_price('puts') if solve_iv else None
+        )
+        sides = []
+        for side, side_greeks in ((self.calls, greeks['calls']), (self.puts, greeks['puts'])):
+            values = side.values.copy()
+            for field in GREEK_FIELDS + ('iv', 'iv_solved', 'iv_failed'):
+                values[field] = side_greeks[field]
+            sides.append(OptionSide(values, side.present, side.instrument_keys))
+        return OptionChainColumns(self.strikes, *sides)
+
+    # ========== Legacy interop ==========
+
+    def copy(self) -> 'OptionChainColumns':
+        return OptionChainColumns(self.strikes.copy(), self.calls.copy(), self.puts.copy())
+
+    def freeze(self) -> 'OptionChainColumns':
+        """Mark every array read-only in place (see OptionSideView.frozen for a locked copy)"""
+        self.strikes.flags.writeable = False
+        self.calls.freeze()
+        self.puts.freeze()
+        return self
+
+    def to_legacy(self) -> Dict[str, 'OptionSideView']:
+        """Dict-compatible `calls` / `puts` views for legacy consumers"""
+        return {
+            'calls': OptionSideView(self, 'calls'),
+            'puts': OptionSideView(self, 'puts'),
+        }
+
+
+class OptionSideView(Mapping):
+    """
+    Read-through Mapping of str(int(strike)) -> per-strike dict for one side
+
+    Rows are built from the columns on first access and cached per view.
+    Every field lives in the columns (including prev_close and OHLC), so a
+    view can be rebound to new columns without touching any row.
+    """
+
+    __slots__ = ('columns', 'option_type', '_side', '_rows', '_keys', '_row_factory')
+
+    def __init__(
+        self,
+        columns: OptionChainColumns,
+        option_type: str,
+        rows: Optional[Dict[str, Any]] = None,
+        row_factory: Optional[Callable[[Dict], Any]] = None
+    ):
+        self.columns = columns
+        self.option_type = option_type
+        self._side = columns.side(option_type)
+        self._rows = rows if rows is not None else {}
+        self._keys: Optional[List[str]] = None
+        self._row_factory = row_factory
+
+    def _index(self, key: Any) -> Optional[int]:
+        try:
+            strike = float(key)
+        except (TypeError, ValueError):
+            return None
+        i = self.columns.index_of(strike)
+        if i is None or not self._side.present[i]:
+            return None
+        return i
+
+    def __getitem__(self, key: Any) -> Dict[str, Any]:
+        key = str(key)
+        row = self._rows.get(key)
+        if row is not None:
+            return row
+        i = self._index(key)
+        if i is None:
+            raise KeyError(key)
+        row = self.columns._row(self._side, i)
+        if self._row_factory is not None:
+            row = self._row_factory(row)
+        self._rows[key] = row
+        return row
+
+    def __contains__(self, key: Any) -> bool:
+        return str(key) in self._rows or self._index(key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        if self._keys is None:
+            self._keys = [strike_key(s) for s in self.columns.strikes[self._side.present]]
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._side.present))
+
+    def __repr__(self) -> str:
+        return f"OptionSideView({self.option_type}, {len(self)} strikes)"
+
+    def __reduce__(self):
+        # Rows are derived data; only the columns are pickled
+        return (OptionSideView, (self.columns, self.option_type))
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Materialize every row into a plain dict (for JSON)"""
+        return {key: dict(self[key]) for key in self}
+
+    def frozen(self, freeze: Callable[[Any], Any]) -> 'OptionSideView':
+        """
+        Read-only copy: arrays copied and locked, rows passed through freeze as
+        they are built
+
+        The columns are copied so the chain this view came from (e.g. the one
+        in the L1 cache) stays writable.
+        """
+        return OptionSideView(self.columns.copy().freeze(), self.option_type, row_factory=freeze)
+
+    def set_column(self, field: str, values: np.ndarray, mask: Optional[np.ndarray] = None):
+        """Write a column of this side in place (where mask is set) and drop cached rows"""
+        column = self._side.values[field]
+        if mask is None:
+            column[:] = values
+        else:
+            column[mask] = values[mask]
+        self._rows.clear()
+
+
+def as_columns(option_chain: Optional[Dict]) -> Optional[OptionChainColumns]:
+    """Columnar form of a chain, whether it holds views or legacy dicts"""
+    if not option_chain:
+        return None
+    calls = option_chain.get('calls')
+    if isinstance(calls, OptionSideView):
+        return calls.columns
+    puts = option_chain.get('puts')
+    if isinstance(puts, OptionSideView):
+        return puts.columns
+    if not calls and not puts:
+        return None
+    return OptionChainColumns.from_legacy(option_chain)
+
+
+def reprice_chain(
+    option_chain: Optional[Dict],
+    spot: float,
+    t: float,
+    rate: float = DEFAULT_RISK_FREE_RATE
+) -> Optional[Dict]:
+    """
+    New chain dict with IV and Greeks for every strike recomputed at spot and t
+
+    The input chain (possibly a published, frozen one) is left untouched.
+    """
+    columns = as_columns(option_chain)
+    if columns is None or not len(columns) or not spot or spot <= 0:
+        return option_chain
+
+    repriced = columns.with_greeks(spot, t, rate)
+    return {**option_chain, **repriced.to_legacy()}
@@ -4,12 +4,14 @@ Calculates true volume-weighted average price from market open (9:15 AM IST)
 """
 
 import numpy as np
-import pandas as pd
 from typing import Dict, Optional, List
 from datetime import datetime, time, date
-from backend.core.timezone_utils import now_ist, today_ist
+from backend.core.timezone_utils import IST, now_ist, today_ist
 from backend.core.logger import get_data_logger
 from backend.core.upstox_client import UpstoxClient
+from backend.core.async_upstox_client import get_async_upstox_client
+from backend.data.candle_aggregator import get_candle_aggregator
+from backend.data.vwap_accumulator import get_vwap_accumulator
 import redis
 import json
 import os
@@ -21,6 +23,12 @@ class SessionVWAP:
     
     def __init__(self, upstox_client: UpstoxClient):
         self.upstox_client = upstox_client
+        self.async_client = get_async_upstox_client(upstox_client.access_token)
+        # Tick-built 1-minute candles; REST is only used while these are not live
+        self.candle_aggregator = get_candle_aggregator()
+        # Running session sums fed by every closed 1-minute tick candle
+        self.accumulator = get_vwap_accumulator()
+        self.candle_aggregator.add_bar_listener(self.accumulator.on_bar)
         redis_host = os.getenv('REDIS_HOST', 'localhost')
         redis_port = int(os.getenv('REDIS_PORT', 6379))
         try:
@@ -52,6 +60,11 @@ class SessionVWAP:
             # Market hasn't opened yet, return previous day's close as VWAP
             return self._get_pre_market_vwap(symbol)
         
+        # Streaming accumulator - O(1) while tick candles are live
+        streamed = self.get_streamed_vwap(symbol)
+        if streamed:
+            return streamed
+        
         # Check cache (if Redis available)
         if self.redis_available and self.redis_client:
             try:
@@ -87,50 +100,74 @@ class SessionVWAP:
             logger.error(f"Error calculating session VWAP for {symbol}: {e}")
             return self._get_default_vwap(symbol)
     
+    def _get_instrument_key(self, symbol: str) -> Optional[str]:
+        if symbol == "NIFTY":
+            return "NSE_INDEX|Nifty 50"
+        elif symbol == "SENSEX":
+            return "BSE_INDEX|SENSEX"
+        return None
+    
+    def get_streamed_vwap(self, symbol: str, require_live: bool = True) -> Optional[Dict]:
+        """
+        Session VWAP from the streaming accumulator, including the forming bar
+        
+        Args:
+            symbol: NIFTY or SENSEX
+            require_live: Only answer while tick candles are live (else None)
+        """
+        instrument_key = self._get_instrument_key(symbol)
+        if not instrument_key or not self.accumulator.has_session(instrument_key):
+            return None
+        if require_live and not self.candle_aggregator.is_live(instrument_key):
+            return None
+        series = self.candle_aggregator.get_series(instrument_key, "1minute")
+        return self.accumulator.get_vwap(instrument_key, series.current if series else None, symbol)
+    
     async def _calculate_session_vwap(self, symbol: str) -> Optional[Dict]:
         """Calculate VWAP from today's 1-minute bars"""
         try:
             # Get instrument key
-            if symbol == "NIFTY":
-                instrument_key = "NSE_INDEX|Nifty 50"
-            elif symbol == "SENSEX":
-                instrument_key = "BSE_INDEX|SENSEX"
-            else:
+            instrument_key = self._get_instrument_key(symbol)
+            if not instrument_key:
                 return None
             
             # Get today's 1-minute candles
             now = now_ist()
             today_str = now.strftime('%Y-%m-%d')
             
-            # Fetch 1-minute data for today
-            candles_response = self.upstox_client.get_historical_candle_data(
-                instrument_key=instrument_key,
-                timeframe="1minute",
-                start_date=today_str,
-                end_date=today_str
-            )
-            
-            if not candles_response or 'data' not in candles_response:
-                logger.warning(f"No intraday data available for {symbol}")
-                return None
-            
-            candles = candles_response['data'].get('candles', [])
+            # Today's 1-minute candles from the tick aggregator, else REST
+            candles = self.candle_aggregator.get_candles(instrument_key, "1minute")
+            if candles is None:
+                candles_response = await self.async_client.get_historical_candle_data(
+                    instrument_key=instrument_key,
+                    timeframe="1minute",
+                    start_date=today_str,
+                    end_date=today_str
+                )
+                
+                if not candles_response or 'data' not in candles_response:
+                    logger.warning(f"No intraday data available for {symbol}")
+                    return None
+                
+                candles = candles_response['data'].get('candles', [])
             if not candles:
                 return None
             
-            # Filter candles from market open (9:15 AM) onwards
+            # Filter today's candles from market open (9:15 AM) onwards
             market_open_candles = []
             for candle in candles:
-                candle_time = datetime.fromisoformat(candle[0].replace('Z', '+00:00'))
-                ist_time = candle_time.replace(tzinfo=None) + pd.Timedelta(hours=5, minutes=30)  # Convert to IST
+                ist_time = datetime.fromisoformat(candle[0].replace('Z', '+00:00')).astimezone(IST)
                 
-                if ist_time.time() >= self.market_open_time:
+                if ist_time.date() == now.date() and ist_time.time() >= self.market_open_time:
                     market_open_candles.append(candle)
             
             if not market_open_candles:
                 logger.warning(f"No candles after market open for {symbol}")
                 return None
             
+            # REST returns newest first; the last candle must be the latest
+            market_open_candles.sort(key=lambda candle: candle[0])
+            
             # Calculate VWAP
             total_pv = 0.0  # Price × Volume
             total_volume = 0.0
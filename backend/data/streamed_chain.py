@@ -0,0 +1,178 @@
+"""
+Streamed Option Chain
+Keeps one underlying/expiry option chain live from WebSocket option ticks
+
+Upstox has no option-chain stream, but every option instrument key can be
+subscribed on the market feed. A StreamedOptionChain is seeded from a full REST
+chain, tracks the ATM +/- N strike window to subscribe, and writes LTP, OI,
+volume and top-of-book from ticks into its own columnar copy. IV and Greeks
+are not taken from ticks - reprice_chain re-solves them from the live prices.
+The REST chain is only needed for the periodic full reconcile.
+"""
+
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+import numpy as np
+
+from backend.data.feed_decoder import FeedTick
+from backend.data.option_chain import OptionChainColumns, OptionSide, as_columns
+
+
+def _writable_copy(columns: OptionChainColumns) -> OptionChainColumns:
+    sides = [
+        OptionSide(side.values.copy(), side.present.copy(), side.instrument_keys.copy())
+        for side in (columns.calls, columns.puts)
+    ]
+    return OptionChainColumns(columns.strikes.copy(), *sides)
+
+
+class StreamedOptionChain:
+    """Option chain for one symbol and expiry updated in place from feed ticks"""
+
+    def __init__(self, symbol: str, expiry: str, strike_step: float, window: int = 10):
+        self.symbol = symbol
+        self.expiry = expiry
+        self.strike_step = strike_step
+        self.window = window
+        self.columns: Optional[OptionChainColumns] = None
+        self.base_chain: Dict[str, Any] = {}
+        self.centre: Optional[float] = None
+        self.subscribed: Set[str] = set()
+        self.reconciled_at = 0.0
+        self.updated_at = 0.0
+        self.ticks_applied = 0
+        self._positions: Dict[str, Tuple[OptionSide, int]] = {}
+
+    # ========== REST reconcile ==========
+
+    def reconcile(
+        self,
+        chain: Dict,
+        fetched_at: float,
+        latest_ticks: Optional[Dict[str, FeedTick]] = None
+    ) -> bool:
+        """
+        Replace the chain with a fresh REST chain
+
+        Args:
+            chain: Processed REST chain
+            fetched_at: time.time() when the REST request was issued
+            latest_ticks: Feed ticks by instrument key; subscribed ticks received
+                after fetched_at are re-applied so prices never move backwards
+        """
+        columns = as_columns(chain)
+        if columns is None or not len(columns):
+            return False
+
+        self.columns = _writable_copy(columns)
+        self.base_chain = chain
+        self._positions = {}
+        for side in (self.columns.calls, self.columns.puts):
+            for i in np.flatnonzero(side.present):
+                key = side.instrument_keys[i]
+                if key:
+                    self._positions[key] = (side, int(i))
+
+        self.reconciled_at = self.updated_at = time.time()
+        if latest_ticks:
+            for key in self.subscribed:
+                tick = latest_ticks.get(key)
+                if tick is not None and tick.received_at >= fetched_at:
+                    self.apply_tick(key, tick)
+        return True
+
+    def seconds_since_reconcile(self) -> float:
+        return time.time() - self.reconciled_at
+
+    def seconds_since_update(self) -> float:
+        return time.time() - self.updated_at
+
+    # ========== Subscription window ==========
+
+    def needs_recentre(self, spot: float) -> bool:
+        """True once spot has moved a full strike step away from the window centre"""
+        return self.centre is None or abs(spot - self.centre) >= self.strike_step
+
+    def recentre(self, spot: float) -> Tuple[Set[str], Set[str]]:
+        """
+        Move the window to ATM +/- window strikes around spot
+
+        Returns:
+            (added, removed) instrument keys relative to the previous window
+        """
+        if self.columns is None:
+            return set(), set()
+        atm = self.columns.nearest_index(spot)
+        if atm is None:
+            return set(), set()
+
+        lo = max(atm - self.window, 0)
+        hi = min(atm + self.window + 1, len(self.columns))
+        keys = set()
+        for side in (self.columns.calls, self.columns.puts):
+            in_window = side.instrument_keys[lo:hi][side.present[lo:hi]]
+            keys.update(key for key in in_window if key)
+
+        added, removed = keys - self.subscribed, self.subscribed - keys
+        self.subscribed = keys
+        self.centre = float(self.columns.strikes[atm])
+        return added, removed
+
+    # ========== Ticks ==========
+
+    def apply_tick(self, instrument_key: str, tick: FeedTick) -> bool:
+        """Write one option tick into the chain; False if the key is not in this chain"""
+        position = self._positions.get(instrument_key)
+        if position is None or not tick.ltp:
+            return False
+        side, i = position
+        side['ltp'][i] = tick.ltp
+        if tick.oi is not None:
+            side['oi_change'][i] += int(tick.oi) - side['oi'][i]
+            side['oi'][i] = int(tick.oi)
+        if tick.volume is not None:
+            side['volume'][i] = int(tick.volume)
+        if tick.bid_price is not None:
+            side['bid'][i] = tick.bid_price
+            side['ask'][i] = tick.ask_price
+        self.ticks_applied += 1
+        self.updated_at = time.time()
+        return True
+
+    def build_chain(self) -> Optional[Dict[str, Any]]:
+        """
+        Independent legacy chain dict from the current state
+
+        prev_close and OHLC written on the REST chain are columns, so they are
+        carried over with the copy.
+        """
+        if self.columns is None:
+            return None
+        columns = _writable_copy(self.columns)
+        views = columns.to_legacy()
+
+        total_call_oi = columns.total_oi('calls')
+        total_put_oi = columns.total_oi('puts')
+        return {
+            **self.base_chain,
+            **views,
+            'pcr': total_put_oi / total_call_oi if total_call_oi > 0 else self.base_chain.get('pcr', 0),
+            'max_pain': columns.max_pain(),
+            'total_call_oi': total_call_oi,
+            'total_put_oi': total_put_oi,
+            'total_oi': total_call_oi + total_put_oi,
+            'streamed': True,
+            'stream_age_seconds': round(self.seconds_since_update(), 3),
+            'reconciled_age_seconds': round(self.seconds_since_reconcile(), 1)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'expiry': self.expiry,
+            'centre': self.centre,
+            'subscribed': len(self.subscribed),
+            'ticks_applied': self.ticks_applied,
+            'seconds_since_update': round(self.seconds_since_update(), 3),
+            'seconds_since_reconcile': round(self.seconds_since_reconcile(), 1)
+        }
@@ -0,0 +1,320 @@
+"""
+Streaming Technical Indicators
+Incremental RSI, EMA, MACD, ATR, ADX, Bollinger Bands and VIX proxy
+
+IndicatorEngine keeps the running state of every indicator reported by the
+multi-timeframe analysis, so adding a bar (or previewing the forming bar on a
+tick) costs O(1) for the recursive indicators and O(window) for the fixed
+rolling windows - independent of how much history has been seen.
+
+IndicatorEngine.from_arrays seeds the same state from full OHLC arrays in one
+vectorized pass (recursive EMA / Wilder smoothing run through lfilter), for
+startup and backfill. Results match the loop-based formulas in
+backend.services.technical_indicators to floating-point precision.
+"""
+
+import copy
+import math
+from collections import deque
+from typing import Any, Dict, Optional
+
+import numpy as np
+from scipy.signal import lfilter
+
+# Periods used by the multi-timeframe analysis
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+ADX_PERIOD = 14
+BOLLINGER_PERIOD = 20
+VIX_PERIOD = 20
+TREND_WINDOW = 20
+EMA_PERIODS = (9, 12, 21, 26)
+SMA_PERIODS = (20, 50)
+
+
+# ========== Batch (vectorized) building blocks ==========
+
+def ema_series(values: np.ndarray, period: int) -> np.ndarray:
+    """EMA of every prefix, seeded with the first value (ema[0] = values[0])"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return values
+    alpha = 2.0 / (period + 1)
+    out = np.empty_like(values)
+    out[0] = values[0]
+    if values.size > 1:
+        out[1:], _ = lfilter([alpha], [1.0, -(1.0 - alpha)], values[1:], zi=[(1.0 - alpha) * values[0]])
+    return out
+
+
+def wilder_series(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    Wilder smoothing: mean of the first period values, then
+    avg = (avg * (period - 1) + x) / period. Element i is the average after
+    values[:period + i]; empty when there are fewer than period values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.size < period:
+        return np.empty(0)
+    out = np.empty(values.size - period + 1)
+    out[0] = values[:period].mean()
+    if out.size > 1:
+        out[1:], _ = lfilter([1.0 / period], [1.0, -(period - 1.0) / period], values[period:],
+                             zi=[(period - 1.0) / period * out[0]])
+    return out
+
+
+def true_range(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray) -> np.ndarray:
+    """True range for bars 1..n-1"""
+    prev_close = closes[:-1]
+    return np.maximum.reduce([
+        highs[1:] - lows[1:],
+        np.abs(highs[1:] - prev_close),
+        np.abs(lows[1:] - prev_close),
+    ])
+
+
+def directional_movement(highs: np.ndarray, lows: np.ndarray):
+    """(+DM, -DM) for bars 1..n-1"""
+    up_move = highs[1:] - highs[:-1]
+    down_move = lows[:-1] - lows[1:]
+    plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+    minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+    return plus_dm, minus_dm
+
+
+def _dx(atr: np.ndarray, plus: np.ndarray, minus: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        plus_di = np.where(atr > 0, plus / atr * 100, 0.0)
+        minus_di = np.where(atr > 0, minus / atr * 100, 0.0)
+        di_sum = plus_di + minus_di
+        return np.where(di_sum > 0, np.abs(plus_di - minus_di) / di_sum * 100, 0.0)
+
+
+def _dx_scalar(atr: float, plus: float, minus: float) -> float:
+    plus_di = (plus / atr) * 100 if atr > 0 else 0
+    minus_di = (minus / atr) * 100 if atr > 0 else 0
+    di_sum = plus_di + minus_di
+    return (abs(plus_di - minus_di) / di_sum) * 100 if di_sum > 0 else 0
+
+
+# ========== Incremental state ==========
+
+class EMAState:
+    """Exponential moving average seeded with the first value"""
+
+    __slots__ = ('period', 'alpha', 'value', 'count')
+
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self.value: Optional[float] = None
+        self.count = 0
+
+    def update(self, x: float):
+        self.value = x if self.value is None else (x * self.alpha) + (self.value * (1 - self.alpha))
+        self.count += 1
+
+    def get(self) -> Optional[float]:
+        """EMA once at least period values were seen (as _calculate_ema requires)"""
+        return float(self.value) if self.count >= self.period else None
+
+
+class WilderState:
+    """Mean of the first period values, then Wilder smoothing"""
+
+    __slots__ = ('period', 'count', 'total', 'value')
+
+    def __init__(self, period: int):
+        self.period = period
+        self.count = 0
+        self.total = 0.0
+        self.value: Optional[float] = None
+
+    def update(self, x: float):
+        if self.value is None:
+            self.total += x
+            self.count += 1
+            if self.count == self.period:
+                self.value = self.total / self.period
+        else:
+            self.value = (self.value * (self.period - 1) + x) / self.period
+
+    def seed(self, values: np.ndarray):
+        """Set the state after consuming values, in one vectorized pass"""
+        if values.size < self.period:
+            self.count = int(values.size)
+            self.total = float(values.sum())
+            self.value = None
+        else:
+            self.count = self.period
+            self.total = float(values[:self.period].sum())
+            self.value = float(wilder_series(values, self.period)[-1])
+
+
+class IndicatorEngine:
+    """Running indicator state for one OHLC series (one instrument and timeframe)"""
+
+    def __init__(self):
+        self.count = 0
+        self.prev_high: Optional[float] = None
+        self.prev_low: Optional[float] = None
+        self.prev_close: Optional[float] = None
+        self.emas = {period: EMAState(period) for period in EMA_PERIODS}
+        self.closes = deque(maxlen=max(SMA_PERIODS + (BOLLINGER_PERIOD, TREND_WINDOW)))
+        self.returns = deque(maxlen=VIX_PERIOD)
+        self.rsi_gain = WilderState(RSI_PERIOD)
+        self.rsi_loss = WilderState(RSI_PERIOD)
+        self.true_ranges = deque(maxlen=ATR_PERIOD)
+        self.adx_tr = WilderState(ADX_PERIOD)
+        self.adx_plus = WilderState(ADX_PERIOD)
+        self.adx_minus = WilderState(ADX_PERIOD)
+        self.dx = deque(maxlen=ADX_PERIOD)
+
+    # ========== Updates ==========
+
+    def update(self, high: float, low: float, close: float):
+        """Add one completed bar - O(1)"""
+        if self.prev_close is not None:
+            prev_close = self.prev_close
+            delta = close - prev_close
+            self.rsi_gain.update(delta if delta > 0 else 0)
+            self.rsi_loss.update(-delta if delta < 0 else 0)
+
+            tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+            self.true_ranges.append(tr)
+
+            up_move = high - self.prev_high
+            down_move = self.prev_low - low
+            self.adx_tr.update(tr)
+            self.adx_plus.update(up_move if up_move > down_move and up_move > 0 else 0)
+            self.adx_minus.update(down_move if down_move > up_move and down_move > 0 else 0)
+            if self.adx_tr.value is not None:
+                self.dx.append(_dx_scalar(self.adx_tr.value, self.adx_plus.value, self.adx_minus.value))
+
+            self.returns.append(delta / prev_close)
+
+        for ema in self.emas.values():
+            ema.update(close)
+        self.closes.append(close)
+        self.prev_high, self.prev_low, self.prev_close = high, low, close
+        self.count += 1
+
+    def preview(self, high: float, low: float, close: float) -> Dict[str, Any]:
+        """Indicator values as if (high, low, close) were the next bar, without committing it"""
+        engine = self.copy()
+        engine.update(high, low, close)
+        return engine.values()
+
+    def copy(self) -> 'IndicatorEngine':
+        """Independent copy of the running state"""
+        engine = copy.copy(self)
+        engine.emas = {period: copy.copy(state) for period, state in self.emas.items()}
+        for name in ('closes', 'returns', 'true_ranges', 'dx'):
+            setattr(engine, name, getattr(self, name).copy())
+        for name in ('rsi_gain', 'rsi_loss', 'adx_tr', 'adx_plus', 'adx_minus'):
+            setattr(engine, name, copy.copy(getattr(self, name)))
+        return engine
+
+    @classmethod
+    def from_arrays(cls, highs, lows, closes) -> 'IndicatorEngine':
+        """Engine state after all bars, computed in one vectorized pass (seeding / backfill)"""
+        highs = np.asarray(highs, dtype=np.float64)
+        lows = np.asarray(lows, dtype=np.float64)
+        closes = np.asarray(closes, dtype=np.float64)
+        engine = cls()
+        n = closes.size
+        if n == 0:
+            return engine
+
+        engine.count = n
+        engine.prev_high, engine.prev_low, engine.prev_close = float(highs[-1]), float(lows[-1]), float(closes[-1])
+        for period, ema in engine.emas.items():
+            ema.value = float(ema_series(closes, period)[-1])
+            ema.count = n
+        engine.closes.extend(closes[-engine.closes.maxlen:].tolist())
+
+        if n > 1:
+            deltas = np.diff(closes)
+            engine.rsi_gain.seed(np.where(deltas > 0, deltas, 0.0))
+            engine.rsi_loss.seed(np.where(deltas < 0, -deltas, 0.0))
+            engine.returns.extend((deltas / closes[:-1])[-VIX_PERIOD:].tolist())
+
+            tr = true_range(highs, lows, closes)
+            engine.true_ranges.extend(tr[-ATR_PERIOD:].tolist())
+
+            plus_dm, minus_dm = directional_movement(highs, lows)
+            engine.adx_tr.seed(tr)
+            engine.adx_plus.seed(plus_dm)
+            engine.adx_minus.seed(minus_dm)
+            if tr.size >= ADX_PERIOD:
+                dx = _dx(
+                    wilder_series(tr, ADX_PERIOD),
+                    wilder_series(plus_dm, ADX_PERIOD),
+                    wilder_series(minus_dm, ADX_PERIOD)
+                )
+                engine.dx.extend(dx[-ADX_PERIOD:].tolist())
+        return engine
+
+    # ========== Values ==========
+
+    def values(self) -> Dict[str, Any]:
+        """Indicator dict in the multi-timeframe analysis format"""
+        closes = self.closes
+        n = self.count
+        window = list(closes)
+
+        def sma(period: int) -> Optional[float]:
+            return float(sum(window[-period:]) / period) if n >= period else None
+
+        ema = {period: state.get() for period, state in self.emas.items()}
+
+        rsi = None
+        if self.rsi_gain.value is not None:
+            avg_gain, avg_loss = self.rsi_gain.value, self.rsi_loss.value
+            rsi = 100.0 if avg_loss == 0 else float(100 - (100 / (1 + avg_gain / avg_loss)))
+
+        macd = None
+        if n >= 26:
+            macd_line = ema[12] - ema[26]
+            # Signal is simplified to the MACD line, as in the original analysis
+            macd = {'macd': float(macd_line), 'signal': float(macd_line), 'histogram': 0.0}
+
+        bollinger = None
+        if n >= BOLLINGER_PERIOD:
+            recent = window[-BOLLINGER_PERIOD:]
+            middle = sum(recent) / BOLLINGER_PERIOD
+            std = math.sqrt(sum((x - middle) ** 2 for x in recent) / BOLLINGER_PERIOD)
+            bollinger = {'upper': float(middle + 2 * std), 'middle': float(middle), 'lower': float(middle - 2 * std)}
+
+        atr = float(sum(self.true_ranges) / ATR_PERIOD) if n >= ATR_PERIOD + 1 else None
+
+        vix = None
+        if n >= VIX_PERIOD and self.returns:
+            mean = sum(self.returns) / len(self.returns)
+            vix = float(math.sqrt(sum((r - mean) ** 2 for r in self.returns) / len(self.returns)) * math.sqrt(252) * 100)
+
+        adx = float(sum(self.dx) / len(self.dx)) if n >= ADX_PERIOD + 1 else None
+
+        trend = 'neutral'
+        if n >= TREND_WINDOW:
+            recent = window[-TREND_WINDOW:]
+            first_half = sum(recent[:10]) / 10
+            second_half = sum(recent[10:]) / 10
+            diff_pct = ((second_half - first_half) / first_half) * 100
+            trend = 'bullish' if diff_pct > 1.0 else 'bearish' if diff_pct < -1.0 else 'neutral'
+
+        return {
+            'rsi': rsi,
+            'macd': macd,
+            'sma_20': sma(20),
+            'sma_50': sma(50),
+            'ema_9': ema[9],
+            'ema_21': ema[21],
+            'bollinger_bands': bollinger,
+            'atr': atr,
+            'current_price': float(self.prev_close) if self.prev_close is not None else None,
+            'trend': trend,
+            'vix': vix,
+            'adx': adx
+        }
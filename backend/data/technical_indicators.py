@@ -9,6 +9,8 @@ import numpy as np
 from datetime import datetime
 import logging
 
+from backend.data.streaming_indicators import ema_series, true_range
+
 logger = logging.getLogger(__name__)
 
 
@@ -225,13 +227,12 @@ class TechnicalIndicators:
             low_prices = prices
         
         # Calculate true ranges
-        true_ranges = []
-        for i in range(1, len(prices)):
-            high_low = high_prices[i] - low_prices[i]
-            high_close = abs(high_prices[i] - prices[i-1])
-            low_close = abs(low_prices[i] - prices[i-1])
-            true_range = max(high_low, high_close, low_close)
-            true_ranges.append(true_range)
+        n = len(prices)
+        true_ranges = true_range(
+            np.asarray(high_prices[:n], dtype=np.float64),
+            np.asarray(low_prices[:n], dtype=np.float64),
+            np.asarray(prices, dtype=np.float64)
+        )
         
         # Calculate ATR (simple average of true ranges)
         if len(true_ranges) < period:
@@ -379,15 +380,7 @@ class TechnicalIndicators:
         Returns:
             EMA array
         """
-        ema = np.zeros_like(prices)
-        ema[0] = prices[0]
-        
-        multiplier = 2 / (period + 1)
-        
-        for i in range(1, len(prices)):
-            ema[i] = (prices[i] * multiplier) + (ema[i-1] * (1 - multiplier))
-        
-        return ema
+        return ema_series(prices, period)
     
     def get_feature_vector(self, primary_symbol: str, secondary_symbols: List[str] = None) -> Dict:
         """
@@ -0,0 +1,360 @@
+"""
+Trading Calendar
+Precomputed exchange sessions, holidays and per-underlying expiries
+
+Expiry and market-hours logic used to be recomputed on every call, with
+weekday arithmetic and strptime in the market data loop, the trading loop and
+the position context service. The calendar does that work once per year. It
+builds:
+
+- per day: session open, close and the system's trading cutoff as epochs
+  (0 on weekends and exchange holidays)
+- per underlying: the sorted expiry dates with their settlement instants, and
+  for every day the index of the first expiry on or after it
+
+Lookups turn a timestamp into a day index with integer arithmetic. IST has no
+DST, so the offset is fixed. current_expiry, time_to_expiry_years and
+is_session_open are then a couple of list reads.
+
+Expiries come from the instrument master when it is loaded, since those are the
+listed contracts. Otherwise they come from the weekly/monthly rules, with an
+expiry that falls on a holiday moved to the previous trading day.
+"""
+
+import json
+import time
+from bisect import bisect_left
+from datetime import date, datetime, time as dt_time, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from backend.core.logger import get_data_logger
+from backend.core.timezone_utils import IST, eod_exit_time, market_open_time
+from backend.data.greeks import EXPIRY_CUTOFF, MIN_TIME_TO_EXPIRY, SECONDS_PER_YEAR
+from backend.data.instrument_master import InstrumentMaster, _expiry_day, get_instrument_master
+
+logger = get_data_logger()
+
+IST_OFFSET = 19800  # +05:30, no DST
+SECONDS_PER_DAY = 86400
+_EPOCH = date(1970, 1, 1)
+
+SESSION_OPEN = market_open_time()     # 09:15
+SESSION_CLOSE = EXPIRY_CUTOFF         # 15:30 exchange close, options settle
+TRADING_CUTOFF = eod_exit_time()      # 15:25 system stops trading
+
+# (cycle, weekday) - Mon=0. Used when the instrument master is not loaded.
+EXPIRY_RULES = {
+    'NIFTY': ('weekly', 1),       # Every Tuesday
+    'SENSEX': ('weekly', 3),      # Every Thursday
+    'BANKNIFTY': ('monthly', 3),  # Last Thursday of the month
+}
+DEFAULT_EXPIRY_RULE = ('weekly', 3)
+
+# NSE/BSE equity derivatives trading holidays (weekdays only).
+# Extra or corrected dates go in data/trading_holidays.json.
+EXCHANGE_HOLIDAYS = {
+    # 2025
+    '2025-02-26': 'Mahashivratri',
+    '2025-03-14': 'Holi',
+    '2025-03-31': 'Id-Ul-Fitr',
+    '2025-04-10': 'Shri Mahavir Jayanti',
+    '2025-04-14': 'Dr. Baba Saheb Ambedkar Jayanti',
+    '2025-04-18': 'Good Friday',
+    '2025-05-01': 'Maharashtra Day',
+    '2025-08-15': 'Independence Day',
+    '2025-08-27': 'Ganesh Chaturthi',
+    '2025-10-02': 'Mahatma Gandhi Jayanti/Dussehra',
+    '2025-10-21': 'Diwali Laxmi Pujan',
+    '2025-10-22': 'Balipratipada',
+    '2025-11-05': 'Prakash Gurpurb Sri Guru Nanak Dev',
+    '2025-12-25': 'Christmas',
+    # 2026
+    '2026-01-26': 'Republic Day',
+    '2026-03-03': 'Holi',
+    '2026-03-26': 'Shri Ram Navami',
+    '2026-03-31': 'Shri Mahavir Jayanti',
+    '2026-04-03': 'Good Friday',
+    '2026-04-14': 'Dr. Baba Saheb Ambedkar Jayanti',
+    '2026-05-01': 'Maharashtra Day',
+    '2026-05-28': 'Bakri Id',
+    '2026-06-26': 'Muharram',
+    '2026-09-14': 'Ganesh Chaturthi',
+    '2026-10-02': 'Mahatma Gandhi Jayanti',
+    '2026-10-20': 'Dussehra',
+    '2026-11-10': 'Diwali Balipratipada',
+    '2026-11-24': 'Prakash Gurpurb Sri Guru Nanak Dev',
+    '2026-12-25': 'Christmas',
+}
+
+TimeLike = Union[None, float, int, datetime]
+
+
+def _seconds(value: dt_time) -> int:
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+_OPEN_S, _CLOSE_S, _CUTOFF_S = _seconds(SESSION_OPEN), _seconds(SESSION_CLOSE), _seconds(TRADING_CUTOFF)
+
+
+def _epoch(t: TimeLike) -> float:
+    """Epoch seconds of a timestamp (naive datetimes are IST)"""
+    if t is None:
+        return time.time()
+    if isinstance(t, datetime):
+        if t.tzinfo is None:
+            t = t.replace(tzinfo=IST)
+        return t.timestamp()
+    return float(t)
+
+
+def _day_of(epoch: float) -> int:
+    """IST calendar day (days since 1970-01-01) of an epoch"""
+    return int((epoch + IST_OFFSET) // SECONDS_PER_DAY)
+
+
+def _instant(day: int, seconds_of_day: int) -> float:
+    """Epoch of an IST time of day on a given day"""
+    return float(day * SECONDS_PER_DAY + seconds_of_day - IST_OFFSET)
+
+
+def _iso(day: int) -> str:
+    return (_EPOCH + timedelta(days=day)).isoformat()
+
+
+class _ExpirySchedule:
+    """One underlying's expiries and the per-day index of the next one"""
+
+    __slots__ = ('expiries', 'days', 'closes', 'next_index')
+
+    def __init__(self, days: List[int], base_day: int, span: int):
+        self.days = days
+        self.expiries = [_iso(day) for day in days]
+        self.closes = [_instant(day, _CLOSE_S) for day in days]
+        self.next_index = [bisect_left(days, base_day + i) for i in range(span)]
+
+
+class TradingCalendar:
+    """Year-at-a-time precomputed sessions and expiries with O(1) lookups"""
+
+    def __init__(
+        self,
+        instrument_master: Optional[InstrumentMaster] = None,
+        holidays_file: str = "data/trading_holidays.json"
+    ):
+        """
+        Args:
+            instrument_master: Source of listed expiries (global master by default)
+            holidays_file: Optional JSON {"YYYY-MM-DD": "name"} merged over the built-in holidays
+        """
+        self.instrument_master = instrument_master or get_instrument_master()
+        self.holidays_file = Path(holidays_file)
+        self.holidays: Dict[str, str] = {}
+
+        self._base_day = 0
+        self._span = 0
+        self._open: List[float] = []
+        self._close: List[float] = []
+        self._cutoff: List[float] = []
+        self._schedules: Dict[str, Optional[_ExpirySchedule]] = {}
+        self._master_date: Optional[str] = None
+        self.builds = 0
+
+    # ========== Precomputation ==========
+
+    def _load_holidays(self) -> Dict[str, str]:
+        holidays = dict(EXCHANGE_HOLIDAYS)
+        try:
+            if self.holidays_file.exists():
+                with open(self.holidays_file, 'r') as f:
+                    holidays.update(json.load(f))
+        except Exception as e:
+            logger.warning(f"Could not read {self.holidays_file}: {e}")
+        return holidays
+
+    def build(self, year: int):
+        """Precompute sessions for the given year and the next one"""
+        started = time.perf_counter()
+        self.holidays = self._load_holidays()
+        holiday_days = {_expiry_day(day) for day in self.holidays}
+
+        self._base_day = (date(year, 1, 1) - _EPOCH).days
+        self._span = (date(year + 2, 1, 1) - _EPOCH).days - self._base_day
+        self._open, self._close, self._cutoff = [], [], []
+        for day in range(self._base_day, self._base_day + self._span):
+            # 1970-01-01 was a Thursday
+            trading = (day + 3) % 7 < 5 and day not in holiday_days
+            self._open.append(_instant(day, _OPEN_S) if trading else 0.0)
+            self._close.append(_instant(day, _CLOSE_S) if trading else 0.0)
+            self._cutoff.append(_instant(day, _CUTOFF_S) if trading else 0.0)
+
+        self._schedules = {}
+        self._master_date = self.instrument_master.index_date
+        for symbol in EXPIRY_RULES:
+            self._schedule(symbol)
+        self.builds += 1
+        logger.info(
+            f"✓ Trading calendar {year}-{year + 1} built: {sum(1 for o in self._open if o)} sessions, "
+            f"{len(self._schedules)} underlyings in {(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+
+    def _rule_expiry_days(self, symbol: str) -> List[int]:
+        """Expiry days from EXPIRY_RULES over the built span, holidays moved back"""
+        cycle, weekday = EXPIRY_RULES.get(symbol, DEFAULT_EXPIRY_RULE)
+        first = _EPOCH + timedelta(days=self._base_day)
+        last = _EPOCH + timedelta(days=self._base_day + self._span + 40)
+        candidates = []
+        if cycle == 'weekly':
+            day = first + timedelta(days=(weekday - first.weekday()) % 7)
+            while day <= last:
+                candidates.append(day)
+                day += timedelta(days=7)
+        else:
+            year, month = first.year, first.month
+            while date(year, month, 1) <= last:
+                month_end = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+                candidates.append(month_end - timedelta(days=(month_end.weekday() - weekday) % 7))
+                year, month = year + month // 12, month % 12 + 1
+
+        days = []
+        for candidate in candidates:
+            day = (candidate - _EPOCH).days
+            while not self._is_trading_day_index(day - self._base_day) and day > self._base_day:
+                day -= 1
+            days.append(day)
+        return days
+
+    def _is_trading_day_index(self, i: int) -> bool:
+        # Days past the built span are assumed to be trading weekdays
+        if 0 <= i < self._span:
+            return self._open[i] > 0
+        return (self._base_day + i + 3) % 7 < 5
+
+    def _schedule(self, symbol: str) -> Optional[_ExpirySchedule]:
+        if self.instrument_master.index_date != self._master_date:
+            self._schedules = {}
+            self._master_date = self.instrument_master.index_date
+        if symbol in self._schedules:
+            return self._schedules[symbol]
+
+        days = sorted({_expiry_day(expiry) for expiry in self.instrument_master.expiries(symbol)})
+        if not days:
+            days = self._rule_expiry_days(symbol)
+        schedule = _ExpirySchedule(days, self._base_day, self._span) if days else None
+        self._schedules[symbol] = schedule
+        return schedule
+
+    def _index(self, epoch: float) -> int:
+        """Day index into the precomputed arrays, rebuilding when outside the span"""
+        i = _day_of(epoch) - self._base_day
+        if not 0 <= i < self._span:
+            self.build((_EPOCH + timedelta(days=_day_of(epoch))).year)
+            i = _day_of(epoch) - self._base_day
+        return i
+
+    # ========== Sessions ==========
+
+    def is_trading_day(self, t: TimeLike = None) -> bool:
+        return self._open[self._index(_epoch(t))] > 0
+
+    def is_session_open(self, t: TimeLike = None) -> bool:
+        """Exchange session is open (09:15-15:30 IST on a trading day)"""
+        epoch = _epoch(t)
+        i = self._index(epoch)
+        return self._open[i] <= epoch < self._close[i]
+
+    def is_trading_window(self, t: TimeLike = None) -> bool:
+        """Within the system's trading hours (09:15-15:25 IST on a trading day)"""
+        epoch = _epoch(t)
+        i = self._index(epoch)
+        return 0 < self._open[i] <= epoch <= self._cutoff[i]
+
+    def session(self, t: TimeLike = None) -> Optional[Tuple[float, float, float]]:
+        """(open, close, cutoff) epochs of the day's session, None on holidays and weekends"""
+        i = self._index(_epoch(t))
+        return (self._open[i], self._close[i], self._cutoff[i]) if self._open[i] else None
+
+    def holiday(self, t: TimeLike = None) -> Optional[str]:
+        """Name of the exchange holiday on the given day"""
+        epoch = _epoch(t)
+        self._index(epoch)
+        return self.holidays.get(_iso(_day_of(epoch)))
+
+    # ========== Expiries ==========
+
+    def _current(self, symbol: str, epoch: float) -> Tuple[Optional[_ExpirySchedule], int]:
+        i = self._index(epoch)
+        schedule = self._schedule(symbol)
+        if schedule is None:
+            return None, 0
+        j = schedule.next_index[i]
+        if j < len(schedule.closes) and epoch >= schedule.closes[j]:
+            j += 1  # Expiry day after settlement rolls to the next expiry
+        return (schedule, j) if j < len(schedule.closes) else (None, 0)
+
+    def current_expiry(self, symbol: str, t: TimeLike = None) -> Optional[str]:
+        """Nearest expiry (YYYY-MM-DD) not yet settled at t"""
+        schedule, j = self._current(symbol, _epoch(t))
+        return schedule.expiries[j] if schedule else None
+
+    def time_to_expiry_years(self, symbol: str, t: TimeLike = None) -> float:
+        """Year fraction until the current expiry settles, floored at MIN_TIME_TO_EXPIRY"""
+        epoch = _epoch(t)
+        schedule, j = self._current(symbol, epoch)
+        if schedule is None:
+            return MIN_TIME_TO_EXPIRY
+        return max((schedule.closes[j] - epoch) / SECONDS_PER_YEAR, MIN_TIME_TO_EXPIRY)
+
+    def days_to_expiry(self, symbol: str, t: TimeLike = None) -> Optional[int]:
+        """Calendar days from t's date to the current expiry"""
+        epoch = _epoch(t)
+        schedule, j = self._current(symbol, epoch)
+        return schedule.days[j] - _day_of(epoch) if schedule else None
+
+    def expiries(self, symbol: str, after: Optional[str] = None) -> List[str]:
+        """Known expiries of an underlying, optionally only those after a given expiry"""
+        self._index(time.time())
+        schedule = self._schedule(symbol)
+        if schedule is None:
+            return []
+        if after is None:
+            return list(schedule.expiries)
+        return schedule.expiries[bisect_left(schedule.days, _expiry_day(after) + 1):]
+
+    def years_until(self, expiry: Union[str, date, datetime, None], t: TimeLike = None) -> float:
+        """Year fraction until any expiry date's 15:30 settlement"""
+        if not expiry:
+            return MIN_TIME_TO_EXPIRY
+        close = _instant(_expiry_day(expiry), _CLOSE_S)
+        return max((close - _epoch(t)) / SECONDS_PER_YEAR, MIN_TIME_TO_EXPIRY)
+
+    def days_until(self, expiry: Union[str, date, datetime, None], t: TimeLike = None) -> Optional[int]:
+        """Calendar days from t's date to an expiry date (never negative)"""
+        if not expiry:
+            return None
+        return max(0, _expiry_day(expiry) - _day_of(_epoch(t)))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'span': [_iso(self._base_day), _iso(self._base_day + self._span - 1)] if self._span else None,
+            'sessions': sum(1 for o in self._open if o),
+            'holidays': len(self.holidays),
+            'expiry_source': 'instrument_master' if self._master_date else 'rules',
+            'underlyings': {
+                symbol: schedule.expiries[:4] for symbol, schedule in self._schedules.items() if schedule
+            },
+            'builds': self.builds
+        }
+
+
+# Global instance
+_trading_calendar = None
+
+
+def get_trading_calendar() -> TradingCalendar:
+    """Get global trading calendar (built for the current year)"""
+    global _trading_calendar
+    if _trading_calendar is None:
+        _trading_calendar = TradingCalendar()
+        _trading_calendar.build(datetime.now(IST).year)
+    return _trading_calendar
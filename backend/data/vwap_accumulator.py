@@ -0,0 +1,250 @@
+"""
+Streaming Session VWAP
+Running per-instrument VWAP, session range and deviation bands from 1-minute bars
+
+Session VWAP used to re-download the day's candles and loop over all of them on
+every read. The accumulator keeps running sums instead - sum(price * volume),
+sum(volume), sum(price^2 * volume) for the deviation bands, close sum/count for
+the TWAP fallback on volume-less index feeds, and the session high/low - fed
+with every closed 1-minute bar from the tick candle aggregator. A read adds the
+forming bar on the fly, so it is O(1).
+
+State resets at the first bar of a new session (09:15 IST) and is checkpointed
+to a small JSON file so a restart resumes the session; bars already counted in
+the checkpoint are skipped when the aggregator is re-seeded.
+"""
+
+import asyncio
+import json
+import math
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from backend.core.logger import get_data_logger
+from backend.core.timezone_utils import IST, now_ist
+from backend.data.candle_aggregator import SESSION_OPEN_SECONDS
+
+logger = get_data_logger()
+
+
+def _session_of(epoch: float) -> Optional[str]:
+    """IST trading date of a bar, or None for bars before the 09:15 open"""
+    local = datetime.fromtimestamp(epoch, IST)
+    if local.hour * 3600 + local.minute * 60 + local.second < SESSION_OPEN_SECONDS:
+        return None
+    return local.date().isoformat()
+
+
+class VWAPState:
+    """Running session sums for one instrument"""
+
+    __slots__ = (
+        'session', 'total_pv', 'total_p2v', 'total_volume', 'close_sum',
+        'bars', 'high', 'low', 'last_price', 'last_bar_start'
+    )
+
+    def __init__(self, session: str):
+        self.session = session
+        self.total_pv = 0.0
+        self.total_p2v = 0.0
+        self.total_volume = 0.0
+        self.close_sum = 0.0
+        self.bars = 0
+        self.high = 0.0
+        self.low = float('inf')
+        self.last_price = 0.0
+        self.last_bar_start = 0.0
+
+    def add(self, start: float, high: float, low: float, close: float, volume: float):
+        typical_price = (high + low + close) / 3
+        self.total_pv += typical_price * volume
+        self.total_p2v += typical_price * typical_price * volume
+        self.total_volume += volume
+        self.close_sum += close
+        self.bars += 1
+        self.high = max(self.high, high)
+        self.low = min(self.low, low)
+        self.last_price = close
+        self.last_bar_start = start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'VWAPState':
+        state = cls(data['session'])
+        for name in cls.__slots__:
+            if name in data:
+                setattr(state, name, data[name])
+        return state
+
+
+class VWAPAccumulator:
+    """Session VWAP per instrument key, fed by closed 1-minute candles"""
+
+    def __init__(
+        self,
+        checkpoint_file: str = "data/state/session_vwap.json",
+        checkpoint_interval: float = 30.0
+    ):
+        """
+        Args:
+            checkpoint_file: JSON checkpoint of today's running sums
+            checkpoint_interval: Minimum seconds between checkpoint writes
+        """
+        self.checkpoint_file = Path(checkpoint_file)
+        self.checkpoint_interval = checkpoint_interval
+        self._states: Dict[str, VWAPState] = {}
+        self._last_checkpoint = 0.0
+        self._write_lock = threading.Lock()
+        self._load_checkpoint()
+
+    # ========== Feeding ==========
+
+    def on_bar(self, instrument_key: str, bar: list):
+        """Add one closed bar [start, open, high, low, close, volume, oi]"""
+        start = bar[0]
+        session = _session_of(start)
+        if session is None:
+            return
+
+        state = self._states.get(instrument_key)
+        if state is None or session > state.session:
+            if state is not None:
+                logger.info(f"🔄 Session VWAP reset for {instrument_key} ({session})")
+            state = self._states[instrument_key] = VWAPState(session)
+        elif session < state.session or start <= state.last_bar_start:
+            return  # Already counted (checkpoint restore or re-seed)
+
+        state.add(start, float(bar[2]), float(bar[3]), float(bar[4]), float(bar[5]))
+
+        if time.time() - self._last_checkpoint >= self.checkpoint_interval:
+            self.checkpoint_soon()
+
+    # ========== Reading ==========
+
+    def has_session(self, instrument_key: str, session: Optional[str] = None) -> bool:
+        """True when today's (or the given) session has at least one bar"""
+        state = self._states.get(instrument_key)
+        session = session or now_ist().date().isoformat()
+        return state is not None and state.session == session and state.bars > 0
+
+    def get_vwap(self, instrument_key: str, forming_bar: Optional[list] = None, symbol: str = None) -> Optional[Dict]:
+        """
+        Current session VWAP in the SessionVWAP result format
+
+        Args:
+            instrument_key: Instrument key
+            forming_bar: Bar currently forming; included without being committed
+            symbol: Symbol name reported in the result
+        """
+        state = self._states.get(instrument_key)
+        if state is None or state.bars == 0:
+            return None
+
+        total_pv, total_p2v, total_volume = state.total_pv, state.total_p2v, state.total_volume
+        close_sum, bars = state.close_sum, state.bars
+        high, low, last_price = state.high, state.low, state.last_price
+        if forming_bar is not None and forming_bar[0] > state.last_bar_start and _session_of(forming_bar[0]) == state.session:
+            f_high, f_low, f_close, f_volume = (float(value) for value in forming_bar[2:6])
+            typical_price = (f_high + f_low + f_close) / 3
+            total_pv += typical_price * f_volume
+            total_p2v += typical_price * typical_price * f_volume
+            total_volume += f_volume
+            close_sum += f_close
+            bars += 1
+            high, low, last_price = max(high, f_high), min(low, f_low), f_close
+
+        if total_volume > 0:
+            vwap = total_pv / total_volume
+            vwap_std = math.sqrt(max(total_p2v / total_volume - vwap * vwap, 0.0))
+        else:
+            # Volume unavailable (index feeds) - time-weighted average price
+            vwap = close_sum / bars
+            vwap_std = 0.0
+
+        return {
+            'vwap': round(vwap, 2),
+            'last_price': round(last_price, 2),
+            'vwap_deviation_pct': round(((last_price - vwap) / vwap) * 100, 3),
+            'total_volume': int(total_volume),
+            'total_pv': round(total_pv, 0),
+            'bars_used': bars,
+            'session_high': round(high, 2),
+            'session_low': round(low, 2),
+            'session_range_pct': round(((high - low) / vwap) * 100, 2),
+            'vwap_std': round(vwap_std, 2),
+            'upper_band_1': round(vwap + vwap_std, 2),
+            'lower_band_1': round(vwap - vwap_std, 2),
+            'upper_band_2': round(vwap + 2 * vwap_std, 2),
+            'lower_band_2': round(vwap - 2 * vwap_std, 2),
+            'symbol': symbol or instrument_key,
+            'market_open_time': '09:15',
+            'updated_at': now_ist().isoformat(),
+            'source': 'stream'
+        }
+
+    # ========== Checkpoint ==========
+
+    def _load_checkpoint(self):
+        """Restore today's running sums from disk (older sessions are dropped)"""
+        try:
+            if not self.checkpoint_file.exists():
+                return
+            with open(self.checkpoint_file, 'r') as f:
+                data = json.load(f)
+            today = now_ist().date().isoformat()
+            for key, state in data.get('states', {}).items():
+                if state.get('session') == today:
+                    self._states[key] = VWAPState.from_dict(state)
+            if self._states:
+                logger.info(f"✓ Restored session VWAP checkpoint for {len(self._states)} instruments")
+        except Exception as e:
+            logger.warning(f"Could not load session VWAP checkpoint: {e}")
+
+    def save_checkpoint(self):
+        """Persist the running sums to disk now (blocking)"""
+        self._write_checkpoint(self._take_checkpoint())
+
+    def checkpoint_soon(self):
+        """Persist without blocking the event loop - the file is written in a worker thread"""
+        payload = self._take_checkpoint()
+        try:
+            asyncio.get_running_loop().run_in_executor(None, self._write_checkpoint, payload)
+        except RuntimeError:
+            self._write_checkpoint(payload)  # No running loop (scripts, tests)
+
+    def _take_checkpoint(self) -> Dict[str, Any]:
+        """Copy of the running sums to write"""
+        self._last_checkpoint = time.time()
+        return {
+            'states': {key: state.to_dict() for key, state in self._states.items()},
+            'last_updated': now_ist().isoformat()
+        }
+
+    def _write_checkpoint(self, payload: Dict[str, Any]):
+        """Write a checkpoint (atomic replace)"""
+        try:
+            with self._write_lock:
+                self.checkpoint_file.parent.mkdir(parents=True, exist_ok=True)
+                tmp_file = self.checkpoint_file.with_suffix('.tmp')
+                with open(tmp_file, 'w') as f:
+                    json.dump(payload, f)
+                tmp_file.replace(self.checkpoint_file)
+        except Exception as e:
+            logger.error(f"Error saving session VWAP checkpoint: {e}")
+
+
+# Global instance
+_vwap_accumulator = None
+
+
+def get_vwap_accumulator() -> VWAPAccumulator:
+    """Get global session VWAP accumulator"""
+    global _vwap_accumulator
+    if _vwap_accumulator is None:
+        _vwap_accumulator = VWAPAccumulator()
+    return _vwap_accumulator
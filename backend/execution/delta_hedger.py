@@ -5,6 +5,7 @@ Maintains net delta between -0.10 and +0.10 automatically
 
 import asyncio
 import json
+from collections.abc import Mapping
 import numpy as np
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
@@ -12,6 +13,7 @@ from backend.core.logger import get_execution_logger
 from backend.core.upstox_client import UpstoxClient
 from backend.execution.order_manager import OrderManager
 from backend.core.timezone_utils import now_ist
+from backend.data.instrument_master import get_instrument_master
 import os
 import redis
 
@@ -33,6 +35,7 @@ class DeltaHedger:
         self.max_delta_threshold = 0.25  # Hedge when |delta| > 0.25
         self.target_delta_range = (-0.10, 0.10)  # Keep delta in this range
         self.hedge_interval_minutes = 3  # Check every 3 minutes
+        self.tick_check_seconds = 5  # Re-check at most this often on tick-driven snapshots
         self.min_hedge_size = 15  # Minimum futures quantity for hedge
         
         # Track hedge positions
@@ -45,11 +48,27 @@ class DeltaHedger:
         while True:
             try:
                 await self.check_and_hedge_all_positions()
-                await asyncio.sleep(self.hedge_interval_minutes * 60)
+                await self._wait_for_next_check()
             except Exception as e:
                 logger.error(f"Error in delta hedging monitor: {e}")
                 await asyncio.sleep(30)  # Wait 30 seconds on error
     
+    async def _wait_for_next_check(self):
+        """Sleep until the periodic check, waking early when a newer market snapshot is published"""
+        interval = self.hedge_interval_minutes * 60
+        manager = self.market_data_manager
+        if not manager or not hasattr(manager, 'wait_for_version'):
+            await asyncio.sleep(interval)
+            return
+        
+        # Tick-driven Greeks publish new snapshots on spot moves; throttle re-checks
+        await asyncio.sleep(self.tick_check_seconds)
+        snapshot = manager.latest()
+        await manager.wait_for_version(
+            snapshot.version if snapshot else 0,
+            timeout=max(0.0, interval - self.tick_check_seconds)
+        )
+    
     async def check_and_hedge_all_positions(self):
         """Check all open gamma scalping positions and hedge if needed"""
         try:
@@ -97,10 +116,18 @@ class DeltaHedger:
         net_delta = 0.0
         net_gamma = 0.0
         
-        for position in positions:
+        # Reprice every position in one vectorized pass when the manager supports it
+        batch_greeks = None
+        if getattr(self, 'market_data_manager', None) and hasattr(self.market_data_manager, 'get_position_greeks'):
+            try:
+                batch_greeks = self.market_data_manager.get_position_greeks(positions)
+            except Exception as e:
+                logger.error(f"Error batch-pricing position greeks for {symbol}: {e}")
+        
+        for i, position in enumerate(positions):
             try:
                 # Get current Greeks for the position
-                current_greeks = await self.get_current_greeks(position)
+                current_greeks = batch_greeks[i] if batch_greeks else await self.get_current_greeks(position)
                 
                 if current_greeks:
                     delta = current_greeks.get('delta', 0.0)
@@ -158,7 +185,7 @@ class DeltaHedger:
             else:  # PUT
                 options_dict = option_chain.get('puts', {})
             
-            if not isinstance(options_dict, dict):
+            if not isinstance(options_dict, Mapping):
                 logger.warning(f"Options dict is {type(options_dict)}, expected dict")
                 return None
             
@@ -183,7 +210,7 @@ class DeltaHedger:
         """Execute delta hedge using futures"""
         try:
             # Calculate hedge quantity
-            futures_quantity = self.calculate_hedge_quantity(net_delta)
+            futures_quantity = self.calculate_hedge_quantity(net_delta, symbol)
             
             if abs(futures_quantity) < self.min_hedge_size:
                 logger.info(f"📊 {symbol} Hedge quantity too small: {futures_quantity} (min: {self.min_hedge_size})")
@@ -212,11 +239,11 @@ class DeltaHedger:
         except Exception as e:
             logger.error(f"Error executing delta hedge for {symbol}: {e}")
     
-    def calculate_hedge_quantity(self, net_delta: float) -> int:
+    def calculate_hedge_quantity(self, net_delta: float, symbol: str = "NIFTY") -> int:
         """Calculate futures quantity needed for hedge"""
         # Simple calculation: 1 futures contract = 1 delta
-        # Round to nearest lot size (NIFTY: 50, SENSEX: 30)
-        lot_size = 50 if 'NIFTY' in str(net_delta) else 30
+        # Round to the listed lot size (instrument master; NIFTY: 50, SENSEX: 30 if unavailable)
+        lot_size = get_instrument_master().lot_size(symbol) or (50 if symbol == 'NIFTY' else 30)
         
         # Calculate raw quantity
         raw_quantity = abs(net_delta)
@@ -240,7 +267,7 @@ class DeltaHedger:
             spot_price = 26000  # Default fallback
             try:
                 if hasattr(self, 'market_data_manager') and self.market_data_manager:
-                    market_state = await self.market_data_manager.get_current_state()
+                    market_state = await self.market_data_manager.get_latest_state()
                     symbol_data = market_state.get(symbol, {})
                     spot_price = symbol_data.get('spot_price', 26000)
             except Exception as e:
@@ -281,7 +308,11 @@ class DeltaHedger:
     async def get_futures_instrument(self, symbol: str) -> Optional[str]:
         """Get current futures instrument key"""
         try:
-            # For NIFTY and SENSEX, use current month futures
+            # Nearest listed future from the instrument master
+            future = get_instrument_master().nearest_future(symbol)
+            if future:
+                return future['instrument_key']
+            
             if symbol == "NIFTY":
                 return "NSE_INDEX|Nifty 50"
             elif symbol == "SENSEX":
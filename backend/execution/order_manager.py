@@ -10,6 +10,10 @@ from typing import Dict, List, Optional
 from datetime import datetime
 from backend.core.timezone_utils import now_ist, to_naive_ist
 from backend.core.upstox_client import UpstoxClient
+from backend.core.async_upstox_client import get_async_upstox_client
+from backend.safety.rate_limiter import Priority
+from backend.data.feed_decoder import extract_ltp
+from backend.execution.position_book import PositionBook, position_key
 from backend.execution.risk_manager import RiskManager
 from backend.services.market_context import MarketContextService
 from backend.core.config import config
@@ -31,14 +35,16 @@ class OrderManager:
     
     def __init__(self, upstox_client: UpstoxClient, risk_manager: RiskManager, market_data=None, market_monitor=None):
         self.upstox_client = upstox_client
+        # Non-blocking client for order placement from coroutines
+        self.async_client = get_async_upstox_client(upstox_client.access_token) if upstox_client else None
         self.risk_manager = risk_manager
         self.is_paper_mode = config.is_paper_mode()
         self.orders = []
-        self.positions = []
+        self.position_book = PositionBook()  # Open positions indexed by id, instrument, strategy, underlying
         self.metrics_exporter = MetricsExporter()
         self.position_service = get_position_service()
         self.market_data = market_data  # Market feed for real-time prices
-        self.feed_subscriptions = {}  # Track which positions are subscribed to feed
+        self.feed_subscriptions = set()  # Instrument keys with a registered price callback
         
         # Market context enrichment service
         self.market_context = MarketContextService(market_monitor, market_data)
@@ -50,6 +56,11 @@ class OrderManager:
         # Restore positions from database on startup
         self._restore_positions_on_startup()
     
+    @property
+    def positions(self) -> List[Dict]:
+        """Open positions in entry order"""
+        return self.position_book.all()
+    
     def _restore_positions_on_startup(self):
         """
         Restore open positions from database on system restart
@@ -59,7 +70,7 @@ class OrderManager:
             restored_positions = self.position_service.restore_positions()
             
             if restored_positions:
-                self.positions = restored_positions
+                self.position_book.clear()
                 
                 # Add to risk manager and resubscribe to market feed with rate limiting
                 for i, position in enumerate(restored_positions):
@@ -88,6 +99,8 @@ class OrderManager:
                         else:
                             logger.warning(f"Unable to rebuild instrument key for position {position.get('position_id')}")
 
+                    # Indexed only once the instrument key is final
+                    self.position_book.add(position)
                     self.risk_manager.add_position(position)
                     # Add delay every 3 positions to avoid rate limiting
                     if i > 0 and i % 3 == 0:
@@ -143,7 +156,7 @@ class OrderManager:
             if success:
                 # Create position
                 position = self._create_position(order, signal)
-                self.positions.append(position)
+                self.position_book.add(position)
                 self.risk_manager.add_position(position)
                 
                 logger.info(
@@ -291,7 +304,7 @@ class OrderManager:
         for attempt in range(max_retries):
             try:
                 # Place order on Upstox with limit price
-                response = self.upstox_client.place_order(
+                response = await self.async_client.place_order(
                     instrument_token=instrument_key,
                     quantity=order['quantity'],
                     transaction_type=action,
@@ -537,7 +550,7 @@ class OrderManager:
                 }
                 
                 # Add to positions for tracking
-                self.positions.append(position)
+                self.position_book.add(position)
                 
                 logger.info(f"✓ Hedge order placed: {order_details.get('direction')} {order_details.get('quantity')} {order_details.get('symbol')} @ ₹{order.get('fill_price'):.2f}")
                 
@@ -592,38 +605,24 @@ class OrderManager:
             
             # Add to market feed subscription
             if hasattr(self, 'market_data') and self.market_data:
-                # Subscribe to instrument
-                asyncio.create_task(
-                    self.market_data.subscribe_instruments([instrument_key])
-                )
-                
-                # Register callback for price updates
-                async def price_update_callback(inst_key: str, feed_data: Dict):
-                    """Callback to handle real-time price updates from market feed"""
-                    # Extract LTP from feed data - try multiple paths
-                    ltp = None
+                # One subscription and callback per contract; the callback updates
+                # every open position on it through the position book
+                if instrument_key not in self.feed_subscriptions:
+                    asyncio.create_task(
+                        self.market_data.subscribe_instruments([instrument_key])
+                    )
                     
-                    # Try fullFeed path (protobuf format)
-                    if "fullFeed" in feed_data and "marketFF" in feed_data["fullFeed"]:
-                        market_ff = feed_data["fullFeed"]["marketFF"]
-                        if "ltpc" in market_ff and "ltp" in market_ff["ltpc"]:
-                            ltp = float(market_ff["ltpc"]["ltp"])
-                    # Try ff path
-                    elif "ff" in feed_data and "marketFF" in feed_data["ff"]:
-                        market_ff = feed_data["ff"]["marketFF"]
-                        if "ltpc" in market_ff and "ltp" in market_ff["ltpc"]:
-                            ltp = float(market_ff["ltpc"]["ltp"])
-                    # Try direct ltp field
-                    elif "ltp" in feed_data:
-                        ltp = float(feed_data["ltp"])
+                    # Register callback for price updates
+                    async def price_update_callback(inst_key: str, feed_data: Dict):
+                        """Callback to handle real-time price updates from market feed"""
+                        # Feed delivers decoded FeedTick records (ltp, oi, iv, greeks)
+                        ltp = extract_ltp(feed_data)
+                        
+                        if ltp:
+                            self.update_position_price_from_feed(inst_key, ltp, feed_data)
                     
-                    if ltp:
-                        self.update_position_price_from_feed(inst_key, ltp, feed_data)
-                
-                self.market_data.register_price_callback(instrument_key, price_update_callback)
-                
-                # Store subscription mapping
-                self.feed_subscriptions[instrument_key] = position.get('id')
+                    self.market_data.register_price_callback(instrument_key, price_update_callback)
+                    self.feed_subscriptions.add(instrument_key)
                 logger.info(f"✓ Subscribed {position.get('symbol')} {position.get('strike_price')} {position.get('instrument_type')} to market feed")
         except Exception as e:
             logger.error(f"Error subscribing position to feed: {e}")
@@ -633,15 +632,14 @@ class OrderManager:
         Update position price from market feed (called every second)
         This receives real-time updates from WebSocket feed
         """
+        # Every open position on this contract, by index lookup
+        for position in self.position_book.by_instrument(instrument_key):
+            self._apply_feed_price(position, ltp, tick_data)
+    
+    def _apply_feed_price(self, position: Dict, ltp: float, tick_data: Dict = None):
+        """Apply one feed price to a position: P&L, Greeks, persistence and dashboard push"""
         try:
-            # Find position by instrument key
-            position_id = self.feed_subscriptions.get(instrument_key)
-            if not position_id:
-                return  # Not tracking this instrument
-            
-            position = next((p for p in self.positions if p.get('id') == position_id), None)
-            if not position:
-                return
+            position_id = position_key(position)
             
             # Update current price
             old_price = position.get('current_price', 0)
@@ -728,7 +726,7 @@ class OrderManager:
     async def update_position_greeks(self, position_id: str, option_data: Dict):
         """Update position Greeks from option chain data"""
         try:
-            position = next((p for p in self.positions if p.get('id') == position_id), None)
+            position = self.position_book.get(position_id)
             if position:
                 position['delta_current'] = option_data.get('delta', position.get('delta_entry', 0))
                 position['gamma_current'] = option_data.get('gamma', position.get('gamma_entry', 0))
@@ -769,7 +767,7 @@ class OrderManager:
                 if not strike or not option_type:
                     position_id_to_remove = position.get('id') or position.get('position_id')
                     if position_id_to_remove:
-                        self.positions = [p for p in self.positions if (p.get('id') != position_id_to_remove and p.get('position_id') != position_id_to_remove)]
+                        self.position_book.remove(position_id_to_remove)
                         self.risk_manager.remove_position(position_id_to_remove)
                         self.position_service.remove_position(position.get('position_id', position.get('id')))
                         logger.warning(f"🧹 Cleaned up corrupted position {position_id_to_remove} from database and memory")
@@ -782,7 +780,7 @@ class OrderManager:
                     logger.warning(f"⚠️ Missing strike price for position, using entry_price as fallback")
                     position['exit_price'] = position.get('current_price', position.get('entry_price'))
                 else:
-                    market_state = await self.market_data.get_current_state()
+                    market_state = await self.market_data.get_latest_state(max_age=15)
                     symbol_data = market_state.get(symbol, {})
                     option_chain = symbol_data.get('option_chain', {})
                     
@@ -832,7 +830,7 @@ class OrderManager:
             
             # Remove from in-memory positions *after* broadcasts so UI doesn’t flicker
             position_id_to_remove = position.get('id') or position.get('position_id')
-            self.positions = [p for p in self.positions if (p.get('id') != position_id_to_remove and p.get('position_id') != position_id_to_remove)]
+            self.position_book.remove(position_id_to_remove)
             self.risk_manager.remove_position(position_id_to_remove)
             
             # Remove from database
@@ -1063,12 +1061,14 @@ class OrderManager:
         # Reverse transaction type for exit
         exit_type = "SELL" if signal.get('direction') == "CALL" else "BUY"
         
-        response = self.upstox_client.place_order(
+        # Exits jump ahead of every other queued broker call
+        response = await self.async_client.place_order(
             instrument_token=instrument_key,
             quantity=position['quantity'],
             transaction_type=exit_type,
             order_type='MARKET',
-            product='I'
+            product='I',
+            priority=Priority.EXIT
         )
         
         if response and response.get('status') == 'success':
@@ -1096,5 +1096,5 @@ class OrderManager:
         """Close all open positions"""
         logger.info(f"Closing all positions ({len(self.positions)})")
         
-        for position in self.positions.copy():
+        for position in self.positions:
             await self.close_position(position)
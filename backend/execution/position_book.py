@@ -0,0 +1,153 @@
+"""
+Position Book
+Open positions indexed by id, instrument key, strategy and underlying
+
+Feed ticks are routed to positions by instrument key on every update, so
+lookups must not scan the open positions. Several positions can share one
+contract; each instrument key maps to all of them.
+"""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+def position_key(position: Dict) -> Optional[str]:
+    """Identity of a position (new positions carry 'id', restored ones only 'position_id')"""
+    return position.get('id') or position.get('position_id')
+
+
+class PositionBook:
+    """In-memory open positions with O(1) lookups by id and instrument"""
+
+    def __init__(self):
+        self._positions: Dict[str, Dict] = {}  # Key -> position, in entry order
+        self._aliases: Dict[str, str] = {}  # 'id' and 'position_id' values -> key
+        # Secondary indexes: value -> {key: position}
+        self._by_instrument: Dict[str, Dict[str, Dict]] = {}
+        self._by_strategy: Dict[str, Dict[str, Dict]] = {}
+        self._by_underlying: Dict[str, Dict[str, Dict]] = {}
+        # Values each position was indexed under, so a later edit of the dict cannot strand entries
+        self._indexed: Dict[str, Tuple[Tuple[str, ...], Optional[str], Optional[str], Optional[str]]] = {}
+
+    # ========== Mutations ==========
+
+    def add(self, position: Dict) -> Optional[str]:
+        """
+        Add a position, or re-index it after its fields changed
+
+        A position already in the book (under either identity) keeps its
+        place in entry order.
+        """
+        key = position_key(position)
+        if not key:
+            return None
+        aliases = tuple(alias for alias in (position.get('id'), position.get('position_id')) if alias)
+        existing = [self._aliases[alias] for alias in aliases if alias in self._aliases]
+        for old_key in existing[1:]:
+            if old_key != existing[0]:
+                self.remove(old_key)  # Two entries merged into one identity
+        instrument_key = position.get('instrument_key')
+        strategy = position.get('strategy_name') or position.get('strategy')
+        underlying = position.get('symbol')
+
+        if not existing:
+            self._positions[key] = position
+        else:
+            old_key = existing[0]
+            self._unindex_key(old_key)
+            if old_key == key:
+                self._positions[key] = position
+            else:
+                # Re-keyed (e.g. a restored position got an 'id'): same slot, new key
+                self._positions = {
+                    (key if k == old_key else k): (position if k == old_key else v)
+                    for k, v in self._positions.items()
+                }
+        for alias in aliases:
+            self._aliases[alias] = key
+        self._index(self._by_instrument, instrument_key, key, position)
+        self._index(self._by_strategy, strategy, key, position)
+        self._index(self._by_underlying, underlying, key, position)
+        self._indexed[key] = (aliases, instrument_key, strategy, underlying)
+        return key
+
+    def remove(self, position_id: str) -> Optional[Dict]:
+        """Remove a position by its 'id' or 'position_id'"""
+        key = self._aliases.get(position_id)
+        position = self._positions.pop(key, None) if key else None
+        if position is None:
+            return None
+        self._unindex_key(key)
+        return position
+
+    def replace(self, positions: List[Dict]):
+        """Reset the book to the given positions (e.g. restored from the database)"""
+        self.clear()
+        for position in positions:
+            self.add(position)
+
+    def clear(self):
+        self._positions.clear()
+        self._aliases.clear()
+        self._by_instrument.clear()
+        self._by_strategy.clear()
+        self._by_underlying.clear()
+        self._indexed.clear()
+
+    # ========== Lookups ==========
+
+    def get(self, position_id: str) -> Optional[Dict]:
+        """Position by its 'id' or 'position_id'"""
+        key = self._aliases.get(position_id)
+        return self._positions.get(key) if key else None
+
+    def by_instrument(self, instrument_key: str) -> List[Dict]:
+        return list(self._by_instrument.get(instrument_key, {}).values())
+
+    def by_strategy(self, strategy_name: str) -> List[Dict]:
+        return list(self._by_strategy.get(strategy_name, {}).values())
+
+    def by_underlying(self, symbol: str) -> List[Dict]:
+        return list(self._by_underlying.get(symbol, {}).values())
+
+    def has_instrument(self, instrument_key: str) -> bool:
+        return instrument_key in self._by_instrument
+
+    def all(self) -> List[Dict]:
+        """Open positions in entry order"""
+        return list(self._positions.values())
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(list(self._positions.values()))
+
+    def __contains__(self, position_id: str) -> bool:
+        return position_id in self._aliases
+
+    # ========== Helpers ==========
+
+    def _unindex_key(self, key: str):
+        """Drop a key's aliases and secondary index entries (not its slot)"""
+        aliases, instrument_key, strategy, underlying = self._indexed.pop(key)
+        for alias in aliases:
+            if self._aliases.get(alias) == key:
+                del self._aliases[alias]
+        self._unindex(self._by_instrument, instrument_key, key)
+        self._unindex(self._by_strategy, strategy, key)
+        self._unindex(self._by_underlying, underlying, key)
+
+    @staticmethod
+    def _index(index: Dict[str, Dict[str, Dict]], value: Optional[str], key: str, position: Dict):
+        if value:
+            index.setdefault(value, {})[key] = position
+
+    @staticmethod
+    def _unindex(index: Dict[str, Dict[str, Dict]], value: Optional[str], key: str):
+        if not value:
+            return
+        bucket = index.get(value)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del index[value]
@@ -86,7 +86,7 @@ class PositionPriceUpdater:
         
         # Get current market state (has option chain data)
         try:
-            market_state = await self.market_data_manager.get_current_state()
+            market_state = await self.market_data_manager.get_latest_state()
             symbol_data = market_state.get(symbol, {})
             option_chain = symbol_data.get('option_chain', {})
         except Exception as e:
@@ -9,6 +9,7 @@ from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from backend.core.logger import get_execution_logger
 from backend.core.upstox_client import UpstoxClient
+from backend.core.async_upstox_client import get_async_upstox_client
 from backend.execution.order_manager import OrderManager
 from backend.database.database import db
 from backend.database.models import Trade
@@ -22,6 +23,7 @@ class PositionReconciler:
     
     def __init__(self, upstox_client: UpstoxClient, order_manager: OrderManager):
         self.upstox_client = upstox_client
+        self.async_client = get_async_upstox_client(upstox_client.access_token)
         self.order_manager = order_manager
         # Use Redis config from environment
         redis_host = os.getenv('REDIS_HOST', 'localhost')
@@ -82,7 +84,7 @@ class PositionReconciler:
         """Get current positions from broker"""
         try:
             # Get positions from Upstox API
-            positions_response = self.upstox_client.get_positions()
+            positions_response = await self.async_client.get_positions()
             
             if not positions_response or 'data' not in positions_response:
                 return []
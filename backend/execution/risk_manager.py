@@ -22,6 +22,7 @@ from backend.strategies.strategy_mappings import (
 )
 from backend.core.adaptive_config import adaptive_config
 from backend.execution.fee_calculator import get_fee_calculator
+from backend.data.instrument_master import get_instrument_master
 
 logger = get_execution_logger()
 
@@ -1254,10 +1255,15 @@ class RiskManager:
         """
         Get lot size for symbol
         
-        Official lot sizes (as of Nov 2025):
+        Listed lot size from the instrument master; fallback to official
+        lot sizes (as of Nov 2025):
         - NIFTY: 75 (expires every Tuesday)
         - SENSEX: 20 (expires every Thursday)
         """
+        lot_size = get_instrument_master().lot_size(symbol)
+        if lot_size:
+            return lot_size
+        
         lot_sizes = {
             'NIFTY': 75,
             'SENSEX': 20
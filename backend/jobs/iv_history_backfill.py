@@ -0,0 +1,96 @@
+"""
+IV History Backfill Job
+Builds the ATM IV history store from stored option_chain_snapshots
+"""
+
+import asyncio
+from datetime import timedelta, timezone
+from itertools import groupby
+from typing import Dict, List, Optional, Tuple
+
+from backend.core.logger import get_data_logger
+from backend.core.timezone_utils import now_utc
+from backend.data.iv_history import IVHistoryStore, get_iv_history_store
+from backend.database.database import db
+from backend.database.models import OptionSnapshot
+
+logger = get_data_logger()
+
+
+class IVHistoryBackfillJob:
+    """Derives one ATM IV sample per stored option chain snapshot"""
+
+    def __init__(self, store: Optional[IVHistoryStore] = None):
+        self.store = store or get_iv_history_store()
+
+    async def run(self, days: int = 365, symbols: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Backfill the store from the last `days` of snapshots
+
+        The query and aggregation run in a worker thread; the samples are merged
+        into the store here, on the event loop that also records live IV.
+
+        Returns:
+            Samples merged per symbol
+        """
+        samples_by_symbol = await asyncio.to_thread(self.collect, days, symbols)
+
+        merged = {}
+        for symbol, samples in samples_by_symbol.items():
+            merged[symbol] = self.store.backfill(symbol, samples)
+            logger.info(f"✓ IV history backfill for {symbol}: {merged[symbol]} snapshot samples")
+        if merged:
+            self.store.save_soon()
+        return merged
+
+    def collect(self, days: int = 365, symbols: Optional[List[str]] = None) -> Dict[str, List[Tuple[float, float]]]:
+        """
+        (epoch, ATM IV) samples per symbol from the last `days` of snapshots (blocking)
+
+        Does not touch the store, so it is safe to run in a thread.
+        """
+        session = db.get_session()
+        if not session:
+            logger.error("Failed to get database session for IV history backfill")
+            return {}
+
+        samples_by_symbol = {}
+        try:
+            query = session.query(
+                OptionSnapshot.symbol,
+                OptionSnapshot.timestamp,
+                OptionSnapshot.strike_price,
+                OptionSnapshot.iv,
+                OptionSnapshot.spot_price
+            ).filter(
+                OptionSnapshot.timestamp >= now_utc().replace(tzinfo=None) - timedelta(days=days),
+                OptionSnapshot.iv > 0,
+                OptionSnapshot.spot_price > 0
+            )
+            if symbols:
+                query = query.filter(OptionSnapshot.symbol.in_(symbols))
+            rows = query.order_by(OptionSnapshot.symbol, OptionSnapshot.timestamp).yield_per(10000)
+
+            for symbol, symbol_rows in groupby(rows, key=lambda row: row.symbol):
+                samples_by_symbol[symbol] = [
+                    sample for _, snapshot in groupby(symbol_rows, key=lambda row: row.timestamp)
+                    if (sample := self._atm_sample(list(snapshot))) is not None
+                ]
+            return samples_by_symbol
+
+        except Exception as e:
+            logger.error(f"IV history backfill failed: {e}", exc_info=True)
+            return samples_by_symbol
+        finally:
+            session.close()
+
+    @staticmethod
+    def _atm_sample(rows: list) -> Optional[Tuple[float, float]]:
+        """(epoch, ATM IV) for the rows of one snapshot - mean of the ATM call and put IV"""
+        spot = rows[0].spot_price
+        atm_strike = min((row.strike_price for row in rows), key=lambda strike: abs(strike - spot))
+        ivs = [row.iv for row in rows if row.strike_price == atm_strike]
+        timestamp = rows[0].timestamp
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)  # Stored as naive UTC
+        return (timestamp.timestamp(), sum(ivs) / len(ivs)) if ivs else None
@@ -29,6 +29,7 @@ from backend.core.config import config
 from backend.core.logger import logger
 from backend.core.upstox_client import UpstoxClient
 from backend.data.market_data import MarketDataManager
+from backend.data.trading_calendar import get_trading_calendar
 # from backend.strategies.strategy_engine import StrategyEngine  # DISABLED - Using SAC Meta-Controller only
 from backend.execution.order_manager import OrderManager
 from backend.execution.risk_manager import RiskManager
@@ -104,6 +105,8 @@ class TradingSystem:
         self.is_running = False
         self.websocket_clients: List[WebSocket] = []
         self.market_data_interval = 30  # Dynamic interval in seconds
+        # Market snapshot rebuild interval (matches the 10s option chain cache TTL)
+        self.snapshot_interval = config.get('data_fetch.snapshot_seconds', 10)
         # Use OFFICIAL data fetch frequency from config
         self.risk_check_interval = config.get('data_fetch.risk_check_internal_seconds', 10)  # Official: 10 seconds
         self.metrics_exporter = MetricsExporter()  # Prometheus metrics
@@ -403,6 +406,19 @@ class TradingSystem:
             # Initialize WebSocket market feed
             try:
                 await self.market_data.initialize_websocket_feed()
+                # Reprice Greeks from spot ticks between snapshot builds
+                self.market_data.enable_tick_greeks(
+                    interval=config.get('data_fetch.tick_greeks_seconds', 0.5)
+                )
+                # Multi-timeframe candles from ticks (seeded once from REST)
+                if config.get('data_fetch.tick_candles', True):
+                    await self.market_data.enable_candle_aggregation()
+                # Optionally stream ATM±N option quotes instead of polling the REST chain
+                if config.get('data_fetch.stream_option_chain', False):
+                    self.market_data.enable_chain_streaming(
+                        strikes=config.get('data_fetch.chain_stream_strikes', 10),
+                        reconcile_interval=config.get('data_fetch.chain_reconcile_seconds', 60)
+                    )
             except Exception as e:
                 logger.warning(f"WebSocket initialization failed, will use REST API: {e}")
             
@@ -424,6 +440,11 @@ class TradingSystem:
     
     async def start(self):
         """Start the trading system"""
+        # Raw feed frames and REST payloads -> data/recordings for offline replay
+        if config.get('data_fetch.record_market_data', False):
+            from backend.data.market_recorder import get_market_recorder
+            get_market_recorder().start()
+        
         if not await self.initialize():
             return
             
@@ -441,6 +462,11 @@ class TradingSystem:
         if self.market_data and self.risk_manager and self.performance_aggregator:
             # Start background tasks
             logger.info("✓ Starting trading loop...")
+            # Single market snapshot producer - every loop below reads its snapshots
+            asyncio.create_task(self.market_data.run_snapshot_producer(
+                interval=self.snapshot_interval,
+                is_active=lambda: self.is_running
+            ))
             asyncio.create_task(self.trading_loop())
             asyncio.create_task(self.market_data_loop())
             asyncio.create_task(self.risk_monitoring_loop())
@@ -448,6 +474,16 @@ class TradingSystem:
             asyncio.create_task(self.performance_aggregator.schedule_daily_aggregation())
             logger.info("✓ Performance aggregation scheduler started (runs at 6:00 PM IST)")
             
+            # Rebuild the ATM IV history behind IV rank from stored option chain snapshots
+            if config.get('data_fetch.iv_history_backfill', True):
+                from backend.jobs.iv_history_backfill import IVHistoryBackfillJob
+                asyncio.create_task(IVHistoryBackfillJob().run())
+            
+            # Daily Upstox instruments download -> local instrument key / lot size index
+            if config.get('data_fetch.instrument_master', True):
+                from backend.data.instrument_master import get_instrument_master
+                asyncio.create_task(get_instrument_master().schedule_daily_refresh())
+            
             # Start SAC Meta-Controller task
             # TODO: SACAgent needs run method implementation
             # if self.sac_agent:
@@ -519,6 +555,9 @@ class TradingSystem:
         
         # Persist recent signal telemetry for next startup
         self._persist_recent_signals()
+        
+        from backend.data.market_recorder import get_market_recorder
+        await asyncio.to_thread(get_market_recorder().stop)
 
         logger.info("✓ Trading system stopped - positions preserved")
     
@@ -577,17 +616,11 @@ class TradingSystem:
                     logger.debug(f"Could not refresh regime parameters: {e}")
             
             try:
-                # Check market hours using IST time
-                now = datetime.now(IST).time()
-                market_open = datetime.strptime("09:15", "%H:%M").time()
-                market_close = datetime.strptime("15:25", "%H:%M").time()  # Close at 3:25 PM IST
-                is_market_hours = market_open <= now <= market_close
-                
-                # Also check if it's a weekday
-                is_weekday = datetime.now(IST).weekday() < 5
-                
-                if not is_market_hours or not is_weekday:
-                    logger.info(f"⏸️ Market closed - trading paused (IST: {datetime.now(IST).strftime('%H:%M:%S')}, Weekday: {is_weekday})")
+                # Check market hours (9:15 AM - 3:25 PM IST on exchange trading days)
+                calendar = get_trading_calendar()
+                if not calendar.is_trading_window():
+                    reason = calendar.holiday() or f"Trading day: {calendar.is_trading_day()}"
+                    logger.info(f"⏸️ Market closed - trading paused (IST: {datetime.now(IST).strftime('%H:%M:%S')}, {reason})")
                     await asyncio.sleep(60)  # Check every minute when closed
                     continue
                 
@@ -598,10 +631,10 @@ class TradingSystem:
                     await self._monitor_positions_only()
                     continue
                 
-                # Get latest market data
+                # Get latest market snapshot (shared, immutable - no refetch)
                 logger.info("📊 Fetching market state...")
-                market_state = await self.market_data.get_current_state()
-                logger.info(f"📊 Market state fetched: {market_state is not None}")
+                market_state = await self.market_data.get_latest_state(max_age=self.snapshot_interval * 2)
+                logger.info(f"📊 Market state fetched: {bool(market_state)}")
                 
                 if market_state:
                     # Update adaptive configuration with market data for regime detection
@@ -813,7 +846,7 @@ class TradingSystem:
             state.append(now.weekday() / 7.0)
             
             # Time to expiry (normalized)
-            days_to_expiry = self._get_days_to_expiry(now)
+            days_to_expiry = get_trading_calendar().days_to_expiry('NIFTY', now)
             state.append(days_to_expiry / 7.0)  # Weekly options
             
             # Pad or trim to exactly 35 dimensions
@@ -829,19 +862,6 @@ class TradingSystem:
             import numpy as np
             return np.zeros(35, dtype=np.float32)
     
-    def _get_days_to_expiry(self, current_time: datetime) -> int:
-        """Calculate days to next expiry"""
-        try:
-            # NIFTY expires on Tuesday (weekday 1)
-            current_weekday = current_time.weekday()
-            if current_weekday <= 1:  # Monday or Tuesday
-                days = 1 - current_weekday
-            else:
-                days = 8 - current_weekday  # Days to next Tuesday
-            return max(0, days)
-        except:
-            return 3  # Default to mid-week
-    
     def _record_signal(self, signal: Dict[str, Any], status: str, reason: Optional[str] = None, accepted: bool = False):
         """Persist recent signal info for APIs and dashboards"""
         try:
@@ -891,14 +911,8 @@ class TradingSystem:
             nifty_state = self.market_data.market_state.get('NIFTY', {})
             vix = nifty_state.get('vix', 15.0)
         
-        # Check market hours using IST time
-        now = datetime.now(IST).time()
-        market_open = datetime.strptime("09:15", "%H:%M").time()
-        market_close = datetime.strptime("15:25", "%H:%M").time()  # 3:25 PM IST
-        is_market_hours = market_open <= now <= market_close
-        
         # Calculate interval based on conditions
-        if not is_market_hours:
+        if not get_trading_calendar().is_trading_window():
             return 300  # 5 minutes after hours (minimal monitoring)
         elif has_positions:
             # Positions get real-time updates from WebSocket feed
@@ -934,11 +948,14 @@ class TradingSystem:
                 # Calculate optimal interval
                 self.market_data_interval = self._calculate_optimal_interval()
                 
-                # Update option chain data (with filtering)
-                await self.market_data.update_option_chain()
+                # Wait for the producer's next snapshot instead of refetching
+                snapshot = self.market_data.latest()
+                await self.market_data.wait_for_version(
+                    snapshot.version if snapshot else 0,
+                    timeout=self.market_data_interval
+                )
                 
-                # Update Greeks (only for filtered strikes)
-                await self.market_data.calculate_greeks()
+                # Greeks are repriced for every strike when each snapshot is built
                 
                 # Update Prometheus metrics
                 await self._update_market_metrics()
@@ -963,8 +980,8 @@ class TradingSystem:
                 # Update heartbeat to show loop is alive (critical for health checks)
                 self.last_heartbeat = now_utc()
                 
-                # Get current market state
-                market_state = await self.market_data.get_current_state()
+                # Get current market state (latest published snapshot)
+                market_state = await self.market_data.get_latest_state(max_age=self.snapshot_interval * 2)
                 
                 # Check for reversal signals
                 reversal_signals = self.reversal_detector.update(market_state)
@@ -1020,13 +1037,8 @@ class TradingSystem:
                     
                     logger.info(f"Grouped {len(positions)} positions into {len(expiry_groups)} expiry groups: {list(expiry_groups.keys())}")
                     
-                    # Fetch current market state (has full option chain like SAC uses)
-                    try:
-                        market_state = await self.market_data.get_current_state()
-                        logger.info(f"✓ Fetched market state for position updates")
-                    except Exception as e:
-                        logger.error(f"Error fetching market state: {e}")
-                        market_state = {}
+                    # Reuse the snapshot read above (has full option chain like SAC uses)
+                    market_state = market_state or {}
                     
                     # Update positions using market_state (same as SAC strategies use)
                     updated_count = 0
@@ -1117,7 +1129,7 @@ class TradingSystem:
                     if instrument_keys:
                         try:
                             logger.info(f"Fetching LTP for {len(instrument_keys)} positions: {instrument_keys[:3]}...")
-                            ltp_response = self.upstox_client.get_ltp(instrument_keys)
+                            ltp_response = await self.market_data.async_client.get_ltp(instrument_keys)
                             
                             if not ltp_response:
                                 logger.warning("LTP API returned None - likely rate limit or API error")
@@ -1341,11 +1353,12 @@ class TradingSystem:
     async def _get_option_ltp(self, symbol: str, strike: float, option_type: str) -> Optional[float]:
         """Get current LTP for an option"""
         try:
-            if symbol not in self.market_data.market_state:
+            snapshot = self.market_data.latest()
+            if not snapshot or symbol not in snapshot.state:
                 logger.debug(f"Symbol {symbol} not in market state")
                 return None
             
-            option_chain = self.market_data.market_state[symbol].get('option_chain', {})
+            option_chain = snapshot.option_chain(symbol)
             if not option_chain:
                 logger.debug(f"No option chain for {symbol}")
                 return None
@@ -1538,8 +1551,9 @@ class TradingSystem:
     async def broadcast_market_data(self):
         """Broadcast market data to WebSocket clients"""
         try:
-            # Get the internal market state (not the full state with nested data)
-            market_state = self.market_data.market_state
+            # Broadcast the same snapshot every other loop reads
+            snapshot = self.market_data.latest()
+            market_state = snapshot.state if snapshot else {}
             
             # Get VIX value (market-wide metric)
             vix_value = None
@@ -204,24 +204,10 @@ class SystemHealthMonitor:
         start_time = time.time()
         
         try:
-            from backend.data.market_data import MarketDataManager
-            from backend.core.upstox_client import UpstoxClient
+            from backend.cache.tiered_cache import get_tiered_cache
             
-            # Create dummy client to test data freshness
-            dummy_client = UpstoxClient("test_token")
-            market_data = MarketDataManager(dummy_client)
-            
-            # Check cache timestamps
-            now = datetime.now()
-            data_age = None
-            
-            # Check spot price cache
-            if market_data.spot_price_cache:
-                latest_timestamp = max(
-                    cache['timestamp'] for cache in market_data.spot_price_cache.values()
-                    if isinstance(cache, dict) and 'timestamp' in cache
-                )
-                data_age = (now - latest_timestamp).total_seconds()
+            # Age of the newest spot price in the shared in-process cache
+            data_age = get_tiered_cache().newest_age('spot')
             
             response_time = time.time() - start_time
             
@@ -238,8 +224,6 @@ class SystemHealthMonitor:
                 status = HealthStatus.CRITICAL
                 message = f"Market data very stale ({data_age:.0f}s old)"
             
-            dummy_client.close()
-            
         except Exception as e:
             response_time = time.time() - start_time
             status = HealthStatus.WARNING
@@ -158,6 +158,18 @@ market_data_age_seconds = Histogram(
     buckets=[0.1, 0.5, 1, 2, 5, 10, 30, 60]
 )
 
+market_data_fetches = Counter(
+    'trading_market_data_fetches_total',
+    'Broker fetches issued vs coalesced onto an in-flight request',
+    ['family', 'outcome']
+)
+
+cache_lookups = Counter(
+    'trading_cache_lookups_total',
+    'Two-tier cache lookups by key family and outcome',
+    ['family', 'outcome']
+)
+
 # VIX and Market Condition
 market_vix = Gauge(
     'trading_market_vix',
@@ -283,6 +295,20 @@ api_request_duration = Histogram(
     buckets=[0.01, 0.05, 0.1, 0.5, 1, 2, 5]
 )
 
+# Broker rate limiting
+broker_queue_wait = Histogram(
+    'trading_broker_queue_wait_seconds',
+    'Time Upstox calls waited for a rate limit token',
+    ['priority'],
+    buckets=[0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10]
+)
+
+broker_rate_limited = Counter(
+    'trading_broker_rate_limited_total',
+    'Upstox 429 responses by endpoint family',
+    ['endpoint']
+)
+
 # ML Model Metrics
 ml_predictions_total = Counter(
     'trading_ml_predictions_total',
@@ -395,6 +421,16 @@ class MetricsExporter:
         market_data_updates.labels(symbol=symbol).inc()
         market_data_age_seconds.labels(symbol=symbol).observe(age_seconds)
     
+    @staticmethod
+    def record_single_flight(family: str, outcome: str):
+        """Record an issued or coalesced market data fetch"""
+        market_data_fetches.labels(family=family, outcome=outcome).inc()
+    
+    @staticmethod
+    def record_cache_lookup(family: str, outcome: str):
+        """Record a cache lookup (l1_hits, l2_hits, stale_hits or misses)"""
+        cache_lookups.labels(family=family, outcome=outcome).inc()
+    
     @staticmethod
     def record_circuit_breaker_trigger(reason: str):
         """Record circuit breaker trigger"""
@@ -416,6 +452,16 @@ class MetricsExporter:
         api_requests.labels(endpoint=endpoint, method=method, status=str(status)).inc()
         api_request_duration.labels(endpoint=endpoint, method=method).observe(duration)
     
+    @staticmethod
+    def record_broker_queue_wait(priority: str, seconds: float):
+        """Record how long an Upstox call waited for a rate limit token"""
+        broker_queue_wait.labels(priority=priority).observe(seconds)
+    
+    @staticmethod
+    def record_broker_rate_limited(endpoint: str):
+        """Record an Upstox 429 response"""
+        broker_rate_limited.labels(endpoint=endpoint).inc()
+    
     @staticmethod
     def record_ml_prediction(model: str, prediction: str):
         """Record ML prediction"""
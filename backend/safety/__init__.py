@@ -3,7 +3,7 @@
 from .circuit_breaker import CircuitBreaker, CircuitBreakerStatus, CircuitBreakerTrigger
 from .order_validator import OrderValidator, ValidationResult
 from .slippage_model import SlippageModel
-from .rate_limiter import RateLimiter
+from .rate_limiter import RateLimiter, Priority, get_rate_limiter
 from .data_monitor import MarketDataMonitor, DataQuality
 from .position_manager import PositionManager
 from .market_monitor import MarketMonitor, MarketCondition
@@ -18,6 +18,8 @@ __all__ = [
     'ValidationResult',
     'SlippageModel',
     'RateLimiter',
+    'Priority',
+    'get_rate_limiter',
     'MarketDataMonitor',
     'DataQuality',
     'PositionManager',
@@ -1,277 +1,473 @@
 """
 Rate Limiter
-Handles API rate limiting and throttling with exponential backoff
+Priority-aware async token buckets shared by every Upstox API call
+
+Every broker call draws one token from the account-wide bucket and one from
+its endpoint family's bucket (orders, quotes, option chain, historical, other).
+Callers that cannot be served at once wait in a priority queue, so exits and
+order placement are granted the next token ahead of queued analytics and
+dashboard requests. A 429 halves the affected budgets and pauses them for the
+Retry-After (or an exponential backoff); the rates climb back after sustained
+success. Queue wait times are kept and exported per priority class.
+
+With shared buckets (RedisTokenBuckets) a token is also taken from the Redis
+copy of the account and family budgets, so the engine, API workers and scripts
+together stay within the account limit. While Redis is unreachable - also
+when it was down from startup - the local budgets drop to fallback_share of
+their rate, so workers that cannot coordinate stay under the account limit
+together. Single-process setups opt out with RATE_LIMIT_DISTRIBUTED=false.
 """
 
 import asyncio
+import heapq
+import itertools
+import os
+import threading
 import time
-from typing import Dict, Optional, Callable, Any
-from collections import deque
-from datetime import datetime, timedelta
+from collections import defaultdict, deque
+from enum import IntEnum
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 
 from backend.core.logger import get_logger
+from backend.monitoring.prometheus_exporter import MetricsExporter
+from backend.safety.redis_token_bucket import RedisTokenBuckets
 
 logger = get_logger(__name__)
 
 
-class RateLimiter:
-    """
-    Token bucket rate limiter with exponential backoff
-    
-    Features:
-    - Token bucket algorithm
-    - Per-second rate limiting
-    - Exponential backoff on 429 errors
-    - Order queue management
-    - Request prioritization
-    """
-    
-    def __init__(self, config: Dict):
-        self.config = config
-        
-        # Rate limit parameters
-        self.max_requests_per_second = config.get('max_requests_per_second', 10)
-        self.max_orders_per_second = config.get('max_orders_per_second', 5)
-        
-        # Token buckets
-        self.request_tokens = self.max_requests_per_second
-        self.order_tokens = self.max_orders_per_second
-        self.last_refill = time.time()
-        
-        # Request history (for monitoring)
-        self.request_history = deque(maxlen=1000)
-        self.order_history = deque(maxlen=100)
-        
-        # Backoff state
-        self.backoff_until = None
+class Priority(IntEnum):
+    """Request priority classes - lower values are served first"""
+    EXIT = 0        # Position exits, stop losses
+    ORDER = 1       # Entries, modifications, cancellations, order status
+    TRADING = 2     # Market data the trading loop acts on
+    ANALYTICS = 3   # Indicators, IV history, backfills
+    DASHBOARD = 4   # API / UI traffic
+
+
+# (requests per second, burst) - every call also draws from 'account'
+ENDPOINT_BUDGETS = {
+    'account': (3.0, 3),
+    'orders': (3.0, 3),
+    'quotes': (3.0, 3),
+    'option_chain': (2.0, 2),
+    'historical': (2.0, 2),
+    'other': (2.0, 2),
+}
+
+DEFAULT_PRIORITIES = {
+    'orders': Priority.ORDER,
+    'quotes': Priority.TRADING,
+    'option_chain': Priority.TRADING,
+    'historical': Priority.ANALYTICS,
+    'other': Priority.TRADING,
+}
+
+
+def endpoint_family(endpoint: str) -> str:
+    """Budget family of an Upstox API path"""
+    if endpoint.startswith('/v2/order/'):
+        return 'orders'
+    if endpoint.startswith('/v2/market-quote/'):
+        return 'quotes'
+    if endpoint.startswith('/v2/option/chain'):
+        return 'option_chain'
+    if '/historical-candle/' in endpoint:
+        return 'historical'
+    return 'other'
+
+
+class TokenBucket:
+    """Token bucket whose rate can be cut and paused after a 429"""
+
+    __slots__ = (
+        'name', 'base_rate', 'rate', 'share', 'capacity', 'tokens',
+        'updated', 'paused_until', 'consecutive_429s', 'last_adjust'
+    )
+
+    def __init__(self, name: str, rate: float, capacity: int):
+        self.name = name
+        self.base_rate = rate
+        self.rate = rate
+        self.share = 1.0  # Fraction of the rate usable by this process (Redis fallback)
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
         self.consecutive_429s = 0
-        self.backoff_multiplier = config.get('backoff_multiplier', 2)
-        self.max_backoff_seconds = config.get('max_backoff_seconds', 60)
-        
-        # Queue for pending requests
-        self.request_queue = []
-        self.is_processing_queue = False
-        
-    async def acquire_token(self, token_type: str = 'request') -> bool:
+        self.last_adjust = 0.0
+
+    def refill(self, now: float):
+        start = max(self.updated, self.paused_until)  # No refill while paused
+        if now > start:
+            self.tokens = min(self.capacity, self.tokens + (now - start) * self.rate * self.share)
+        self.updated = max(self.updated, now)
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available (call after refill)"""
+        deficit = 1.0 - self.tokens
+        return max(0.0, self.paused_until - now) + (deficit / (self.rate * self.share) if deficit > 0 else 0.0)
+
+
+class RateLimiter:
+    """Shared broker rate limiter: endpoint budgets, priority queue, 429 adaptation"""
+
+    def __init__(
+        self,
+        budgets: Optional[Dict[str, Tuple[float, int]]] = None,
+        backoff_base: float = 1.0,
+        max_backoff_seconds: float = 60.0,
+        min_rate_fraction: float = 0.1,
+        recovery_interval: float = 5.0,
+        shared: Optional[RedisTokenBuckets] = None,
+        fallback_share: float = 1 / 3
+    ):
         """
-        Acquire a token for API call
-        
         Args:
-            token_type: 'request' or 'order'
-            
+            budgets: Overrides of ENDPOINT_BUDGETS, family -> (rate, burst)
+            backoff_base: First pause after a 429 without Retry-After (doubles per repeat)
+            max_backoff_seconds: Longest pause
+            min_rate_fraction: Lowest rate a 429 can cut a budget to, as a fraction of base
+            recovery_interval: Seconds between 25% rate recovery steps after a 429
+            shared: Redis buckets shared with other processes on the account
+            fallback_share: Fraction of the local budgets used while shared is set
+                but Redis is unreachable (whether or not it was ever reached)
+        """
+        self.buckets = {
+            name: TokenBucket(name, rate, burst)
+            for name, (rate, burst) in {**ENDPOINT_BUDGETS, **(budgets or {})}.items()
+        }
+        self.backoff_base = backoff_base
+        self.max_backoff_seconds = max_backoff_seconds
+        self.min_rate_fraction = min_rate_fraction
+        self.recovery_interval = recovery_interval
+        self.shared = shared
+        self.fallback_share = fallback_share
+        self.fallback_active = False
+
+        # Buckets are also reserved from worker threads by the sync client
+        self._lock = threading.Lock()
+        # Heap of (priority, seq, family, future, queued_at)
+        self._waiters: List[tuple] = []
+        self._seq = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        self._waits = {priority: deque(maxlen=1000) for priority in Priority}
+        self._granted = defaultdict(int)
+        self.rate_limited = defaultdict(int)
+
+    # ========== Acquiring ==========
+
+    async def acquire(self, family: str, priority: Optional[Priority] = None) -> float:
+        """
+        Wait for a token of an endpoint family
+
         Returns:
-            True if token acquired (may wait)
+            Seconds spent queued
         """
-        
-        # Check if in backoff period
-        if self.backoff_until:
-            wait_time = (self.backoff_until - datetime.now()).total_seconds()
-            if wait_time > 0:
-                logger.warning(
-                    f"⏳ Rate limit backoff active. Waiting {wait_time:.1f}s..."
-                )
-                await asyncio.sleep(wait_time)
-                self.backoff_until = None
-                
-        # Refill tokens
-        self._refill_tokens()
-        
-        # Get appropriate bucket
-        if token_type == 'order':
-            tokens = self.order_tokens
-            max_tokens = self.max_orders_per_second
-        else:
-            tokens = self.request_tokens
-            max_tokens = self.max_requests_per_second
-            
-        # Wait if no tokens available
-        while tokens <= 0:
-            wait_time = 1.0 / max_tokens  # Wait for next token
-            logger.debug(f"No {token_type} tokens available. Waiting {wait_time:.2f}s...")
-            await asyncio.sleep(wait_time)
-            self._refill_tokens()
-            tokens = self.order_tokens if token_type == 'order' else self.request_tokens
-            
-        # Consume token
-        if token_type == 'order':
-            self.order_tokens -= 1
-            self.order_history.append(datetime.now())
+        priority = self._priority(family, priority)
+        if not self._waiters and self._local_wait(family)[0] <= 0:
+            if (await self._take_shared(family))[0] <= 0:
+                self._take_local(family)
+                self._record_wait(priority, 0.0)
+                return 0.0
+
+        loop = asyncio.get_running_loop()
+        self._bind(loop)
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), family, future, time.monotonic()))
+        self._wakeup.set()
+
+        waited = await future
+        self._record_wait(priority, waited)
+        return waited
+
+    def acquire_blocking(self, family: str, priority: Optional[Priority] = None) -> float:
+        """
+        Blocking acquire for the synchronous client
+
+        From a worker thread the request joins the event loop's priority queue;
+        on the loop thread itself (or with no loop) a token is reserved and the
+        caller sleeps until it is due.
+        """
+        loop = self._loop
+        if loop is not None and loop.is_running() and threading.get_ident() != self._loop_thread:
+            return asyncio.run_coroutine_threadsafe(self.acquire(family, priority), loop).result()
+
+        priority = self._priority(family, priority)
+        waited = 0.0
+        while self.shared is not None:
+            shared_wait = self._shared_result(self.shared.take_blocking(self._shared_budgets(family)))[0]
+            if shared_wait <= 0:
+                break
+            time.sleep(shared_wait)
+            waited += shared_wait
+
+        with self._lock:
+            now = time.monotonic()
+            account, bucket = self._buckets_for(family)
+            account.refill(now)
+            bucket.refill(now)
+            delay = max(account.wait_time(now), bucket.wait_time(now))
+            account.tokens -= 1
+            bucket.tokens -= 1
+        if delay > 0:
+            time.sleep(delay)
+        self._record_wait(priority, waited + delay)
+        return waited + delay
+
+    def _priority(self, family: str, priority: Optional[Priority]) -> Priority:
+        return DEFAULT_PRIORITIES.get(family, Priority.TRADING) if priority is None else Priority(priority)
+
+    def _buckets_for(self, family: str) -> Tuple[TokenBucket, TokenBucket]:
+        return self.buckets['account'], self.buckets.get(family, self.buckets['other'])
+
+    def _local_wait(self, family: str) -> Tuple[float, bool]:
+        """(seconds until the local budgets allow a call, whether the account budget blocks)"""
+        with self._lock:
+            now = time.monotonic()
+            account, bucket = self._buckets_for(family)
+            account.refill(now)
+            bucket.refill(now)
+            account_wait = account.wait_time(now)
+            return max(account_wait, bucket.wait_time(now)), account_wait > 0
+
+    def _take_local(self, family: str):
+        with self._lock:
+            account, bucket = self._buckets_for(family)
+            account.tokens -= 1
+            bucket.tokens -= 1
+
+    # ========== Shared Budgets ==========
+
+    def _shared_budgets(self, family: str) -> list:
+        account, bucket = self._buckets_for(family)
+        return [(account.name, account.base_rate, account.capacity), (bucket.name, bucket.base_rate, bucket.capacity)]
+
+    async def _take_shared(self, family: str) -> Tuple[float, bool]:
+        """(seconds until the shared budgets allow a call, whether the account budget blocks)"""
+        if self.shared is None:
+            return 0.0, False
+        return self._shared_result(await self.shared.take(self._shared_budgets(family)))
+
+    def _shared_result(self, result: Optional[Tuple[float, int]]) -> Tuple[float, bool]:
+        if result is None:
+            self._set_fallback(True)
+            return 0.0, False
+        self._set_fallback(False)
+        wait, blocker = result
+        return wait, blocker == 1
+
+    def _set_fallback(self, active: bool):
+        """Scale local budgets down to fallback_share while Redis is unreachable"""
+        if active == self.fallback_active:
+            return
+        with self._lock:
+            now = time.monotonic()
+            for bucket in self.buckets.values():
+                bucket.refill(now)  # Accrue at the old share first
+                bucket.share = self.fallback_share if active else 1.0
+            self.fallback_active = active
+        if active:
+            logger.warning(f"⚠️ Shared Upstox rate limit unavailable - using {self.fallback_share:.0%} of local budgets")
         else:
-            self.request_tokens -= 1
-            self.request_history.append(datetime.now())
-            
-        return True
-        
-    def _refill_tokens(self):
-        """Refill tokens based on elapsed time"""
-        now = time.time()
-        elapsed = now - self.last_refill
-        
-        if elapsed >= 1.0:
-            # Refill full bucket every second
-            self.request_tokens = self.max_requests_per_second
-            self.order_tokens = self.max_orders_per_second
-            self.last_refill = now
-            
-    async def execute_with_retry(
-        self,
-        func: Callable,
-        *args,
-        max_retries: int = 3,
-        token_type: str = 'request',
-        **kwargs
-    ) -> Optional[Any]:
+            logger.info("✓ Shared Upstox rate limit connected")
+
+    # ========== Dispatching ==========
+
+    def _bind(self, loop: asyncio.AbstractEventLoop):
+        """Start the dispatcher on the running loop (again if the loop changed)"""
+        if self._loop is loop and self._dispatcher is not None and not self._dispatcher.done():
+            return
+        if self._loop is not loop:
+            self._waiters = []  # Futures of a previous loop can never be resolved
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+        self._wakeup = asyncio.Event()
+        self._dispatcher = loop.create_task(self._dispatch())
+
+    async def _dispatch(self):
+        while True:
+            self._wakeup.clear()
+            delay = await self._grant_ready()
+            if delay is None:
+                await self._wakeup.wait()
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _grant_ready(self) -> Optional[float]:
         """
-        Execute function with rate limiting and retry logic
-        
-        Args:
-            func: Async function to execute
-            args: Function arguments
-            max_retries: Maximum retry attempts
-            token_type: Token type to acquire
-            kwargs: Function keyword arguments
-            
+        Grant tokens to waiters in priority order
+
+        A waiter blocked only by its own family's budget does not hold up
+        lower-priority waiters of other families; once the account budget is
+        exhausted nobody behind the head of the queue is served.
+
         Returns:
-            Function result or None on failure
+            Seconds until the next grant may be possible, None when idle
         """
-        
-        for attempt in range(max_retries):
-            try:
-                # Acquire token
-                await self.acquire_token(token_type)
-                
-                # Execute function
-                result = await func(*args, **kwargs)
-                
-                # Success - reset backoff
-                self.consecutive_429s = 0
-                
-                return result
-                
-            except Exception as e:
-                error_str = str(e).lower()
-                
-                # Check for rate limit error
-                if '429' in error_str or 'rate limit' in error_str or 'too many' in error_str:
-                    self.consecutive_429s += 1
-                    backoff_seconds = self._calculate_backoff()
-                    
-                    logger.warning(
-                        f"⚠️ Rate limit hit (attempt {attempt + 1}/{max_retries}). "
-                        f"Backing off {backoff_seconds:.1f}s..."
-                    )
-                    
-                    self.backoff_until = datetime.now() + timedelta(seconds=backoff_seconds)
-                    await asyncio.sleep(backoff_seconds)
-                    
+        pending = []
+        delay = None
+        while self._waiters:
+            entry = heapq.heappop(self._waiters)
+            _, _, family, future, queued_at = entry
+            if future.done():
+                continue  # Cancelled while queued
+
+            wait, account_blocked = self._local_wait(family)
+            if wait <= 0:
+                wait, account_blocked = await self._take_shared(family)
+                if wait <= 0:
+                    self._take_local(family)
+                    if not future.done():
+                        future.set_result(time.monotonic() - queued_at)
                     continue
-                    
-                # Other error - don't retry
-                logger.error(f"Error executing function: {e}")
-                return None
-                
-        logger.error(f"Max retries ({max_retries}) exceeded")
-        return None
-        
-    def _calculate_backoff(self) -> float:
-        """Calculate exponential backoff delay"""
-        # Exponential: 1s, 2s, 4s, 8s, 16s, ... up to max
-        delay = min(
-            2 ** (self.consecutive_429s - 1),
-            self.max_backoff_seconds
-        )
-        
-        # Add jitter (±20%)
-        import random
-        jitter = delay * random.uniform(-0.2, 0.2)
-        
-        return delay + jitter
-        
-    def report_429_error(self):
-        """Manually report a 429 error (for non-exception cases)"""
-        self.consecutive_429s += 1
-        backoff_seconds = self._calculate_backoff()
-        self.backoff_until = datetime.now() + timedelta(seconds=backoff_seconds)
-        
+
+            pending.append(entry)
+            delay = wait if delay is None else min(delay, wait)
+            if account_blocked:
+                break
+
+        for entry in pending:
+            heapq.heappush(self._waiters, entry)
+        return delay
+
+    def _wake(self):
+        if self._wakeup is None or self._loop is None or self._loop.is_closed():
+            return
+        if threading.get_ident() == self._loop_thread:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    # ========== 429 Adaptation ==========
+
+    def on_rate_limited(self, family: str, retry_after: Optional[float] = None) -> float:
+        """
+        Report a 429: halve the family and account rates and pause both
+
+        Returns:
+            Pause in seconds
+        """
+        with self._lock:
+            now = time.monotonic()
+            account, bucket = self._buckets_for(family)
+            bucket.consecutive_429s += 1
+            if retry_after and retry_after > 0:
+                pause = min(retry_after, self.max_backoff_seconds)
+            else:
+                # Exponential: 1s, 2s, 4s, 8s, ... up to max
+                pause = min(self.backoff_base * 2 ** (bucket.consecutive_429s - 1), self.max_backoff_seconds)
+            for limited in (bucket, account):
+                limited.refill(now)
+                limited.rate = max(limited.base_rate * self.min_rate_fraction, limited.rate / 2)
+                limited.tokens = min(limited.tokens, 0.0)
+                limited.paused_until = max(limited.paused_until, now + pause)
+                limited.last_adjust = now
+
+        self.rate_limited[family] += 1
+        MetricsExporter.record_broker_rate_limited(family)
+        self._penalize_shared([account.name, bucket.name], pause)
         logger.warning(
-            f"⚠️ Manual 429 reported. Backoff {backoff_seconds:.1f}s"
+            f"⚠️ Upstox 429 on {family}: budget cut to {bucket.rate:.2f}/s "
+            f"(account {account.rate:.2f}/s), pausing {pause:.1f}s"
         )
-        
+        self._wake()
+        return pause
+
+    def _penalize_shared(self, names: List[str], pause: float):
+        """Pause the shared budgets for every process"""
+        if self.shared is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            loop.create_task(self.shared.penalize(names, pause))
+        else:
+            self.shared.penalize_blocking(names, pause)
+
+    def on_success(self, family: str):
+        """Let budgets cut by a 429 climb back, 25% of base per recovery interval"""
+        account, bucket = self._buckets_for(family)
+        if bucket.consecutive_429s == 0 and bucket.rate >= bucket.base_rate and account.rate >= account.base_rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            bucket.consecutive_429s = 0
+            for limited in (bucket, account):
+                if limited.rate < limited.base_rate and now - limited.last_adjust >= self.recovery_interval:
+                    limited.refill(now)  # Accrue at the old rate first
+                    limited.rate = min(limited.base_rate, limited.rate + limited.base_rate * 0.25)
+                    limited.last_adjust = now
+                    if limited.rate >= limited.base_rate:
+                        logger.info(f"✓ Upstox {limited.name} budget recovered to {limited.rate:.2f}/s")
+
+    # ========== Metrics ==========
+
+    def _record_wait(self, priority: Priority, seconds: float):
+        self._waits[priority].append(seconds)
+        self._granted[priority] += 1
+        MetricsExporter.record_broker_queue_wait(priority.name.lower(), seconds)
+
     def get_stats(self) -> Dict:
-        """Get rate limiter statistics"""
-        now = datetime.now()
-        
-        # Count recent requests
-        recent_requests = sum(
-            1 for ts in self.request_history
-            if (now - ts).total_seconds() < 60
-        )
-        
-        recent_orders = sum(
-            1 for ts in self.order_history
-            if (now - ts).total_seconds() < 60
-        )
-        
+        """Budgets, queue depth and wait times per priority class"""
+        now = time.monotonic()
+        queued = defaultdict(int)
+        for priority, _, _, future, _ in self._waiters:
+            if not future.done():
+                queued[Priority(priority).name.lower()] += 1
+
+        waits = {}
+        for priority, samples in self._waits.items():
+            if not self._granted[priority]:
+                continue
+            values = np.fromiter(samples, dtype=float)
+            waits[priority.name.lower()] = {
+                'granted': self._granted[priority],
+                'avg_wait_ms': round(float(values.mean()) * 1000, 2),
+                'p95_wait_ms': round(float(np.percentile(values, 95)) * 1000, 2),
+                'max_wait_ms': round(float(values.max()) * 1000, 2)
+            }
+
         return {
-            'request_tokens_available': self.request_tokens,
-            'order_tokens_available': self.order_tokens,
-            'max_requests_per_second': self.max_requests_per_second,
-            'max_orders_per_second': self.max_orders_per_second,
-            'requests_last_minute': recent_requests,
-            'orders_last_minute': recent_orders,
-            'consecutive_429s': self.consecutive_429s,
-            'backoff_active': self.backoff_until is not None,
-            'backoff_until': self.backoff_until.isoformat() if self.backoff_until else None
-        }
-        
-    async def queue_order(self, order_func: Callable, *args, **kwargs):
-        """
-        Queue an order for execution with rate limiting
-        
-        Args:
-            order_func: Async order function
-            args: Function arguments
-            kwargs: Function keyword arguments
-        """
-        
-        order = {
-            'func': order_func,
-            'args': args,
-            'kwargs': kwargs,
-            'queued_at': datetime.now(),
-            'priority': kwargs.pop('priority', 0)  # Higher priority = executed first
+            'budgets': {
+                name: {
+                    'rate': round(bucket.rate, 3),
+                    'base_rate': bucket.base_rate,
+                    'tokens': round(bucket.tokens, 2),
+                    'paused_for': round(max(0.0, bucket.paused_until - now), 2)
+                }
+                for name, bucket in self.buckets.items()
+            },
+            'queued': dict(queued),
+            'wait_times': waits,
+            'rate_limited': dict(self.rate_limited),
+            'shared': {
+                'enabled': self.shared is not None,
+                'available': self.shared is not None and self.shared.available,
+                'fallback_active': self.fallback_active
+            }
         }
-        
-        self.request_queue.append(order)
-        
-        # Sort by priority
-        self.request_queue.sort(key=lambda x: x['priority'], reverse=True)
-        
-        logger.info(f"Order queued (queue size: {len(self.request_queue)})")
-        
-        # Start processing if not already running
-        if not self.is_processing_queue:
-            asyncio.create_task(self._process_queue())
-            
-    async def _process_queue(self):
-        """Process queued orders with rate limiting"""
-        self.is_processing_queue = True
-        
-        while self.request_queue:
-            order = self.request_queue.pop(0)
-            
-            wait_time = (datetime.now() - order['queued_at']).total_seconds()
-            logger.info(f"Processing queued order (waited {wait_time:.1f}s)")
-            
-            try:
-                await self.execute_with_retry(
-                    order['func'],
-                    *order['args'],
-                    token_type='order',
-                    **order['kwargs']
-                )
-            except Exception as e:
-                logger.error(f"Error processing queued order: {e}")
-                
-        self.is_processing_queue = False
-        logger.info("Queue processing complete")
+
+
+# Global instance
+_rate_limiter = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get the rate limiter shared by every Upstox client"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        # Budgets are shared through Redis unless RATE_LIMIT_DISTRIBUTED=false
+        distributed = os.getenv('RATE_LIMIT_DISTRIBUTED', 'true').lower() not in ('0', 'false', 'no')
+        _rate_limiter = RateLimiter(shared=RedisTokenBuckets() if distributed else None)
+    return _rate_limiter
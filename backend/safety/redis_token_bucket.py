@@ -0,0 +1,246 @@
+"""
+Redis Token Buckets
+Broker rate limit budgets shared by every process using the Upstox account
+
+The trading engine, each uvicorn worker of the dashboard API and helper
+scripts all call Upstox with the same account. Their local limiters each
+allow the full budget, so together they overrun it. These buckets live in
+Redis and are refilled and debited by Lua scripts, atomically across
+processes, using the Redis server clock. A 429 seen by any process pauses and
+halves the shared budget; it recovers in 25% steps.
+
+When Redis cannot be reached the methods return None and the caller falls
+back to a conservative local limit.
+"""
+
+import asyncio
+import os
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import redis
+import redis.asyncio as aioredis
+
+from backend.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# KEYS: bucket hashes
+# ARGV: rate_1 (tokens/s), capacity_1, ..., rate_n, capacity_n, key_ttl_ms, recovery_ms
+# Returns {wait_ms, index of the bucket that blocks (0 when granted)}
+TAKE_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local n = #KEYS
+local ttl = tonumber(ARGV[2 * n + 1])
+local recovery = tonumber(ARGV[2 * n + 2])
+local tokens = {}
+local wait, blocker = 0, 0
+for i = 1, n do
+    local base_rate = tonumber(ARGV[2 * i - 1]) / 1000
+    local capacity = tonumber(ARGV[2 * i])
+    local s = redis.call('HMGET', KEYS[i], 'tokens', 'updated', 'paused_until', 'factor', 'adjusted')
+    local tk = tonumber(s[1]) or capacity
+    local updated = tonumber(s[2]) or now
+    local paused = tonumber(s[3]) or 0
+    local factor = tonumber(s[4]) or 1
+    local adjusted = tonumber(s[5]) or 0
+    local rate = base_rate * factor
+    local start = math.max(updated, paused)
+    if now > start then tk = math.min(capacity, tk + (now - start) * rate) end
+    if factor < 1 and now - adjusted >= recovery then
+        redis.call('HSET', KEYS[i], 'factor', math.min(1, factor + 0.25), 'adjusted', now)
+    end
+    tokens[i] = tk
+    local w = math.max(0, paused - now)
+    if tk < 1 then w = w + (1 - tk) / rate end
+    if w > wait then
+        wait = w
+        blocker = i
+    end
+end
+for i = 1, n do
+    if wait <= 0 then tokens[i] = tokens[i] - 1 end
+    redis.call('HSET', KEYS[i], 'tokens', tokens[i], 'updated', now)
+    redis.call('PEXPIRE', KEYS[i], ttl)
+end
+return {math.ceil(wait), blocker}
+"""
+
+# KEYS: bucket hashes
+# ARGV: pause_ms, min_factor, key_ttl_ms
+PENALIZE_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local pause_until = now + tonumber(ARGV[1])
+for i = 1, #KEYS do
+    local s = redis.call('HMGET', KEYS[i], 'tokens', 'paused_until', 'factor')
+    local tk = tonumber(s[1]) or 0
+    local paused = tonumber(s[2]) or 0
+    local factor = tonumber(s[3]) or 1
+    redis.call('HSET', KEYS[i],
+        'tokens', math.min(tk, 0),
+        'updated', now,
+        'paused_until', math.max(paused, pause_until),
+        'factor', math.max(tonumber(ARGV[2]), factor / 2),
+        'adjusted', now)
+    redis.call('PEXPIRE', KEYS[i], tonumber(ARGV[3]))
+end
+return #KEYS
+"""
+
+# (bucket name, rate per second, capacity)
+Budget = Tuple[str, float, int]
+
+
+class RedisTokenBuckets:
+    """Atomic token buckets in Redis with sync and async access"""
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        prefix: str = "ratelimit:upstox",
+        retry_seconds: float = 30.0,
+        key_ttl: float = 60.0,
+        recovery_interval: float = 5.0,
+        min_rate_fraction: float = 0.1
+    ):
+        """
+        Args:
+            redis_url: Redis URL (REDIS_HOST/REDIS_PORT by default)
+            prefix: Key prefix of the bucket hashes
+            retry_seconds: How long Redis is skipped after an error
+            key_ttl: Idle buckets expire (and reset to full) after this long
+            recovery_interval: Seconds between 25% recovery steps after a 429
+            min_rate_fraction: Lowest fraction of the base rate a 429 can cut to
+        """
+        if redis_url is None:
+            redis_url = f"redis://{os.getenv('REDIS_HOST', 'localhost')}:{os.getenv('REDIS_PORT', '6379')}/0"
+        self.redis_url = redis_url
+        self.prefix = prefix
+        self.retry_seconds = retry_seconds
+        self.key_ttl_ms = int(key_ttl * 1000)
+        self.recovery_ms = int(recovery_interval * 1000)
+        self.min_rate_fraction = min_rate_fraction
+
+        self._sync: Optional[redis.Redis] = None
+        self._async: Optional[aioredis.Redis] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._scripts = {}
+        self._down_until = 0.0
+        self.errors = 0
+
+    # ========== Clients ==========
+
+    def _sync_client(self) -> Optional[redis.Redis]:
+        if time.time() < self._down_until:
+            return None
+        if self._sync is None:
+            self._sync = redis.Redis.from_url(self.redis_url, socket_connect_timeout=1, socket_timeout=1)
+            self._scripts['sync'] = (
+                self._sync.register_script(TAKE_SCRIPT),
+                self._sync.register_script(PENALIZE_SCRIPT)
+            )
+        return self._sync
+
+    def _async_client(self) -> Optional[aioredis.Redis]:
+        if time.time() < self._down_until:
+            return None
+        loop = asyncio.get_running_loop()
+        if self._async is None or self._async_loop is not loop:
+            self._async = aioredis.from_url(self.redis_url, socket_connect_timeout=1, socket_timeout=1)
+            self._async_loop = loop
+            self._scripts['async'] = (
+                self._async.register_script(TAKE_SCRIPT),
+                self._async.register_script(PENALIZE_SCRIPT)
+            )
+        return self._async
+
+    def _failed(self, error: Exception):
+        self.errors += 1
+        self._down_until = time.time() + self.retry_seconds
+        self._sync = None
+        self._async = None
+        logger.warning(f"Shared rate limit unavailable ({error}), retrying Redis in {self.retry_seconds:.0f}s")
+
+    @property
+    def available(self) -> bool:
+        return time.time() >= self._down_until
+
+    # ========== Script Arguments ==========
+
+    def _keys(self, budgets: Sequence[Budget]) -> List[str]:
+        return [f"{self.prefix}:{name}" for name, _, _ in budgets]
+
+    def _take_args(self, budgets: Sequence[Budget]) -> List:
+        args = []
+        for _, rate, capacity in budgets:
+            args += [rate, capacity]
+        return args + [self.key_ttl_ms, self.recovery_ms]
+
+    def _penalize_args(self, pause: float) -> List:
+        pause_ms = int(pause * 1000)
+        return [pause_ms, self.min_rate_fraction, pause_ms + self.key_ttl_ms]
+
+    @staticmethod
+    def _result(reply) -> Tuple[float, int]:
+        wait_ms, blocker = reply
+        return int(wait_ms) / 1000, int(blocker)
+
+    # ========== Taking Tokens ==========
+
+    async def take(self, budgets: Sequence[Budget]) -> Optional[Tuple[float, int]]:
+        """
+        Take one token from every bucket, or none if any is short
+
+        Returns:
+            (seconds to wait, 1-based index of the blocking bucket, 0 when
+            granted), or None when Redis is unavailable
+        """
+        client = self._async_client()
+        if client is None:
+            return None
+        try:
+            take_script, _ = self._scripts['async']
+            return self._result(await take_script(keys=self._keys(budgets), args=self._take_args(budgets)))
+        except Exception as e:
+            self._failed(e)
+            return None
+
+    def take_blocking(self, budgets: Sequence[Budget]) -> Optional[Tuple[float, int]]:
+        """Synchronous take() for callers without an event loop"""
+        client = self._sync_client()
+        if client is None:
+            return None
+        try:
+            take_script, _ = self._scripts['sync']
+            return self._result(take_script(keys=self._keys(budgets), args=self._take_args(budgets)))
+        except Exception as e:
+            self._failed(e)
+            return None
+
+    # ========== 429 Penalty ==========
+
+    async def penalize(self, names: Sequence[str], pause: float):
+        """Pause and halve shared buckets after a 429"""
+        client = self._async_client()
+        if client is None:
+            return
+        try:
+            _, penalize_script = self._scripts['async']
+            await penalize_script(keys=[f"{self.prefix}:{name}" for name in names], args=self._penalize_args(pause))
+        except Exception as e:
+            self._failed(e)
+
+    def penalize_blocking(self, names: Sequence[str], pause: float):
+        """Synchronous penalize()"""
+        client = self._sync_client()
+        if client is None:
+            return
+        try:
+            _, penalize_script = self._scripts['sync']
+            penalize_script(keys=[f"{self.prefix}:{name}" for name in names], args=self._penalize_args(pause))
+        except Exception as e:
+            self._failed(e)
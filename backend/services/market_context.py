@@ -9,6 +9,7 @@ from zoneinfo import ZoneInfo
 from enum import Enum
 
 from backend.core.logger import get_logger
+from backend.data.trading_calendar import get_trading_calendar
 
 logger = get_logger(__name__)
 
@@ -167,21 +168,9 @@ class MarketContextService:
         
         return expiry_day == check_day
     
-    def calculate_days_to_expiry(self, expiry_date: Optional[datetime],
-                                from_date: Optional[datetime] = None) -> Optional[int]:
-        """Calculate days until expiry"""
-        if not expiry_date:
-            return None
-        
-        if from_date is None:
-            from_date = datetime.now(IST)
-        
-        # Calculate difference
-        expiry_day = expiry_date.date() if hasattr(expiry_date, 'date') else expiry_date
-        from_day = from_date.date() if hasattr(from_date, 'date') else from_date
-        
-        delta = (expiry_day - from_day).days
-        return max(0, delta)  # Don't return negative days
+    def calculate_days_to_expiry(self, expiry_date, from_date: Optional[datetime] = None) -> Optional[int]:
+        """Calculate days until expiry (never negative)"""
+        return get_trading_calendar().days_until(expiry_date, from_date)
     
     def enrich_position_entry(self, position: Dict, market_data: Dict = None) -> Dict:
         """
@@ -6,8 +6,11 @@ Tracks prev_close and OHLC data for option chains using Upstox full market quote
 from typing import Dict, Optional, List
 from datetime import datetime, timedelta
 from collections import defaultdict
-import asyncio
+import numpy as np
 from backend.core.logger import logger
+from backend.core.async_upstox_client import get_async_upstox_client
+from backend.safety.rate_limiter import Priority
+from backend.data.option_chain import PRICE_HISTORY_FIELDS, OptionSideView
 
 
 class PriceHistoryTracker:
@@ -15,6 +18,7 @@ class PriceHistoryTracker:
     
     def __init__(self, upstox_client):
         self.upstox_client = upstox_client
+        self.async_client = get_async_upstox_client(upstox_client.access_token)
         self.price_history = defaultdict(dict)  # {instrument_key: {timestamp: price_data}}
         self.prev_close_cache = {}  # {instrument_key: prev_close_price}
         self.last_fetch_time = {}
@@ -57,11 +61,8 @@ class PriceHistoryTracker:
             for i in range(0, len(instrument_keys), batch_size):
                 batch = instrument_keys[i:i + batch_size]
                 
-                # Run in thread to avoid blocking
-                quotes = await asyncio.to_thread(
-                    self.upstox_client.get_full_market_quote,
-                    batch
-                )
+                # Non-blocking pooled request
+                quotes = await self.async_client.get_full_market_quote(batch, priority=Priority.ANALYTICS)
                 
                 if quotes and 'data' in quotes:
                     all_quotes.update(quotes['data'])
@@ -79,9 +80,33 @@ class PriceHistoryTracker:
         
         enriched = option_chain.copy()
         
-        # Enrich calls
-        if 'calls' in enriched:
-            for strike, data in enriched['calls'].items():
+        for side_name in ('calls', 'puts'):
+            side = enriched.get(side_name)
+            if not side:
+                continue
+            
+            if isinstance(side, OptionSideView):
+                # Columnar chain: fill the price history columns, rows stay lazy
+                keys = side.columns.side(side_name).instrument_keys
+                history = {field: np.zeros(len(keys)) for field in PRICE_HISTORY_FIELDS}
+                found = np.zeros(len(keys), dtype=bool)
+                for i, instrument_key in enumerate(keys):
+                    # Upstox returns keys with colon instead of pipe
+                    ohlc = quotes.get(instrument_key.replace('|', ':'), {}).get('ohlc') if instrument_key else None
+                    if not ohlc:
+                        continue
+                    found[i] = True
+                    history['prev_close'][i] = ohlc.get('close', 0)
+                    history['open'][i] = ohlc.get('open', 0)
+                    history['high'][i] = ohlc.get('high', 0)
+                    history['low'][i] = ohlc.get('low', 0)
+                    # Cache for fast access
+                    self.prev_close_cache[instrument_key] = history['prev_close'][i]
+                for field, values in history.items():
+                    side.set_column(field, values, found)
+                continue
+            
+            for strike, data in side.items():
                 instrument_key = data.get('instrument_key')
                 if not instrument_key:
                     continue
@@ -91,31 +116,13 @@ class PriceHistoryTracker:
                 quote = quotes.get(quote_key, {})
                 
                 ohlc = quote.get('ohlc', {})
-                enriched['calls'][strike]['prev_close'] = ohlc.get('close', data.get('ltp', 0))
-                enriched['calls'][strike]['open'] = ohlc.get('open', 0)
-                enriched['calls'][strike]['high'] = ohlc.get('high', 0)
-                enriched['calls'][strike]['low'] = ohlc.get('low', 0)
+                data['prev_close'] = ohlc.get('close', data.get('ltp', 0))
+                data['open'] = ohlc.get('open', 0)
+                data['high'] = ohlc.get('high', 0)
+                data['low'] = ohlc.get('low', 0)
                 
                 # Cache for fast access
-                self.prev_close_cache[instrument_key] = ohlc.get('close', data.get('ltp', 0))
-        
-        # Enrich puts
-        if 'puts' in enriched:
-            for strike, data in enriched['puts'].items():
-                instrument_key = data.get('instrument_key')
-                if not instrument_key:
-                    continue
-                
-                quote_key = instrument_key.replace('|', ':')
-                quote = quotes.get(quote_key, {})
-                
-                ohlc = quote.get('ohlc', {})
-                enriched['puts'][strike]['prev_close'] = ohlc.get('close', data.get('ltp', 0))
-                enriched['puts'][strike]['open'] = ohlc.get('open', 0)
-                enriched['puts'][strike]['high'] = ohlc.get('high', 0)
-                enriched['puts'][strike]['low'] = ohlc.get('low', 0)
-                
-                self.prev_close_cache[instrument_key] = ohlc.get('close', data.get('ltp', 0))
+                self.prev_close_cache[instrument_key] = data['prev_close']
         
         return enriched
     
@@ -123,19 +130,23 @@ class PriceHistoryTracker:
         """Apply cached prev_close prices to option chain"""
         enriched = option_chain.copy()
         
-        # Apply to calls
-        if 'calls' in enriched:
-            for strike, data in enriched['calls'].items():
-                instrument_key = data.get('instrument_key')
-                if instrument_key in self.prev_close_cache:
-                    enriched['calls'][strike]['prev_close'] = self.prev_close_cache[instrument_key]
-        
-        # Apply to puts
-        if 'puts' in enriched:
-            for strike, data in enriched['puts'].items():
+        for side_name in ('calls', 'puts'):
+            side = enriched.get(side_name)
+            if not side:
+                continue
+            
+            if isinstance(side, OptionSideView):
+                keys = side.columns.side(side_name).instrument_keys
+                cached = [self.prev_close_cache.get(key) for key in keys]
+                found = np.array([value is not None for value in cached], dtype=bool)
+                if found.any():
+                    side.set_column('prev_close', np.array([value or 0.0 for value in cached]), found)
+                continue
+            
+            for strike, data in side.items():
                 instrument_key = data.get('instrument_key')
                 if instrument_key in self.prev_close_cache:
-                    enriched['puts'][strike]['prev_close'] = self.prev_close_cache[instrument_key]
+                    data['prev_close'] = self.prev_close_cache[instrument_key]
         
         return enriched
     
@@ -0,0 +1,414 @@
+"""
+Simulated Market
+Random-walk underlyings and Black-Scholes priced option chains for the
+local Upstox stand-in
+
+Each underlying follows a geometric random walk stepped on every tick. Its
+option strikes around ATM are repriced in one vectorized Black-Scholes pass
+over a small volatility smile. Instrument keys use the same formats the
+engine builds, so subscriptions, chain lookups and orders line up without an
+instrument master.
+"""
+
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from backend.config.underlying_config import STRIKE_ROUNDING
+from backend.core.timezone_utils import IST
+from backend.core.upstox_client import build_option_instrument_key
+from backend.data.greeks import SECONDS_PER_YEAR, black_scholes
+from backend.data.proto import MarketDataFeedV3_pb2 as pb
+from backend.data.trading_calendar import get_trading_calendar
+
+VIX_KEY = "NSE_INDEX|India VIX"
+IST_OFFSET_SECONDS = 19800
+
+
+@dataclass
+class Underlying:
+    symbol: str
+    index_key: str
+    exchange: str
+    spot: float
+    strike_step: int
+    lot_size: int
+
+
+DEFAULT_UNDERLYINGS = [
+    Underlying('NIFTY', 'NSE_INDEX|Nifty 50', 'NSE', 25000.0, STRIKE_ROUNDING['NIFTY'], 75),
+    Underlying('SENSEX', 'BSE_INDEX|SENSEX', 'BSE', 82000.0, STRIKE_ROUNDING['SENSEX'], 20),
+    Underlying('BANKNIFTY', 'NSE_INDEX|Nifty Bank', 'NSE', 56000.0, 100, 35),
+]
+
+
+class MarketModel:
+    """Every simulated instrument's state, advanced one tick at a time"""
+
+    def __init__(
+        self,
+        underlyings: Optional[Sequence[Underlying]] = None,
+        strikes: int = 40,
+        expiries: int = 2,
+        volatility: float = 0.14,
+        vix: float = 13.5,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            underlyings: Simulated indices (NIFTY, SENSEX, BANKNIFTY by default)
+            strikes: Strikes per underlying and expiry around the opening ATM
+            expiries: Listed expiries per underlying (from the trading calendar)
+            volatility: Annualized volatility of the random walk and ATM IV
+            vix: Initial India VIX level
+            seed: Random seed for reproducible runs
+        """
+        self.underlyings = {u.symbol: u for u in (underlyings or DEFAULT_UNDERLYINGS)}
+        self.volatility = volatility
+        self.rng = np.random.default_rng(seed)
+        self.ticks = 0
+        self.last_step = time.time()
+
+        self._underlying_list = list(self.underlyings.values())
+        self.expiries = {symbol: self._listed_expiries(symbol, expiries) for symbol in self.underlyings}
+
+        # Index instruments: key -> row in the index arrays
+        self.index_keys = [u.index_key for u in self._underlying_list] + [VIX_KEY]
+        self.index_row = {key: i for i, key in enumerate(self.index_keys)}
+        self.index_price = np.array([u.spot for u in self._underlying_list] + [vix])
+        self.index_open = self.index_price.copy()
+        self.index_high = self.index_price.copy()
+        self.index_low = self.index_price.copy()
+
+        # Options: one row per (underlying, expiry, strike, side)
+        keys, under, strike, is_call, expiry = [], [], [], [], []
+        for u_row, u in enumerate(self._underlying_list):
+            atm = round(u.spot / u.strike_step) * u.strike_step
+            for expiry_date in self.expiries[u.symbol]:
+                for k in range(-(strikes // 2), strikes - strikes // 2):
+                    for call in (True, False):
+                        option_strike = atm + k * u.strike_step
+                        keys.append(build_option_instrument_key(
+                            u.exchange, u.symbol, expiry_date, option_strike, 'CE' if call else 'PE'
+                        ))
+                        under.append(u_row)
+                        strike.append(float(option_strike))
+                        is_call.append(call)
+                        expiry.append(expiry_date)
+        self.option_keys = keys
+        self.option_row = {key: i for i, key in enumerate(keys)}
+        self.option_under = np.array(under, dtype=np.int64)
+        self.option_strike = np.array(strike)
+        self.option_is_call = np.array(is_call, dtype=bool)
+        self.option_expiry = expiry
+        # Time to expiry is computed once per distinct expiry on every reprice
+        self._expiry_dates = sorted(set(expiry))
+        self._expiry_of_row = np.array([self._expiry_dates.index(e) for e in expiry], dtype=np.int64)
+        self.option_oi = self.rng.integers(50_000, 5_000_000, len(keys)).astype(np.float64)
+        self.option_prev_oi = self.option_oi.copy()
+        self.option_volume = np.zeros(len(keys))
+        self._greeks: Dict[str, np.ndarray] = {}
+        self._reprice()
+        self.option_open = self._greeks['price'].copy()
+        self.option_high = self.option_open.copy()
+        self.option_low = self.option_open.copy()
+
+    @staticmethod
+    def _listed_expiries(symbol: str, count: int) -> List[str]:
+        calendar = get_trading_calendar()
+        current = calendar.current_expiry(symbol)
+        if current is None:
+            return []
+        return [current] + calendar.expiries(symbol, after=current)[:count - 1]
+
+    @property
+    def instrument_count(self) -> int:
+        return len(self.index_keys) + len(self.option_keys)
+
+    def lot_size(self, symbol: str) -> int:
+        underlying = self.underlyings.get(symbol)
+        return underlying.lot_size if underlying else 1
+
+    def underlying_of(self, instrument_key: str) -> Optional[Underlying]:
+        row = self.option_row.get(instrument_key)
+        if row is not None:
+            return self._underlying_list[self.option_under[row]]
+        for u in self._underlying_list:
+            if u.index_key == instrument_key:
+                return u
+        return None
+
+    # ========== Price process ==========
+
+    def step(self, now: Optional[float] = None):
+        """Advance every instrument by the time elapsed since the last step"""
+        now = now or time.time()
+        dt = max(now - self.last_step, 1e-3) / SECONDS_PER_YEAR
+        self.last_step = now
+        self.ticks += 1
+
+        shocks = self.rng.standard_normal(len(self.index_price))
+        drift = -0.5 * self.volatility ** 2 * dt
+        self.index_price[:-1] *= np.exp(drift + self.volatility * np.sqrt(dt) * shocks[:-1])
+        # VIX mean-reverts around its opening level
+        self.index_price[-1] += 2.0 * (self.index_open[-1] - self.index_price[-1]) * dt * 252 + shocks[-1] * 0.01
+        np.maximum(self.index_high, self.index_price, out=self.index_high)
+        np.minimum(self.index_low, self.index_price, out=self.index_low)
+
+        self._reprice()
+        traded = self.rng.random(len(self.option_keys)) < 0.2
+        self.option_volume[traded] += self.rng.integers(1, 20, int(traded.sum())) * 25
+        self.option_oi[traded] += self.rng.integers(-10, 11, int(traded.sum())) * 25
+        np.maximum(self.option_high, self._greeks['price'], out=self.option_high)
+        np.minimum(self.option_low, self._greeks['price'], out=self.option_low)
+
+    def _reprice(self):
+        spot = self.index_price[self.option_under]
+        moneyness = np.log(self.option_strike / spot)
+        iv = self.volatility * (1.0 + 2.5 * moneyness ** 2 - 0.4 * moneyness)
+        calendar = get_trading_calendar()
+        t = np.array([calendar.years_until(expiry) for expiry in self._expiry_dates])[self._expiry_of_row]
+        greeks = black_scholes(spot, self.option_strike, t, iv, self.option_is_call)
+        greeks['price'] = np.maximum(np.round(greeks['price'] / 0.05) * 0.05, 0.05)
+        greeks['iv'] = iv
+        self._greeks = greeks
+
+    def ltp(self, instrument_key: str) -> Optional[float]:
+        row = self.index_row.get(instrument_key)
+        if row is not None:
+            return round(float(self.index_price[row]), 2)
+        row = self.option_row.get(instrument_key)
+        if row is not None:
+            return round(float(self._greeks['price'][row]), 2)
+        return None
+
+    # ========== REST payloads ==========
+
+    @staticmethod
+    def response_key(instrument_key: str) -> str:
+        """Upstox answers market quotes keyed with ':' instead of '|'"""
+        return instrument_key.replace('|', ':')
+
+    def _ohlc(self, instrument_key: str) -> Optional[Dict[str, float]]:
+        row = self.index_row.get(instrument_key)
+        if row is not None:
+            arrays = (self.index_open, self.index_high, self.index_low, self.index_price)
+        else:
+            row = self.option_row.get(instrument_key)
+            if row is None:
+                return None
+            arrays = (self.option_open, self.option_high, self.option_low, self._greeks['price'])
+        open_, high, low, close = (round(float(values[row]), 2) for values in arrays)
+        return {'open': open_, 'high': high, 'low': low, 'close': close}
+
+    def ltp_payload(self, instrument_keys: Sequence[str]) -> Dict[str, Any]:
+        return {
+            self.response_key(key): {'last_price': self.ltp(key), 'instrument_token': key}
+            for key in instrument_keys if self.ltp(key) is not None
+        }
+
+    def ohlc_payload(self, instrument_keys: Sequence[str]) -> Dict[str, Any]:
+        return {
+            self.response_key(key): {'ohlc': self._ohlc(key), 'last_price': self.ltp(key), 'instrument_token': key}
+            for key in instrument_keys if self.ltp(key) is not None
+        }
+
+    def quote_payload(self, instrument_keys: Sequence[str]) -> Dict[str, Any]:
+        quotes = {}
+        now = datetime.now(IST)
+        for key in instrument_keys:
+            ltp = self.ltp(key)
+            if ltp is None:
+                continue
+            row = self.option_row.get(key)
+            tick = 0.05 if row is not None else 0.0
+            depth = {
+                'buy': [{'quantity': 75 * (5 - level), 'price': round(ltp - tick * (level + 1), 2), 'orders': 5 - level} for level in range(5)],
+                'sell': [{'quantity': 75 * (5 - level), 'price': round(ltp + tick * (level + 1), 2), 'orders': 5 - level} for level in range(5)],
+            }
+            ohlc = self._ohlc(key)
+            quotes[self.response_key(key)] = {
+                'ohlc': ohlc,
+                'depth': depth,
+                'timestamp': now.isoformat(),
+                'instrument_token': key,
+                'symbol': key.split('|', 1)[-1],
+                'last_price': ltp,
+                'volume': int(self.option_volume[row]) if row is not None else 0,
+                'average_price': round((ohlc['high'] + ohlc['low'] + ohlc['close']) / 3, 2),
+                'oi': float(self.option_oi[row]) if row is not None else 0.0,
+                'net_change': round(ltp - ohlc['open'], 2),
+                'total_buy_quantity': sum(level['quantity'] for level in depth['buy']),
+                'total_sell_quantity': sum(level['quantity'] for level in depth['sell']),
+                'last_trade_time': str(int(time.time() * 1000)),
+            }
+        return quotes
+
+    def option_chain(self, index_key: str, expiry: str) -> List[Dict[str, Any]]:
+        """/v2/option/chain items (empty for an unlisted expiry, like the live API)"""
+        underlying = next((u for u in self._underlying_list if u.index_key == index_key), None)
+        if underlying is None or expiry not in self.expiries[underlying.symbol]:
+            return []
+        u_row = self._underlying_list.index(underlying)
+        spot = round(float(self.index_price[self.index_row[index_key]]), 2)
+        greeks = self._greeks
+        by_strike: Dict[float, Dict[str, Any]] = {}
+        for row in range(len(self.option_keys)):
+            if self.option_under[row] != u_row or self.option_expiry[row] != expiry:
+                continue
+            strike = float(self.option_strike[row])
+            price = round(float(greeks['price'][row]), 2)
+            item = by_strike.setdefault(strike, {
+                'expiry': expiry,
+                'pcr': 0.0,
+                'strike_price': strike,
+                'underlying_key': index_key,
+                'underlying_spot_price': spot,
+            })
+            item['call_options' if self.option_is_call[row] else 'put_options'] = {
+                'instrument_key': self.option_keys[row],
+                'market_data': {
+                    'ltp': price,
+                    'volume': int(self.option_volume[row]),
+                    'oi': float(self.option_oi[row]),
+                    'close_price': round(float(self.option_open[row]), 2),
+                    'bid_price': round(max(price - 0.05, 0.05), 2),
+                    'bid_qty': 750,
+                    'ask_price': round(price + 0.05, 2),
+                    'ask_qty': 750,
+                    'prev_oi': float(self.option_prev_oi[row]),
+                },
+                'option_greeks': {
+                    'vega': round(float(greeks['vega'][row]), 4),
+                    'theta': round(float(greeks['theta'][row]), 4),
+                    'gamma': round(float(greeks['gamma'][row]), 6),
+                    'delta': round(float(greeks['delta'][row]), 4),
+                    'iv': round(float(greeks['iv'][row]) * 100, 2),
+                    'pop': round(abs(float(greeks['delta'][row])) * 100, 2),
+                },
+            }
+        for item in by_strike.values():
+            call_oi = item.get('call_options', {}).get('market_data', {}).get('oi', 0)
+            put_oi = item.get('put_options', {}).get('market_data', {}).get('oi', 0)
+            item['pcr'] = round(put_oi / call_oi, 4) if call_oi else 0.0
+        return [by_strike[strike] for strike in sorted(by_strike)]
+
+    def option_contracts(self, index_key: str, expiry: Optional[str] = None) -> List[Dict[str, Any]]:
+        """/v2/option/contract items"""
+        contracts = []
+        for row, key in enumerate(self.option_keys):
+            underlying = self._underlying_list[self.option_under[row]]
+            if underlying.index_key != index_key or (expiry and self.option_expiry[row] != expiry):
+                continue
+            contracts.append({
+                'instrument_key': key,
+                'trading_symbol': key.split('|', 1)[1],
+                'expiry': self.option_expiry[row],
+                'strike_price': float(self.option_strike[row]),
+                'instrument_type': 'CE' if self.option_is_call[row] else 'PE',
+                'lot_size': underlying.lot_size,
+                'tick_size': 5.0,
+                'underlying_key': index_key,
+                'underlying_symbol': underlying.symbol,
+                'segment': f"{underlying.exchange}_FO",
+            })
+        return contracts
+
+    def candles(self, instrument_key: str, minutes: int, count: int, period: Optional[int] = None) -> List[List[Any]]:
+        """
+        Newest-first [timestamp, open, high, low, close, volume, oi] ending at the current price
+
+        Args:
+            minutes: Trading minutes per candle (scales the volatility)
+            count: Number of candles
+            period: Seconds between candle timestamps (minutes * 60 by default)
+        """
+        last = self.ltp(instrument_key)
+        if last is None:
+            return []
+        rng = np.random.default_rng(abs(hash((instrument_key, minutes))) % (2 ** 32))
+        step_vol = self.volatility * np.sqrt(minutes / (252 * 375))
+        closes = last * np.exp(np.concatenate(([0.0], np.cumsum(rng.standard_normal(count - 1) * step_vol))))
+        period = period or minutes * 60
+        # Candle boundaries fall on IST clock times (daily candles at IST midnight)
+        offset = IST_OFFSET_SECONDS
+        now = int((time.time() + offset) // period * period - offset)
+        candles = []
+        for i, close in enumerate(closes):
+            open_ = close * np.exp(rng.standard_normal() * step_vol * 0.5)
+            high = max(open_, close) * (1 + abs(rng.standard_normal()) * step_vol * 0.3)
+            low = min(open_, close) * (1 - abs(rng.standard_normal()) * step_vol * 0.3)
+            timestamp = datetime.fromtimestamp(now - i * period, IST).isoformat()
+            candles.append([timestamp, round(open_, 2), round(high, 2), round(low, 2), round(close, 2),
+                            int(rng.integers(1_000, 100_000)), 0])
+        return candles
+
+    # ========== Feed frames ==========
+
+    def market_info_frame(self) -> bytes:
+        response = pb.FeedResponse()
+        response.type = pb.market_info
+        response.currentTs = int(time.time() * 1000)
+        for segment in ('NSE_INDEX', 'NSE_FO', 'BSE_INDEX', 'BSE_FO'):
+            response.marketInfo.segmentStatus[segment] = pb.NORMAL_OPEN
+        return response.SerializeToString()
+
+    def feed_frame(self, instrument_keys: Sequence[str], modes: Dict[str, str], initial: bool = False) -> bytes:
+        """MarketDataFeedV3 FeedResponse with the current state of the given instruments"""
+        response = pb.FeedResponse()
+        response.type = pb.initial_feed if initial else pb.live_feed
+        now_ms = int(time.time() * 1000)
+        response.currentTs = now_ms
+        greeks = self._greeks
+        for key in instrument_keys:
+            mode = modes.get(key, 'full')
+            feed = response.feeds[key]
+            index_row = self.index_row.get(key)
+            if index_row is not None:
+                price = float(self.index_price[index_row])
+                if mode == 'ltpc':
+                    ltpc = feed.ltpc
+                else:
+                    index_ff = feed.fullFeed.indexFF
+                    ltpc = index_ff.ltpc
+                    ohlc = index_ff.marketOHLC.ohlc.add()
+                    ohlc.interval, ohlc.open, ohlc.high, ohlc.low, ohlc.close = (
+                        '1d', self.index_open[index_row], self.index_high[index_row], self.index_low[index_row], price
+                    )
+                ltpc.ltp, ltpc.ltt, ltpc.cp = price, now_ms, float(self.index_open[index_row])
+                continue
+
+            row = self.option_row.get(key)
+            if row is None:
+                continue
+            price = float(greeks['price'][row])
+            if mode == 'ltpc':
+                feed.ltpc.ltp, feed.ltpc.ltt, feed.ltpc.ltq, feed.ltpc.cp = price, now_ms, 75, float(self.option_open[row])
+                continue
+            if mode == 'option_greeks':
+                first = feed.firstLevelWithGreeks
+                first.ltpc.ltp, first.ltpc.ltt, first.ltpc.cp = price, now_ms, float(self.option_open[row])
+                first.firstDepth.bidP, first.firstDepth.bidQ = max(price - 0.05, 0.05), 750
+                first.firstDepth.askP, first.firstDepth.askQ = price + 0.05, 750
+                option_greeks, first.vtt, first.oi, first.iv = first.optionGreeks, int(self.option_volume[row]), float(self.option_oi[row]), float(greeks['iv'][row])
+            else:
+                market_ff = feed.fullFeed.marketFF
+                market_ff.ltpc.ltp, market_ff.ltpc.ltt, market_ff.ltpc.ltq, market_ff.ltpc.cp = price, now_ms, 75, float(self.option_open[row])
+                for level in range(5):
+                    quote = market_ff.marketLevel.bidAskQuote.add()
+                    quote.bidP, quote.bidQ = max(price - 0.05 * (level + 1), 0.05), 750 * (5 - level)
+                    quote.askP, quote.askQ = price + 0.05 * (level + 1), 750 * (5 - level)
+                ohlc = market_ff.marketOHLC.ohlc.add()
+                ohlc.interval, ohlc.open, ohlc.high, ohlc.low, ohlc.close = (
+                    '1d', self.option_open[row], self.option_high[row], self.option_low[row], price
+                )
+                market_ff.atp = price
+                market_ff.vtt, market_ff.oi, market_ff.iv = int(self.option_volume[row]), float(self.option_oi[row]), float(greeks['iv'][row])
+                market_ff.tbq = market_ff.tsq = 18750.0
+                option_greeks = market_ff.optionGreeks
+            option_greeks.delta, option_greeks.gamma = float(greeks['delta'][row]), float(greeks['gamma'][row])
+            option_greeks.theta, option_greeks.vega, option_greeks.rho = float(greeks['theta'][row]), float(greeks['vega'][row]), float(greeks['rho'][row])
+        return response.SerializeToString()
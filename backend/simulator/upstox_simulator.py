@@ -0,0 +1,510 @@
+"""
+Upstox Simulator
+Local stand-in for the Upstox REST API and MarketDataFeedV3 WebSocket
+
+Serves the v2/v3 endpoints the engine calls (quotes, LTP, OHLC, candles,
+option chain and contracts, orders, positions, funds, profile) and a
+protobuf market feed from one simulated market (market_model). Tick rate,
+instruments per frame, strikes, response latency and 429 injection are
+configurable, so the full engine can be driven at 10-100x production
+message rates on one box. Point the engine at it with:
+
+    UPSTOX_BASE_URL=http://127.0.0.1:8765
+
+and start it with:
+
+    python -m backend.simulator.upstox_simulator --tick-rate 50 --strikes 80
+
+Feed authorization returns a plain ws:// URL to this server, so
+MarketFeedManager connects here without further configuration. Orders fill
+immediately at the simulated LTP.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+import uvicorn
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+
+from backend.core.logger import get_logger
+from backend.core.timezone_utils import now_ist
+from backend.simulator.market_model import MarketModel
+
+logger = get_logger(__name__)
+
+FEED_PATH = "/v3/feed/market-data-feed"
+CANDLE_MINUTES = {'minutes': 1, 'hours': 60, 'days': 375}
+V2_CANDLE_MINUTES = {'1minute': 1, '30minute': 30, 'day': 375, 'week': 375 * 5, 'month': 375 * 21}
+
+
+@dataclass
+class SimulatorConfig:
+    """Knobs of the simulator (changeable at runtime through POST /sim/config)"""
+    tick_rate: float = 10.0            # Market steps (and feed frames per connection) per second
+    keys_per_frame: int = 100          # Subscribed instruments carried by each frame
+    strikes: int = 40                  # Strikes per underlying and expiry
+    expiries: int = 2                  # Listed expiries per underlying
+    latency_ms: float = 0.0            # Added to every REST response
+    latency_jitter_ms: float = 0.0     # Uniform extra latency on top of latency_ms
+    error_rate_429: float = 0.0        # Fraction of REST calls answered with 429
+    max_requests_per_second: float = 0.0  # Hard REST limit answered with 429 (0 = off)
+    retry_after_seconds: float = 1.0   # Retry-After sent with injected 429s
+    client_queue: int = 100            # Frames buffered per feed connection before dropping
+    seed: Optional[int] = None
+
+
+def success(data: Any) -> Dict[str, Any]:
+    return {'status': 'success', 'data': data}
+
+
+def error(status_code: int, code: str, message: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={'status': 'error', 'errors': [{'errorCode': code, 'message': message}]},
+        headers=headers
+    )
+
+
+class FeedConnection:
+    """One feed WebSocket client: its subscriptions and outgoing frame queue"""
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.modes: Dict[str, str] = {}
+        self.keys: List[str] = []
+        self.cursor = 0
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.frames_sent = 0
+        self.frames_dropped = 0
+
+    def apply(self, request: Dict[str, Any]):
+        """Apply a sub / unsub / change_mode request"""
+        method = request.get('method')
+        data = request.get('data') or {}
+        keys = data.get('instrumentKeys') or []
+        if method in ('sub', 'change_mode'):
+            mode = data.get('mode', 'full')
+            for key in keys:
+                self.modes[key] = mode
+        elif method == 'unsub':
+            for key in keys:
+                self.modes.pop(key, None)
+        self.keys = list(self.modes)
+
+    def next_keys(self, count: int) -> List[str]:
+        """Next slice of subscribed keys, round robin"""
+        if not self.keys:
+            return []
+        if len(self.keys) <= count:
+            return self.keys
+        start = self.cursor % len(self.keys)
+        batch = self.keys[start:start + count]
+        if len(batch) < count:
+            batch += self.keys[:count - len(batch)]
+        self.cursor = start + count
+        return batch
+
+    def offer(self, frame: bytes):
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.frames_dropped += 1
+
+
+class UpstoxSimulator:
+    """Simulated market plus the REST and feed endpoints serving it"""
+
+    def __init__(self, config: Optional[SimulatorConfig] = None):
+        self.config = config or SimulatorConfig()
+        self.model = MarketModel(strikes=self.config.strikes, expiries=self.config.expiries, seed=self.config.seed)
+        self._random = random.Random(self.config.seed)
+
+        self.connections: Set[FeedConnection] = set()
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        self.positions: Dict[str, Dict[str, Any]] = {}
+        self._ticker: Optional[asyncio.Task] = None
+        self._window_started = time.monotonic()
+        self._window_requests = 0
+        self._stats = {'requests': 0, 'injected_429': 0, 'limited_429': 0, 'orders': 0, 'ticks': 0,
+                       'frames_sent': 0, 'frames_dropped': 0, 'behind_schedule': 0}
+
+        self.app = FastAPI(title="Upstox Simulator")
+        self.app.middleware("http")(self._inject_faults)
+        self._add_routes()
+        self.app.add_event_handler("startup", self._start_ticker)
+        self.app.add_event_handler("shutdown", self._stop_ticker)
+
+    # ========== Fault injection ==========
+
+    async def _inject_faults(self, request: Request, call_next):
+        path = request.url.path
+        if path.startswith("/sim/"):
+            return await call_next(request)
+        self._stats['requests'] += 1
+        config = self.config
+
+        delay = config.latency_ms + self._random.uniform(0, config.latency_jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+        if config.max_requests_per_second > 0:
+            now = time.monotonic()
+            if now - self._window_started >= 1.0:
+                self._window_started, self._window_requests = now, 0
+            self._window_requests += 1
+            if self._window_requests > config.max_requests_per_second:
+                self._stats['limited_429'] += 1
+                return self._too_many_requests()
+
+        if config.error_rate_429 > 0 and self._random.random() < config.error_rate_429:
+            self._stats['injected_429'] += 1
+            return self._too_many_requests()
+        return await call_next(request)
+
+    def _too_many_requests(self) -> JSONResponse:
+        return error(
+            429, 'UDAPI10005', 'Too Many Request Sent',
+            headers={'Retry-After': f"{self.config.retry_after_seconds:g}"}
+        )
+
+    # ========== Routes ==========
+
+    def _add_routes(self):
+        app = self.app
+        model = self.model
+
+        def symbols(request: Request) -> List[str]:
+            return [key for key in request.query_params.get('symbol', '').split(',') if key]
+
+        @app.get("/v2/market-quote/ltp")
+        async def ltp(request: Request):
+            return success(model.ltp_payload(symbols(request)))
+
+        @app.get("/v2/market-quote/quotes")
+        async def quotes(request: Request):
+            return success(model.quote_payload(symbols(request)))
+
+        @app.get("/v2/market-quote/ohlc")
+        async def ohlc(request: Request):
+            return success(model.ohlc_payload(symbols(request)))
+
+        @app.get("/v2/option/chain")
+        async def option_chain(instrument_key: str, expiry_date: str):
+            return success(model.option_chain(instrument_key, expiry_date))
+
+        @app.get("/v2/option/contract")
+        async def option_contract(instrument_key: str, expiry_date: Optional[str] = None):
+            return success(model.option_contracts(instrument_key, expiry_date))
+
+        @app.get("/v2/historical-candle/{instrument_key}/{interval}/{to_date}/{from_date}")
+        async def historical_candles_v2(instrument_key: str, interval: str, to_date: str, from_date: str):
+            minutes = V2_CANDLE_MINUTES.get(interval, 1)
+            count = self._candle_count(minutes, from_date, to_date)
+            period = 86400 * (minutes // 375) if minutes >= 375 else None
+            return success({'candles': model.candles(instrument_key, minutes, count, period=period)})
+
+        @app.get("/v3/historical-candle/intraday/{instrument_key}/{unit}/{interval}")
+        async def intraday_candles(instrument_key: str, unit: str, interval: int):
+            minutes = CANDLE_MINUTES.get(unit, 1) * interval
+            return success({'candles': model.candles(instrument_key, minutes, max(1, min(375 // minutes, 375)))})
+
+        @app.get("/v3/historical-candle/day/{instrument_key}/{interval}")
+        async def day_candles(request: Request, instrument_key: str, interval: int):
+            params = request.query_params
+            count = self._candle_count(375, params['from'], params['to']) if 'from' in params and 'to' in params else 60
+            return success({'candles': model.candles(instrument_key, 375 * interval, count, period=86400 * interval)})
+
+        @app.get("/v3/feed/market-data-feed/authorize")
+        async def authorize_feed(request: Request):
+            url = f"ws://{request.url.netloc}{FEED_PATH}"
+            return success({'authorizedRedirectUri': url, 'authorized_redirect_uri': url})
+
+        @app.post("/v2/order/place")
+        async def place_order(request: Request):
+            return self._place_order(await request.json())
+
+        @app.put("/v2/order/modify")
+        async def modify_order(request: Request):
+            body = await request.json()
+            order = self.orders.get(body.get('order_id'))
+            if order is None:
+                return error(400, 'UDAPI100010', 'Order not found')
+            # Fills are immediate, so there is never an open order to change
+            return error(400, 'UDAPI100039', f"Order {order['order_id']} is already {order['status']}")
+
+        @app.delete("/v2/order/cancel")
+        async def cancel_order(request: Request):
+            order_id = request.query_params.get('order_id')
+            if order_id is None:
+                body = await request.body()
+                order_id = json.loads(body).get('order_id') if body else None
+            order = self.orders.get(order_id)
+            if order is None:
+                return error(400, 'UDAPI100010', 'Order not found')
+            return error(400, 'UDAPI100040', f"Order {order_id} is already {order['status']}")
+
+        @app.get("/v2/order/details")
+        async def order_details(order_id: str):
+            order = self.orders.get(order_id)
+            if order is None:
+                return error(400, 'UDAPI100010', 'Order not found')
+            return success(order)
+
+        @app.get("/v2/order/retrieve-all")
+        async def order_book():
+            return success(list(self.orders.values()))
+
+        @app.get("/v2/portfolio/short-term-positions")
+        async def positions():
+            return success([self._position_payload(position) for position in self.positions.values()])
+
+        @app.get("/v2/portfolio/long-term-holdings")
+        async def holdings():
+            return success([])
+
+        @app.get("/v2/user/get-funds-and-margin")
+        async def funds():
+            margin = {'used_margin': 0.0, 'payin_amount': 0.0, 'span_margin': 0.0, 'adhoc_margin': 0.0,
+                      'notional_cash': 0.0, 'available_margin': 10_000_000.0, 'exposure_margin': 0.0}
+            return success({'equity': margin, 'commodity': dict(margin, available_margin=0.0)})
+
+        @app.get("/v2/user/profile")
+        async def profile():
+            return success({'email': 'simulator@localhost', 'exchanges': ['NSE', 'NFO', 'BSE', 'BFO'],
+                            'products': ['D', 'I', 'CO', 'MTF'], 'broker': 'UPSTOX', 'user_id': 'SIM001',
+                            'user_name': 'Upstox Simulator', 'order_types': ['MARKET', 'LIMIT', 'SL', 'SL-M'],
+                            'user_type': 'individual', 'poa': False, 'is_active': True})
+
+        @app.get("/sim/stats")
+        async def stats():
+            return self.get_stats()
+
+        @app.post("/sim/config")
+        async def update_config(request: Request):
+            updates = await request.json()
+            known = {f.name for f in fields(SimulatorConfig)} - {'strikes', 'expiries', 'seed'}
+            for name, value in updates.items():
+                if name in known:
+                    setattr(self.config, name, value)
+            logger.info(f"Simulator config updated: {updates}")
+            return asdict(self.config)
+
+        @app.websocket(FEED_PATH)
+        async def market_feed(websocket: WebSocket):
+            await self._serve_feed(websocket)
+
+    @staticmethod
+    def _candle_count(minutes: int, from_date: str, to_date: str) -> int:
+        try:
+            days = (datetime.strptime(to_date, "%Y-%m-%d") - datetime.strptime(from_date, "%Y-%m-%d")).days + 1
+        except ValueError:
+            days = 1
+        return max(1, min(days * 375 // minutes, 5000))
+
+    # ========== Orders ==========
+
+    def _place_order(self, body: Dict[str, Any]) -> JSONResponse:
+        key = body.get('instrument_token')
+        price = self.model.ltp(key) if key else None
+        if price is None:
+            return error(400, 'UDAPI100011', f"Invalid instrument key: {key}")
+        quantity = int(body.get('quantity') or 0)
+        if quantity <= 0:
+            return error(400, 'UDAPI100016', 'Quantity must be positive')
+
+        self._stats['orders'] += 1
+        order_id = f"SIM{now_ist().strftime('%y%m%d')}{uuid.uuid4().hex[:10].upper()}"
+        side = body.get('transaction_type', 'BUY')
+        timestamp = now_ist().strftime('%Y-%m-%d %H:%M:%S')
+        self.orders[order_id] = {
+            'order_id': order_id,
+            'exchange_order_id': order_id,
+            'instrument_token': key,
+            'trading_symbol': key.split('|', 1)[-1],
+            'transaction_type': side,
+            'order_type': body.get('order_type', 'MARKET'),
+            'product': body.get('product', 'I'),
+            'validity': body.get('validity', 'DAY'),
+            'quantity': quantity,
+            'filled_quantity': quantity,
+            'pending_quantity': 0,
+            'price': body.get('price', 0),
+            'trigger_price': body.get('trigger_price', 0),
+            'average_price': price,
+            'status': 'complete',
+            'status_message': None,
+            'tag': body.get('tag'),
+            'order_timestamp': timestamp,
+            'exchange_timestamp': timestamp,
+        }
+
+        position = self.positions.setdefault(key, {
+            'instrument_token': key, 'product': body.get('product', 'I'),
+            'buy_quantity': 0, 'buy_value': 0.0, 'sell_quantity': 0, 'sell_value': 0.0,
+        })
+        if side == 'BUY':
+            position['buy_quantity'] += quantity
+            position['buy_value'] += quantity * price
+        else:
+            position['sell_quantity'] += quantity
+            position['sell_value'] += quantity * price
+        return JSONResponse(success({'order_id': order_id}))
+
+    def _position_payload(self, position: Dict[str, Any]) -> Dict[str, Any]:
+        key = position['instrument_token']
+        last_price = self.model.ltp(key) or 0.0
+        underlying = self.model.underlying_of(key)
+        buy_qty, sell_qty = position['buy_quantity'], position['sell_quantity']
+        net = buy_qty - sell_qty
+        buy_price = position['buy_value'] / buy_qty if buy_qty else 0.0
+        sell_price = position['sell_value'] / sell_qty if sell_qty else 0.0
+        average_price = buy_price if net >= 0 else sell_price
+        pnl = position['sell_value'] - position['buy_value'] + net * last_price
+        unrealised = net * (last_price - average_price)
+        return {
+            'exchange': f"{underlying.exchange}_FO" if underlying else 'NSE_FO',
+            'instrument_token': key,
+            'trading_symbol': key.split('|', 1)[-1],
+            'product': position['product'],
+            'quantity': net,
+            'multiplier': 1.0,
+            'buy_price': round(buy_price, 2),
+            'sell_price': round(sell_price, 2),
+            'average_price': round(average_price, 2),
+            'last_price': last_price,
+            'close_price': last_price,
+            'day_buy_quantity': buy_qty,
+            'day_buy_value': round(position['buy_value'], 2),
+            'day_sell_quantity': sell_qty,
+            'day_sell_value': round(position['sell_value'], 2),
+            'pnl': round(pnl, 2),
+            'realised': round(pnl - unrealised, 2),
+            'unrealised': round(unrealised, 2),
+            'value': round(net * last_price, 2),
+        }
+
+    # ========== Market feed ==========
+
+    async def _serve_feed(self, websocket: WebSocket):
+        await websocket.accept()
+        connection = FeedConnection(websocket, self.config.client_queue)
+        self.connections.add(connection)
+        sender = asyncio.create_task(self._send_frames(connection))
+        logger.info(f"Feed client connected ({len(self.connections)} open)")
+        try:
+            await websocket.send_bytes(self.model.market_info_frame())
+            while True:
+                message = await websocket.receive()
+                if message['type'] == 'websocket.disconnect':
+                    break
+                raw = message.get('bytes') or message.get('text')
+                if not raw:
+                    continue
+                try:
+                    request = json.loads(raw)
+                except ValueError:
+                    continue
+                connection.apply(request)
+                if request.get('method') in ('sub', 'change_mode'):
+                    keys = (request.get('data') or {}).get('instrumentKeys') or []
+                    connection.offer(self.model.feed_frame(keys, connection.modes, initial=True))
+        except WebSocketDisconnect:
+            pass
+        finally:
+            sender.cancel()
+            self.connections.discard(connection)
+            self._stats['frames_sent'] += connection.frames_sent
+            self._stats['frames_dropped'] += connection.frames_dropped
+            logger.info(f"Feed client disconnected ({len(self.connections)} open)")
+
+    async def _send_frames(self, connection: FeedConnection):
+        try:
+            while True:
+                frame = await connection.queue.get()
+                await connection.websocket.send_bytes(frame)
+                connection.frames_sent += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.debug(f"Feed send failed: {e}")
+
+    async def _start_ticker(self):
+        self._ticker = asyncio.create_task(self._tick_loop())
+        logger.info(
+            f"🧪 Upstox simulator ready: {self.model.instrument_count} instruments, "
+            f"{self.config.tick_rate:g} ticks/s, {self.config.keys_per_frame} keys/frame"
+        )
+
+    async def _stop_ticker(self):
+        if self._ticker is not None:
+            self._ticker.cancel()
+
+    async def _tick_loop(self):
+        """Step the market and fan a frame out to every connection on a fixed schedule"""
+        next_tick = time.monotonic()
+        while True:
+            interval = 1.0 / max(self.config.tick_rate, 0.01)
+            next_tick += interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif -delay > interval:
+                # Fell more than a tick behind: skip ahead instead of bursting
+                self._stats['behind_schedule'] += 1
+                next_tick = time.monotonic()
+
+            self.model.step()
+            self._stats['ticks'] += 1
+            for connection in list(self.connections):
+                keys = connection.next_keys(self.config.keys_per_frame)
+                if keys:
+                    connection.offer(self.model.feed_frame(keys, connection.modes))
+
+    def get_stats(self) -> Dict[str, Any]:
+        open_sent = sum(c.frames_sent for c in self.connections)
+        open_dropped = sum(c.frames_dropped for c in self.connections)
+        return {
+            **self._stats,
+            'frames_sent': self._stats['frames_sent'] + open_sent,
+            'frames_dropped': self._stats['frames_dropped'] + open_dropped,
+            'connections': len(self.connections),
+            'subscriptions': sum(len(c.keys) for c in self.connections),
+            'instruments': self.model.instrument_count,
+            'positions': len(self.positions),
+            'config': asdict(self.config),
+        }
+
+
+def create_app(config: Optional[SimulatorConfig] = None) -> FastAPI:
+    """FastAPI app of a new simulator"""
+    return UpstoxSimulator(config).app
+
+
+if __name__ == "__main__":
+    defaults = SimulatorConfig()
+    parser = argparse.ArgumentParser(description="Local Upstox REST and market feed simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tick-rate", type=float, default=defaults.tick_rate, help="Market steps and frames per second")
+    parser.add_argument("--keys-per-frame", type=int, default=defaults.keys_per_frame)
+    parser.add_argument("--strikes", type=int, default=defaults.strikes, help="Strikes per underlying and expiry")
+    parser.add_argument("--expiries", type=int, default=defaults.expiries)
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument("--latency-jitter-ms", type=float, default=defaults.latency_jitter_ms)
+    parser.add_argument("--error-rate-429", type=float, default=defaults.error_rate_429, help="Fraction of REST calls rejected with 429")
+    parser.add_argument("--max-requests-per-second", type=float, default=defaults.max_requests_per_second)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    simulator_config = SimulatorConfig(**{
+        name: value for name, value in vars(args).items() if name not in ('host', 'port')
+    })
+    uvicorn.run(create_app(simulator_config), host=args.host, port=args.port, log_level="warning")
@@ -4,6 +4,8 @@ Enhanced gamma scalping with real-time Greeks analysis
 """
 
 from typing import Dict, List
+import numpy as np
+from backend.data.option_chain import as_columns, strike_key
 from backend.strategies.strategy_base import BaseStrategy, Signal
 from backend.core.logger import get_logger
 
@@ -44,13 +46,23 @@ class SACGammaScalpingStrategy(BaseStrategy):
                 # Scan ALL strikes in option chain for high gamma (not just 5 near ATM)
                 atm_strike = round(spot_price / 100) * 100
                 
-                # Process ALL strikes in option chain
-                for strike_str, put_data in puts_dict.items():
-                    strike = float(strike_str)
-                    
-                    # Skip strikes too far OTM (>5% from spot for efficiency)
-                    if abs(strike - spot_price) / spot_price > 0.05:
-                        continue
+                # Vectorized pre-screen over the columnar chain; only candidates get a row dict
+                columns = as_columns(option_chain_data)
+                if columns is None:
+                    continue
+                puts = columns.puts
+                abs_delta = np.abs(puts['delta'])
+                candidates = np.flatnonzero(
+                    puts.present
+                    & (np.abs(columns.strikes - spot_price) / spot_price <= 0.05)  # Skip strikes too far OTM
+                    & (puts['gamma'] > self.min_gamma)
+                    & (abs_delta > 0.3) & (abs_delta < 0.7)
+                    & (puts['ltp'] > 50)
+                )
+                
+                for i in candidates:
+                    strike = float(columns.strikes[i])
+                    put_data = puts_dict[strike_key(strike)]
                     
                     # Extract data for PUT
                     gamma = put_data.get('gamma', 0)
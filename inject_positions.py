@@ -137,8 +137,8 @@ async def inject_positions():
                     }
                 }
                 
-                # Add to order manager's positions
-                trading_system.order_manager.positions.append(position)
+                # Add to order manager's position book (positions is a read-only list)
+                trading_system.order_manager.position_book.add(position)
                 
                 # Also add to risk manager's positions
                 if hasattr(trading_system, 'risk_manager') and trading_system.risk_manager:
@@ -79,7 +79,7 @@ async def test_data_freshness():
         print("\n📊 Testing Option Chain Freshness...")
         
         # Test SENSEX option chain freshness
-        expiry = market_data_manager._get_current_weekly_expiry(symbol)
+        expiry = market_data_manager.calendar.current_expiry(symbol)
         fresh_chains = 0
         stale_chains = 0
         
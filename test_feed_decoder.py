@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the protobuf feed decoder and FeedTick records
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from google.protobuf.json_format import MessageToDict
+
+from backend.data.feed_decoder import FeedTick, decode_feed_response, extract_ltp
+from backend.data.proto import MarketDataFeedV3_pb2 as pb
+
+OPTION_KEY = "NSE_FO|45001"
+INDEX_KEY = "NSE_INDEX|Nifty 50"
+LTPC_KEY = "NSE_EQ|INE002A01018"
+
+
+def build_frame() -> bytes:
+    """One V3 frame with an option (marketFF), an index (indexFF) and an ltpc-mode feed"""
+    response = pb.FeedResponse()
+
+    market_ff = response.feeds[OPTION_KEY].fullFeed.marketFF
+    market_ff.ltpc.ltp = 125.5
+    market_ff.ltpc.ltt = 1760000000000
+    market_ff.ltpc.ltq = 75
+    market_ff.ltpc.cp = 120.0
+    market_ff.vtt = 150000
+    market_ff.oi = 42000
+    market_ff.iv = 0.145
+    market_ff.atp = 123.4
+    market_ff.tbq = 9000
+    market_ff.tsq = 8000
+    for bid_p, ask_p in ((125.0, 126.0), (124.5, 126.5)):
+        quote = market_ff.marketLevel.bidAskQuote.add()
+        quote.bidP, quote.bidQ, quote.askP, quote.askQ = bid_p, 150, ask_p, 225
+    market_ff.optionGreeks.delta = 0.52
+    market_ff.optionGreeks.gamma = 0.0012
+    market_ff.optionGreeks.theta = -8.5
+    market_ff.optionGreeks.vega = 11.2
+    market_ff.optionGreeks.rho = 0.9
+
+    response.feeds[INDEX_KEY].fullFeed.indexFF.ltpc.ltp = 25012.35
+
+    response.feeds[LTPC_KEY].ltpc.ltp = 1410.2
+    response.feeds[LTPC_KEY].ltpc.cp = 1400.0
+
+    return response.SerializeToString()
+
+
+def test_option_full_feed():
+    """marketFF fields land on the tick; Greeks and top-of-book come from the protobuf"""
+    tick = decode_feed_response(build_frame(), received_at=1760000000.0)[OPTION_KEY]
+
+    assert isinstance(tick, FeedTick)
+    assert tick.mode == 'fullFeed'
+    assert tick.ltp == 125.5 and tick.close_price == 120.0
+    assert tick.ltt == 1760000000000 and tick.ltq == 75
+    assert tick.volume == 150000 and tick.oi == 42000
+    assert abs(tick.iv - 0.145) < 1e-9
+    assert tick.total_buy_qty == 9000 and tick.total_sell_qty == 8000
+    assert (tick.bid_price, tick.bid_qty, tick.ask_price, tick.ask_qty) == (125.0, 150, 126.0, 225)
+    assert abs(tick.delta - 0.52) < 1e-9 and tick.theta == -8.5
+    assert tick.depth == ((125.0, 150, 126.0, 225), (124.5, 150, 126.5, 225))
+    assert tick.received_at == 1760000000.0
+    print("   ✅ Option marketFF decoded into FeedTick")
+
+
+def test_index_full_feed():
+    """V3 index frames use fullFeed.indexFF; no Greeks or depth"""
+    tick = decode_feed_response(build_frame())[INDEX_KEY]
+
+    assert tick.mode == 'fullFeed'
+    assert tick.ltp == 25012.35
+    assert tick.delta is None and tick.volume is None
+    assert tick.depth == ()
+    print("   ✅ Index LTP read from indexFF")
+
+
+def test_ltpc_feed():
+    """ltpc-mode feeds carry only LTP/close"""
+    tick = decode_feed_response(build_frame())[LTPC_KEY]
+
+    assert tick.mode == 'ltpc'
+    assert tick.ltp == 1410.2 and tick.close_price == 1400.0
+    assert tick.bid_price is None
+    print("   ✅ ltpc-mode feed decoded")
+
+
+def test_dict_style_access():
+    """get()/[]/in behave like the old feed dicts"""
+    ticks = decode_feed_response(build_frame())
+    option, index = ticks[OPTION_KEY], ticks[INDEX_KEY]
+
+    assert option.get('ltp') == 125.5
+    assert index.get('delta', 0) == 0
+    assert index.get('not_a_field', 'x') == 'x'
+    assert 'delta' in option and 'delta' not in index
+    assert option['oi'] == 42000
+    try:
+        index['delta']
+        assert False, "missing field should raise KeyError"
+    except KeyError:
+        pass
+    print("   ✅ Dict-style access matches the old feed dicts")
+
+
+def test_to_dict_matches_message_to_dict():
+    """to_dict() gives the same tree MessageToDict built before"""
+    response = pb.FeedResponse()
+    response.ParseFromString(build_frame())
+    ticks = decode_feed_response(build_frame())
+
+    for key, feed in response.feeds.items():
+        assert ticks[key].to_dict() == MessageToDict(feed)
+    print("   ✅ to_dict() matches MessageToDict")
+
+
+def test_extract_ltp():
+    """extract_ltp handles FeedTicks and legacy dicts alike"""
+    ticks = decode_feed_response(build_frame())
+
+    for key, tick in ticks.items():
+        assert extract_ltp(tick) == tick.ltp
+        assert extract_ltp(tick.to_dict()) == tick.ltp
+    assert extract_ltp({"ff": {"indexFF": {"ltpc": {"ltp": 100.5}}}}) == 100.5
+    assert extract_ltp({"ltp": 7}) == 7.0
+    assert extract_ltp({}) is None
+    print("   ✅ extract_ltp works on ticks and dicts")
+
+
+def test_empty_frame():
+    """A frame with no feeds decodes to nothing"""
+    assert decode_feed_response(pb.FeedResponse().SerializeToString()) == {}
+    print("   ✅ Empty frame decodes to no ticks")
+
+
+if __name__ == "__main__":
+    print("Testing feed decoder...")
+    print("=" * 50)
+    test_option_full_feed()
+    test_index_full_feed()
+    test_ltpc_feed()
+    test_dict_style_access()
+    test_to_dict_matches_message_to_dict()
+    test_extract_ltp()
+    test_empty_frame()
+    print("\n✅ All feed decoder checks passed")
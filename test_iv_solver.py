@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the vectorized implied volatility solver edge cases
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from backend.data.greeks import black_scholes, implied_volatility
+
+SPOT = 25000.0
+
+
+def test_round_trip():
+    """Prices from known sigmas solve back to those sigmas across the chain"""
+    strikes = np.arange(22000, 28001, 250, dtype=float)
+    for t in (1 / 365, 7 / 365, 30 / 365):
+        for sigma in (0.08, 0.15, 0.40):
+            is_call = strikes >= SPOT
+            prices = black_scholes(SPOT, strikes, t, sigma, is_call)['price']
+            quoted = prices > 0.05  # Sub-tick prices do not pin sigma down
+            iv, ok = implied_volatility(prices[quoted], SPOT, strikes[quoted], t, is_call[quoted])
+            assert ok.all(), f"not converged: t={t} sigma={sigma}"
+            assert np.abs(iv - sigma).max() < 1e-3, f"t={t} sigma={sigma}: {iv}"
+    print("   ✅ Round trip within 0.1 vol point")
+
+
+def test_sub_tick_price():
+    """A far OTM price below the absolute tolerance must not converge at the starting sigma"""
+    iv, ok = implied_volatility([5e-5], SPOT, [28000], [2 / 365], [True])
+    assert not (ok[0] and abs(iv[0] - 0.2) < 1e-6), f"returned the initial guess: {iv[0]}"
+    if ok[0]:
+        model = black_scholes(SPOT, 28000, 2 / 365, iv[0], True)['price']
+        assert abs(model - 5e-5) < 1e-6
+    print(f"   ✅ 5e-5 call: sigma={iv[0]:.4f} converged={ok[0]}")
+
+
+def test_zero_vega():
+    """Options whose price does not move with sigma are reported as not converged"""
+    iv, ok = implied_volatility([1e-12], SPOT, [28000], [2 / 365], [True])
+    assert not ok[0] and np.isnan(iv[0])
+    print("   ✅ Flat-vega option not converged")
+
+
+def test_no_arbitrage_bounds():
+    """Prices at or below intrinsic or above the upper bound have no solution"""
+    t = 7 / 365
+    prices = [0.0, 900.0, SPOT + 1, -5.0, np.nan]
+    strikes = [25000, 24000, 25000, 25000, 25000]
+    iv, ok = implied_volatility(prices, SPOT, strikes, t, [True] * 5)
+    assert not ok.any() and np.isnan(iv).all()
+    print("   ✅ Out-of-bounds prices rejected")
+
+
+def test_expired_option():
+    """t = 0 is floored instead of dividing by zero"""
+    iv, ok = implied_volatility([10.0], SPOT, [25000], [0.0], [True])
+    assert iv.shape == (1,) and ok.shape == (1,)
+    print(f"   ✅ Expiry-day option: sigma={iv[0]} converged={ok[0]}")
+
+
+def test_initial_guess():
+    """A broker IV seed gives the same answer as the default seed"""
+    strikes = np.array([24500.0, 25000.0, 25500.0])
+    prices = black_scholes(SPOT, strikes, 7 / 365, 0.14, strikes >= SPOT)['price']
+    seeded, ok_seeded = implied_volatility(prices, SPOT, strikes, 7 / 365, strikes >= SPOT, initial=[0.3, np.nan, 9.0])
+    plain, ok_plain = implied_volatility(prices, SPOT, strikes, 7 / 365, strikes >= SPOT)
+    assert ok_seeded.all() and ok_plain.all()
+    assert np.abs(seeded - plain).max() < 1e-4
+    print("   ✅ Seeded and unseeded solves agree")
+
+
+if __name__ == "__main__":
+    print("Testing implied volatility solver...")
+    print("=" * 50)
+    test_round_trip()
+    test_sub_tick_price()
+    test_zero_vega()
+    test_no_arbitrage_bounds()
+    test_expired_option()
+    test_initial_guess()
+    print("\n✅ All IV solver checks passed")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test script to verify market replay request matching across recording days
+"""
+
+import sys
+from datetime import date, datetime
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from backend.core.timezone_utils import IST
+from backend.data.market_recorder import encode_rest
+from backend.data.market_replay import RecordedResponses, request_key
+
+CHAIN_PARAMS = {'instrument_key': 'NSE_INDEX|Nifty 50', 'expiry_date': '2026-10-20'}
+
+
+def test_request_key_rewrites_dates():
+    """Dates become day offsets from the request day; expiries match any expiry"""
+    recorded = request_key('GET', '/v2/historical-candle/NSE_INDEX|Nifty 50/day/2026-10-15/2026-09-15', None, None, date(2026, 10, 15))
+    replayed = request_key('GET', '/v2/historical-candle/NSE_INDEX|Nifty 50/day/2026-10-16/2026-09-16', None, None, date(2026, 10, 16))
+    assert recorded == replayed and '{d+0}' in recorded and '{d-30}' in recorded
+
+    chain = request_key('GET', '/v2/option/chain', CHAIN_PARAMS, None, date(2026, 10, 15))
+    later_expiry = request_key('GET', '/v2/option/chain', {**CHAIN_PARAMS, 'expiry_date': '2026-10-27'}, None, date(2026, 10, 16))
+    other_underlying = request_key('GET', '/v2/option/chain', {**CHAIN_PARAMS, 'instrument_key': 'BSE_INDEX|SENSEX'}, None, date(2026, 10, 15))
+    assert chain == later_expiry and chain != other_underlying
+    print("   ✅ Candle date ranges and expiries normalised")
+
+
+def test_request_key_without_day_is_exact():
+    """Without a request day the key is the literal request; param order does not matter"""
+    a = request_key('get', '/v2/option/chain', CHAIN_PARAMS, None)
+    b = request_key('GET', '/v2/option/chain', dict(reversed(list(CHAIN_PARAMS.items()))), None)
+    c = request_key('GET', '/v2/option/chain', {**CHAIN_PARAMS, 'expiry_date': '2026-10-27'}, None)
+    assert a == b and a != c
+    assert request_key('GET', '/x', {'note': '2026-13-45'}, None, date(2026, 10, 15)).count('2026-13-45') == 1  # Not a date
+    print("   ✅ Exact keys without a request day")
+
+
+def test_lookup_never_answers_from_the_future():
+    """The latest response at or before the replay clock; None before the first one"""
+    responses = RecordedResponses()
+    t0 = datetime(2026, 10, 15, 10, 0, tzinfo=IST).timestamp()
+    for i in range(3):
+        responses.add(t0 + 60 * i, encode_rest('GET', '/v2/option/chain', CHAIN_PARAMS, None, {'n': i}))
+
+    today = date(2026, 10, 16)
+    params = {**CHAIN_PARAMS, 'expiry_date': '2026-10-27'}
+    assert responses.lookup('GET', '/v2/option/chain', params, None, t0 - 1, today) is None
+    assert responses.lookup('GET', '/v2/option/chain', params, None, t0, today) == {'n': 0}
+    assert responses.lookup('GET', '/v2/option/chain', params, None, t0 + 90, today) == {'n': 1}
+    assert responses.lookup('GET', '/v2/option/chain', params, None, t0 + 3600, today) == {'n': 2}
+    assert (responses.hits, responses.misses) == (3, 1)
+    print("   ✅ Lookups honour the replay clock")
+
+
+if __name__ == "__main__":
+    print("Testing market replay request matching...")
+    print("=" * 50)
+    test_request_key_rewrites_dates()
+    test_request_key_without_day_is_exact()
+    test_lookup_never_answers_from_the_future()
+    print("\n✅ All market replay checks passed")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test script to verify vectorized max pain against the brute-force double loop
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from backend.data.max_pain import max_pain_curve
+
+
+def brute_force(strikes, call_oi, put_oi):
+    """Writer payout at every strike, O(n^2)"""
+    oi = {}
+    for strike, c, p in zip(strikes, call_oi, put_oi):
+        total = oi.setdefault(float(strike), [0.0, 0.0])
+        total[0] += c
+        total[1] += p
+    candidates = sorted(oi)
+    pain = []
+    for expiry_price in candidates:
+        total = 0.0
+        for strike in candidates:
+            call, put = oi[strike]
+            if strike < expiry_price:
+                total += (expiry_price - strike) * call
+            elif strike > expiry_price:
+                total += (strike - expiry_price) * put
+        pain.append(total)
+    best = candidates[int(np.argmin(pain))] if candidates else 0.0
+    return best, np.array(candidates), np.array(pain)
+
+
+def test_random_chains():
+    """Sorted, shuffled and duplicated strike rows match the double loop"""
+    rng = np.random.default_rng(7)
+    for _ in range(200):
+        n = int(rng.integers(1, 80))
+        strikes = 20000 + 50 * rng.choice(200, size=n, replace=False)
+        call_oi = rng.integers(0, 500000, size=n).astype(float)
+        put_oi = rng.integers(0, 500000, size=n).astype(float)
+
+        if rng.random() < 0.5:
+            # One row per CE/PE, shuffled
+            rows = rng.permutation(2 * n)
+            strikes = np.concatenate([strikes, strikes])[rows]
+            call_oi, put_oi = (np.concatenate([call_oi, np.zeros(n)])[rows],
+                               np.concatenate([np.zeros(n), put_oi])[rows])
+
+        expected_strike, expected_strikes, expected_pain = brute_force(strikes, call_oi, put_oi)
+        result = max_pain_curve(strikes, call_oi, put_oi)
+        assert result.strike == expected_strike, (result.strike, expected_strike)
+        assert np.array_equal(result.strikes, expected_strikes)
+        assert np.allclose(result.pain, expected_pain, rtol=1e-12, atol=1e-6)
+    print("   ✅ 200 random chains match the brute force")
+
+
+def test_edge_cases():
+    """Empty chain, single strike and ties"""
+    assert max_pain_curve([], [], []).strike == 0.0
+    assert max_pain_curve([25000], [100], [200]).strike == 25000.0
+    # Zero OI everywhere: every strike ties, lowest wins
+    assert max_pain_curve([25100, 25000, 25200], [0, 0, 0], [0, 0, 0]).strike == 25000.0
+    print("   ✅ Empty, single-strike and tied chains")
+
+
+if __name__ == "__main__":
+    print("Testing max pain...")
+    print("=" * 50)
+    test_random_chains()
+    test_edge_cases()
+    print("\n✅ All max pain checks passed")
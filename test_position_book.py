@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test script to verify PositionBook indexing on add, remove and re-index
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from backend.execution.position_book import PositionBook
+
+
+def make_position(position_id, instrument_key, strategy='gamma_scalping', symbol='NIFTY', **fields):
+    return {
+        'id': position_id,
+        'instrument_key': instrument_key,
+        'strategy_name': strategy,
+        'symbol': symbol,
+        **fields
+    }
+
+
+def test_add_and_lookup():
+    """Positions are found by id and every secondary index"""
+    book = PositionBook()
+    a = make_position('a', 'NSE_FO|1')
+    b = make_position('b', 'NSE_FO|1', strategy='vwap_deviation')
+    c = make_position('c', 'BSE_FO|2', symbol='SENSEX')
+    for position in (a, b, c):
+        book.add(position)
+
+    assert len(book) == 3 and book.all() == [a, b, c]
+    assert book.get('b') is b and 'c' in book
+    assert book.by_instrument('NSE_FO|1') == [a, b]
+    assert book.by_strategy('gamma_scalping') == [a, c]
+    assert book.by_underlying('SENSEX') == [c]
+    assert book.has_instrument('BSE_FO|2') and not book.has_instrument('NSE_FO|9')
+    print("   ✅ Lookups by id, instrument, strategy and underlying")
+
+
+def test_remove():
+    """Removing a position clears it from every index and drops empty buckets"""
+    book = PositionBook()
+    a = make_position('a', 'NSE_FO|1')
+    b = make_position('b', 'NSE_FO|1')
+    book.add(a)
+    book.add(b)
+
+    assert book.remove('a') is a
+    assert book.by_instrument('NSE_FO|1') == [b] and book.get('a') is None
+    assert book.remove('b') is b
+    assert not book.has_instrument('NSE_FO|1') and book.by_strategy('gamma_scalping') == []
+    assert book.remove('missing') is None and len(book) == 0
+    print("   ✅ Remove clears every index")
+
+
+def test_reindex_after_edit():
+    """A position edited in place is re-indexed by add() without stale entries"""
+    book = PositionBook()
+    position = make_position('a', 'NSE_FO|1')
+    book.add(position)
+
+    # Rolled to another contract and strategy
+    position['instrument_key'] = 'NSE_FO|2'
+    position['strategy_name'] = 'iron_condor'
+    book.add(position)
+
+    assert len(book) == 1
+    assert not book.has_instrument('NSE_FO|1') and book.by_instrument('NSE_FO|2') == [position]
+    assert book.by_strategy('gamma_scalping') == [] and book.by_strategy('iron_condor') == [position]
+
+    # Edited again without re-indexing: remove still clears the indexed values
+    position['instrument_key'] = 'NSE_FO|3'
+    book.remove('a')
+    assert not book.has_instrument('NSE_FO|2') and not book.has_instrument('NSE_FO|3')
+    print("   ✅ Re-index after edits leaves no stale entries")
+
+
+def test_restored_position_aliases():
+    """Positions restored from the database only carry 'position_id'"""
+    book = PositionBook()
+    restored = {'position_id': 'db-1', 'instrument_key': 'NSE_FO|1', 'strategy': 'gamma_scalping', 'symbol': 'NIFTY'}
+    book.add(restored)
+    assert book.get('db-1') is restored and book.by_strategy('gamma_scalping') == [restored]
+
+    # Once it is also given an 'id', either identity finds it
+    restored['id'] = 'live-1'
+    book.add(restored)
+    assert len(book) == 1 and book.get('live-1') is restored and book.get('db-1') is restored
+
+    book.replace([make_position('x', 'NSE_FO|5')])
+    assert 'db-1' not in book and 'live-1' not in book and book.get('x') is not None
+    assert book.add({'instrument_key': 'NSE_FO|6'}) is None and len(book) == 1
+    print("   ✅ 'id' / 'position_id' aliases and replace()")
+
+
+def test_update_keeps_entry_order():
+    """Re-adding or re-keying a position keeps its place in entry order"""
+    book = PositionBook()
+    a = make_position('a', 'NSE_FO|1')
+    b = {'position_id': 'db-b', 'instrument_key': 'NSE_FO|2', 'strategy': 'gamma_scalping', 'symbol': 'NIFTY'}
+    c = make_position('c', 'NSE_FO|3')
+    for position in (a, b, c):
+        book.add(position)
+
+    a['instrument_key'] = 'NSE_FO|9'
+    book.add(a)
+    b['id'] = 'live-b'
+    book.add(b)
+
+    assert book.all() == [a, b, c] and list(book) == [a, b, c]
+    assert book.by_instrument('NSE_FO|9') == [a] and book.get('live-b') is b
+    print("   ✅ Updates keep entry order")
+
+
+if __name__ == "__main__":
+    print("Testing position book...")
+    print("=" * 50)
+    test_add_and_lookup()
+    test_remove()
+    test_reindex_after_edit()
+    test_restored_position_aliases()
+    test_update_keeps_entry_order()
+    print("\n✅ All position book checks passed")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the Upstox rate limiter's priority queue and 429 adaptation
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from backend.safety.rate_limiter import Priority, RateLimiter
+
+
+def test_priority_order():
+    """Queued callers are granted in priority order, not arrival order"""
+    async def run():
+        limiter = RateLimiter(budgets={'account': (20.0, 1), 'other': (100.0, 10)})
+        await limiter.acquire('other')  # Use up the only account token
+
+        granted = []
+
+        async def caller(priority):
+            await limiter.acquire('other', priority)
+            granted.append(priority)
+
+        arrivals = [Priority.DASHBOARD, Priority.ANALYTICS, Priority.EXIT, Priority.TRADING, Priority.ORDER]
+        await asyncio.gather(*(caller(priority) for priority in arrivals))
+        return granted
+
+    granted = asyncio.run(run())
+    assert granted == sorted(granted), granted
+    print(f"   ✅ Granted in order: {[priority.name for priority in granted]}")
+
+
+def test_family_budget_does_not_block_others():
+    """A waiter blocked only by its own family lets other families through"""
+    async def run():
+        limiter = RateLimiter(budgets={'account': (100.0, 10), 'historical': (1.0, 1), 'quotes': (100.0, 10)})
+        await limiter.acquire('historical')
+        started = time.monotonic()
+        slow = asyncio.create_task(limiter.acquire('historical', Priority.EXIT))
+        await asyncio.sleep(0)
+        await limiter.acquire('quotes', Priority.DASHBOARD)
+        quote_wait = time.monotonic() - started
+        slow.cancel()
+        return quote_wait
+
+    quote_wait = asyncio.run(run())
+    assert quote_wait < 0.2, quote_wait
+    print(f"   ✅ Quotes served in {quote_wait * 1000:.0f}ms behind a blocked historical call")
+
+
+def test_backoff_on_429():
+    """A 429 halves the family and account rates and pauses both, doubling per repeat"""
+    limiter = RateLimiter(backoff_base=1.0, max_backoff_seconds=8.0, min_rate_fraction=0.1)
+    quotes, account = limiter.buckets['quotes'], limiter.buckets['account']
+
+    pauses = [limiter.on_rate_limited('quotes') for _ in range(5)]
+    assert pauses == [1.0, 2.0, 4.0, 8.0, 8.0], pauses
+    assert quotes.rate == quotes.base_rate * 0.1  # Floored at min_rate_fraction
+    assert account.paused_until > time.monotonic() + 7
+    assert limiter.rate_limited['quotes'] == 5
+
+    assert limiter.on_rate_limited('orders', retry_after=3) == 3.0
+    assert limiter.on_rate_limited('orders', retry_after=120) == 8.0
+    print(f"   ✅ Backoff pauses {pauses}, Retry-After honoured and capped")
+
+
+def test_recovery_after_429():
+    """Rates climb back by 25% of base per recovery interval after success"""
+    limiter = RateLimiter(recovery_interval=0.0)
+    quotes = limiter.buckets['quotes']
+    limiter.on_rate_limited('quotes')
+    assert quotes.rate == quotes.base_rate / 2
+
+    steps = []
+    while quotes.rate < quotes.base_rate:
+        limiter.on_success('quotes')
+        steps.append(quotes.rate)
+    assert steps == [quotes.base_rate * 0.75, quotes.base_rate], steps
+    assert quotes.consecutive_429s == 0
+    print(f"   ✅ Recovered to {quotes.rate}/s in {len(steps)} steps")
+    assert limiter.on_rate_limited('quotes') == 1.0  # Backoff starts over
+
+
+def test_recovery_waits_for_interval():
+    """No recovery step before recovery_interval has passed"""
+    limiter = RateLimiter(recovery_interval=60.0)
+    quotes = limiter.buckets['quotes']
+    limiter.on_rate_limited('quotes')
+    limiter.on_success('quotes')
+    assert quotes.rate == quotes.base_rate / 2
+    print("   ✅ Rate held until the recovery interval passes")
+
+
+class UnreachableRedis:
+    """RedisTokenBuckets stand-in whose Redis is down (or comes back)"""
+    available = False
+    reply = None
+
+    async def take(self, budgets):
+        return self.reply
+
+    def take_blocking(self, budgets):
+        return self.reply
+
+
+def test_fallback_share_when_redis_down_from_startup():
+    """Local budgets drop to fallback_share even if Redis was never reached"""
+    async def run():
+        shared = UnreachableRedis()
+        limiter = RateLimiter(shared=shared, fallback_share=0.25)
+        await limiter.acquire('quotes')
+        down = (limiter.fallback_active, {bucket.share for bucket in limiter.buckets.values()})
+
+        shared.reply = (0.0, 0)  # Redis answers
+        await limiter.acquire('quotes')
+        up = (limiter.fallback_active, {bucket.share for bucket in limiter.buckets.values()})
+        return down, up
+
+    down, up = asyncio.run(run())
+    assert down == (True, {0.25}), down
+    assert up == (False, {1.0}), up
+    print("   ✅ Reduced share while Redis is unreachable from startup, full once it answers")
+
+
+def test_blocking_fallback_when_redis_down():
+    """The synchronous path applies the same fallback"""
+    limiter = RateLimiter(shared=UnreachableRedis(), fallback_share=0.5)
+    limiter.acquire_blocking('quotes')
+    assert limiter.fallback_active and limiter.buckets['account'].share == 0.5
+    print("   ✅ Blocking acquire falls back too")
+
+
+if __name__ == "__main__":
+    print("Testing rate limiter...")
+    print("=" * 50)
+    test_priority_order()
+    test_family_budget_does_not_block_others()
+    test_backoff_on_429()
+    test_recovery_after_429()
+    test_recovery_waits_for_interval()
+    test_fallback_share_when_redis_down_from_startup()
+    test_blocking_fallback_when_redis_down()
+    print("\n✅ All rate limiter checks passed")
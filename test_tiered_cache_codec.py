@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the L2 cache codec round-trips values without pickle
+"""
+
+import pickle
+import sys
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from backend.cache.tiered_cache import decode_value, encode_value
+from backend.core.timezone_utils import IST
+from backend.data.option_chain import OptionChainColumns
+
+
+def make_chain():
+    """Columnar chain views plus the scalar fields MarketDataManager caches with them"""
+    raw = [
+        {
+            'strike_price': strike,
+            'call_options': {'instrument_key': f'NSE_FO|C{strike}', 'market_data': {'ltp': 100 + strike / 1000, 'oi': 10, 'close_price': 90}},
+            'put_options': {'instrument_key': f'NSE_FO|P{strike}', 'market_data': {'ltp': 80, 'oi': 20}}
+        }
+        for strike in range(24000, 26001, 50)
+    ]
+    columns, _ = OptionChainColumns.from_upstox(raw)
+    return columns, {
+        **columns.to_legacy(),
+        'pcr': np.float64(1.2),
+        'max_pain': 25000.0,
+        'fetch_time': datetime(2026, 10, 15, 10, 30, tzinfo=IST),
+        'expiry': date(2026, 10, 20),
+        'strikes_by_oi': {25000: 'atm', (24900, 25100): [1, 2]},
+    }
+
+
+def test_option_chain_round_trip():
+    """Chain columns, shared views, datetimes and non-string keys survive the round trip"""
+    columns, chain = make_chain()
+    data = encode_value(chain, 123.5)
+    value, stored_at = decode_value(data)
+
+    assert stored_at == 123.5
+    assert value['calls'].columns is value['puts'].columns  # Stored once, shared again
+    assert np.array_equal(value['calls'].columns.strikes, columns.strikes)
+    assert np.array_equal(value['calls'].columns.calls.values, columns.calls.values)
+    assert np.array_equal(value['puts'].columns.puts.present, columns.puts.present)
+    assert list(value['calls'].columns.calls.instrument_keys) == list(columns.calls.instrument_keys)
+    assert dict(value['calls']['25000']) == dict(chain['calls']['25000'])
+    assert value['pcr'] == 1.2 and value['max_pain'] == 25000.0
+    assert value['fetch_time'] == chain['fetch_time'] and value['expiry'] == chain['expiry']
+    assert value['strikes_by_oi'] == chain['strikes_by_oi']
+
+    # Decoded arrays are copies the caller may write to
+    value['calls'].set_column('high', np.ones(len(columns.strikes)))
+    print(f"   ✅ Option chain round trip ({len(data)} bytes)")
+
+
+def test_scalars_and_compression():
+    """Small values stay raw, large ones are compressed; both decode"""
+    small = encode_value(25012.5, 1.0)
+    large = encode_value({'rows': list(range(5000))}, 2.0)
+    assert small[:1] == b'J' and large[:1] == b'Z'
+    assert decode_value(small) == (25012.5, 1.0)
+    assert decode_value(large)[0] == {'rows': list(range(5000))}
+    print("   ✅ Raw and zlib payloads")
+
+
+def test_unsupported_values_rejected():
+    """Objects without a safe encoding raise instead of being pickled"""
+    for value in (object(), np.array([object()]), {'x': {1, 2}}):
+        try:
+            encode_value(value, 0.0)
+        except TypeError:
+            continue
+        raise AssertionError(f"encoded {value!r}")
+    print("   ✅ Unsupported values raise TypeError")
+
+
+def test_pickle_payload_rejected():
+    """A pickle planted in Redis is never unpickled"""
+    for codec in (b'P', b'J'):
+        try:
+            decode_value(codec + b'\0' * 8 + pickle.dumps({'x': 1}))
+        except Exception:
+            continue
+        raise AssertionError(f"decoded a pickle with codec {codec!r}")
+    print("   ✅ Pickle payloads rejected")
+
+
+if __name__ == "__main__":
+    print("Testing L2 cache codec...")
+    print("=" * 50)
+    test_option_chain_round_trip()
+    test_scalars_and_compression()
+    test_unsupported_values_rejected()
+    test_pickle_payload_rejected()
+    print("\n✅ All L2 codec checks passed")
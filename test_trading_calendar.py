@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test script to verify TradingCalendar expiries, holiday shifts and sessions
+"""
+
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from backend.core.timezone_utils import IST
+from backend.data.instrument_master import InstrumentMaster
+from backend.data.trading_calendar import TradingCalendar
+
+
+def ist(*args) -> datetime:
+    return datetime(*args, tzinfo=IST)
+
+
+def rule_calendar() -> TradingCalendar:
+    """Calendar on the weekly/monthly rules (no instrument master loaded)"""
+    empty = tempfile.mkdtemp()
+    calendar = TradingCalendar(InstrumentMaster(index_dir=empty), holidays_file=f"{empty}/none.json")
+    calendar.build(2026)
+    return calendar
+
+
+class ListedExpiries:
+    """Instrument master stand-in with listed expiries"""
+    index_date = '2026-10-15'
+
+    def expiries(self, symbol):
+        return ['2026-10-21', '2026-10-28'] if symbol == 'NIFTY' else []
+
+
+def test_weekly_expiries():
+    """NIFTY expires on Tuesdays, SENSEX on Thursdays"""
+    calendar = rule_calendar()
+    assert calendar.current_expiry('NIFTY', ist(2026, 10, 6, 10, 0)) == '2026-10-06'
+    assert calendar.current_expiry('SENSEX', ist(2026, 10, 6, 10, 0)) == '2026-10-08'
+    assert calendar.current_expiry('BANKNIFTY', ist(2026, 10, 6, 10, 0)) == '2026-10-29'  # Last Thursday
+    print("   ✅ Weekly and monthly rules")
+
+
+def test_holiday_shift():
+    """An expiry on an exchange holiday moves to the previous trading day"""
+    calendar = rule_calendar()
+    # Tuesday 2026-10-20 is Dussehra
+    assert calendar.current_expiry('NIFTY', ist(2026, 10, 15, 10, 0)) == '2026-10-19'
+    assert calendar.days_to_expiry('NIFTY', ist(2026, 10, 15, 10, 0)) == 4
+    # Thursday 2026-03-26 is Shri Ram Navami
+    assert calendar.current_expiry('SENSEX', ist(2026, 3, 23, 10, 0)) == '2026-03-25'
+    assert calendar.holiday(ist(2026, 10, 20, 12, 0)) == 'Dussehra'
+    assert not calendar.is_trading_day(ist(2026, 10, 20, 12, 0))
+    print("   ✅ Holiday expiries moved to the previous trading day")
+
+
+def test_rolls_after_settlement():
+    """On expiry day the contract is current until the 15:30 settlement"""
+    calendar = rule_calendar()
+    assert calendar.current_expiry('NIFTY', ist(2026, 10, 19, 15, 29)) == '2026-10-19'
+    assert calendar.current_expiry('NIFTY', ist(2026, 10, 19, 15, 31)) == '2026-10-27'
+    minutes_left = calendar.time_to_expiry_years('NIFTY', ist(2026, 10, 19, 15, 0)) * 365 * 24 * 60
+    assert abs(minutes_left - 30) < 1e-6, minutes_left
+    # Across the year end
+    assert calendar.current_expiry('NIFTY', ist(2026, 12, 30, 10, 0)) == '2027-01-05'
+    print("   ✅ Rolls to the next expiry at settlement and across years")
+
+
+def test_listed_expiries_win():
+    """Expiries from the instrument master replace the rules"""
+    calendar = TradingCalendar(ListedExpiries(), holidays_file="/nonexistent.json")
+    calendar.build(2026)
+    assert calendar.current_expiry('NIFTY', ist(2026, 10, 15, 10, 0)) == '2026-10-21'
+    assert calendar.expiries('NIFTY', after='2026-10-21') == ['2026-10-28']
+    assert calendar.current_expiry('SENSEX', ist(2026, 10, 15, 10, 0)) == '2026-10-15'  # Rules as fallback
+    print("   ✅ Listed expiries override the rules")
+
+
+def test_sessions():
+    """Session and trading-window bounds on trading days, weekends and holidays"""
+    calendar = rule_calendar()
+    assert calendar.is_session_open(ist(2026, 10, 15, 9, 15))
+    assert not calendar.is_session_open(ist(2026, 10, 15, 15, 30))
+    assert calendar.is_trading_window(ist(2026, 10, 15, 15, 25))
+    assert not calendar.is_trading_window(ist(2026, 10, 15, 15, 26))
+    assert calendar.session(ist(2026, 10, 17, 10, 0)) is None  # Saturday
+    assert not calendar.is_session_open(ist(2026, 10, 20, 10, 0))  # Holiday
+    print("   ✅ Sessions, cutoff, weekends and holidays")
+
+
+if __name__ == "__main__":
+    print("Testing trading calendar...")
+    print("=" * 50)
+    test_weekly_expiries()
+    test_holiday_shift()
+    test_rolls_after_settlement()
+    test_listed_expiries_win()
+    test_sessions()
+    print("\n✅ All trading calendar checks passed")
@@ -8,8 +8,13 @@ import pandas as pd
 from datetime import datetime, timedelta
 from typing import Dict, Tuple, Optional
 import subprocess
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.data.max_pain import max_pain_curve
+
 class QuantumEdgeFeatureEngineer:
     """
     Extracts 34-dimensional feature vector from option chain snapshots
@@ -349,17 +354,15 @@ class QuantumEdgeFeatureEngineer:
         if len(strikes) == 0:
             return df['spot'].iloc[0]
         
-        pain = {}
-        for strike in strikes:
-            call_pain = df[(df['option_type'] == 'CE') & (df['strike'] < strike)]
-            put_pain = df[(df['option_type'] == 'PE') & (df['strike'] > strike)]
-            
-            call_loss = ((strike - call_pain['strike']) * call_pain['oi']).sum()
-            put_loss = ((put_pain['strike'] - strike) * put_pain['oi']).sum()
-            
-            pain[strike] = call_loss + put_loss
+        is_call = (df['option_type'] == 'CE').to_numpy()
+        is_put = (df['option_type'] == 'PE').to_numpy()
+        oi = df['oi'].to_numpy(dtype=np.float64)
         
-        return min(pain, key=pain.get) if pain else df['spot'].iloc[0]
+        return max_pain_curve(
+            df['strike'].to_numpy(dtype=np.float64),
+            np.where(is_call, oi, 0.0),
+            np.where(is_put, oi, 0.0)
+        ).strike
     
     def extract_features_batch(
         self, 